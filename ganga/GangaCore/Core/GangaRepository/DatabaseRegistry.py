@@ -251,6 +251,7 @@ class Registry(object):
         "location",
         "repository",
         "flush_thread",
+        "write_thread",
         "_parent",
         "_objects",
         "_read_lock",
@@ -279,6 +280,7 @@ class Registry(object):
         self._incomplete_objects = None
 
         self.flush_thread = None
+        self.write_thread = None
 
     def hasStarted(self):
         """
@@ -485,6 +487,15 @@ class Registry(object):
                 self.repository.flush([obj_id])
                 obj._setFlushed()
 
+    def _schedule_flush(self, objs):
+        """
+        There is no writer thread for the database, the objects are left dirty to be flushed by the next ``flush_all``
+
+        Args:
+            objs (list): a list of objects to flush
+        """
+        pass
+
     def flush_all(self):
         """
         This will attempt to flush all the jobs in the registry.
@@ -0,0 +1,275 @@
+"""
+Storage of subjobs as their differences to a template made from the master job.
+
+The subjobs of a job mostly repeat the configuration of their master: the application, the backend, the output
+files and so on. With [Registry]SubJobDeltaStorage enabled, the XML of the master job is written once, when its
+subjobs are first written, to the 'subjobs.template' file of the job, leaving out the subjobs and the attributes
+which change while the job runs. Every subjob is then written as the lines of its XML which are not in the template:
+
+    #GangaDelta 1 <sha1 of the template>
+    =<first line>,<number of lines>      lines copied from the template
+    +<line>                              line of the XML of the subjob
+    -<line>                              last line of the XML of the subjob, if it has no newline
+
+A subjob is written as plain XML instead whenever the master has been changed since the template was made or when
+the delta would not be much smaller, so both kinds of files can be found in a job and either can be read back.
+"""
+
+import difflib
+import hashlib
+import os
+import threading
+from functools import partial
+from collections import OrderedDict
+from io import StringIO
+
+from GangaCore.Core.GangaRepository.VStreamer import to_file as xml_to_file, from_file as xml_from_file, XMLFileError
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+DELTA_HEADER = '#GangaDelta'
+DELTA_VERSION = 1
+TEMPLATE_FILE_NAME = 'subjobs.template'
+
+# Attributes of the master which are not in the template, on top of the ones which are not copied to the subjobs,
+# as they change when it is (re)submitted
+_runtime_attributes = ('info',)
+
+# A delta is only written if it is at most this fraction of the size of the full XML
+_max_delta_fraction = 0.5
+
+# template file -> ((inode, mtime), SubJobTemplate) of the templates loaded most recently
+_loaded_templates = OrderedDict()
+_max_loaded_templates = 100
+_loaded_templates_lock = threading.Lock()
+
+
+def _split_lines(text):
+    """ Return the lines of text keeping their newlines, only '\\n' ends a line unlike str.splitlines """
+    lines = [line + '\n' for line in text.split('\n')]
+    if lines[-1] == '\n':
+        lines.pop()
+    else:
+        lines[-1] = lines[-1][:-1]
+    return lines
+
+
+def master_template(master, sub_split='subjobs'):
+    """
+    Return the XML of the master job used as the template of its subjobs: everything but the subjobs and the
+    attributes which change while the job runs.
+    Some values are written differently once they have been loaded back (plain lists come back as GangaLists), so
+    the template is the XML of the master as it is after loading it, which is the same in every session.
+    Args:
+        master (Job): The master job
+        sub_split (str): Name of the attribute holding the subjobs
+    """
+    ignore = [sub_split]
+    ignore.extend(_runtime_attributes)
+    ignore.extend(name for name, item in master._schema.allItems() if not item['copyable'])
+    sio = StringIO()
+    xml_to_file(master, sio, ignore)
+    loaded, errors = xml_from_file(StringIO(sio.getvalue()))
+    if errors:
+        return sio.getvalue()
+    sio = StringIO()
+    xml_to_file(loaded, sio, ignore)
+    return sio.getvalue()
+
+
+class SubJobTemplate(object):
+    """
+    The template the subjobs of one job are written against
+    """
+
+    def __init__(self, text):
+        """
+        Args:
+            text (str): The XML of the master job, see master_template
+        """
+        self.text = text
+        self.lines = _split_lines(text)
+        self.digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        self._matcher = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def template_file(job_directory):
+        """ Return the name of the template file of the job stored in job_directory """
+        return os.path.join(job_directory, TEMPLATE_FILE_NAME)
+
+    @classmethod
+    def load(cls, job_directory):
+        """
+        Return the template of the job stored in job_directory, None if it has none.
+        Templates are never modified once written so the ones loaded recently are kept.
+        Args:
+            job_directory (str): Directory of the master job
+        """
+        fn = cls.template_file(job_directory)
+        try:
+            fn_stat = os.stat(fn)
+        except OSError:
+            return None
+        key = (fn_stat.st_ino, fn_stat.st_mtime_ns)
+        with _loaded_templates_lock:
+            loaded = _loaded_templates.get(fn)
+            if loaded is not None and loaded[0] == key:
+                _loaded_templates.move_to_end(fn)
+                return loaded[1]
+        try:
+            with open(fn) as template_file:
+                template = cls(template_file.read())
+        except IOError:
+            return None
+        with _loaded_templates_lock:
+            _loaded_templates[fn] = (key, template)
+            if len(_loaded_templates) > _max_loaded_templates:
+                _loaded_templates.popitem(last=False)
+        return template
+
+    def save(self, job_directory):
+        """
+        Write the template into job_directory. The subjobs already written refer to the template in there so it is
+        never replaced.
+        Args:
+            job_directory (str): Directory of the master job
+        """
+        fn = self.template_file(job_directory)
+        new_name = fn + '.new'
+        with open(new_name, 'w') as template_file:
+            template_file.write(self.text)
+        try:
+            # link rather than rename so an existing template is left alone
+            os.link(new_name, fn)
+        finally:
+            os.unlink(new_name)
+        fn_stat = os.stat(fn)
+        with _loaded_templates_lock:
+            _loaded_templates[fn] = ((fn_stat.st_ino, fn_stat.st_mtime_ns), self)
+
+    def delta(self, text):
+        """
+        Return the delta of the XML text of a subjob to this template, None if it's not worth storing it as a delta
+        Args:
+            text (str): The XML of the subjob
+        """
+        lines = _split_lines(text)
+        with self._lock:
+            if self._matcher is None:
+                self._matcher = difflib.SequenceMatcher(None)
+                self._matcher.set_seq2(self.lines)
+            self._matcher.set_seq1(lines)
+            opcodes = self._matcher.get_opcodes()
+
+        delta = ['%s %d %s\n' % (DELTA_HEADER, DELTA_VERSION, self.digest)]
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                delta.append('=%d,%d\n' % (j1, j2 - j1))
+            else:
+                for line in lines[i1:i2]:
+                    if line.endswith('\n'):
+                        delta.append('+' + line)
+                    else:
+                        delta.append('-' + line + '\n')
+        delta = ''.join(delta)
+        if len(delta) > _max_delta_fraction * len(text):
+            return None
+        return delta
+
+    def apply(self, delta):
+        """
+        Return the XML of the subjob stored as delta
+        Args:
+            delta (str): The delta as written by to_file
+        """
+        delta_lines = _split_lines(delta)
+        header = delta_lines[0].split()
+        if len(header) != 3 or header[0] != DELTA_HEADER or int(header[1]) != DELTA_VERSION:
+            raise XMLFileError(None, "Unknown subjob delta format: %s" % delta_lines[0].strip())
+        if header[2] != self.digest:
+            raise XMLFileError(None, "Subjob delta was written against a different template")
+
+        lines = []
+        for line in delta_lines[1:]:
+            tag = line[0]
+            if tag == '=':
+                start, count = line[1:].split(',')
+                start = int(start)
+                lines.extend(self.lines[start:start + int(count)])
+            elif tag == '+':
+                lines.append(line[1:])
+            elif tag == '-':
+                lines.append(line[1:-1])
+            else:
+                raise XMLFileError(None, "Corrupt subjob delta line: %s" % line.strip())
+        return ''.join(lines)
+
+
+def subjob_writer(job_directory, master, sub_split='subjobs'):
+    """
+    Return the function writing the subjobs of master: as deltas to the template of the job, which is made now if
+    there is none, or as plain XML if the master has changed since its template was made.
+    Args:
+        job_directory (str): Directory of the master job
+        master (Job): The master job
+        sub_split (str): Name of the attribute holding the subjobs
+    """
+    current = SubJobTemplate(master_template(master, sub_split))
+    template = SubJobTemplate.load(job_directory)
+    if template is None:
+        if not os.path.isdir(job_directory):
+            os.makedirs(job_directory)
+        try:
+            current.save(job_directory)
+            template = current
+        except OSError as err:
+            logger.debug("Subjob template not written: %s" % err)
+            template = SubJobTemplate.load(job_directory)
+    if template is None or template.digest != current.digest:
+        logger.debug("Master job in %s differs from its subjob template, writing the subjobs in full" % job_directory)
+        return xml_to_file
+    return partial(to_file, template=template)
+
+
+def is_delta(text):
+    """ Return if the content of a subjob file is a delta rather than XML """
+    return text.startswith(DELTA_HEADER)
+
+
+def to_file(j, fobj=None, ignore_subs=[], template=None):
+    """
+    Write the subjob j to fobj as a delta to template, or as XML if there is no template or the delta isn't worth it
+    Args:
+        j (Job): The subjob
+        fobj (file): File to write to
+        ignore_subs (list): Attributes not to write
+        template (SubJobTemplate): Template of the master of j
+    """
+    sio = StringIO()
+    xml_to_file(j, sio, ignore_subs)
+    text = sio.getvalue()
+    if template is not None:
+        delta = template.delta(text)
+        if delta is not None:
+            text = delta
+    fobj.write(text)
+
+
+def from_file(fobj, get_template):
+    """
+    Load a subjob written by to_file, as a delta or as XML
+    Args:
+        fobj (file): File to read from
+        get_template (callable): Returns the SubJobTemplate of the master job, None if it has none
+    """
+    text = fobj.read()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    if is_delta(text):
+        template = get_template()
+        if template is None:
+            raise XMLFileError(None, "Subjob delta found but the job has no %s" % TEMPLATE_FILE_NAME)
+        text = template.apply(text)
+    return xml_from_file(StringIO(text))
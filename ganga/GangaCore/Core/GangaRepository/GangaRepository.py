@@ -12,6 +12,8 @@
 # if a root object has a status field and some load error occurs, it will
 # be set to "incomplete"
 
+from contextlib import nullcontext
+
 from GangaCore.Utility.logging import getLogger
 
 from GangaCore.Utility.Plugin import allPlugins
@@ -158,6 +160,13 @@ class GangaRepository(object):
         """
         return None
 
+    def batched_writes(self):
+        """batched_writes() --> context manager
+        Context within which the repository may hold back the index records of the objects being flushed
+        and write them out together when the context exits.
+        """
+        return nullcontext()
+
     def get_other_sessions(self):
         """get_session_list()
         Tries to determine the other sessions that are active and returns an informative string for each of them.
@@ -16,6 +16,7 @@ from GangaCore import GANGA_SWAN_INTEGRATION
 
 from GangaCore.Core.GangaRepository.SessionLock import SessionLockManager, dry_run_unix_locks
 from GangaCore.Core.GangaRepository.FixedLock import FixedLockManager
+from GangaCore.Core.GangaRepository.IndexStore import IndexStore
 
 import GangaCore.Utility.logging
 
@@ -214,6 +215,8 @@ class GangaRepositoryLocal(GangaRepository):
         self._cache_load_timestamp = {}
         self.printed_explanation = False
         self._fully_loaded = {}
+        self._index_store = None
+        self._index_migration = []
 
     def startup(self):
         """ Starts a repository and reads in a directory structure.
@@ -225,9 +228,11 @@ class GangaRepositoryLocal(GangaRepository):
         self._cached_cat = {}
         self._cached_cls = {}
         self._cached_obj = {}
-        self._master_index_timestamp = 0
 
         self.known_bad_ids = []
+        # All index records live in this single append-only log
+        self._index_store = IndexStore(os.path.join(self.root, 'index.log'))
+        self._index_migration = []
         if "XML" in self.registry.type:
             self.to_file = xml_to_file
             self.from_file = xml_from_file
@@ -309,20 +314,30 @@ class GangaRepositoryLocal(GangaRepository):
             this_id (int): This is the id for which we want to load the index file from disk
         """
         #logger.debug("Loading index %s" % this_id)
-        fn = self.get_idxfn(this_id)
-        # index timestamp changed
-        fn_ctime = os.stat(fn).st_ctime
+        record = self._index_store.get(this_id)
+        if record is not None:
+            fn = self._index_store.fn
+            fn_ctime = record[0]
+        else:
+            # No record in the index store, fall back to an index file written by an older version
+            fn = self.get_idxfn(this_id)
+            fn_ctime = os.stat(fn).st_ctime
         cache_time = self._cache_load_timestamp.get(this_id, 0)
         if cache_time != fn_ctime:
             logger.debug("%s != %s" % (cache_time, fn_ctime))
-            try:
-                with open(fn, 'rb') as fobj:
-                    cat, cls, cache = pickle_from_file(fobj)[0]
-            except EOFError:
-                pass
-            except Exception as x:
-                logger.warning("index_load Exception: %s" % x)
-                raise IOError("Error on unpickling: %s %s" % (getName(x), x))
+            if record is not None:
+                cat, cls, cache = record[1:]
+            else:
+                try:
+                    with open(fn, 'rb') as fobj:
+                        cat, cls, cache = pickle_from_file(fobj)[0]
+                except EOFError:
+                    pass
+                except Exception as x:
+                    logger.warning("index_load Exception: %s" % x)
+                    raise IOError("Error on unpickling: %s %s" % (getName(x), x))
+                # Move this index into the index store at the end of update_index
+                self._index_migration.append((this_id, fn_ctime, cat, cls, cache))
             if this_id in self.objects:
                 obj = self.objects[this_id]
                 setattr(obj, "_registry_refresh", True)
@@ -358,25 +373,44 @@ class GangaRepositoryLocal(GangaRepository):
             Should not raise any Errors,
         Args:
             this_id (int): This is the index for which we want to write the index to disk
-            shutdown (bool): True causes this to always be written regardless of any checks"""
+            shutdown (bool): Unused, a record is only appended to the index store when the index has changed"""
         if this_id in self.incomplete_objects:
             return
         logger.debug("Writing index: %s" % this_id)
         obj = self.objects[this_id]
         try:
-            ifn = self.get_idxfn(this_id)
             new_idx_cache = self.registry.getIndexCache(stripProxy(obj))
-            if not os.path.exists(ifn) or shutdown:
-                new_cache = new_idx_cache
-                with open(ifn, "wb") as this_file:
-                    new_index = (obj._category, getName(obj), new_cache)
-                    logger.debug("Writing: %s" % str(new_index))
-                    pickle_to_file(new_index, this_file)
-                self._cached_obj[this_id] = new_cache
+            record = self._index_store.get(this_id)
+            new_index = (obj._category, getName(obj), new_idx_cache)
+            if record is None or record[1:] != new_index:
+                logger.debug("Writing: %s" % str(new_index))
+                stamp = time.time()
+                self._index_store.put(this_id, stamp, *new_index)
+                self._cache_load_timestamp[this_id] = stamp
+                self._cached_cat[this_id] = new_index[0]
+                self._cached_cls[this_id] = new_index[1]
                 obj._index_cache = {}
             self._cached_obj[this_id] = new_idx_cache
-        except IOError as err:
-            logger.error("Index saving to '%s' failed: %s %s" % (ifn, getName(err), err))
+        except (IOError, OSError) as err:
+            logger.error("Index saving to '%s' failed: %s %s" % (self._index_store.fn, getName(err), err))
+
+    def batched_writes(self):
+        """
+        Context within which the index records of the objects being flushed are appended to the index store in one go
+        """
+        return self._index_store.deferred()
+
+    def _remove_index(self, this_id):
+        """
+        Remove the index of this object from the index store and any index file left by an older version
+        Args:
+            this_id (int): This is the id of the object whose index is to be removed
+        """
+        try:
+            self._index_store.remove(this_id)
+        except (IOError, OSError) as err:
+            logger.debug("Failed to remove index record %s: %s" % (this_id, err))
+        rmrf(self.get_idxfn(this_id))
 
     def get_index_listing(self):
         """Get dictionary of possible objects in the Repository: True means index is present,
@@ -412,119 +446,62 @@ class GangaRepositoryLocal(GangaRepository):
 
     def _read_master_cache(self):
         """
-        read in the master cache to reduce significant I/O over many indexes separately on startup
+        read in the index store to reduce significant I/O over many indexes separately on startup
+        A master index written by an older version is moved into the index store
         """
         try:
+            self._index_store.read()
             _master_idx = os.path.join(self.root, 'master.idx')
             if os.path.isfile(_master_idx):
-                logger.debug("Reading Master index")
-                self._master_index_timestamp = os.stat(_master_idx).st_ctime
+                logger.debug("Moving Master index into the index store")
                 with open(_master_idx, 'rb') as input_f:
                     this_master_cache = pickle_from_file(input_f)[0]
-                for this_cache in this_master_cache:
-                    if this_cache[1] >= 0:
-                        this_id = this_cache[0]
-                        self._cache_load_timestamp[this_id] = this_cache[1]
-                        self._cached_cat[this_id] = this_cache[2]
-                        self._cached_cls[this_id] = this_cache[3]
-                        self._cached_obj[this_id] = this_cache[4]
-            else:
-                logger.debug("Not Reading Master Index")
+                self._index_store.append([tuple(this_cache) for this_cache in this_master_cache
+                                          if this_cache[1] >= 0 and this_cache[0] not in self._index_store])
+                rmrf(_master_idx)
+            for this_id, this_record in self._index_store.items():
+                self._cache_load_timestamp[this_id] = this_record[0]
+                self._cached_cat[this_id] = this_record[1]
+                self._cached_cls[this_id] = this_record[2]
+                self._cached_obj[this_id] = this_record[3]
         except Exception as err:
             GangaCore.Utility.logging.log_unknown_exception()
-            logger.debug("Master Index corrupt, ignoring it")
+            logger.debug("Index store corrupt, ignoring it")
             logger.debug("Exception: %s" % err)
             self._clear_stored_cache()
-        finally:
-            rmrf(os.path.join(self.root, 'master.idx'))
 
     def _clear_stored_cache(self):
         """
         clear the master cache(s) which have been stored in memory
         """
-        for k, v in self._cache_load_timestamp.items():
-            self._cache_load_timestamp.pop(k)
-        for k, v in self._cached_cat.items():
-            self._cached_cat.pop(k)
-        for k, v in self._cached_cls.items():
-            self._cached_cls.pop(k)
-        for k, v in self._cached_obj.items():
-            self._cached_obj.pop(k)
+        self._cache_load_timestamp.clear()
+        self._cached_cat.clear()
+        self._cached_cls.clear()
+        self._cached_obj.clear()
 
     def _write_master_cache(self, shutdown=False):
         """
-        write a master index cache once per 300sec
+        Bring the index records of all fully loaded objects up to date in the index store.
+        On shutdown the index store is compacted if it has grown too large and no other session is using it
         Args:
             shutdown (boool): True causes this to be written now
         """
         try:
-            _master_idx = os.path.join(self.root, 'master.idx')
-            this_master_cache = []
-            if os.path.isfile(_master_idx) and not shutdown:
-                if abs(self._master_index_timestamp - os.stat(_master_idx).st_ctime) < 300:
-                    return
-
-            items_to_save = iter(self.objects.items())
+            items_to_save = iter(list(self._fully_loaded.items()))
             for k, v in items_to_save:
                 if k in self.incomplete_objects:
                     continue
                 try:
-                    if k in self._fully_loaded:
-                        # Check and write index first
-                        obj = v  # self.objects[k]
-                        new_index = None
-                        if obj is not None:
-                            new_index = self.registry.getIndexCache(stripProxy(obj))
-
-                        if new_index is not None:
-                            #logger.debug("k: %s" % k)
-                            arr_k = [k]
-                            if len(self.lock(arr_k)) != 0:
-                                self.index_write(k)
-                                self.unlock(arr_k)
-                                self._cached_obj[k] = new_index
-
+                    arr_k = [k]
+                    if len(self.lock(arr_k)) != 0:
+                        self.index_write(k)
+                        self.unlock(arr_k)
                 except Exception as err:
                     logger.debug("Failed to update index: %s on startup/shutdown" % k)
                     logger.debug("Reason: %s" % err)
 
-            iterables = iter(self._cache_load_timestamp.items())
-            for k, v in iterables:
-                if k in self.incomplete_objects:
-                    continue
-                cached_list = []
-                cached_list.append(k)
-                try:
-                    fn = self.get_idxfn(k)
-                    if os.path.isfile(fn):
-                        time = os.stat(fn).st_ctime
-                    else:
-                        time = -1
-                except OSError as err:
-                    logger.debug("_write_master_cache: %s" % err)
-                    logger.debug("_cache_load_timestamp: %s" % self._cache_load_timestamp)
-                    import errno
-                    if err.errno == errno.ENOENT:  # If file is not found
-                        time = -1
-                    else:
-                        raise
-
-                if time > 0:
-                    cached_list.append(time)
-                    cached_list.append(self._cached_cat[k])
-                    cached_list.append(self._cached_cls[k])
-                    cached_list.append(self._cached_obj[k])
-                    this_master_cache.append(cached_list)
-
-            try:
-                with open(_master_idx, 'wb') as of:
-                    pickle_to_file(this_master_cache, of)
-            except IOError as err:
-                logger.debug("write_master: %s" % err)
-                try:
-                    os.remove(os.path.join(self.root, 'master.idx'))
-                except OSError as x:
-                    GangaCore.Utility.logging.log_user_exception(True)
+            if shutdown and self._index_store.needs_compaction() and not self.get_other_sessions():
+                self._index_store.compact(live_ids=list(self.objects.keys()))
         except Exception as err:
             logger.debug("write_error2: %s" % err)
             GangaCore.Utility.logging.log_unknown_exception()
@@ -550,6 +527,8 @@ class GangaRepositoryLocal(GangaRepository):
         # First locate and load the index files
         logger.debug("updating index...")
         objs = self.get_index_listing()
+        # Pick up any index records written by other sessions
+        self._index_store.read()
         changed_ids = []
         deleted_ids = set(self.objects.keys())
         summary = []
@@ -619,6 +598,14 @@ class GangaRepositoryLocal(GangaRepository):
 
         logger.debug("Iterated over Items")
 
+        if self._index_migration:
+            logger.debug("Moving %s index files into the index store" % len(self._index_migration))
+            try:
+                self._index_store.append(self._index_migration)
+            except (IOError, OSError) as err:
+                logger.debug("Failed to move index files into the index store: %s" % err)
+            self._index_migration = []
+
         # Check deleted files:
         for this_id in deleted_ids:
             self._internal_del__(this_id)
@@ -728,6 +715,11 @@ class GangaRepositoryLocal(GangaRepository):
                     # I have been constructed in this session, I don't know how to flush!
                     if hasattr(getattr(obj, self.sub_split)[0], "_dirty"):
                         split_cache = getattr(obj, self.sub_split)
+                        if self.to_file is xml_to_file:
+                            sub_to_file = SubJobXMLList.getSubJobWriter(os.path.dirname(fn), obj)
+                        else:
+                            sub_to_file = self.to_file
+                        written = []
                         for i in range(len(split_cache)):
                             if not split_cache[i]._dirty:
                                 continue
@@ -737,8 +729,9 @@ class GangaRepositoryLocal(GangaRepository):
                                 os.makedirs(os.path.dirname(sfn))
                             else:
                                 logger.debug("Using Folder: %s" % os.path.dirname(sfn))
-                            safe_save(sfn, split_cache[i], self.to_file)
+                            safe_save(sfn, split_cache[i], sub_to_file)
                             split_cache[i]._setFlushed()
+                            written.append(i)
                     # Now generate an index file to take advantage of future non-loading goodness
                     tempSubJList = SubJobXMLList(os.path.dirname(fn), self.registry, self.dataFileName, False, obj)
                     # equivalent to for sj in job.subjobs
@@ -747,6 +740,8 @@ class GangaRepositoryLocal(GangaRepository):
                     for sj in getattr(obj, self.sub_split):
                         job_dict[sj.id] = stripProxy(sj)
                     tempSubJList._reset_cachedJobs(job_dict)
+                    if split_cache is not None:
+                        tempSubJList.updateIndex(written)
                     tempSubJList.flush(ignore_disk=True)
                     del tempSubJList
 
@@ -792,7 +787,6 @@ class GangaRepositoryLocal(GangaRepository):
                 logger.debug("safe_flush: %s" % this_id)
                 self._safe_flush_xml(this_id)
 
-                self._cache_load_timestamp[this_id] = time.time()
                 self._cached_cls[this_id] = getName(self.objects[this_id])
                 self._cached_cat[this_id] = self.objects[this_id]._category
                 self._cached_obj[this_id] = self.objects[this_id]._index_cache
@@ -994,7 +988,7 @@ class GangaRepositoryLocal(GangaRepository):
                 try:
                     # remove internal representation
                     self._internal_del__(this_id)
-                    rmrf(os.path.dirname(fn) + ".index")
+                    self._remove_index(this_id)
                 except OSError as err:
                     logger.debug("load unlink Error: %s" % err)
                     pass
@@ -1128,7 +1122,7 @@ class GangaRepositoryLocal(GangaRepository):
             self.incomplete_objects.append(this_id)
             # remove index so we do not continue working with wrong
             # information
-            rmrf(os.path.dirname(fn) + ".index")
+            self._remove_index(this_id)
             raise InaccessibleObjectError(self, this_id, err)
 
         return False
@@ -1144,7 +1138,7 @@ class GangaRepositoryLocal(GangaRepository):
             # KeyError
             fn = self.get_fn(this_id)
             try:
-                rmrf(os.path.dirname(fn) + ".index")
+                self._remove_index(this_id)
             except OSError as err:
                 logger.debug("Delete Error: %s" % err)
             self._internal_del__(this_id)
@@ -0,0 +1,263 @@
+"""
+Single-file index store for the local repository.
+
+All of the index records of a repository, i.e. (id, timestamp, category, class, cache), are kept in one append-only
+log file. Each record is framed as: magic, payload length, crc32 of the payload and the pickled payload.
+Reading the log is done through mmap and only the bytes appended since the last read are parsed.
+A record which has been only partially written (e.g. a session crashed in the middle of a write) fails its
+checksum and is skipped, the reader then resynchronises on the next magic marker, so the rest of the index is never lost.
+The log is periodically compacted into a new file which then atomically replaces the old one.
+"""
+
+import errno
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+# Marker used to find the start of each record in the log
+_MAGIC = b'GIDX'
+# magic, length of payload, crc32 of payload
+_HEADER = struct.Struct('<4sII')
+
+
+def _frame(payload):
+    """
+    Return the bytes of one framed record
+    Args:
+        payload (bytes): The pickled record
+    """
+    return _HEADER.pack(_MAGIC, len(payload), zlib.crc32(payload) & 0xffffffff) + payload
+
+
+class IndexStore(object):
+    """
+    Append-only, memory-mapped log of the index records of all objects in a repository.
+    A record with a category of None marks the object as deleted.
+    """
+
+    def __init__(self, fn, compact_ratio=2.0, compact_min_records=1000):
+        """
+        Args:
+            fn (str): The file name of the log
+            compact_ratio (float): Compact once the log holds this many times more records than there are live objects
+            compact_min_records (int): Never compact logs holding fewer records than this
+        """
+        self.fn = fn
+        self.compact_ratio = compact_ratio
+        self.compact_min_records = compact_min_records
+        # id -> (timestamp, category, class, cache)
+        self._records = {}
+        # Number of records in the log including superseded ones
+        self._num_records = 0
+        # Offset up to which the log has been parsed and the inode it belongs to
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.RLock()
+        # Records held back by the threads which are inside ``deferred``
+        self._deferred = threading.local()
+
+    def __contains__(self, this_id):
+        with self._lock:
+            return this_id in self._records
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    def get(self, this_id):
+        """
+        Return the (timestamp, category, class, cache) record of this_id or None if there is none
+        Args:
+            this_id (int): id of the object
+        """
+        with self._lock:
+            return self._records.get(this_id)
+
+    def items(self):
+        """ Return a list of all (id, (timestamp, category, class, cache)) records in the store """
+        with self._lock:
+            return list(self._records.items())
+
+    def read(self):
+        """
+        Read any records which have been appended to the log (by this or by another session) since the last read.
+        Returns the set of ids whose record changed.
+        """
+        changed = set()
+        with self._lock:
+            try:
+                st = os.stat(self.fn)
+            except OSError as err:
+                if err.errno != errno.ENOENT:
+                    raise
+                return changed
+
+            if self._inode is not None and (st.st_ino != self._inode or st.st_size < self._offset):
+                # The log has been replaced by a compaction, start again from the beginning
+                logger.debug("Index log %s has been replaced, re-reading it" % self.fn)
+                changed.update(self._records.keys())
+                self._records = {}
+                self._num_records = 0
+                self._offset = 0
+            self._inode = st.st_ino
+
+            if st.st_size == self._offset:
+                return changed
+
+            with open(self.fn, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0:
+                    return changed
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    pos = self._offset
+                    while pos + _HEADER.size <= size:
+                        magic, length, crc = _HEADER.unpack_from(mm, pos)
+                        end = pos + _HEADER.size + length
+                        if magic != _MAGIC or end > size:
+                            if magic == _MAGIC and mm.find(_MAGIC, pos + 1) == -1:
+                                # Record is still being written (or was torn at the very end of the log)
+                                break
+                            pos = self._resync(mm, pos)
+                            if pos < 0:
+                                pos = size
+                                break
+                            continue
+                        payload = mm[pos + _HEADER.size:end]
+                        if zlib.crc32(payload) & 0xffffffff != crc:
+                            logger.debug("Skipping corrupt record at %s in %s" % (pos, self.fn))
+                            pos = self._resync(mm, pos)
+                            if pos < 0:
+                                pos = size
+                                break
+                            continue
+                        try:
+                            this_id, stamp, cat, cls, cache = pickle.loads(payload)
+                        except Exception as err:
+                            logger.debug("Skipping unreadable record at %s in %s: %s" % (pos, self.fn, err))
+                            pos = end
+                            continue
+                        if cat is None:
+                            self._records.pop(this_id, None)
+                        else:
+                            self._records[this_id] = (stamp, cat, cls, cache)
+                        self._num_records += 1
+                        changed.add(this_id)
+                        pos = end
+                    self._offset = pos
+        return changed
+
+    @staticmethod
+    def _resync(mm, pos):
+        """
+        Return the position of the next record marker after pos, -1 if there is none
+        Args:
+            mm (mmap): The mapped log
+            pos (int): Position of the corrupt record
+        """
+        return mm.find(_MAGIC, pos + 1)
+
+    def append(self, records):
+        """
+        Append records to the log. Each record is (id, timestamp, category, class, cache), a category of None deletes the id.
+        All records are written with a single write so that concurrent appends from other sessions don't interleave.
+        Args:
+            records (list): The records to be appended
+        """
+        if not records:
+            return
+        held_back = getattr(self._deferred, 'records', None)
+        if held_back is not None:
+            held_back.extend(records)
+            return
+        data = b''.join(_frame(pickle.dumps(tuple(record), pickle.HIGHEST_PROTOCOL)) for record in records)
+        with self._lock:
+            dirname = os.path.dirname(self.fn)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            fd = os.open(self.fn, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            # Pick up our own records (and any from other sessions which came before them)
+            self.read()
+
+    @contextmanager
+    def deferred(self):
+        """
+        Context within which the records appended by the current thread are held back and then written to the log
+        with a single append when the outermost context exits. Other threads are not affected.
+        """
+        if getattr(self._deferred, 'records', None) is not None:
+            yield
+            return
+        self._deferred.records = []
+        try:
+            yield
+        finally:
+            records = self._deferred.records
+            self._deferred.records = None
+            self.append(records)
+
+    def put(self, this_id, stamp, cat, cls, cache):
+        """
+        Append a single index record for this_id
+        Args:
+            this_id (int): id of the object
+            stamp (float): time at which the index was generated
+            cat (str): category of the object
+            cls (str): class name of the object
+            cache (dict): index cache of the object
+        """
+        self.append([(this_id, stamp, cat, cls, cache)])
+
+    def remove(self, this_id):
+        """
+        Mark this_id as deleted in the log
+        Args:
+            this_id (int): id of the object
+        """
+        with self._lock:
+            if this_id in self._records:
+                self.append([(this_id, None, None, None, None)])
+
+    def needs_compaction(self):
+        """ Returns True if the log holds many more records than there are live objects """
+        with self._lock:
+            return self._num_records >= self.compact_min_records and \
+                self._num_records > self.compact_ratio * max(len(self._records), 1)
+
+    def compact(self, live_ids=None):
+        """
+        Rewrite the log with only the latest record of each object and atomically replace the old log.
+        This must not be done whilst another session may be appending to the log.
+        Args:
+            live_ids (iterable): If given, only the records of these ids are kept
+        """
+        with self._lock:
+            self.read()
+            if live_ids is not None:
+                live_ids = set(live_ids)
+            records = [(this_id,) + record for this_id, record in sorted(self._records.items())
+                       if live_ids is None or this_id in live_ids]
+            new_fn = self.fn + '.new'
+            with open(new_fn, 'wb') as f:
+                for record in records:
+                    f.write(_frame(pickle.dumps(record, pickle.HIGHEST_PROTOCOL)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(new_fn, self.fn)
+            self._records = {}
+            self._num_records = 0
+            self._offset = 0
+            self._inode = None
+            self.read()
+            logger.debug("Compacted index log %s to %s records" % (self.fn, len(self._records)))
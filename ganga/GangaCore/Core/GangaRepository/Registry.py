@@ -9,6 +9,7 @@ from GangaCore.Core.exceptions import (GangaException,
 
 import time
 import threading
+from collections import OrderedDict
 
 from GangaCore.Core.GangaThread.GangaThread import GangaThread
 from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
@@ -275,6 +276,134 @@ class RegistryFlusher(GangaThread):
         logger.debug("Auto-Flusher shutting down for Registry: %s" % self.registry.name)
 
 
+class RegistryWriter(GangaThread):
+    """
+    Write-behind flusher of a registry.
+    Objects handed to ``schedule`` are written to disk by this thread so that the threads changing them (e.g. the monitoring)
+    don't have to wait on the disk. Scheduling an object which is already waiting to be written does nothing, so an object
+    which changes many times in quick succession is only written once. The queue is bounded, once it is full ``schedule``
+    blocks until the writer has caught up. ``barrier`` blocks until everything scheduled before it has been written.
+    """
+
+    __slots__ = ('registry', 'delay', 'max_pending', '_pending', '_busy', '_waiters', '_cond', '_stop_event')
+
+    def __init__(self, registry, *args, **kwargs):
+        """
+        Args:
+            registry (Registry): The registry whose objects this thread is writing
+            args (list): Args passed to the constructor of a new RegistryWriter thread
+            kwargs (dict): Kwds passed to the constructor of a new RegistryWriter thread
+        """
+        super(RegistryWriter, self).__init__(*args, **kwargs)
+        self.registry = registry
+        regConf = getConfig('Registry')
+        self.delay = regConf['AsyncFlushDelay']
+        self.max_pending = max(regConf['AsyncFlushQueueSize'], 1)
+        # id(obj) -> obj, in the order in which the objects were first scheduled
+        self._pending = OrderedDict()
+        self._busy = False
+        self._waiters = 0
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """
+        Ask the thread to stop, anything which is still queued is written first
+        """
+        with self._cond:
+            self._stop_event.set()
+            self._cond.notify_all()
+
+    @property
+    def stopped(self):
+        """
+        Returns if the writer has been asked to stop
+        """
+        return self._stop_event.is_set()
+
+    def join(self, *args, **kwargs):
+        """
+        Called on thread shutdown to stop the active thread
+        Args:
+            args (list): Args passed to the join of the thread
+            kwargs (dict) : Kwds passed to the join of the thread
+        """
+        self.stop()
+        super(RegistryWriter, self).join(*args, **kwargs)
+
+    def schedule(self, objs):
+        """
+        Queue the root objects of objs to be written. Returns straight away unless the queue is full.
+        Args:
+            objs (list): The objects which have changed
+        """
+        with self._cond:
+            for obj in objs:
+                root = obj._getRoot()
+                if id(root) in self._pending:
+                    continue
+                while len(self._pending) >= self.max_pending and self.is_alive() and not self.stopped:
+                    self._cond.notify_all()
+                    self._cond.wait(1.)
+                self._pending[id(root)] = root
+            self._cond.notify_all()
+
+    def barrier(self):
+        """
+        Block until all of the objects which have been scheduled so far have been written to disk
+        """
+        with self._cond:
+            self._waiters += 1
+            self._cond.notify_all()
+            try:
+                while (self._pending or self._busy) and self.is_alive():
+                    self._cond.wait(1.)
+            finally:
+                self._waiters -= 1
+
+    def _next_batch(self):
+        """
+        Wait for objects to be scheduled and return them, returns None once the thread has been stopped and everything has
+        been written
+        """
+        with self._cond:
+            while not self._pending:
+                if self.stopped:
+                    return None
+                self._cond.wait()
+            # Give further changes to the same objects the chance to be coalesced into this write
+            deadline = time.time() + self.delay
+            while not self.stopped and self._waiters == 0 and len(self._pending) < self.max_pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = list(self._pending.values())
+            self._pending.clear()
+            self._busy = True
+            self._cond.notify_all()
+            return batch
+
+    def run(self):
+        """
+        Write the scheduled objects in batches until the thread is stopped
+        """
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            try:
+                if self.registry.hasStarted():
+                    self.registry._flush(batch)
+            except Exception as err:
+                logger.error("Failed to write %s objects of registry '%s': %s" % (len(batch), self.registry.name, err))
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+        logger.debug("Writer shutting down for Registry: %s" % self.registry.name)
+
+
 class Registry(object):
 
     """Ganga Registry
@@ -282,7 +411,8 @@ class Registry(object):
     """
 
     __slots__ = ('name', 'doc', '_hasStarted', '_needs_metadata', 'metadata', '_read_lock', '_flush_lock',
-                 '_parent', 'repository', '_objects', '_incomplete_objects', 'flush_thread', 'type', 'location')
+                 '_parent', 'repository', '_objects', '_incomplete_objects', 'flush_thread', 'write_thread', 'type',
+                 'location')
 
     def __init__(self, name, doc):
         """Registry constructor, giving public name and documentation
@@ -305,6 +435,7 @@ class Registry(object):
         self._incomplete_objects = None
 
         self.flush_thread = None
+        self.write_thread = None
 
     def hasStarted(self):
         """
@@ -510,25 +641,57 @@ class Registry(object):
         if self.hasStarted() is not True:
             raise RegistryAccessError("Cannot flush to a disconnected repository!")
 
-        for obj in objs:
-            # check if the object is dirty, if not do nothing
-            if not obj._dirty:
-                continue
+        # check if the objects are dirty, if not do nothing
+        objs = [obj for obj in objs if obj._dirty]
+        if not objs:
+            return
+
+        if len(objs) == 1:
+            try:
+                to_flush = [(self.find(objs[0]), objs[0])]
+            except ObjectNotInRegistryError:
+                return
+        else:
+            # Look the ids up in one pass over the registry rather than once per object
+            ids = {id(o): id_ for id_, o in self._objects.items()}
+            to_flush = sorted(((ids[id(obj)], obj) for obj in objs if id(obj) in ids), key=lambda pair: pair[0])
+
+        # Objects are written in the order of their ids, i.e. one directory of the repository at a time,
+        # and the repository is free to write their index records in one go at the end
+        with self.repository.batched_writes():
+            for obj_id, obj in to_flush:
+                if not self.repository.isObjectLoaded(obj):
+                    continue
+
+                with obj.const_lock:
+                    # flush the object
+                    self.repository.flush([obj_id])
+                    obj._setFlushed()
+
+    def _schedule_flush(self, objs):
+        """
+        Queue a set of objects to be flushed to the persistency layer by the writer thread of this registry.
+        This returns without waiting for the disk unless the queue of the writer is full. If there is no writer
+        running the objects are left dirty, to be flushed by the next ``flush_all``.
 
-            if not self.has_loaded(obj):
-                continue
+        Args:
+            objs (list): a list of objects to flush
+        """
+        if not isType(objs, (list, tuple, GangaList)):
+            objs = [objs]
 
-            with obj.const_lock:
-                # flush the object
-                obj_id = self.find(obj)
-                self.repository.flush([obj_id])
-                obj._setFlushed()
+        if self.write_thread is not None and self.write_thread.is_alive():
+            self.write_thread.schedule([obj for obj in objs if obj._dirty])
 
     def flush_all(self):
         """
         This will attempt to flush all the jobs in the registry.
         It does this via ``_flush`` so the same conditions apply.
+        Anything still queued for the writer thread is written before this returns.
         """
+        if self.write_thread is not None:
+            self.write_thread.barrier()
+
         if self.hasStarted():
             for _obj in self.values():
                 self._flush(_obj)
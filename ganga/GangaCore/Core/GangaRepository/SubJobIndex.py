@@ -0,0 +1,364 @@
+"""
+Columnar index of the subjobs of one job, as stored in the 'subjobs.idx' file of the job.
+
+The index cache of every subjob (see Registry.getIndexCache) is held as one column per key rather than as one dict per
+subjob, so that a row can be updated in place when a subjob is written and the statuses (or any other key) of all of
+the subjobs can be read at once without building a dict for each of them:
+
+    status      bytearray of codes into a table of the statuses, 0 where there is no row for the subjob
+    modified    array of doubles, the ctime of the data file of the subjob when its row was made
+    <key>       array of codes into the table of the distinct values of the key, 0 where the row has no such key
+
+The file is: magic, version, number of rows, crc32 of the rest, the length of the pickled tables of values and the
+tables themselves, then the raw (little endian) arrays in the order above.
+Index files written by older versions (a pickled dict of dicts) are still read.
+"""
+
+import pickle
+import struct
+import sys
+import zlib
+from array import array
+
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+_MAGIC = b'GSJI'
+_VERSION = 1
+# magic, version, number of rows, crc32 of everything after the header
+_HEADER = struct.Struct('<4sHII')
+_TABLES_LENGTH = struct.Struct('<I')
+
+# The keys of the index cache which have a column of their own
+_STATUS = 'status'
+_MODIFIED = 'modified'
+
+
+def _code_type(table_size):
+    """ Return the typecode of the smallest array holding codes into a table of table_size values """
+    if table_size <= 0xff:
+        return 'B'
+    if table_size <= 0xffff:
+        return 'H'
+    return 'I'
+
+
+def _to_bytes(values):
+    """ Return the little endian bytes of the array values """
+    if sys.byteorder == 'big' and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode, data, start, length):
+    """
+    Return the array of length values of typecode stored in data at start, and the position after them
+    Args:
+        typecode (str): typecode of the array
+        data (bytes): Content of the index file
+        start (int): Position of the array in data
+        length (int): Number of values in the array
+    """
+    values = array(typecode)
+    end = start + length * values.itemsize
+    if end > len(data):
+        raise ValueError("Truncated subjob index")
+    values.frombytes(data[start:end])
+    if sys.byteorder == 'big' and values.itemsize > 1:
+        values.byteswap()
+    return values, end
+
+
+class _Column(object):
+    """
+    One key of the index cache of all of the subjobs, dictionary encoded
+    """
+
+    __slots__ = ('values', 'codes', '_lookup')
+
+    def __init__(self, length, values=None, codes=None):
+        """
+        Args:
+            length (int): Number of rows
+            values (list): Table of the values, values[0] is unused as code 0 marks a row without this key
+            codes (array): Code of the value of each row
+        """
+        self.values = values if values is not None else [None]
+        self.codes = codes if codes is not None else array(_code_type(len(self.values)), bytes(length))
+        self._lookup = None
+
+    @staticmethod
+    def _key(value):
+        """ Return the key of value in the lookup table, None for values which can't be looked up """
+        key = (type(value), value)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def encode(self, value):
+        """ Return the code of value, adding it to the table if it's not there yet """
+        if self._lookup is None:
+            self._lookup = {}
+            for code in range(1, len(self.values)):
+                key = self._key(self.values[code])
+                if key is not None:
+                    self._lookup.setdefault(key, code)
+        key = self._key(value)
+        code = self._lookup.get(key) if key is not None else None
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            if key is not None:
+                self._lookup[key] = code
+            if _code_type(len(self.values)) != self.codes.typecode:
+                self.codes = array(_code_type(len(self.values)), self.codes)
+        return code
+
+    def resize(self, length):
+        """ Add or remove rows so there are length of them """
+        if length > len(self.codes):
+            self.codes.extend(array(self.codes.typecode, bytes((length - len(self.codes)) * self.codes.itemsize)))
+        else:
+            del self.codes[length:]
+
+    def compact(self):
+        """ Drop the values no longer used by any row from the table """
+        used = sorted(set(self.codes))
+        if len(used) + (0 not in used) >= len(self.values):
+            return
+        remap = {0: 0}
+        values = [None]
+        for code in used:
+            if code:
+                remap[code] = len(values)
+                values.append(self.values[code])
+        self.values = values
+        self.codes = array(_code_type(len(values)), [remap[code] for code in self.codes])
+        self._lookup = None
+
+
+class SubJobIndex(object):
+    """
+    The index caches of the subjobs of one job, held as columns
+    """
+
+    def __init__(self, length=0):
+        """
+        Args:
+            length (int): Number of (empty) rows
+        """
+        self._statuses = [None]
+        self._status_codes = {}
+        self._status = bytearray(length)
+        self._modified = array('d', bytes(8 * length))
+        self._columns = {}
+
+    def __len__(self):
+        return len(self._status)
+
+    def __contains__(self, index):
+        return 0 <= index < len(self._status) and self._status[index] != 0
+
+    def __deepcopy__(self, memo=None):
+        return SubJobIndex.fromBytes(self.toBytes())
+
+    def count(self):
+        """ Return the number of subjobs which have a row """
+        return len(self._status) - self._status.count(0)
+
+    def isComplete(self, length):
+        """ Return if there is a row for each of the subjobs 0 to length-1 """
+        return len(self._status) >= length and self._status.find(0, 0, length) == -1
+
+    def resize(self, length):
+        """ Add empty rows or remove rows so there are length of them """
+        if length > len(self._status):
+            self._status.extend(bytes(length - len(self._status)))
+            self._modified.extend(array('d', bytes(8 * (length - len(self._modified)))))
+        else:
+            del self._status[length:]
+            del self._modified[length:]
+        for column in self._columns.values():
+            column.resize(length)
+
+    def _statusCode(self, status):
+        """ Return the code of status, adding it to the table of statuses if it's not there yet """
+        code = self._status_codes.get(status)
+        if code is None:
+            if len(self._statuses) > 0xff:
+                raise ValueError("Too many different subjob statuses for the subjob index")
+            code = len(self._statuses)
+            self._statuses.append(status)
+            self._status_codes[status] = code
+        return code
+
+    def set(self, index, cache):
+        """
+        Replace the row of a subjob with its index cache
+        Args:
+            index (int): id of the subjob
+            cache (dict): The index cache of the subjob, with its 'status' and 'modified' time
+        """
+        if index >= len(self._status):
+            self.resize(index + 1)
+        self._status[index] = self._statusCode(cache.get(_STATUS))
+        self._modified[index] = cache.get(_MODIFIED) or 0.
+        for key, column in self._columns.items():
+            if key not in cache:
+                column.codes[index] = 0
+        for key, value in cache.items():
+            if key in (_STATUS, _MODIFIED):
+                continue
+            column = self._columns.get(key)
+            if column is None:
+                column = self._columns[key] = _Column(len(self._status))
+            code = column.encode(value)
+            column.codes[index] = code
+
+    def remove(self, index):
+        """ Drop the row of a subjob so it is made again """
+        if index in self:
+            self._status[index] = 0
+            self._modified[index] = 0.
+            for column in self._columns.values():
+                column.codes[index] = 0
+
+    def get(self, index):
+        """ Return the index cache of a subjob as a dict, None if there is no row for it """
+        if index not in self:
+            return None
+        cache = {_STATUS: self._statuses[self._status[index]], _MODIFIED: self._modified[index]}
+        for key, column in self._columns.items():
+            code = column.codes[index]
+            if code:
+                cache[key] = column.values[code]
+        return cache
+
+    def rows(self):
+        """ Return the dict of the index caches of all of the subjobs which have a row, keyed by their id """
+        return dict((index, self.get(index)) for index in range(len(self._status)) if self._status[index])
+
+    def statuses(self, length=None):
+        """
+        Return the list of the statuses of the subjobs, None for the subjobs without a row
+        Args:
+            length (int): Number of subjobs, the list is padded with None up to it
+        """
+        statuses = self._statuses
+        result = [statuses[code] for code in self._status]
+        if length is not None:
+            result = result[:length] + [None] * (length - len(result))
+        return result
+
+    def column(self, key, length=None):
+        """
+        Return the list of the values of key for all of the subjobs, None for the subjobs which don't have it
+        Args:
+            key (str): Key of the index cache
+            length (int): Number of subjobs, the list is padded with None up to it
+        """
+        if key == _STATUS:
+            return self.statuses(length)
+        if key == _MODIFIED:
+            result = [modified if code else None for code, modified in zip(self._status, self._modified)]
+        else:
+            column = self._columns.get(key)
+            if column is None:
+                result = [None] * len(self._status)
+            else:
+                values = column.values
+                result = [values[code] for code in column.codes]
+        if length is not None:
+            result = result[:length] + [None] * (length - len(result))
+        return result
+
+    def idsWithStatus(self, statuses):
+        """
+        Return the sorted ids of the subjobs whose row has one of statuses
+        Args:
+            statuses (iterable): The statuses of interest
+        """
+        ids = []
+        for status in statuses:
+            code = self._status_codes.get(status)
+            if code is None:
+                continue
+            pos = self._status.find(code)
+            while pos != -1:
+                ids.append(pos)
+                pos = self._status.find(code, pos + 1)
+        return sorted(ids)
+
+    def toBytes(self):
+        """ Return the content of the index file """
+        columns = sorted(self._columns.items())
+        for key, column in columns:
+            if len(column.values) > 2 * len(self._status) + 16:
+                column.compact()
+        tables = pickle.dumps((self._statuses, [(key, column.codes.typecode, column.values) for key, column in columns]),
+                              pickle.HIGHEST_PROTOCOL)
+        body = [_TABLES_LENGTH.pack(len(tables)), tables, bytes(self._status), _to_bytes(self._modified)]
+        body.extend(_to_bytes(column.codes) for key, column in columns)
+        body = b''.join(body)
+        return _HEADER.pack(_MAGIC, _VERSION, len(self._status), zlib.crc32(body) & 0xffffffff) + body
+
+    @classmethod
+    def fromBytes(cls, data):
+        """
+        Return the index stored in data, as written by toBytes
+        Args:
+            data (bytes): Content of the index file
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated subjob index")
+        magic, version, length, crc = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Unknown subjob index format")
+        if zlib.crc32(data[_HEADER.size:]) & 0xffffffff != crc:
+            raise ValueError("Corrupt subjob index")
+        pos = _HEADER.size
+        tables_length, = _TABLES_LENGTH.unpack_from(data, pos)
+        pos += _TABLES_LENGTH.size
+        statuses, tables = pickle.loads(data[pos:pos + tables_length])
+        pos += tables_length
+
+        index = cls()
+        index._statuses = statuses
+        index._status_codes = dict((status, code) for code, status in enumerate(statuses) if code)
+        index._status = bytearray(data[pos:pos + length])
+        pos += length
+        index._modified, pos = _from_bytes('d', data, pos, length)
+        for key, typecode, values in tables:
+            codes, pos = _from_bytes(typecode, data, pos, length)
+            index._columns[key] = _Column(length, values, codes)
+        return index
+
+    @classmethod
+    def fromRows(cls, rows):
+        """
+        Return the index holding rows
+        Args:
+            rows (dict): The index caches of the subjobs keyed by their id, as written by older versions
+        """
+        index = cls()
+        for subjob_id in sorted(rows):
+            if rows[subjob_id] is not None:
+                index.set(subjob_id, rows[subjob_id])
+        return index
+
+    def write(self, fobj):
+        """ Write the index to the (binary) file object fobj """
+        fobj.write(self.toBytes())
+
+    @classmethod
+    def read(cls, fobj):
+        """ Return the index read from the (binary) file object fobj, which may be in the format of older versions """
+        data = fobj.read()
+        if data[:len(_MAGIC)] == _MAGIC:
+            return cls.fromBytes(data)
+        logger.debug("Reading subjob index written by an older version")
+        return cls.fromRows(pickle.loads(data))
@@ -430,6 +430,14 @@ class SubJobJsonList(GangaObject):
                 sj_statuses.append(self.__getitem__(i).status)
         return sj_statuses
 
+    def getSubJobIdsWithStatus(self, statuses):
+        """
+        Returns the ids of the subjobs which are in one of statuses whilst respecting the Lazy loading
+        Args:
+            statuses (list): The statuses of interest
+        """
+        return [i for i, status in enumerate(self.getAllSJStatus()) if status in statuses]
+
     def _setFlushed(self):
         """ Like Node only descend into objects which aren't in the Schema"""
         for index in self._cachedJobs:
@@ -5,6 +5,9 @@ from GangaCore.Core.GangaRepository.GangaRepository import RepositoryError
 from GangaCore.Core.exceptions import GangaException
 from GangaCore.GPIDev.Base.Proxy import stripProxy
 from GangaCore.Core.GangaRepository.VStreamer import XMLFileError
+from GangaCore.Core.GangaRepository.SubJobIndex import SubJobIndex
+from GangaCore.Utility.Config import getConfig
+from functools import partial
 import errno
 import copy
 import threading
@@ -76,7 +79,7 @@ class SubJobXMLList(GangaObject):
         if jobDirectory == '' and registry is None:
             return
 
-        self._subjobIndexData = {}
+        self._subjobIndexData = SubJobIndex()
         if parent:
             self._setParent(parent)
         self.load_subJobIndex()
@@ -142,55 +145,16 @@ class SubJobXMLList(GangaObject):
         return subjob_id in self._cachedJobs
 
     def load_subJobIndex(self):
-        """Load the index from all sujobs ynto _subjobIndexData or empty it is an error occurs"""
+        """Load the index from all sujobs into _subjobIndexData or empty it is an error occurs"""
         index_file = path.join(self._jobDirectory, self._subjob_master_index_name)
         if path.isfile(index_file):
-            index_file_obj = None
             try:
-                from GangaCore.Core.GangaRepository.PickleStreamer import from_file
-
-                try:
-                    index_file_obj = open(index_file, "rb")
-                    self._subjobIndexData = from_file(index_file_obj)[0]
-                except IOError as err:
-                    self._subjobIndexData = None
-                    self._setDirty()
-
-                if self._subjobIndexData is None:
-                    self._subjobIndexData = {}
-                else:
-                    for subjob_id in self._subjobIndexData:
-                        index_data = self._subjobIndexData.get(subjob_id)
-                        # CANNOT PERFORM REASONABLE DISK CHECKING ON AFS
-                        # SLOW FILE ACCESS WRITE AND METADATA MEANS FILE DATA DOES NOT MATCH MOD TIME
-                        # if index_data is not None and 'modified' in index_data:
-                        #    mod_time = index_data['modified']
-                        #    disk_location = self.__get_dataFile(str(subjob_id))
-                        #    disk_time = stat(disk_location).st_ctime
-                        #    diff = disk_time - mod_time
-                        #    if disk_time > mod_time and (diff*diff < 9.):
-                        #        logger.warning("objs: %s" % self._cachedJobs.keys())
-                        #        logger.warning("%s != %s" % (mod_time, disk_time))
-                        #        logger.warning("SubJob: %s has been modified, re-loading" % (subjob_id))
-                        #        new_data = self._registry.getIndexCache( self.__getitem__(subjob_id) )
-                        #        self._subjobIndexData[subjob_id] = new_data
-                        #        break
-                        # else:
-                        if index_data is None:
-                            logger.warning("Cannot find subjob index %s, rebuilding" % subjob_id)
-                            new_data = self._registry.getIndexCache(self.__getitem__(subjob_id))
-                            self._subjobIndexData[subjob_id] = new_data
-                            continue
-                        #self._subjobIndexData = {}
+                with open(index_file, "rb") as index_file_obj:
+                    self._subjobIndexData = SubJobIndex.read(index_file_obj)
             except Exception as err:
                 logger.debug("Subjob Index file open, error: %s" % err)
-                self._subjobIndexData = {}
+                self._subjobIndexData = SubJobIndex()
                 self._setDirty()
-            finally:
-                if index_file_obj is not None:
-                    index_file_obj.close()
-                if self._subjobIndexData is None:
-                    self._subjobIndexData = {}
         else:
             self._setDirty()
         return
@@ -207,39 +171,47 @@ class SubJobXMLList(GangaObject):
             logger.debug("Can't write Index. Moving on as this is not essential to functioning it's a performance bug")
             logger.debug("Error: %s" % err)
 
+    def __getIndexRow(self, index):
+        """Return the row of the index for a subjob: its index cache, backend id and the time its data file was written
+        Args:
+            index (int): This is the index of the subjob we're interested in
+        """
+        subjob = self.__getitem__(index)
+        row = self._registry.getIndexCache(subjob)
+        row['backend:id'] = getattr(subjob.backend, 'id', None)
+        row['modified'] = stat(self.__get_dataFile(index)).st_ctime
+        return row
+
+    def updateIndex(self, indexes):
+        """Update the rows of the index of the subjobs which have just been written to disk
+        Args:
+            indexes (list): The indexes of the (loaded) subjobs which have been written
+        """
+        for index in indexes:
+            self._subjobIndexData.set(index, self.__getIndexRow(index))
+
     def __really_writeIndex(self, ignore_disk=False):
-        """Do the actual work of writing the index for all subjobs
+        """Do the actual work of writing the index for all subjobs. The rows of the subjobs written by flush are
+        already up to date so only the rows missing from the index have to be made
         Args:
             ignore_disk (bool): Optional flag to force the class to ignore all on-disk data when flushing
         """
 
-        all_caches = {}
         if ignore_disk:
             range_limit = list(self._cachedJobs.keys())
         else:
-            range_limit = list(range(len(self)))
+            range_limit = range(len(self))
+            # Drop the rows of the subjobs which are no longer on disk
+            self._subjobIndexData.resize(len(range_limit))
 
         for sj_id in range_limit:
-            if sj_id in self._cachedJobs:
-                this_cache = self._registry.getIndexCache(self.__getitem__(sj_id))
-                all_caches[sj_id] = this_cache
-                disk_location = self.__get_dataFile(sj_id)
-                all_caches[sj_id]['modified'] = stat(disk_location).st_ctime
-            else:
-                if sj_id in self._subjobIndexData:
-                    all_caches[sj_id] = self._subjobIndexData[sj_id]
-                else:
-                    this_cache = self._registry.getIndexCache(self.__getitem__(sj_id))
-                    all_caches[sj_id] = this_cache
-                    disk_location = self.__get_dataFile(sj_id)
-                    all_caches[sj_id]['modified'] = stat(disk_location).st_ctime
+            if sj_id not in self._subjobIndexData:
+                self._subjobIndexData.set(sj_id, self.__getIndexRow(sj_id))
 
         try:
-            from GangaCore.Core.GangaRepository.PickleStreamer import to_file
             index_file = path.join(self._jobDirectory, self._subjob_master_index_name)
-            index_file_obj = open(index_file, "wb")
-            to_file(all_caches, index_file_obj)
-            index_file_obj.close()
+            with open(index_file, "wb") as index_file_obj:
+                self._subjobIndexData.write(index_file_obj)
         # Once I work out what the other exceptions here are I'll add them
         except (IOError,) as err:
             logger.debug("cache write error: %s" % err)
@@ -416,11 +388,12 @@ class SubJobXMLList(GangaObject):
                         else:
                             raise RepositoryError(self, "IOError on loading subobject %s: %s" % (index, x))
 
-                from GangaCore.Core.GangaRepository.VStreamer import from_file
+                from GangaCore.Core.GangaRepository.DeltaStreamer import from_file, SubJobTemplate
+                get_template = partial(SubJobTemplate.load, self._jobDirectory)
 
                 # load the subobject into a temporary object
                 try:
-                    loaded_sj = from_file(sj_file)[0]
+                    loaded_sj = from_file(sj_file, get_template)[0]
                 except (IOError, XMLFileError) as err:
 
                     try:
@@ -428,7 +401,7 @@ class SubJobXMLList(GangaObject):
                             index, self.getMasterID()))
                         subjob_data = self.__get_dataFile(str(index), True)
                         sj_file = self._loadSubJobFromDisk(subjob_data)
-                        loaded_sj = from_file(sj_file)[0]
+                        loaded_sj = from_file(sj_file, get_template)[0]
                         has_loaded_backup = True
                     except (IOError, XMLFileError) as err:
                         logger.debug("Failed to Load XML for job: %s using: %s" % (index, subjob_data))
@@ -477,47 +450,65 @@ class SubJobXMLList(GangaObject):
         if index > len(self) or index < 0:
             return None
 
-        if index in self._subjobIndexData:
-            if self.isLoaded(index):
-                return self._registry.getIndexCache(self.__getitem__(index))
-            else:
-                return self._subjobIndexData[index]
+        if index in self._subjobIndexData and not self.isLoaded(index):
+            return self._subjobIndexData.get(index)
         else:
             return self._registry.getIndexCache(self.__getitem__(index))
 
-        return None
-
     def getAllCachedData(self):
         """Get the cached data from the index for all subjobs"""
         cached_data = []
-        #logger.debug("Cache: %s" % self._subjobIndexData)
-        if len(self._subjobIndexData) == len(self):
-            for i in range(len(self)):
-                if self.isLoaded(i):
-                    cached_data.append(self._registry.getIndexCache(self.__getitem__(i)))
-                else:
-                    cached_data.append(self._subjobIndexData[i])
-        else:
-            for i in range(len(self)):
+        for i in range(len(self)):
+            if self.isLoaded(i) or i not in self._subjobIndexData:
                 cached_data.append(self._registry.getIndexCache(self.__getitem__(i)))
-
+            else:
+                cached_data.append(self._subjobIndexData.get(i))
         return cached_data
 
+    def __getAllValues(self, key, attribute):
+        """Return the values of key in the index for all subjobs, taken from the subjobs themselves for the ones which
+        are loaded (and may have changed) or have no row in the index
+        Args:
+            key (str): key of the index column
+            attribute (callable): returns the value from a subjob
+        """
+        values = self._subjobIndexData.column(key, len(self))
+        for i, subjob in list(self._cachedJobs.items()):
+            if i < len(values):
+                values[i] = attribute(subjob)
+        for i in range(len(values)):
+            if values[i] is None and i not in self._subjobIndexData:
+                values[i] = attribute(self.__getitem__(i))
+        return values
+
     def getAllSJStatus(self):
         """
         Returns the cached statuses of the subjobs whilst respecting the Lazy loading
         """
-        sj_statuses = []
-        if len(self._subjobIndexData) == len(self):
-            for i in range(len(self)):
-                if self.isLoaded(i):
-                    sj_statuses.append(self.__getitem__(i).status)
-                else:
-                    sj_statuses.append(self._subjobIndexData[i]['status'])
-        else:
-            for i in range(len(self)):
-                sj_statuses.append(self.__getitem__(i).status)
-        return sj_statuses
+        return self.__getAllValues('status', lambda subjob: subjob.status)
+
+    def getAllSJBackendIDs(self):
+        """
+        Returns the cached backend ids of the subjobs whilst respecting the Lazy loading
+        """
+        return self.__getAllValues('backend:id', lambda subjob: getattr(subjob.backend, 'id', None))
+
+    def getSubJobIdsWithStatus(self, statuses):
+        """
+        Returns the ids of the subjobs which are in one of statuses whilst respecting the Lazy loading
+        Args:
+            statuses (list): The statuses of interest
+        """
+        num_subjobs = len(self)
+        if not self._subjobIndexData.isComplete(num_subjobs):
+            return [i for i, status in enumerate(self.getAllSJStatus()) if status in statuses]
+        sj_ids = set(i for i in self._subjobIndexData.idsWithStatus(statuses) if i < num_subjobs)
+        for i, subjob in list(self._cachedJobs.items()):
+            if subjob.status in statuses:
+                sj_ids.add(i)
+            else:
+                sj_ids.discard(i)
+        return sorted(sj_ids)
 
     def flush(self, ignore_disk=False):
         """Flush all subjobs to disk using XML methods
@@ -526,7 +517,8 @@ class SubJobXMLList(GangaObject):
         """
         from GangaCore.Core.GangaRepository.GangaRepositoryXML import safe_save
 
-        from GangaCore.Core.GangaRepository.VStreamer import to_file
+        # only worked out once there is a subjob to write as it may serialize the master
+        to_file = None
 
         if ignore_disk:
             range_limit = list(self._cachedJobs.keys())
@@ -545,10 +537,28 @@ class SubJobXMLList(GangaObject):
                 if subjob_obj is subjob_obj._getRoot():
                     raise GangaException(self, "Subjob parent not set correctly in flush.")
 
+                if to_file is None:
+                    to_file = self.getSubJobWriter(self._jobDirectory, self._definedParent)
                 safe_save(subjob_data, subjob_obj, to_file)
+                self.updateIndex([index])
 
         self.write_subJobIndex(ignore_disk)
 
+    @staticmethod
+    def getSubJobWriter(jobDirectory, master):
+        """Return the function used to write the subjobs of master to disk. This is the XML VStreamer unless
+        [Registry]SubJobDeltaStorage is enabled, then subjobs are written as their differences to a template of the master
+        (see DeltaStreamer).
+        Args:
+            jobDirectory (str): dir on disk which contains the subjob folders
+            master (Job): the master job of the subjobs
+        """
+        from GangaCore.Core.GangaRepository.VStreamer import to_file
+        if master is None or not getConfig('Registry')['SubJobDeltaStorage']:
+            return to_file
+        from GangaCore.Core.GangaRepository.DeltaStreamer import subjob_writer
+        return subjob_writer(jobDirectory, master)
+
     def _setFlushed(self):
         """ Like Node only descend into objects which aren't in the Schema"""
         for index in self._cachedJobs:
@@ -565,9 +575,8 @@ class SubJobXMLList(GangaObject):
             markup (str): This is the markup function used to format the text in the table from registry slice
         """
         ds = ""
-        for obj_i in self.keys():
+        for cached_data in self.getAllCachedData():
 
-            cached_data = self.getCachedData(obj_i)
             colour = reg_slice._getColour(cached_data)
 
             vals = []
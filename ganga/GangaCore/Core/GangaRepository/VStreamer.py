@@ -1,4 +1,6 @@
 import re
+import ast
+import datetime
 from GangaCore.Core.exceptions import GangaException
 from GangaCore.Utility.logging import getLogger
 from GangaCore.GPIDev.Base.Proxy import addProxy, stripProxy, isType, getName
@@ -6,11 +8,11 @@ from GangaCore.GPIDev.Base.Proxy import addProxy, stripProxy, isType, getName
 from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList, makeGangaListByRef
 
 # config_scope is namespace used for evaluating simple objects (e.g. File, datetime, SharedDir)
-from GangaCore.Utility.Config import config_scope
+from GangaCore.Utility.Config import config_scope, getConfig
 
 from GangaCore.Utility.Plugin import PluginManagerError, allPlugins
 
-from GangaCore.GPIDev.Base.Objects import GangaObject, ObjectMetaclass
+from GangaCore.GPIDev.Base.Objects import GangaObject, ObjectMetaclass, Node
 from GangaCore.GPIDev.Schema import Schema, Version
 from GangaCore.GPIDev.Lib.GangaList.GangaList import makeGangaList
 
@@ -24,6 +26,14 @@ logger = getLogger()
 
 _cached_eval_strings = {}
 
+# raw <value> CDATA -> (decoded value, function copying it or None), see FastLoader
+_cached_values = {}
+# the cache is emptied once it holds this many values
+_max_cached_values = 100000
+
+# (category, name, version) -> _ClassDecoder, see FastLoader
+_class_decoders = {}
+
 ##########################################################################
 # Ganga Project. http://cern.ch/ganga
 #
@@ -90,7 +100,11 @@ def _raw_from_file(f):
     # logger.debug('----------------------------')
     ###logger.debug('Parsing file: %s',f.name)
     xml_content = f.read()
-    obj, errors = Loader().parse(xml_content)
+    if getConfig('Registry')['FastXMLLoader']:
+        loader = FastLoader()
+    else:
+        loader = Loader()
+    obj, errors = loader.parse(xml_content)
     return obj, errors
 
 
@@ -460,3 +474,272 @@ class Loader(object):
             if not hasattr(obj, attr):
                 raise AssertionError("incomplete XML file")
         return obj, self.errors
+
+
+##########################################################################
+# Fast XML Parser.
+
+# Types of the values which can be shared between objects rather than copied
+_immutable_types = frozenset((str, bytes, int, float, complex, bool, type(None),
+                              datetime.datetime, datetime.date, datetime.time, datetime.timedelta))
+
+
+def _value_copier(value):
+    """
+    Return the function making a copy of a decoded value for a new object, None if the value can be shared.
+    Containers of immutable values only need a shallow copy, anything else is deep copied as the Loader does.
+    Args:
+        value (unknown): The decoded value
+    """
+    value_type = type(value)
+    if value_type in _immutable_types:
+        return None
+    if value_type in (list, tuple, frozenset, set):
+        shallow = all(_value_copier(v) is None for v in value)
+    elif value_type is dict:
+        shallow = all(_value_copier(v) is None for v in value.values())
+    else:
+        shallow = False
+    if not shallow:
+        return copy.deepcopy
+    if value_type in (tuple, frozenset):
+        return None
+    return value_type.copy
+
+
+# Functions the literal parser may call, as long as this is what they are in config_scope
+_literal_calls = (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)
+
+
+def _literal(node):
+    """
+    Return the value of the ast node of a literal: a constant, list, tuple, dict or a call of one of _literal_calls.
+    Raises ValueError for anything else.
+    Args:
+        node (ast.AST): The node to be converted
+    """
+    node_type = type(node)
+    if node_type is ast.Constant:
+        return node.value
+    if node_type is ast.List:
+        return [_literal(n) for n in node.elts]
+    if node_type is ast.Tuple:
+        return tuple(_literal(n) for n in node.elts)
+    if node_type is ast.Dict:
+        if None in node.keys:
+            raise ValueError('dict unpacking is not a literal')
+        return {_literal(k): _literal(v) for k, v in zip(node.keys, node.values)}
+    if node_type is ast.UnaryOp and type(node.operand) is ast.Constant and type(node.op) in (ast.USub, ast.UAdd):
+        value = node.operand.value
+        if type(value) in (int, float, complex):
+            return -value if type(node.op) is ast.USub else +value
+    if node_type is ast.Call and not node.keywords and type(node.func) is ast.Attribute \
+            and type(node.func.value) is ast.Name:
+        function = getattr(config_scope.get(node.func.value.id), node.func.attr, None)
+        if function in _literal_calls:
+            return function(*[_literal(n) for n in node.args])
+    raise ValueError('not a literal: %s' % node_type.__name__)
+
+
+def _decode_literal(s):
+    """
+    Return the python object for the repr() stored in a <value> element.
+    Literals are converted without compiling them, anything else is evaluated in config_scope as the Loader does.
+    Args:
+        s (str): The unescaped content of the <value> element
+    """
+    tree = ast.parse(s.strip(), mode='eval')
+    try:
+        return _literal(tree.body)
+    except ValueError:
+        return eval(compile(tree, '<value>', 'eval'), config_scope)
+
+
+def _decode_value(text):
+    """
+    Return a new instance of the value held in the raw CDATA text of a <value> element
+    Args:
+        text (str): Content of the <value> element as found in the XML
+    """
+    try:
+        value, copier = _cached_values[text]
+    except KeyError:
+        s = unescape(text) if '&' in text else text
+        if 'L}' in s:
+            s = re.sub(r'(\d)L(\})', r'\1\2', s)
+        value = _decode_literal(s)
+        copier = _value_copier(value)
+        if len(_cached_values) >= _max_cached_values:
+            _cached_values.clear()
+        _cached_values[text] = (value, copier)
+    if copier is None:
+        return value
+    return copier(value)
+
+
+def _set_schema_attribute(obj, attrib_name, attrib_value):
+    """ GangaObject.setSchemaAttribute without the method lookup, used for classes which don't override it """
+    obj._data_dict[attrib_name] = attrib_value
+    if isinstance(attrib_value, Node) and attrib_value._getParent() is not obj:
+        attrib_value._setParent(obj)
+
+
+def _make_loaded_list(items):
+    """
+    Return the GangaList which makeGangaList(items) returns, for items freshly loaded from XML (so without proxies)
+    without going through the constructor and the schema defaults.
+    Args:
+        items (list): The items of the new list
+    """
+    alist = GangaList.getNew()
+    alist._data_dict = {'_list': items, '_is_preparable': False}
+    # makeGangaList sets _is_preparable through the schema which marks the new list as dirty
+    alist._dirty = True
+    return alist
+
+
+class _ClassDecoder(object):
+
+    """
+    What the FastLoader needs to know about one class found in the XML, worked out once per class and version
+    """
+
+    __slots__ = ('cls', 'set_attribute')
+
+    def __init__(self, cls):
+        self.cls = cls
+        if cls.setSchemaAttribute is GangaObject.setSchemaAttribute:
+            self.set_attribute = _set_schema_attribute
+        else:
+            self.set_attribute = cls.setSchemaAttribute
+
+    @staticmethod
+    def find(attrs):
+        """
+        Return the decoder for the class described by the attributes of a <class> element.
+        Raises PluginManagerError for unknown classes and SchemaVersionError for incompatible versions.
+        Args:
+            attrs (dict): Attributes of the <class> element
+        """
+        key = (attrs['category'], attrs['name'], attrs['version'])
+        try:
+            return _class_decoders[key]
+        except KeyError:
+            pass
+        cls = allPlugins.find(attrs['category'], attrs['name'])
+        version = Version(*[int(v) for v in attrs['version'].split('.')])
+        if not cls._schema.version.isCompatible(version):
+            raise SchemaVersionError('Incompatible schema of %s, repository is %s currently in use is %s.%s' % (
+                attrs['name'], attrs['version'], cls._schema.version.major, cls._schema.version.minor))
+        decoder = _class_decoders[key] = _ClassDecoder(cls)
+        return decoder
+
+
+class FastLoader(Loader):
+
+    """ Job object tree loader giving the same object trees as the Loader in less time.
+    The classes and the <value> elements are decoded once and cached, sequences are built without going
+    through the GangaList constructor and the CDATA is buffered in a list.
+    """
+
+    def parse(self, s):
+        """ Parse and load object from string s using internal XML parser (expat).
+        """
+        import xml.parsers.expat
+
+        # the decoder of each object being loaded
+        decoders = []
+        sequence_start = self.sequence_start
+        errors = self.errors
+        value_parts = []
+        # state shared with the handlers: [ignore_count, in <value>, stack]
+        state = [0, False, None]
+
+        def start_element(name, attrs):
+            # if higher level element had error, ignore the corresponding part of the XML tree as we go down
+            if state[0]:
+                state[0] += 1
+                return
+            stack = state[2]
+            if name == 'root':
+                assert stack is None, "duplicated <root> element"
+                state[2] = []
+                return
+            assert stack is not None, "missing <root> element"
+
+            if name == 'value':
+                state[1] = True
+                del value_parts[:]
+            elif name == 'attribute':
+                stack.append(attrs['name'])
+            elif name == 'sequence':
+                sequence_start.append(len(stack))
+            elif name == 'class':
+                try:
+                    decoder = _ClassDecoder.find(attrs)
+                except (PluginManagerError, SchemaVersionError) as err:
+                    errors.append(err)
+                    # ignore all elements until the corresponding </class> is reached
+                    state[0] = 1
+                    stack.append(EmptyGangaObject())
+                else:
+                    stack.append(decoder.cls.getNew())
+                    decoders.append(decoder)
+
+        def end_element(name):
+            # if higher level element had error, ignore the corresponding part of the XML tree as we go up
+            if state[0]:
+                state[0] -= 1
+                return
+            stack = state[2]
+            if name == 'value':
+                text = ''.join(value_parts)
+                state[1] = False
+                try:
+                    stack.append(_decode_value(text))
+                except Exception:
+                    raise GangaException(
+                        "ERROR in loading XML, failed to correctly parse attribute value: \'%s\'" % text)
+            elif name == 'attribute':
+                value = stack.pop()
+                aname = stack.pop()
+                obj = stack[-1]
+                try:
+                    decoders[-1].set_attribute(obj, aname, value)
+                except Exception:
+                    raise GangaException(
+                        "ERROR in loading XML, failed to set attribute %s for class %s" % (aname, getName(obj)))
+            elif name == 'sequence':
+                pos = sequence_start.pop()
+                alist = _make_loaded_list(stack[pos:])
+                del stack[pos:]
+                stack.append(alist)
+            elif name == 'class':
+                decoders.pop()
+
+        def char_data(data):
+            # the CDATA of a <value> may come in several pieces
+            if state[1]:
+                value_parts.append(data)
+
+        p = xml.parsers.expat.ParserCreate()
+        p.buffer_text = True
+
+        p.StartElementHandler = start_element
+        p.EndElementHandler = end_element
+        p.CharacterDataHandler = char_data
+
+        p.Parse(s)
+
+        stack = self.stack = state[2]
+        if len(stack) != 1:
+            errors.append(AssertionError('multiple objects inside <root> element'))
+
+        obj = stack[-1]
+
+        # Raise Exception if object is incomplete
+        data = obj._data
+        for attr, item in obj._schema.allItems():
+            if attr not in data and not hasattr(obj, attr):
+                raise AssertionError("incomplete XML file")
+        return obj, errors
@@ -2,7 +2,12 @@ import os
 import pickle
 import pymongo
 
+from functools import partial
+
 from GangaCore.Core.GangaRepository.VStreamer import from_file
+from GangaCore.Core.GangaRepository.DeltaStreamer import from_file as subjob_from_file, SubJobTemplate
+from GangaCore.Core.GangaRepository.IndexStore import IndexStore
+from GangaCore.Core.GangaRepository.SubJobIndex import SubJobIndex
 from GangaCore.Core.GangaRepository.DStreamer import (
     EmptyGangaObject,
     index_to_database,
@@ -35,25 +40,34 @@ def job_migrate(connection):
     """
     jobs_path = os.path.join(getLocalRoot(), '6.0', 'jobs')
 
+    index_store = IndexStore(os.path.join(jobs_path, "index.log"))
+    index_store.read()
+
     job_ids = [i for i in os.listdir(os.path.join(jobs_path, "0xxx"))
-               if "index" not in i]
+               if i.isdigit()]
     for idx in sorted(job_ids):
         job_file = getXMLFile(int(idx))
         job_folder = os.path.dirname(job_file)
         jeb, err = from_file(open(job_file, "rb"))
-        _, _, index = pickle.load(
-            open(job_file.replace("/data", ".index"), "rb"))
+        record = index_store.get(int(idx))
+        if record is not None:
+            _, _, _, index = record
+        else:
+            # repositories from before the index log keep the index of each job in a pickled .index file
+            with open(job_file.replace("/data", ".index"), "rb") as index_file:
+                _, _, index = pickle.load(index_file)
         # check for subjobs
         if "subjobs.idx" in os.listdir(job_folder):
             subjob_ids = [i for i in os.listdir(job_folder) if i.isdecimal()]
             subjob_files = [os.path.join(job_folder, i, "data")
                             for i in subjob_ids]
-            subjob_indexes = pickle.load(
-                open(os.path.join(job_folder, "subjobs.idx"), "rb"))
+            with open(os.path.join(job_folder, "subjobs.idx"), "rb") as index_file:
+                subjob_indexes = SubJobIndex.read(index_file).rows()
 
             for s_idx, file in zip(sorted(subjob_indexes), sorted(subjob_files)):
                 s_index = subjob_indexes[s_idx]
-                s_jeb, er = from_file(open(file, "rb"))
+                # subjobs may be stored as deltas to a template of the master, they go into the database in full
+                s_jeb, er = subjob_from_file(open(file, "rb"), partial(SubJobTemplate.load, job_folder))
 
                 if isinstance(s_jeb, EmptyGangaObject):
                     continue
@@ -0,0 +1,212 @@
+"""
+A pipeline pushing a list of items through a sequence of stages, such as preparing and submitting the subjobs of a job.
+
+Every stage has its own pool of workers so that a slow stage doesn't hold up the others, and an item moves on to the
+next stage as soon as it is done with the previous one. The number of items in flight is bounded, when that many are
+being worked on the caller waits for one of them to finish before starting the next one.
+"""
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+
+from GangaCore.Core.exceptions import GangaValueError
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+
+def _timed_call(function, item):
+    """
+    Return function(item) and the time the call took. This is what the workers of a stage run
+    Args:
+        function (callable): The function of the stage
+        item (object): The item to pass to it
+    """
+    start = time.time()
+    result = function(item)
+    return result, time.time() - start
+
+
+class PipelineStage(object):
+    """
+    A stage of a Pipeline: the function applied to each item and the pool of workers running it.
+    A 'process' pool runs the function in other processes, so the function, its items and its results must be
+    picklable and any changes it makes to the items are not seen by this session.
+    """
+
+    __slots__ = ('name', 'function', 'workers', 'kind', 'count', 'failed', 'busy', '_first', '_last')
+
+    def __init__(self, name, function, workers=1, kind='thread'):
+        """
+        Args:
+            name (str): Name of the stage, used when reporting
+            function (callable): Called with each item, its return value is the item passed to the next stage
+            workers (int): Number of workers of the stage
+            kind (str): 'thread' or 'process'
+        """
+        if kind not in ('thread', 'process'):
+            raise GangaValueError("Unknown kind of pipeline stage '%s', expected 'thread' or 'process'" % kind)
+        self.name = name
+        self.function = function
+        self.workers = max(int(workers), 1)
+        self.kind = kind
+        # Number of items done and failed, and the total time spent on them
+        self.count = 0
+        self.failed = 0
+        self.busy = 0.
+        # When the first item entered the stage and when the last one left it
+        self._first = None
+        self._last = None
+
+    def _executor(self):
+        if self.kind == 'process':
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='Pipeline_%s' % self.name)
+
+    @property
+    def throughput(self):
+        """ Items done per second of the time the stage was in use """
+        if not self.count or self._first is None:
+            return 0.
+        return self.count / max(self._last - self._first, 1e-6)
+
+    def report(self):
+        """ A one line summary of the work done by this stage """
+        return "%s: %s items (%s failed) at %.1f/s, %.2fs busy" % (self.name, self.count, self.failed,
+                                                                   self.throughput, self.busy)
+
+
+class Pipeline(object):
+    """
+    Push items through a sequence of PipelineStages.
+
+    When keep_going is False the first failure stops the pipeline: no new items are started, the items waiting for a
+    worker are dropped and the exception is raised once the items being worked on have finished. When keep_going is
+    True the failed items are recorded in ``failures`` and the others carry on.
+    """
+
+    def __init__(self, stages, keep_going=False, max_pending=None):
+        """
+        Args:
+            stages (list): The PipelineStages, in order
+            keep_going (bool): Carry on with the other items when one of them fails
+            max_pending (int): Largest number of items in flight, by default twice the number of workers
+        """
+        self.stages = list(stages)
+        self.keep_going = keep_going
+        if not max_pending:
+            max_pending = 2 * sum(stage.workers for stage in self.stages)
+        self.max_pending = max_pending
+        # index -> (stage name, exception) of the items which failed
+        self.failures = {}
+        self._results = []
+        self._in_flight = 0
+        self._aborted = False
+        self._futures = set()
+        self._cond = threading.Condition()
+        self._executors = []
+
+    def run(self, items):
+        """
+        Push all items through the pipeline and return the list of the results of the last stage, in the order of the
+        items. The result of an item which failed is None.
+        Args:
+            items (iterable): The items to be processed
+        """
+        items = list(items)
+        self._results = [None] * len(items)
+        self.failures = {}
+        self._aborted = False
+
+        with ExitStack() as stack:
+            self._executors = [stack.enter_context(stage._executor()) for stage in self.stages]
+            for index, item in enumerate(items):
+                with self._cond:
+                    while self._in_flight >= self.max_pending and not self._aborted:
+                        self._cond.wait()
+                    if self._aborted:
+                        break
+                    self._in_flight += 1
+                self._submit(0, index, item)
+
+            with self._cond:
+                while self._in_flight:
+                    self._cond.wait()
+        self._executors = []
+
+        logger.debug("Pipeline done with %s items: %s" % (len(items), '; '.join(self.report())))
+
+        if self.failures and not self.keep_going:
+            raise self.failures[min(self.failures)][1]
+        return self._results
+
+    def report(self):
+        """ Return a list of one line summaries of the work done by each stage """
+        return [stage.report() for stage in self.stages]
+
+    def _submit(self, stage_no, index, item):
+        """ Hand item to the workers of the stage stage_no """
+        stage = self.stages[stage_no]
+        with self._cond:
+            if stage._first is None:
+                stage._first = time.time()
+        try:
+            future = self._executors[stage_no].submit(_timed_call, stage.function, item)
+        except Exception as err:
+            self._failed(stage, index, err)
+            return
+        with self._cond:
+            self._futures.add(future)
+        future.add_done_callback(partial(self._done, stage_no, index))
+
+    def _done(self, stage_no, index, future):
+        """ Called when an item is done with a stage, passes it on to the next stage """
+        stage = self.stages[stage_no]
+        with self._cond:
+            self._futures.discard(future)
+        if future.cancelled():
+            self._finish()
+            return
+        try:
+            result, elapsed = future.result()
+        except Exception as err:
+            self._failed(stage, index, err)
+            return
+
+        with self._cond:
+            stage.count += 1
+            stage.busy += elapsed
+            stage._last = time.time()
+            aborted = self._aborted
+
+        if aborted:
+            self._finish()
+        elif stage_no + 1 < len(self.stages):
+            self._submit(stage_no + 1, index, result)
+        else:
+            self._results[index] = result
+            self._finish()
+
+    def _failed(self, stage, index, err):
+        """ Record the failure of an item, stopping the pipeline unless we keep going """
+        logger.debug("Item %s failed in pipeline stage '%s': %s" % (index, stage.name, err))
+        with self._cond:
+            stage.failed += 1
+            stage._last = time.time()
+            self.failures[index] = (stage.name, err)
+            to_cancel = []
+            if not self.keep_going and not self._aborted:
+                self._aborted = True
+                to_cancel = list(self._futures)
+        # Cancelling runs the callbacks of the cancelled futures so this must be done without holding the lock
+        for future in to_cancel:
+            future.cancel()
+        self._finish()
+
+    def _finish(self):
+        """ An item has left the pipeline """
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
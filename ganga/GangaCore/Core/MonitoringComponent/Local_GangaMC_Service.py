@@ -1175,16 +1175,16 @@ class JobRegistry_Monitor(GangaThread):
                 log.debug("Lets not crash here!")
                 return
 
-            # FIXME THIS METHOD DOES NOT EXIST
-            #log.debug("[Update Thread %s] Flushing registry %s." % (current_thread, [x.id for x in jobList_fromset]))
-            # FIXME THIS RETURNS A REGISTRYSLICE OBJECT NOT A REGISTRY, IS THIS CORRECT? SHOULD WE FLUSH
-            # COMMENTING OUT AS IT SIMPLY WILL NOT RUN/RESOLVE!
-            # this concerns me - rcurrie
-            # self.registry_slice._flush(jobList_fromset)  # Optimisation required!
-
-            # for this_job in jobList_fromset:
-            #    stripped_job = stripProxy(this_job)
-            #    stripped_job._getRegistry()._flush([stripped_job])
+            # Hand the updated jobs to the writer thread of their registry, this doesn't wait for them to be written
+            log.debug("[Update Thread %s] Scheduling flush of %s." % (current_thread, [x.id for x in jobList_fromset]))
+            to_flush = {}
+            for this_job in jobList_fromset:
+                stripped_job = stripProxy(this_job)
+                this_registry = stripped_job._getRegistry()
+                if this_registry is not None:
+                    to_flush.setdefault(id(this_registry), (this_registry, []))[1].append(stripped_job)
+            for this_registry, these_jobs in to_flush.values():
+                this_registry._schedule_flush(these_jobs)
 
         except Exception as err:
             log.debug("Monitoring Loop Error: %s" % str(err))
@@ -47,6 +47,46 @@ class AsyncMonitoringService(GangaThread):
         if not self.enabled:
             return
 
+        found_active_backends = self._find_active_jobs(job_slice)
+
+        # If a backend is newly found as active, trigger its monitoring
+        previously_active_backends = self.active_backends
+        self.active_backends = found_active_backends
+        for backend_name, these_jobs in self.active_backends.items():
+            if backend_name not in previously_active_backends:
+                log.debug(f'Adding {backend_name} to list of backends to monitor.')
+                self._check_backend(lazyLoadJobBackend(these_jobs[0]))
+
+        self._log_backend_summary(found_active_backends)
+
+        if previously_active_backends:
+            self._cleanup_finished_backends(previously_active_backends, found_active_backends)
+
+        self.loop.call_later(POLL_RATE, self._check_active_backends)
+
+    def _find_active_jobs(self, job_slice=None):
+        """
+        Returns a dict of backend name -> list of jobs which are to be monitored.
+        If the registry keeps an index of the active jobs only that index is read, so the cost of this
+        depends on the number of active jobs rather than on the number of jobs in the repository.
+        Args:
+            job_slice (RegistrySlice): Optional slice of jobs to be scanned instead of the whole registry
+        """
+        registry = getattr(self.registry_slice, 'objects', None)
+        if job_slice is None and hasattr(registry, 'getActiveJobIds'):
+            found_active_backends = {}
+            for backend_name, active_ids in registry.getActiveJobIds().items():
+                for i in active_ids:
+                    try:
+                        j = stripProxy(self.registry_slice(i))
+                    except RegistryKeyError as err:
+                        log.debug("RegistryKeyError: The job was most likely removed")
+                        log.debug("RegError %s" % str(err))
+                        continue
+                    found_active_backends.setdefault(backend_name, [])
+                    found_active_backends[backend_name].append(j)
+            return found_active_backends
+
         if job_slice:
             fixed_ids = job_slice.ids()
         else:
@@ -70,21 +110,7 @@ class AsyncMonitoringService(GangaThread):
             except RegistryLockError as err:
                 log.debug("RegistryLockError: The job was most likely removed")
                 log.debug("Reg LockError%s" % str(err))
-
-        # If a backend is newly found as active, trigger its monitoring
-        previously_active_backends = self.active_backends
-        self.active_backends = found_active_backends
-        for backend_name in self.active_backends:
-            if backend_name not in previously_active_backends:
-                log.debug(f'Adding {backend_name} to list of backends to monitor.')
-                self._check_backend(backend_obj)
-
-        self._log_backend_summary(found_active_backends)
-
-        if previously_active_backends:
-            self._cleanup_finished_backends(previously_active_backends, found_active_backends)
-
-        self.loop.call_later(POLL_RATE, self._check_active_backends)
+        return found_active_backends
 
     def _log_backend_summary(self, active_backends):
         summary = "{"
@@ -24,55 +24,105 @@ class SandboxError(GangaException):
 
 # FIXME: os.system error handling missing in this module!
 
-def createPackedInputSandbox(sandbox_files, inws, name):
-    """Put all sandbox_files into tarball called name and write it into to the input workspace.
-       This function is called by Ganga client at the submission time.
-       Arguments:
-                'sandbox_files': a list of File or FileBuffer objects.
-                'inws': a InputFileWorkspace object
-       Return: a list containing a path to the tarball
-       """
+SANDBOX_CACHE_DIR_NAME = 'sandbox_cache'
 
-#    from GangaCore.Core import FileWorkspace
-#    from GangaCore.GPIDev.Lib.File import File
+# tarfile compression -> extension of the tarballs in the sandbox cache
+_cache_extensions = {'gz': '.tgz', 'bz2': '.tbz2', '': '.tar'}
 
-#    tgzfile = os.path.join(tmpdir,name)
 
-    tgzfile = inws.getPath(name)
+def _sandbox_file_format(tgzfile):
+    """Return the compression of the tarball tgzfile as understood by tarfile"""
+    if mimetypes.guess_type(tgzfile)[1] in ['gzip']:
+        return 'gz'
+    elif mimetypes.guess_type(tgzfile)[1] in ['bzip2']:
+        return 'bz2'
+    return ''
 
-    import stat
-    import tarfile
 
-    logger.debug("Creating packed Sandbox with %s many sandbox files." % len(sandbox_files))
+def _sandbox_member_name(f):
+    """Return the name of the File or FileBuffer f in the sandbox tarball"""
+    from GangaCore.GPIDev.Base.Proxy import isType
+    from GangaCore.GPIDev.Lib.File.FileBuffer import FileBuffer
 
-#
-# Curent release with os module
-#
+    # FIX for Ganga/test/Internals/FileBuffer_Sandbox
+    # Don't keep the './' on files as looking for an exact filename
+    # afterwards won't work
+    if isType(f, FileBuffer) and f.subdir == os.curdir:
+        return os.path.basename(f.name)
+    return os.path.join(f.subdir, os.path.basename(f.name))
 
-#   wsdir = os.path.join(tmpdir,"ws")
-#   ws = FileWorkspace.FileWorkspace(wsdir)
-#   ws.create()
-#   for f in sandbox_files:
-#       ws.writefile(f)
 
-    # if os.system("tar -C %s -czf %s ."%(wsdir,tgzfile)) !=0:
-    #       print "ERROR:: can't create tarball file with InputSandbox"
+def _sandbox_digest(sandbox_files, file_format):
+    """Return the hash of the content of the tarball of sandbox_files: the names, modes and contents of the files
+       Arguments:
+                'sandbox_files': a list of File or FileBuffer objects.
+                'file_format': compression of the tarball
+    """
+    import hashlib
+    from GangaCore.GPIDev.Base.Proxy import isType
+    from GangaCore.GPIDev.Lib.File.FileBuffer import FileBuffer
+
+    digest = hashlib.sha1(file_format.encode('utf-8'))
+    for f in sandbox_files:
+        digest.update(b'\0' + _sandbox_member_name(f).encode('utf-8') + b'\0')
+        if isType(f, FileBuffer):
+            contents = f.getContents()
+            if not isinstance(contents, bytes):
+                contents = contents.encode("utf-8")
+            digest.update(b'%d:%d:' % (f.isExecutable(), len(contents)))
+            digest.update(contents)
+        else:
+            try:
+                # the mode of the file is kept in the tarball
+                digest.update(b'%d:%o:%d:' % (f.isExecutable(), os.stat(f.name).st_mode, os.path.getsize(f.name)))
+                with open(f.name, 'rb') as fileobj:
+                    for block in iter(lambda: fileobj.read(1024 * 1024), b''):
+                        digest.update(block)
+            except (IOError, OSError):
+                raise SandboxError("File '%s' does not exist." % f.name)
+    return digest.hexdigest()
+
+
+def getSandboxCachePath():
+    """Return the directory of the packed input sandboxes shared by the jobs with the same input files"""
+    from GangaCore.Utility.Config import getConfig
+    from GangaCore.Utility.files import expandfilename
+    return os.path.join(expandfilename(getConfig('Configuration')['gangadir']), SANDBOX_CACHE_DIR_NAME)
+
+
+def cleanSandboxCache():
+    """Remove the tarballs of the sandbox cache no longer linked to from the input workspace of any job.
+       The tarballs are hard linked into the workspaces, so their link count is their reference count.
+       Return: the number of tarballs removed
+    """
+    cache_dir = getSandboxCachePath()
+    if not os.path.isdir(cache_dir):
+        return 0
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.startswith('.new_'):
+            # being packed
+            continue
+        cached = os.path.join(cache_dir, name)
+        try:
+            if os.stat(cached).st_nlink <= 1:
+                os.unlink(cached)
+                removed += 1
+        except OSError as err:
+            logger.debug("Sandbox cache entry %s not removed: %s" % (cached, err))
+    logger.debug("Removed %s unused tarballs from the sandbox cache" % removed)
+    return removed
 
-#
-# Future release with tarball module
 
-    if mimetypes.guess_type(tgzfile)[1] in ['gzip']:
-        file_format = 'gz'
-    elif mimetypes.guess_type(tgzfile)[1] in ['bzip2']:
-        file_format = 'bz2'
-    else:
-        file_format = ''
+def _writePackedSandbox(sandbox_files, tgzfile, file_format):
+    """Write the tarball tgzfile of sandbox_files"""
+    import stat
+    import tarfile
 
     with tarfile.open(tgzfile, 'w:%s' % file_format) as tf:
         tf.dereference = True  # --not needed in Windows
 
         from GangaCore.GPIDev.Base.Proxy import isType
-        from GangaCore.GPIDev.Lib.File.File import File
         from GangaCore.GPIDev.Lib.File.FileBuffer import FileBuffer
 
         for f in sandbox_files:
@@ -88,13 +138,7 @@ def createPackedInputSandbox(sandbox_files, inws, name):
                     fileobj = BytesIO(contents.encode("utf-8"))
 
                 tinfo = tarfile.TarInfo()
-                # FIX for Ganga/test/Internals/FileBuffer_Sandbox
-                # Don't keep the './' on files as looking for an exact filename
-                # afterwards won't work
-                if f.subdir == os.curdir:
-                    tinfo.name = os.path.basename(f.name)
-                else:
-                    tinfo.name = os.path.join(f.subdir, os.path.basename(f.name))
+                tinfo.name = _sandbox_member_name(f)
                 import time
                 tinfo.mtime = time.time()
                 tinfo.size = len(fileobj.getvalue())
@@ -109,13 +153,85 @@ def createPackedInputSandbox(sandbox_files, inws, name):
                 except Exception as err:
                     raise SandboxError("File '%s' does not exist." % f.name)
 
-                tinfo = tf.gettarinfo(f.name, os.path.join(f.subdir, os.path.basename(f.name)))
+                tinfo = tf.gettarinfo(f.name, _sandbox_member_name(f))
 
             if f.isExecutable():
                 tinfo.mode = tinfo.mode | stat.S_IXUSR
             tf.addfile(tinfo, fileobj)
             fileobj.close()
 
+
+def _linkCachedSandbox(sandbox_files, tgzfile, file_format):
+    """Hard link (or copy) the tarball of sandbox_files from the sandbox cache to tgzfile, packing it into the cache
+       first if it isn't there. Return if tgzfile was made from the cache.
+    """
+    import shutil
+    import tempfile
+
+    cache_dir = getSandboxCachePath()
+    cached = os.path.join(cache_dir, _sandbox_digest(sandbox_files, file_format) + _cache_extensions[file_format])
+
+    if not os.path.exists(cached):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        # written aside then renamed, other sessions may be packing the same files
+        fd, new_file = tempfile.mkstemp(dir=cache_dir, prefix='.new_')
+        os.close(fd)
+        try:
+            _writePackedSandbox(sandbox_files, new_file, file_format)
+            os.chmod(new_file, 0o644)
+            os.rename(new_file, cached)
+        finally:
+            if os.path.exists(new_file):
+                os.unlink(new_file)
+        logger.debug("Packed input sandbox %s into the sandbox cache" % cached)
+
+    if os.path.exists(tgzfile):
+        os.unlink(tgzfile)
+    try:
+        os.link(cached, tgzfile)
+    except OSError as err:
+        logger.debug("Can't link %s from the sandbox cache, copying it: %s" % (cached, err))
+        try:
+            shutil.copyfile(cached, tgzfile)
+        except (IOError, OSError) as err:
+            # removed from the cache in the meantime
+            logger.debug("Can't copy %s from the sandbox cache: %s" % (cached, err))
+            return False
+    return True
+
+
+def createPackedInputSandbox(sandbox_files, inws, name):
+    """Put all sandbox_files into tarball called name and write it into to the input workspace.
+       This function is called by Ganga client at the submission time.
+       With [Configuration]SandboxCache the tarball is packed once for all of the jobs with the same files and
+       hard linked from the sandbox cache of the gangadir into their workspaces.
+       Arguments:
+                'sandbox_files': a list of File or FileBuffer objects.
+                'inws': a InputFileWorkspace object
+       Return: a list containing a path to the tarball
+       """
+
+    from GangaCore.Utility.Config import getConfig
+
+    tgzfile = inws.getPath(name)
+
+    logger.debug("Creating packed Sandbox with %s many sandbox files." % len(sandbox_files))
+
+    file_format = _sandbox_file_format(tgzfile)
+
+    if getConfig('Configuration')['SandboxCache']:
+        try:
+            if _linkCachedSandbox(sandbox_files, tgzfile, file_format):
+                return [tgzfile]
+        except (IOError, OSError) as err:
+            logger.debug("Sandbox cache not used for %s: %s" % (tgzfile, err))
+
+    # never write through a link to the sandbox cache
+    if os.path.exists(tgzfile):
+        os.unlink(tgzfile)
+    _writePackedSandbox(sandbox_files, tgzfile, file_format)
+
     return [tgzfile]
 
 
@@ -1,5 +1,6 @@
 
-from .Sandbox import (SandboxError, createInputSandbox,
-                      createPackedInputSandbox, getPackedOutputSandbox)
+from .Sandbox import (SandboxError, cleanSandboxCache, createInputSandbox,
+                      createPackedInputSandbox, getPackedOutputSandbox,
+                      getSandboxCachePath)
 from .WNSandbox import (OUTPUT_TARBALL_NAME, PYTHON_DIR, createOutputSandbox,
                         createPackedOutputSandbox, getPackedInputSandbox)
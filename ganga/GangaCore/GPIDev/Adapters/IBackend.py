@@ -4,6 +4,7 @@
 # $Id: IBackend.py,v 1.2 2008-10-02 10:31:05 moscicki Exp $
 ##########################################################################
 
+import functools
 import itertools
 import os
 from collections import defaultdict
@@ -67,25 +68,30 @@ class IBackend(GangaObject):
         """
         pass
 
-    def _parallel_submit(self, b, sj, sc, master_input_sandbox, fqid, logger):
-
+    @staticmethod
+    def _parallel_submit(master_input_sandbox, sc_and_sj):
+        """ Submit a single subjob, this is the 'submit' stage of the parallel submission """
+        sc, sj = sc_and_sj
+        fqid = sj.getFQID('.')
         try:
             sj.updateStatus('submitting')
-            if b.submit(sc, master_input_sandbox):
+            if sj.backend.submit(sc, master_input_sandbox):
                 sj.info.increment()
-                return 1
-            else:
-                raise IncompleteJobSubmissionError(fqid, 'submission failed')
+                sj.updateStatus('submitted', update_master=False)
+                return sj
+            raise IncompleteJobSubmissionError(fqid, 'submission failed')
         except Exception as err:
             logger.error("Parallel Job Submission Failed: %s" % err)
-            return 0
-
-    def _successfulSubmit(self, out, sj, incomplete_subjobs):
-        if out == 0:
-            incomplete_subjobs.append(sj.getFQID('.'))
             sj.updateStatus('new', update_master=False)
-        else:
-            sj.updateStatus('submitted', update_master=False)
+            raise IncompleteJobSubmissionError(fqid, 'submission failed')
+
+    @staticmethod
+    def _flush_submitted(sj):
+        """ Hand a submitted subjob to be written by the registry, this is the 'flush' stage of the parallel submission """
+        registry = sj._getRegistry()
+        if registry is not None:
+            registry._schedule_flush([sj])
+        return sj
 
     def master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going=False, parallel_submit=False):
         """  Submit   the  master  job  and  all   its  subjobs.   The
@@ -146,13 +152,13 @@ class IBackend(GangaObject):
         # Shall we submit in parallel
         if parallel_submit:
 
-            from GangaCore.Core.GangaThread.WorkerThreads import getQueues
+            from GangaCore.Core.GangaThread.Pipeline import Pipeline, PipelineStage
 
-            for sc, sj in zip(subjobconfigs, rjobs):
+            for sj in rjobs:
 
                 b = sj.backend
 
-                # Must check for credentials here as we cannot handle missing credentials on Queues by design!
+                # Must check for credentials here as we cannot handle missing credentials in the workers by design!
                 if hasattr(b, 'credential_requirements') and b.credential_requirements is not None:
                     from GangaCore.GPIDev.Credentials.CredentialStore import credential_store
                     try:
@@ -160,29 +166,19 @@ class IBackend(GangaObject):
                     except GangaKeyError:
                         credential_store.create(b.credential_requirements)
 
-                fqid = sj.getFQID('.')
-                # FIXME would be nice to move this to the internal threads not user ones
-                getQueues()._monitoring_threadpool.add_function(
-                    self._parallel_submit,
-                    (b, sj, sc, master_input_sandbox, fqid, logger),
-                    callback_func=self._successfulSubmit,
-                    callback_args=(sj, incomplete_subjobs)
-                )
-
-            def subjob_status_check(rjobs):
-                has_submitted = True
-                for sj in rjobs:
-                    if sj.status not in ["submitted", "failed", "completed", "running",
-                                         "completing"] and sj.getFQID('.') not in incomplete_subjobs:
-                        has_submitted = False
-                        break
-                return has_submitted
-
-            while not subjob_status_check(rjobs):
-                import time
-                time.sleep(1.)
-
-            if incomplete_subjobs:
+            # Submit the subjobs in a pool of our own, not in the monitoring one, and write them out as they go
+            queues_config = getConfig('Queues')
+            pipeline = Pipeline([PipelineStage('submit', functools.partial(self._parallel_submit, master_input_sandbox),
+                                               workers=queues_config['SubmitThreads']),
+                                 PipelineStage('flush', self._flush_submitted)],
+                                keep_going=keep_going, max_pending=queues_config['SubmitMaxPending'])
+            try:
+                pipeline.run(zip(subjobconfigs, rjobs))
+            finally:
+                logger.info("Submission of %s subjobs: %s" % (len(rjobs), ', '.join(pipeline.report())))
+
+            if pipeline.failures:
+                incomplete_subjobs = [rjobs[index].getFQID('.') for index in sorted(pipeline.failures)]
                 raise IncompleteJobSubmissionError(
                     incomplete_subjobs, 'submission failed for subjobs %s' % incomplete_subjobs)
             return 1
@@ -424,16 +420,8 @@ class IBackend(GangaObject):
             monitorable_subjob_ids = []
 
             if isType(job_main.subjobs, SubJobJsonList):
-                cache = job_main.subjobs.getAllCachedData()
-                for sj_id in range(0, len(job_main.subjobs)):
-                    if cache[sj_id]['status'] in ['submitted', 'running']:
-                        if job_main.subjobs.isLoaded(sj_id):
-                            # SJ may have changed from cache in memory
-                            this_sj = job_main.subjobs(sj_id)
-                            if this_sj.status in ['submitted', 'running']:
-                                monitorable_subjob_ids.append(sj_id)
-                        else:
-                            monitorable_subjob_ids.append(sj_id)
+                # Taken from the subjob index, the subjobs in memory may have changed from it
+                monitorable_subjob_ids = job_main.subjobs.getSubJobIdsWithStatus(['submitted', 'running'])
             else:
                 for sj in job_main.subjobs:
                     if sj.status in ['submitted', 'running']:
@@ -8,6 +8,10 @@ from GangaCore.Utility.Config import ConfigError, getConfig
 from GangaCore.GPIDev.Adapters.IPostProcessor import PostProcessException, IPostProcessor
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem
 import GangaCore.Utility.logging
+import threading
+import hashlib
+import shutil
+import json
 import os
 
 from GangaCore.GPIDev.Base.Proxy import isType
@@ -45,10 +49,63 @@ def getDefaultMergeDir():
     return os.path.expanduser(outputdir)
 
 
+# name of the directory of the outputdir of a master job holding the partial merges of its subjobs
+PARTIALS_DIR_NAME = '.merge_partials'
+
+# the partial merges are recorded by the threads monitoring the subjobs
+_partials_lock = threading.Lock()
+
+
+def _readProgress(partials_dir):
+    """Read the record of the partial merges in partials_dir
+
+    files maps the name of each file merged to the files of the subjobs waiting to be merged ('pending') and to the
+    partial merges made ('partials'), each with the files of the subjobs it holds. recorded lists the subjobs added.
+    """
+    try:
+        with open(os.path.join(partials_dir, 'progress')) as progress_file:
+            return json.load(progress_file)
+    except (IOError, ValueError):
+        return {'next': 0, 'recorded': [], 'files': {}}
+
+
+def _writeProgress(partials_dir, progress):
+    """Replace the record of the partial merges in partials_dir"""
+    progress_name = os.path.join(partials_dir, 'progress')
+    with open(progress_name + '.new', 'w') as progress_file:
+        json.dump(progress, progress_file)
+    os.rename(progress_name + '.new', progress_name)
+
+
+def _forgetSubjob(partials_dir, progress, sjid):
+    """Take the files of the subjob of id sjid out of the record, the partial merges holding them are dropped and the
+    files of the other subjobs in them are merged again"""
+    if sjid not in progress['recorded']:
+        return
+    progress['recorded'].remove(sjid)
+    for entry in progress['files'].values():
+        entry['pending'].pop(sjid, None)
+        for name, subjob_files in list(entry['partials'].items()):
+            if sjid in subjob_files:
+                del entry['partials'][name]
+                del subjob_files[sjid]
+                entry['pending'].update(subjob_files)
+                try:
+                    os.unlink(os.path.join(partials_dir, name))
+                except OSError:
+                    pass
+
+
 class IMerger(IPostProcessor):
 
     """
     Contains the interface for all mergers, all mergers should inherit from this object.
+
+    When incremental is set, the files of each subjob are added to partial merges as the subjob completes, rather than
+    all of them being merged once the master job is over, which then only has to combine these. The partial merges,
+    of [Mergers]merge_fan_in files each, are kept in the outputdir of the master job with a record of the subjobs they
+    hold so that a new session carries on with them. Subjob files are merged in the order in which the subjobs
+    completed, which the merge summary reflects.
     """
 
     # set outputdir for auto merge policy flag
@@ -66,6 +123,8 @@ class IMerger(IPostProcessor):
         'files': SimpleItem(defvalue=[], typelist=[str], sequence=1, doc='A list of files to merge.'),
         'ignorefailed': SimpleItem(defvalue=False, doc='Jobs that are in the failed or killed states will be excluded from the merge when this flag is set to True.'),
         'overwrite': SimpleItem(defvalue=False, doc='The default behaviour for this Merger object. Will overwrite output files.'),
+        'incremental': SimpleItem(defvalue=False, doc='Merge the files of the subjobs in steps as they complete rather than '
+                                  'all at once when the job is over. Needs the files to be listed.'),
     })
     order = 1
 
@@ -75,8 +134,15 @@ class IMerger(IPostProcessor):
         """
         Execute
         """
+        incremental = self.incremental and len(self.files)
+        if incremental and job.master is not None:
+            if newstatus == 'completed':
+                self.mergeSubjob(job)
+            return True
         if (len(job.subjobs) != 0):
             try:
+                if incremental:
+                    return self.mergeIncremental(job)
                 return self.merge(job.subjobs, job.outputdir)
             except PostProcessException as e:
                 logger.error("%s" % e)
@@ -84,6 +150,124 @@ class IMerger(IPostProcessor):
         else:
             return True
 
+    def mergePartial(self, file_list, partial_file):
+        """Merge the files of file_list into partial_file, a partial merge later combined with others by
+        combinePartials"""
+        self.mergefiles(file_list, partial_file)
+
+    def combinePartials(self, partial_list, output_file):
+        """Combine the partial merges of partial_list into output_file"""
+        self.mergefiles(partial_list, output_file)
+
+    def _partialMerger(self, file_name):
+        """Returns the merger making the partial merges of file_name"""
+        return self
+
+    def _partialsDir(self, master):
+        """Returns the directory of the partial merges of the subjobs of master made by this merger"""
+        files_hash = hashlib.sha1(json.dumps(sorted(self.files)).encode()).hexdigest()[:8]
+        return os.path.join(master.outputdir, PARTIALS_DIR_NAME, '%s_%s' % (self._name, files_hash))
+
+    def mergeSubjob(self, job):
+        """Add the files of the completed subjob job to the partial merges of its master. They are merged once
+        [Mergers]merge_fan_in files are waiting"""
+        files = {}
+        try:
+            # the subjob only moves to its new status once its postprocessors have run
+            self._addJobFiles(job, files, self.ignorefailed, self.overwrite)
+        except PostProcessException as err:
+            # left to the final merge, which reports the problem
+            logger.debug('Subjob %s is left to the final merge: %s' % (job.fqid, err))
+            return
+
+        fan_in = max(2, config['merge_fan_in'])
+        partials_dir = self._partialsDir(job.master)
+        sjid = str(job.id)
+        to_merge = []
+        with _partials_lock:
+            os.makedirs(partials_dir, exist_ok=True)
+            progress = _readProgress(partials_dir)
+            # a resubmitted subjob replaces what it did before
+            _forgetSubjob(partials_dir, progress, sjid)
+            progress['recorded'].append(sjid)
+            for k, file_list in files.items():
+                entry = progress['files'].setdefault(k, {'pending': {}, 'partials': {}})
+                entry['pending'][sjid] = file_list
+                if sum(len(pending) for pending in entry['pending'].values()) >= fan_in:
+                    name = '%d_%s' % (progress['next'], os.path.basename(k))
+                    progress['next'] += 1
+                    to_merge.append((k, name, entry['pending']))
+                    entry['pending'] = {}
+            _writeProgress(partials_dir, progress)
+
+        if not to_merge:
+            return
+
+        # merged outside of the lock, so that the other subjobs are not held up
+        merged = []
+        for k, name, subjob_files in to_merge:
+            file_list = [f for sj_files in subjob_files.values() for f in sj_files]
+            try:
+                self._partialMerger(k).mergePartial(file_list, os.path.join(partials_dir, name))
+                merged.append((k, name, subjob_files, True))
+            except (PostProcessException, IOError, OSError) as err:
+                logger.warning('The partial merge of %s failed and will be retried: %s', k, err)
+                merged.append((k, name, subjob_files, False))
+
+        with _partials_lock:
+            progress = _readProgress(partials_dir)
+            for k, name, subjob_files, ok in merged:
+                entry = progress['files'].setdefault(k, {'pending': {}, 'partials': {}})
+                if ok:
+                    entry['partials'][name] = subjob_files
+                else:
+                    entry['pending'].update(subjob_files)
+            _writeProgress(partials_dir, progress)
+
+    def mergeIncremental(self, job, ignorefailed=None, overwrite=None):
+        """Merge the files of the subjobs of job missing from its partial merges and combine them all into the
+        outputdir of job"""
+
+        if ignorefailed is None:
+            ignorefailed = self.ignorefailed
+
+        if overwrite is None:
+            overwrite = self.overwrite
+
+        partials_dir = self._partialsDir(job)
+        remaining = []
+        with _partials_lock:
+            progress = _readProgress(partials_dir)
+            for sj in job.subjobs:
+                sjid = str(sj.id)
+                if not self._checkStatus(sj, ignorefailed):
+                    _forgetSubjob(partials_dir, progress, sjid)
+                elif sjid not in progress['recorded']:
+                    remaining.append(sj)
+        files = self._collectFiles(remaining, ignorefailed, overwrite)
+
+        for k in set(files) | set(progress['files']):
+            entry = progress['files'].get(k, {'pending': {}, 'partials': {}})
+            merger = self._partialMerger(k)
+            partial_names = sorted(entry['partials'], key=lambda name: int(name.split('_', 1)[0]))
+            partials = [os.path.join(partials_dir, name) for name in partial_names]
+            merged_files = [f for name in partial_names for sj_files in entry['partials'][name].values()
+                            for f in sj_files]
+            file_list = [f for sj_files in entry['pending'].values() for f in sj_files] + files.get(k, [])
+
+            def combine(all_files, output_file, partials=partials, file_list=file_list, merger=merger, k=k):
+                if file_list:
+                    os.makedirs(partials_dir, exist_ok=True)
+                    last = os.path.join(partials_dir, '%d_%s' % (progress['next'], os.path.basename(k)))
+                    merger.mergePartial(file_list, last)
+                    partials = partials + [last]
+                merger.combinePartials(partials, output_file)
+
+            self._mergeOutput(k, merged_files + file_list, job.outputdir, overwrite, combine)
+
+        shutil.rmtree(partials_dir, ignore_errors=True)
+        return self.success
+
     def merge(self, jobs, outputdir=None, ignorefailed=None, overwrite=None):
 
         if ignorefailed is None:
@@ -103,8 +287,6 @@ class IMerger(IPostProcessor):
             else:
                 outputdir = os.path.expanduser(outputdir)
 
-        files = {}
-
         if isType(jobs, Job):
             if outputdir is None:
                 outputdir = jobs.outputdir
@@ -114,104 +296,124 @@ class IMerger(IPostProcessor):
             logger.warning('The jobslice given was empty. The merge will not continue.')
             return self.success
 
-        for j in jobs:
-            # first check that the job is ok
-            if j.status != 'completed':
-                # check if we can keep going
-                if j.status == 'failed' or j.status == 'killed':
-                    if ignorefailed:
-                        logger.warning('Job %s has status %s and is being ignored.', j.fqid, j.status)
-                        continue
-                    else:
-                        raise PostProcessException('Job %s has status %s and so the merge can not continue. '
-                                                   'This can be overridden with the ignorefailed flag.' % (j.fqid, j.status))
-                else:
-                    raise PostProcessException("Job %s is in an unsupported status %s and so the merge can not continue. '\
-                    'Supported statuses are 'completed', 'failed' or 'killed' (if the ignorefailed flag is set)." % (j.fqid, j.status))
-
-            if len(j.subjobs):
-                sub_result = self.merge(
-                    j.subjobs, outputdir=j.outputdir, ignorefailed=ignorefailed, overwrite=overwrite)
-                if (sub_result == self.failure) and not ignorefailed:
-                    raise PostProcessException('The merge of Job %s failed and so the merge can not continue. '
-                                               'This can be overridden with the ignorefailed flag.' % j.fqid)
-
-            import glob
-            for f in self.files:
-
-                for matchedFile in glob.glob(os.path.join(j.outputdir, f)):
-                    relMatchedFile = ''
-                    try:
-                        relMatchedFile = os.path.relpath(
-                            matchedFile, j.outputdir)
-                    except Exception as err:
-                        logger.debug("Err: %s" % err)
-                        GangaCore.Utility.logging.log_unknown_exception()
-                        relMatchedFile = relpath(matchedFile, j.outputdir)
-                    if relMatchedFile in files:
-                        files[relMatchedFile].append(matchedFile)
-                    else:
-                        files[relMatchedFile] = [matchedFile]
-
-                if not len(glob.glob(os.path.join(j.outputdir, f))):
-                    if ignorefailed:
-                        logger.warning(
-                            'The file pattern %s in Job %s was not found. The file will be ignored.', f, j.fqid)
-                        continue
-                    else:
-                        raise PostProcessException('The file pattern %s in Job %s was not found and so the merge can not continue. '
-                                                   'This can be overridden with the ignorefailed flag.' % (f, j.fqid))
-                # files[f].extend(matchedFiles)
+        files = self._collectFiles(jobs, ignorefailed, overwrite)
 
         for k in files.keys():
-            # make sure we are not going to over write anything
-            outputfile = os.path.join(outputdir, k)
-            if os.path.exists(outputfile) and not overwrite:
-                raise PostProcessException('The merge process can not continue as it will result in over writing. '
-                                           'Either move the file %s or set the overwrite flag to True.' % outputfile)
-
-            # make the directory if it does not exist
-            if not os.path.exists(outputdir):
-                os.makedirs(outputdir)
-
-            # recreate structure from output sandbox
-            outputfile_dirname = os.path.dirname(outputfile)
-            if outputfile_dirname != outputdir:
-                if not os.path.exists(outputfile_dirname):
-                    os.mkdir(outputfile_dirname)
-
-            # check that we are merging some files
-            if not files[k]:
-                logger.warning('Attempting to merge with no files. Request will be ignored.')
-                continue
-
-            # check outputfile != inputfile
-            for f in files[k]:
-                if f == outputfile:
-                    raise PostProcessException(
-                        'Output file %s equals input file %s. The merge will fail.' % (outputfile, f))
-            # merge the lists of files with a merge tool into outputfile
-            msg = None
-            try:
-                self.mergefiles(files[k], outputfile)
+            self._mergeOutput(k, files[k], outputdir, overwrite, self.mergefiles)
 
-                # create a log file of the merge
-                # we only get to here if the merge_tool ran ok
-                log_file = '%s.merge_summary' % outputfile
-                with open(log_file, 'w') as log:
-                    log.write('# -- List of files merged -- #\n')
-                    for f in files[k]:
-                        log.write('%s\n' % f)
-                    log.write('# -- End of list -- #\n')
+        return self.success
 
-            except PostProcessException as e:
-                msg = str(e)
+    def _checkStatus(self, j, ignorefailed):
+        """Returns if the files of job j are to be merged, raises if it's in a status which prevents the merge"""
+        # first check that the job is ok
+        if j.status != 'completed':
+            # check if we can keep going
+            if j.status == 'failed' or j.status == 'killed':
+                if ignorefailed:
+                    logger.warning('Job %s has status %s and is being ignored.', j.fqid, j.status)
+                    return False
+                else:
+                    raise PostProcessException('Job %s has status %s and so the merge can not continue. '
+                                               'This can be overridden with the ignorefailed flag.' % (j.fqid, j.status))
+            else:
+                raise PostProcessException("Job %s is in an unsupported status %s and so the merge can not continue. '\
+                'Supported statuses are 'completed', 'failed' or 'killed' (if the ignorefailed flag is set)." % (j.fqid, j.status))
+        return True
 
-                # store the error msg
-                log_file = '%s.merge_summary' % outputfile
-                with open(log_file, 'w') as log:
-                    log.write('# -- Error in Merge -- #\n')
-                    log.write('\t%s\n' % msg)
-                raise e
+    def _collectFiles(self, jobs, ignorefailed, overwrite):
+        """Returns the files of the jobs to merge, keyed by their path relative to the outputdir of their job"""
 
-        return self.success
+        files = {}
+
+        for j in jobs:
+            if self._checkStatus(j, ignorefailed):
+                self._addJobFiles(j, files, ignorefailed, overwrite)
+
+        return files
+
+    def _addJobFiles(self, j, files, ignorefailed, overwrite):
+        """Add the files of job j to merge to files, keyed by their path relative to the outputdir of j"""
+        if len(j.subjobs):
+            sub_result = self.merge(
+                j.subjobs, outputdir=j.outputdir, ignorefailed=ignorefailed, overwrite=overwrite)
+            if (sub_result == self.failure) and not ignorefailed:
+                raise PostProcessException('The merge of Job %s failed and so the merge can not continue. '
+                                           'This can be overridden with the ignorefailed flag.' % j.fqid)
+
+        import glob
+        for f in self.files:
+
+            for matchedFile in glob.glob(os.path.join(j.outputdir, f)):
+                relMatchedFile = ''
+                try:
+                    relMatchedFile = os.path.relpath(
+                        matchedFile, j.outputdir)
+                except Exception as err:
+                    logger.debug("Err: %s" % err)
+                    GangaCore.Utility.logging.log_unknown_exception()
+                    relMatchedFile = relpath(matchedFile, j.outputdir)
+                if relMatchedFile in files:
+                    files[relMatchedFile].append(matchedFile)
+                else:
+                    files[relMatchedFile] = [matchedFile]
+
+            if not len(glob.glob(os.path.join(j.outputdir, f))):
+                if ignorefailed:
+                    logger.warning(
+                        'The file pattern %s in Job %s was not found. The file will be ignored.', f, j.fqid)
+                    continue
+                else:
+                    raise PostProcessException('The file pattern %s in Job %s was not found and so the merge can not continue. '
+                                               'This can be overridden with the ignorefailed flag.' % (f, j.fqid))
+            # files[f].extend(matchedFiles)
+
+    def _mergeOutput(self, k, file_list, outputdir, overwrite, merge_files):
+        """Merge the files of file_list into the file k of outputdir with merge_files(file_list, output_file) and
+        write the summary of the merge"""
+        # make sure we are not going to over write anything
+        outputfile = os.path.join(outputdir, k)
+        if os.path.exists(outputfile) and not overwrite:
+            raise PostProcessException('The merge process can not continue as it will result in over writing. '
+                                       'Either move the file %s or set the overwrite flag to True.' % outputfile)
+
+        # make the directory if it does not exist, the mergers of a SmartMerger may be doing the same
+        os.makedirs(outputdir, exist_ok=True)
+
+        # recreate structure from output sandbox
+        outputfile_dirname = os.path.dirname(outputfile)
+        if outputfile_dirname != outputdir:
+            os.makedirs(outputfile_dirname, exist_ok=True)
+
+        # check that we are merging some files
+        if not file_list:
+            logger.warning('Attempting to merge with no files. Request will be ignored.')
+            return
+
+        # check outputfile != inputfile
+        for f in file_list:
+            if f == outputfile:
+                raise PostProcessException(
+                    'Output file %s equals input file %s. The merge will fail.' % (outputfile, f))
+        # merge the lists of files with a merge tool into outputfile
+        msg = None
+        try:
+            merge_files(file_list, outputfile)
+
+            # create a log file of the merge
+            # we only get to here if the merge_tool ran ok
+            log_file = '%s.merge_summary' % outputfile
+            with open(log_file, 'w') as log:
+                log.write('# -- List of files merged -- #\n')
+                for f in file_list:
+                    log.write('%s\n' % f)
+                log.write('# -- End of list -- #\n')
+
+        except PostProcessException as e:
+            msg = str(e)
+
+            # store the error msg
+            log_file = '%s.merge_summary' % outputfile
+            with open(log_file, 'w') as log:
+                log.write('# -- Error in Merge -- #\n')
+                log.write('\t%s\n' % msg)
+            raise e
@@ -3,8 +3,10 @@ import glob
 import inspect
 import os
 import sys
+import threading
 import time
 import uuid
+from functools import partial
 
 import GangaCore.Core.FileWorkspace
 from GangaCore.Core import Sandbox
@@ -364,8 +366,12 @@ class Job(GangaObject):
         "_storedJobMasterConfig",
         "_storedAppMasterConfig",
         "_stored_subjobs_proxy",
+        "_subjob_status_counts",
     ]
 
+    # Protects the subjob status histograms which are updated from the monitoring threads
+    _subjob_status_counts_lock = threading.RLock()
+
     # TODO: usage of **kwds may be envisaged at this level to optimize the
     # overriding of values, this must be reviewed
     def __init__(self, prev_job=None, **kwds):
@@ -991,31 +997,62 @@ class Job(GangaObject):
 
         return postprocessFailure
 
+    def getSubJobStatusCounts(self):
+        """
+        This returns a dict of status -> number of subjobs in that status whilst respecting lazy loading.
+        The histogram is kept up to date as the subjobs change status and is only rebuilt
+        (from the subjob index) when it's not known or no longer matches the number of subjobs.
+        """
+        with Job._subjob_status_counts_lock:
+            counts = getattr(self, "_subjob_status_counts", None)
+            if counts is None or sum(counts.values()) != len(self.subjobs):
+                if isinstance(self.subjobs, SubJobJsonList):
+                    statuses = self.subjobs.getAllSJStatus()
+                else:
+                    statuses = [sj.status for sj in self.subjobs]
+                counts = {}
+                for stat in statuses:
+                    counts[stat] = counts.get(stat, 0) + 1
+                self._subjob_status_counts = counts
+            return dict(counts)
+
+    def _subjobStatusChanged(self, old_status, new_status):
+        """
+        Update the subjob status histogram of this (master) job after one of its subjobs changed status
+        Args:
+            old_status (str): The status the subjob had before
+            new_status (str): The status the subjob has now
+        """
+        with Job._subjob_status_counts_lock:
+            counts = getattr(self, "_subjob_status_counts", None)
+            if counts is None:
+                # Nothing to keep up to date, this is built on the next request
+                return
+            if counts.get(old_status, 0) > 0:
+                counts[old_status] -= 1
+                if counts[old_status] == 0:
+                    del counts[old_status]
+            else:
+                # The histogram is inconsistent with the subjobs, rebuild it on the next request
+                self._subjob_status_counts = None
+                return
+            counts[new_status] = counts.get(new_status, 0) + 1
+
     def getSubJobStatuses(self):
         """
         This returns a set of all of the different subjob statuses whilst respecting lazy loading
         """
-
-        if isinstance(self.subjobs, SubJobJsonList):
-            stats = set(self.subjobs.getAllSJStatus())
-        else:
-            stats = set(sj.status for sj in self.subjobs)
-
-        return stats
+        return set(self.getSubJobStatusCounts())
 
     def returnSubjobStatuses(self):
-        stats = []
-        if isinstance(self.subjobs, SubJobJsonList):
-            stats = self.subjobs.getAllSJStatus()
-        else:
-            stats = [sj.status for sj in self.subjobs]
+        stats = self.getSubJobStatusCounts()
         return "%s/%s/%s/%s" % (
-            stats.count("running"),
-            stats.count("failed")
-            + stats.count("failed_frozen")
-            + stats.count("killed"),
-            stats.count("completing"),
-            stats.count("completed") + stats.count("completed_frozen"),
+            stats.get("running", 0),
+            stats.get("failed", 0)
+            + stats.get("failed_frozen", 0)
+            + stats.get("killed", 0),
+            stats.get("completing", 0),
+            stats.get("completed", 0) + stats.get("completed_frozen", 0),
         )
 
     def updateMasterJobStatus(self):
@@ -1554,11 +1591,12 @@ class Job(GangaObject):
         return jobmasterconfig
 
     @staticmethod
-    def _prepare_sj(rtHandler, i, app, sub_c, app_master_c, job_master_c, finished):
+    def _prepare_sj(rtHandler, app_master_c, job_master_c, sub_job_and_config):
+        sub_job, sub_c = sub_job_and_config
+        app = sub_job.application
         if app.is_prepared in [None, False]:
             app.prepare()
-        finished[i] = rtHandler.prepare(app, sub_c, app_master_c, job_master_c)
-        return
+        return rtHandler.prepare(app, sub_c, app_master_c, job_master_c)
 
     def _getJobSubConfig(self, subjobs):
         jobsubconfig = None
@@ -1590,31 +1628,16 @@ class Job(GangaObject):
                         for (sub_job, sub_conf) in zip(subjobs, appsubconfig)
                     ]
                 else:
-                    finished = {}
-
-                    from GangaCore.Core.GangaThread.WorkerThreads import getQueues
-
-                    index = 0
-                    for sub_j, sub_conf in zip(subjobs, appsubconfig):
-                        getQueues()._monitoring_threadpool.add_function(
-                            self._prepare_sj,
-                            (
-                                rtHandler,
-                                index,
-                                sub_j.application,
-                                sub_conf,
-                                appmasterconfig,
-                                jobmasterconfig,
-                                finished,
-                            ),
-                        )
-                        index += 1
-
-                    while len(finished) != len(subjobs):
-                        time.sleep(0.25)
+                    from GangaCore.Core.GangaThread.Pipeline import Pipeline, PipelineStage
 
-                    for index in finished.keys():
-                        jobsubconfig[index] = finished[index]
+                    queues_config = getConfig("Queues")
+                    stage = PipelineStage(
+                        "prepare",
+                        partial(self._prepare_sj, rtHandler, appmasterconfig, jobmasterconfig),
+                        workers=queues_config["SubmitPrepareThreads"],
+                    )
+                    pipeline = Pipeline([stage], max_pending=queues_config["SubmitMaxPending"])
+                    jobsubconfig = pipeline.run(zip(subjobs, appsubconfig))
 
         else:
             #   I am a sub-job, lets calculate my config
@@ -2325,6 +2348,10 @@ class Job(GangaObject):
             wsp.jobid = this_job_id
             doit(wsp.remove)
 
+            # the packed input sandboxes of the job may have been the last links to their copy in the sandbox cache
+            if config["SandboxCache"]:
+                doit(Sandbox.cleanSandboxCache)
+
             try:
                 # If the job is associated with a shared directory resource (e.g. has a prepared() application)
                 # decrement the reference counter.
@@ -2787,6 +2814,25 @@ class Job(GangaObject):
         elif attr == "comment":
             super(Job, self).__setattr__(attr, value)
 
+        elif attr == "status":
+            old_value = self.status
+            new_value = stripProxy(runtimeEvalString(self, attr, value))
+            super(Job, self).__setattr__(attr, new_value)
+            master = self.master
+            if master is None:
+                # Keep the registry index of jobs to be monitored up to date
+                registry = self._getRegistry()
+                if hasattr(registry, "updateActiveJob"):
+                    registry.updateActiveJob(self)
+            elif old_value != new_value:
+                master._subjobStatusChanged(old_value, new_value)
+
+        elif attr == "subjobs":
+            new_value = stripProxy(runtimeEvalString(self, attr, value))
+            super(Job, self).__setattr__(attr, new_value)
+            with Job._subjob_status_counts_lock:
+                self._subjob_status_counts = None
+
         elif attr.startswith("_"):
             # If it's an internal attribute then just pass it on
             super(Job, self).__setattr__(attr, value)
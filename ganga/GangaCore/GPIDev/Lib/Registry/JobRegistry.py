@@ -5,12 +5,15 @@
 # $Id: JobRegistry.py,v 1.1.2.1 2009-07-24 13:39:39 ebke Exp $
 ##########################################################################
 
+import threading
+
 import GangaCore.Utility.logging
 from GangaCore.Core.exceptions import GangaException
 from GangaCore.Core.GangaRepository.Registry import (RegistryAccessError,
                                                      RegistryFlusher,
-                                                     RegistryKeyError)
-from GangaCore.GPIDev.Base.Proxy import isType, stripProxy
+                                                     RegistryKeyError,
+                                                     RegistryWriter)
+from GangaCore.GPIDev.Base.Proxy import getName, getRuntimeGPIObject, isType, stripProxy
 from GangaCore.GPIDev.Lib.Job.Job import Job
 from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.external.OrderedDict import OrderedDict as oDict
@@ -30,11 +33,23 @@ logger = GangaCore.Utility.logging.getLogger()
 
 class JobRegistry(Registry):
 
+    # Job states which require the backend to be polled by the monitoring
+    active_states = ('submitting', 'submitted', 'running')
+    # Component attributes whose class is stored in the index cache so that select doesn't have to load the jobs
+    indexed_components = ('application', 'backend', 'splitter', 'inputdata')
+
     def __init__(self, name, doc):
         super(JobRegistry, self).__init__(name, doc)
         self.stored_slice = JobRegistrySlice(self.name)
         self.stored_slice.objects = self
         self.stored_proxy = JobRegistrySliceProxy(self.stored_slice)
+        # backend name -> set of ids of the jobs which the monitoring has to poll
+        self._active_jobs = {}
+        # id -> backend name, so that a job can be found again without knowing its old status
+        self._active_backend_of = {}
+        self._active_lock = threading.RLock()
+        # backend class name as stored in the index cache -> backend name used by the monitoring
+        self._backend_names = {}
 
     def getSlice(self):
         return self.stored_slice
@@ -60,25 +75,107 @@ class JobRegistry(Registry):
                 value = None
         del this_slice
 
-        # store subjob status
-        if hasattr(obj, "subjobs"):
-            cache["subjobs:status"] = []
-            if hasattr(obj.subjobs, "getAllCachedData"):
-                for sj in obj.subjobs.getAllCachedData():
-                    cache["subjobs:status"].append(sj['status'])
-            else:
-                for sj in obj.subjobs:
-                    cache["subjobs:status"].append(sj.status)
+        # store the classes of the components most often used to select jobs, see RegistrySlice._compile_select
+        for attr in self.indexed_components:
+            try:
+                cache["class:" + attr] = getName(getattr(obj, attr))
+            except Exception as err:
+                logger.debug("Failed to index '%s': %s" % (attr, err))
+
+        # store the histogram of subjob statuses
+        if hasattr(obj, "getSubJobStatusCounts"):
+            cache["subjobs:status_counts"] = obj.getSubJobStatusCounts()
 
         #print("Cache: %s" % str(cache))
         return cache
 
+    def _getActiveBackendName(self, obj):
+        """
+        Returns the name of the backend of obj if the job has to be monitored, None otherwise.
+        The raw index cache is used for jobs which have not been loaded so no job is read from disk
+        and the (expensive) has_loaded lookup in the repository is avoided.
+        Args:
+            obj (Job): The (master) job to be checked
+        """
+        cache = obj._index_cache_dict
+        if cache and 'status' in cache:
+            if cache['status'] not in self.active_states:
+                return None
+            backend_class = cache.get('display:backend')
+            if backend_class:
+                if backend_class not in self._backend_names:
+                    backend_obj = getRuntimeGPIObject(backend_class, True)
+                    if backend_obj is None:
+                        return getName(obj.backend)
+                    self._backend_names[backend_class] = getName(backend_obj)
+                return self._backend_names[backend_class]
+            return getName(obj.backend)
+        if obj.status not in self.active_states:
+            return None
+        return getName(obj.backend)
+
+    def updateActiveJob(self, obj, this_id=None):
+        """
+        Update the index of active jobs for the given job.
+        This is called whenever the status of a master job changes and when jobs are added to/removed from the registry
+        Args:
+            obj (Job): The job which has changed, None if the job has been removed
+            this_id (int): The id of the job, taken from obj if not given
+        """
+        if this_id is None:
+            this_id = obj.id
+        if this_id is None:
+            return
+
+        backend_name = None
+        if obj is not None:
+            try:
+                backend_name = self._getActiveBackendName(obj)
+            except Exception as err:
+                logger.debug("Failed to determine if job %s is active: %s" % (this_id, err))
+
+        with self._active_lock:
+            old_backend = self._active_backend_of.get(this_id)
+            if old_backend == backend_name:
+                return
+            if old_backend is not None:
+                these_ids = self._active_jobs.get(old_backend)
+                if these_ids is not None:
+                    these_ids.discard(this_id)
+                    if not these_ids:
+                        del self._active_jobs[old_backend]
+                del self._active_backend_of[this_id]
+            if backend_name is not None:
+                self._active_jobs.setdefault(backend_name, set()).add(this_id)
+                self._active_backend_of[this_id] = backend_name
+
+    def getActiveJobIds(self):
+        """
+        Returns a dict of backend name -> sorted list of ids of the jobs which are currently submitting, submitted or running.
+        The cost of this is proportional to the number of active jobs and not to the size of the registry
+        """
+        with self._active_lock:
+            return dict((backend_name, sorted(these_ids)) for backend_name, these_ids in self._active_jobs.items())
+
+    def _rebuildActiveIndex(self):
+        """
+        (Re)build the index of active jobs from the index cache of all of the jobs in the registry
+        """
+        with self._active_lock:
+            self._active_jobs = {}
+            self._active_backend_of = {}
+            for this_id, obj in list(self._objects.items()):
+                if this_id in self._incomplete_objects:
+                    continue
+                self.updateActiveJob(obj, this_id)
+
     def startup(self):
         """
             This is the main startup method of the Registry
         """
         self._needs_metadata = True
         super(JobRegistry, self).startup()
+        self._rebuildActiveIndex()
         if len(self.metadata.ids()) == 0:
             from GangaCore.GPIDev.Lib.JobTree import JobTree
             jt = JobTree()
@@ -87,6 +184,9 @@ class JobRegistry(Registry):
         self.jobtree = self.metadata[self.metadata.ids()[-1]]
         self.flush_thread = RegistryFlusher(self, 'JobRegistryFlusher')
         self.flush_thread.start()
+        if getConfig('Registry')['EnableAsyncFlush'] and self.type not in ["Database", "CentralDatabase"]:
+            self.write_thread = RegistryWriter(self, 'JobRegistryWriter')
+            self.write_thread.start()
 
     def check(self):
         """
@@ -161,13 +261,29 @@ class JobRegistry(Registry):
 
     def shutdown(self, kill):
         self.flush_thread.join()
+        if self.write_thread is not None:
+            # Write out whatever is still queued before the repository goes away
+            self.write_thread.join()
+            self.write_thread = None
         super(JobRegistry, self).shutdown(kill=kill)
 
     def getJobTree(self):
         return self.jobtree
 
+    def _add(self, obj, force_index=None):
+        this_id = super(JobRegistry, self)._add(obj, force_index)
+        self.updateActiveJob(obj, this_id)
+        return this_id
+
     def _remove(self, obj, auto_removed=0):
+        if auto_removed:
+            try:
+                this_id = self.find(obj)
+            except Exception:
+                this_id = None
         super(JobRegistry, self)._remove(obj, auto_removed)
+        if auto_removed and this_id is not None:
+            self.updateActiveJob(None, this_id)
         try:
             self.jobtree.cleanlinks()
         except Exception as err:
@@ -108,7 +108,7 @@ class RegistrySlice(object):
             return False
         return self.objects.clean(force)
 
-    def select(self, minid=None, maxid=None, **attrs):
+    def select(self, minid=None, maxid=None, allow_load=True, **attrs):
         from GangaCore.GPIDev.Lib.Job.Job import Job
 
         if isType(minid, Job):
@@ -160,13 +160,83 @@ class RegistrySlice(object):
 
         def append(id, obj):
             this_slice.objects[id] = obj
-        self.do_select(append, minid, maxid, **attrs)
+        self.do_select(append, minid, maxid, allow_load, **attrs)
         return this_slice
 
-    def do_select(self, callback, minid=None, maxid=None, **attrs):
+    @staticmethod
+    def _compile_select(attr, attrvalue, allow_load):
+        """
+        Return a function which tests whether an object passes the filter attr=attrvalue.
+        Objects which are in memory are tested directly. Objects which haven't been loaded from disk are tested against
+        their index cache, which holds simple attributes under their own name and the class of component attributes
+        under 'class:<name>' (see JobRegistry.getIndexCache). They're only loaded if the index can't answer the filter.
+        Args:
+            attr (str): The name of the attribute
+            attrvalue (unknown): The value to compare against, a string is matched as a wildcard pattern
+            allow_load (bool): Whether an object may be loaded from disk to answer the filter
+        """
+        # The schema of the objects is looked up once per class
+        compiled = {}
+
+        def compile_for(obj):
+            try:
+                item = obj._schema.getItem(attr)
+                logger.debug("Here: %s, is item: %s" % (attr, type(item)))
+            except KeyError as err:
+                from GangaCore.GPIDev.Base import GangaAttributeError
+                logger.debug("KeyError getting item: '%s' from schema" % attr)
+                raise GangaAttributeError('undefined select attribute: %s' % attr)
+
+            if item.isA(ComponentItem):
+                # TODO we need to distinguish between passing a Class type and a defined class instance
+                # If we passed a class type to select it should look only for classes which are of this type
+                # If we pass a class instance a compartison of the internal attributes should be performed
+                from GangaCore.GPIDev.Base.Filters import allComponentFilters
+
+                cfilter = allComponentFilters[item['category']]
+                filtered_value = cfilter(attrvalue, item)
+                if filtered_value is not None:
+                    class_name = getName(filtered_value)
+                else:
+                    class_name = getName(attrvalue)
+                return 'class:' + attr, lambda value: getName(value) == class_name, lambda name: name == class_name
+
+            if isinstance(attrvalue, str):
+                # Compare the type of the attribute against attrvalue
+                reobj = re.compile(fnmatch.translate(attrvalue))
+
+                def test(value):
+                    return bool(reobj.match(str(value)))
+            else:
+                def test(value):
+                    return value == attrvalue
+            return attr, test, test
+
+        def predicate(obj):
+            cls = obj.__class__
+            if cls not in compiled:
+                compiled[cls] = compile_for(obj)
+            index_key, test, test_index = compiled[cls]
+
+            if obj._should_load and obj._registry is not None:
+                # Not loaded from disk yet, try to answer from the index cache
+                index_cache = obj._index_cache_dict
+                if index_key in index_cache:
+                    return test_index(index_cache[index_key])
+                if not allow_load:
+                    raise GangaException("Selecting on '%s' needs object %s to be loaded from disk, "
+                                         "use allow_load=True to allow this" % (attr, obj._registry.find(obj)))
+            return test(getattr(obj, attr))
+
+        return predicate
+
+    def do_select(self, callback, minid=None, maxid=None, allow_load=True, **attrs):
         """Get the slice of jobs. 'minid' and 'maxid' specify optional (inclusive) slice range.
         The returned slice object has the job registry interface but it is not connected to
         persistent storage. 
+        Objects which haven't been loaded from disk are selected from their index cache where possible.
+        If 'allow_load' is False, a filter which can only be answered by loading such an object raises a
+        GangaException instead of loading it.
         """
 
         logger = getLogger()
@@ -188,6 +258,10 @@ class RegistrySlice(object):
 
         logger.debug("do_select: attrs: %s" % attrs)
 
+        # The filters are compiled once for all objects, see _compile_select
+        predicates = {a: self._compile_select(a, attrs[a], allow_load) for a in attrs
+                      if a != 'ids' and self.name != 'box'}
+
         def select_by_list(this_id):
             return this_id in ids
 
@@ -240,51 +314,13 @@ class RegistrySlice(object):
                             raise GangaAttributeError(
                                 'undefined select attribute: %s' % a)
                     else:
-
                         if a == 'ids':
                             if int(this_id) not in attrs['ids']:
                                 selected = False
                                 break
-                        else:
-                            try:
-                                item = obj._schema.getItem(a)
-                                logger.debug("Here: %s, is item: %s" % (a, type(item)))
-                            except KeyError as err:
-                                from GangaCore.GPIDev.Base import GangaAttributeError
-                                logger.debug("KeyError getting item: '%s' from schema" % a)
-                                raise GangaAttributeError('undefined select attribute: %s' % a)
-                            else:
-                                attrvalue = attrs[a]
-
-                                if item.isA(ComponentItem):
-                                    # TODO we need to distinguish between passing a Class type and a defined class instance
-                                    # If we passed a class type to select it should look only for classes which are of this type
-                                    # If we pass a class instance a compartison of the internal attributes should be performed
-                                    from GangaCore.GPIDev.Base.Filters import allComponentFilters
-
-                                    cfilter = allComponentFilters[item['category']]
-                                    filtered_value = cfilter(attrs[a], item)
-                                    from GangaCore.GPIDev.Base.Proxy import getName
-                                    if not filtered_value is None:
-                                        attrvalue = getName(filtered_value)
-                                    else:
-                                        attrvalue = getName(attrvalue)
-
-                                    if getName(getattr(obj, a)) != attrvalue:
-                                        selected = False
-                                        break
-                                else:
-                                    if isinstance(attrvalue, str):
-                                        regex = fnmatch.translate(attrvalue)
-                                        reobj = re.compile(regex)
-                                        # Compare the type of the attribute
-                                        # against attrvalue
-                                        if not reobj.match(str(getattr(obj, a))):
-                                            selected = False
-                                    else:
-                                        if getattr(obj, a) != attrvalue:
-                                            selected = False
-                                            break
+                        elif not predicates[a](obj):
+                            selected = False
+                            break
                 if selected:
                     logger.debug("Actually Selected")
                     callback(this_id, obj)
@@ -346,7 +382,8 @@ class RegistrySlice(object):
             def __init__(self, reg):
                 self.it = list(reg.objects.values()).__iter__()
 
-            def __iter__(self): return self
+            def __iter__(self):
+                return self
 
             def __next__(self):
                 return next(self.it)
@@ -37,7 +37,8 @@ class RegistrySliceProxy(object):
             def __init__(self, reg):
                 self.it = stripProxy(reg).__iter__()
 
-            def __iter__(self): return self
+            def __iter__(self):
+                return self
 
             def __next__(self):
                 return _wrap(next(self.it))
@@ -52,7 +53,7 @@ class RegistrySliceProxy(object):
     def __call__(self, arg):
         return _wrap(stripProxy(self).__call__(arg))
 
-    def select(self, minid=None, maxid=None, **attrs):
+    def select(self, minid=None, maxid=None, allow_load=True, **attrs):
         """ Select a subset of objects. Examples for jobs:
         jobs.select(10): select jobs with ids higher or equal to 10;
         jobs.select(10,20) select jobs with ids in 10,20 range (inclusive);
@@ -60,13 +61,15 @@ class RegistrySliceProxy(object):
         jobs.select(name='some') select all jobs with some name;
         jobs.select(application='Executable') select all jobs with Executable application;
         jobs.select(backend='Local') select all jobs with Local backend.
+        Jobs which haven't been loaded are selected from their index where possible,
+        use allow_load=False to raise an error rather than load a job which can't be.
         """
         unwrap_attrs = {}
         for a in attrs:
             unwrap_attrs[a] = _unwrap(attrs[a])
         logger = getLogger()
         logger.debug("Calling: %s" % str(stripProxy(self).select))
-        return self.__class__(stripProxy(self).select(minid, maxid, **unwrap_attrs))
+        return self.__class__(stripProxy(self).select(minid, maxid, allow_load, **unwrap_attrs))
 
     def _display(self, interactive=True):
         return stripProxy(self)._display(interactive)
@@ -23,6 +23,21 @@ def formatTraceback():
     return "\n %s\n%s\n%s\n" % (''.join(traceback.format_tb(sys.exc_info()[2])), sys.exc_info()[0], sys.exc_info()[1])
 
 
+def cachedSubJobStatusCounts(j):
+    """Return the histogram of subjob statuses stored in the index cache of a job or None if there is no cache.
+    Older index caches store the list of subjob statuses which is converted here"""
+    if not (hasattr(j, '_index_cache') and j._index_cache):
+        return None
+    if 'subjobs:status_counts' in j._index_cache:
+        return j._index_cache['subjobs:status_counts']
+    if 'subjobs:status' in j._index_cache:
+        counts = {}
+        for sj_stat in j._index_cache['subjobs:status']:
+            counts[sj_stat] = counts.get(sj_stat, 0) + 1
+        return counts
+    return None
+
+
 class IUnit(GangaObject):
     _schema = Schema(Version(1, 0), {
         'status': SimpleItem(defvalue='new', protected=1, doc='Status - running, pause or completed', typelist=[str]),
@@ -373,11 +388,10 @@ class IUnit(GangaObject):
             j = stripProxy(job)
 
             # try to preserve lazy loading
-            if hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status' in j._index_cache:
-                if len(j._index_cache['subjobs:status']) > 0:
-                    for sj_stat in j._index_cache['subjobs:status']:
-                        if sj_stat in active_states:
-                            tot_active += 1
+            sj_counts = cachedSubJobStatusCounts(j)
+            if sj_counts is not None:
+                if len(sj_counts) > 0:
+                    tot_active += sum(sj_counts.get(sj_stat, 0) for sj_stat in active_states)
                 else:
                     if j._index_cache['status'] in active_states:
                         tot_active += 1
@@ -410,11 +424,10 @@ class IUnit(GangaObject):
             j = stripProxy(job)
 
             # try to preserve lazy loading
-            if hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status' in j._index_cache:
-                if len(j._index_cache['subjobs:status']) > 0:
-                    for sj_stat in j._index_cache['subjobs:status']:
-                        if sj_stat == status:
-                            tot_active += 1
+            sj_counts = cachedSubJobStatusCounts(j)
+            if sj_counts is not None:
+                if len(sj_counts) > 0:
+                    tot_active += sj_counts.get(status, 0)
                 else:
                     if j._index_cache['status'] == status:
                         tot_active += 1
@@ -448,9 +461,10 @@ class IUnit(GangaObject):
             j = stripProxy(job)
 
             # try to preserve lazy loading
-            if hasattr(j, '_index_cache') and j._index_cache and 'subjobs:status' in j._index_cache:
-                if len(j._index_cache['subjobs:status']) != 0:
-                    total += len(j._index_cache['subjobs:status'])
+            sj_counts = cachedSubJobStatusCounts(j)
+            if sj_counts is not None:
+                if len(sj_counts) != 0:
+                    total += sum(sj_counts.values())
                 else:
                     total += 1
             else:
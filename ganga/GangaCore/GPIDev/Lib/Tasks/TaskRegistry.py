@@ -282,7 +282,7 @@ class TaskRegistrySliceProxy(RegistrySliceProxy):
         """Copy all tasks."""
         return JobRegistrySliceProxy(stripProxy(self).copy(keep_going=keep_going))
 
-    def select(self, minid=None, maxid=None, **attrs):
+    def select(self, minid=None, maxid=None, allow_load=True, **attrs):
         """Select a subset of tasks. Examples:
         tasks.select(10): select tasks with ids higher or equal to 10;
         tasks.select(10,20) select tasks with ids in 10,20 range (inclusive);
@@ -293,7 +293,7 @@ class TaskRegistrySliceProxy(RegistrySliceProxy):
         for a in attrs:
             unwrap_attrs[a] = _unwrap(attrs[a])
         return TaskRegistrySliceProxy(
-            stripProxy(self).select(minid, maxid, **unwrap_attrs)
+            stripProxy(self).select(minid, maxid, allow_load, **unwrap_attrs)
         )
 
     def __call__(self, x):
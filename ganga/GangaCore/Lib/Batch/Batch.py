@@ -3,6 +3,8 @@ import time
 import os
 import re
 import os.path
+import shlex
+import threading
 
 import GangaCore.Utility.logging
 import GangaCore.Utility.Config
@@ -11,7 +13,7 @@ import GangaCore.Utility.Virtualization
 from GangaCore.GPIDev.Adapters.IBackend import IBackend
 from GangaCore.GPIDev.Base.Proxy import isType, getName, stripProxy
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem
-from GangaCore.Core.exceptions import BackendError
+from GangaCore.Core.exceptions import BackendError, IncompleteJobSubmissionError
 
 logger = GangaCore.Utility.logging.getLogger()
 
@@ -53,6 +55,68 @@ def shell_cmd(cmd, soutfile=None, allowed_exit=[0]):
     return rc, soutfile, m is None
 
 
+# status command -> (time of the query, states) of the last query of the batch system made with it
+_scheduler_states = {}
+_scheduler_states_lock = threading.Lock()
+
+
+def scheduler_states(config):
+    """Return the states of all of the jobs known to the batch system as {batch id: state}, None if it can't be queried
+
+    One status command gives the states of all of the jobs, its reply is kept for status_cache_time seconds so that
+    the monitoring of all of the (master) jobs in a sweep shares it.
+    Args:
+        config (dict): Configuration of the backend, with status_str, status_res_pattern, array_id_str and
+                       status_cache_time
+    """
+    cmd = config['status_str']
+    with _scheduler_states_lock:
+        queried = _scheduler_states.get(cmd)
+        if queried is not None and time.time() - queried[0] < config['status_cache_time']:
+            return queried[1]
+
+        states = None
+        rc, soutfile, ef = shell_cmd(cmd)
+        try:
+            with open(soutfile) as sout_file:
+                sout = sout_file.read()
+        finally:
+            if os.path.exists(soutfile):
+                os.remove(soutfile)
+        if rc == 0 and ef:
+            states = {}
+            for m in re.finditer(config['status_res_pattern'], sout, re.M):
+                batch_id = m.group('id')
+                # the jobs of an array are reported with their index, 0 or nothing for the jobs not in an array
+                index = m.groupdict().get('index')
+                if index and int(index):
+                    batch_id = config['array_id_str'] % {'id': batch_id, 'index': int(index)}
+                states[batch_id] = m.group('status')
+        else:
+            logger.warning('Could not query the batch system, the status files of the jobs are read instead: %s', sout)
+        _scheduler_states[cmd] = (time.time(), states)
+        return states
+
+
+# Script submitted as a job array, it runs the job script of the subjob of its array index
+ARRAY_SCRIPT = """#!/usr/bin/env python3
+import os
+
+# array index -> (job script, working directory, stdout, stderr) of each subjob
+tasks = %(tasks)s
+scriptpath, workdir, stdout, stderr = tasks[int(os.environ[%(index_name)s])]
+
+for fd, filename in ((1, stdout), (2, stderr)):
+    out = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(out, fd)
+    os.close(out)
+
+os.chdir(workdir)
+cmd = %(exe_cmd)s + [scriptpath]
+os.execv(cmd[0], cmd)
+"""
+
+
 class Batch(IBackend):
 
     """ Batch submission backend.
@@ -135,24 +199,12 @@ class Batch(IBackend):
                 logger.warning("jobnamesubstitution should be a list of length 2. Skipping job name substitution.")
         return tmp_name
 
-    def submit(self, jobconfig, master_input_sandbox):
-        global re
-        job = self.getJobObject()
-
-        inw = job.getInputWorkspace()
-        outw = job.getOutputWorkspace()
-
-        #scriptpath = self.preparejob(jobconfig,inw,outw)
-        scriptpath = self.preparejob(jobconfig, master_input_sandbox)
-
-        # FIX from Angelo Carbone
-        # stderr_option = '-e '+str(outw.getPath())+'stderr'
-        # stdout_option = '-o '+str(outw.getPath())+'stdout'
-
-        # FIX from Alex Richards - see Savannah #87477
-        stdout_option = self.config['stdoutConfig'] % str(outw.getPath())
-        stderr_option = self.config['stderrConfig'] % str(outw.getPath())
-
+    def _getQueueOption(self, job, with_name=True):
+        """Return the queue, extraopts and job name options of the submit command, None if extraopts has a forbidden option
+        Args:
+            job (Job): The job being submitted
+            with_name (bool): Pass the name of the job with the jobnameopt option
+        """
         queue_option = ''
         if self.queue:
             if isType(self, Slurm):
@@ -161,7 +213,7 @@ class Batch(IBackend):
                 queue_option = '-q ' + str(self.queue)
 
         try:
-            jobnameopt = "-" + self.config['jobnameopt']
+            jobnameopt = "-" + self.config['jobnameopt'] if with_name else False
         except Exception as err:
             logger.debug("Unknown error: %s" % str(err))
             jobnameopt = False
@@ -170,26 +222,167 @@ class Batch(IBackend):
             for opt in re.compile(r'(-\w+)').findall(self.extraopts):
                 if opt in ('-o', '-e', '-oo', '-eo'):
                     logger.warning("option %s is forbidden", opt)
-                    return False
+                    return None
                 if self.queue:
                     if isType(self, Slurm):
                         if opt == '-p':
                             logger.warning(
                                 "option %s is forbidden if partition is defined ( partition = '%s')", opt, self.queue)
-                            return False
+                            return None
                     elif opt == '-q':
                         logger.warning("option %s is forbidden if queue is defined ( queue = '%s')", opt, self.queue)
-                        return False
+                        return None
                 if jobnameopt and opt == jobnameopt:
                     jobnameopt = False
 
             queue_option = queue_option + " " + self.extraopts
 
         if jobnameopt and job.name != '':
+            # PBS doesn't like names with spaces
             tmp_name = self._getLegalJobName(job)
             queue_option = queue_option + " " + \
                 jobnameopt + " " + "'%s'" % (tmp_name)
 
+        return queue_option
+
+    def master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going=False, parallel_submit=False):
+        """Submit the subjobs as job arrays of the batch system, with one submit command for up to array_max_size
+        subjobs. The array index of each subjob picks its own job script. Jobs without subjobs, or all jobs if
+        job_arrays is disabled in the configuration of the backend, are submitted one at a time as in IBackend.
+        An array is submitted or fails as a whole, the arrays submitted before a failing one stay submitted.
+        """
+        if not self.config['job_arrays'] or len(rjobs) < 2:
+            return IBackend.master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going, parallel_submit)
+
+        job = self.getJobObject()
+        logger.info("submitting %s subjobs of job %s to %s backend as job arrays", len(rjobs), job.getFQID('.'),
+                    getName(self))
+
+        master_input_sandbox = self.master_prepare(masterjobconfig)
+        first_index = self.config['array_first_index']
+        array_size = max(self.config['array_max_size'], 1)
+
+        for array_number, start in enumerate(range(0, len(rjobs), array_size)):
+            array_jobs = rjobs[start:start + array_size]
+            tasks = {}
+            array_ids = None
+            try:
+                for index, (sc, sj) in enumerate(zip(subjobconfigs[start:start + array_size], array_jobs), first_index):
+                    sj.updateStatus('submitting')
+                    outw = sj.getOutputWorkspace()
+                    scriptpath = stripProxy(sj.backend).preparejob(sc, master_input_sandbox)
+                    tasks[index] = (scriptpath, sj.getInputWorkspace().getPath(), outw.getPath('stdout'),
+                                    outw.getPath('stderr'))
+
+                array_ids = self._submitArray(job, tasks, array_number)
+            except Exception as err:
+                logger.error("Job array submission failed: %s" % err)
+
+            if array_ids is None:
+                for sj in rjobs[start:]:
+                    if sj.status == 'submitting':
+                        sj.updateStatus('new')
+                fqids = [sj.getFQID('.') for sj in rjobs[start:]]
+                raise IncompleteJobSubmissionError(fqids, 'job array submission failed')
+
+            array_id, queue = array_ids
+            for index, sj in enumerate(array_jobs, first_index):
+                b = stripProxy(sj.backend)
+                if array_id:
+                    b.id = self.config['array_id_str'] % {'id': array_id, 'index': index}
+                if queue:
+                    b.actualqueue = queue
+                sj.updateStatus('submitted')
+                stripProxy(sj.info).increment()
+
+        return 1
+
+    def _submitArray(self, job, tasks, array_number=0):
+        """Write the script of a job array of job and submit it. Return (id of the array, queue), which are None if
+        they can't be found in the reply of the submit command, or None if the submission failed
+        Args:
+            job (Job): The master job
+            tasks (dict): array index -> (job script, working directory, stdout, stderr) of each subjob
+            array_number (int): Number of the array among the arrays of job
+        """
+        array_opt = self.config['array_opt']
+        queue_option = self._getQueueOption(job, with_name='%(name)s' not in array_opt)
+        if queue_option is None:
+            return None
+        name = self._getLegalJobName(job) or 'ganga_%s' % job.getFQID('.')
+        queue_option = queue_option + " " + array_opt % {'first': min(tasks), 'last': max(tasks), 'name': name}
+
+        import sys
+        if self.config['shared_python_executable']:
+            exe_cmd = [sys.executable]
+        else:
+            exe_cmd = []
+
+        # The array script takes the place of the job script: it redirects the output to the output workspace of the
+        # subjob of its array index, as -o/-e do for single jobs, and runs the job script of that subjob
+        text = ARRAY_SCRIPT % {'tasks': repr(tasks), 'index_name': repr(self.config['array_index_name']),
+                               'exe_cmd': repr(exe_cmd)}
+        from GangaCore.GPIDev.Lib.File import FileBuffer
+        inw = job.getInputWorkspace()
+        outw = job.getOutputWorkspace()
+        scriptpath = inw.writefile(FileBuffer('__arrayscript__%s' % array_number, text), executable=1)
+
+        # the output of the array script itself, it's empty unless the job script of the subjob couldn't be started
+        array_output = '%s.%s' % (array_number, self.config['array_index_pattern'])
+        stdout_option = self.config['stdoutConfig'] % str(outw.getPath()) + array_output
+        stderr_option = self.config['stderrConfig'] % str(outw.getPath()) + array_output
+
+        if self.config['shared_python_executable']:
+            script_cmd = "%s %s" % (sys.executable, scriptpath)
+        else:
+            script_cmd = scriptpath
+
+        command_str = self.config['submit_str'] % (
+            inw.getPath(), queue_option, stderr_option, stdout_option, script_cmd)
+        self.command_string = command_str
+        rc, soutfile = self.command(command_str)
+        with open(soutfile) as sout_file:
+            sout = sout_file.read()
+        if os.path.exists(soutfile):
+            os.remove(soutfile)
+
+        if rc != 0:
+            logger.warning('command output \n %s ', sout)
+            return None
+
+        array_id, queue = None, None
+        m = re.compile(self.config['submit_array_res_pattern'], re.M).search(sout)
+        if m is None:
+            logger.warning('could not match the output and extract the Batch job array identifier!')
+            logger.warning('command output \n %s ', sout)
+        else:
+            array_id = m.group('id')
+            if 'queue' in m.groupdict():
+                queue = m.group('queue')
+        return array_id, queue
+
+    def submit(self, jobconfig, master_input_sandbox):
+        global re
+        job = self.getJobObject()
+
+        inw = job.getInputWorkspace()
+        outw = job.getOutputWorkspace()
+
+        #scriptpath = self.preparejob(jobconfig,inw,outw)
+        scriptpath = self.preparejob(jobconfig, master_input_sandbox)
+
+        # FIX from Angelo Carbone
+        # stderr_option = '-e '+str(outw.getPath())+'stderr'
+        # stdout_option = '-o '+str(outw.getPath())+'stdout'
+
+        # FIX from Alex Richards - see Savannah #87477
+        stdout_option = self.config['stdoutConfig'] % str(outw.getPath())
+        stderr_option = self.config['stderrConfig'] % str(outw.getPath())
+
+        queue_option = self._getQueueOption(job)
+        if queue_option is None:
+            return False
+
         # bugfix #16646
         if self.config['shared_python_executable']:
             import sys
@@ -251,43 +444,9 @@ class Batch(IBackend):
         stdout_option = self.config['stdoutConfig'] % str(outw.getPath())
         stderr_option = self.config['stderrConfig'] % str(outw.getPath())
 
-        queue_option = ''
-        if self.queue:
-            if isType(self, Slurm):
-                queue_option = '-p ' + str(self.queue)
-            else:
-                queue_option = '-q ' + str(self.queue)
-
-        try:
-            jobnameopt = "-" + self.config['jobnameopt']
-        except Exception as err:
-            logger.debug("Err: %s" % str(err))
-            jobnameopt = False
-
-        if self.extraopts:
-            for opt in re.compile(r'(-\w+)').findall(self.extraopts):
-                if opt in ('-o', '-e', '-oo', '-eo'):
-                    logger.warning("option %s is forbidden", opt)
-                    return False
-                if self.queue:
-                    if isType(self, Slurm):
-                        if opt == '-p':
-                            logger.warning(
-                                "option %s is forbidden if partition is defined ( partition = '%s')", opt, self.queue)
-                            return False
-                    elif opt == '-q':
-                        logger.warning("option %s is forbidden if queue is defined ( queue = '%s')", opt, self.queue)
-                        return False
-                if jobnameopt and opt == jobnameopt:
-                    jobnameopt = False
-
-            queue_option = queue_option + " " + self.extraopts
-
-        if jobnameopt and job.name != '':
-            # PBS doesn't like names with spaces
-            tmp_name = self._getLegalJobName(job)
-            queue_option = queue_option + " " + \
-                jobnameopt + " " + "'%s'" % (tmp_name)
+        queue_option = self._getQueueOption(job)
+        if queue_option is None:
+            return False
 
         # bugfix #16646
         if self.config['shared_python_executable']:
@@ -334,7 +493,8 @@ class Batch(IBackend):
         return rc == 0
 
     def kill(self):
-        rc, soutfile = self.command(self.config['kill_str'] % (self.id))
+        # the ids of the subjobs of job arrays, like 123[4], must not be expanded by the shell
+        rc, soutfile = self.command(self.config['kill_str'] % shlex.quote(str(self.id)))
 
         with open(soutfile) as sout_file:
             sout = sout_file.read()
@@ -556,7 +716,27 @@ class Batch(IBackend):
             return pid, queue, actualCE, exitcode
 
         from GangaCore.Utility.Config import getConfig
+
+        # states reported by the batch system of each backend in bulk_status mode, None to read the status files
+        reported = {}
+        for backend_name in set(getName(j.backend) for j in jobs):
+            config = getConfig(backend_name)
+            reported[backend_name] = scheduler_states(config) if config['bulk_status'] else None
+
         for j in jobs:
+            backend_name = getName(j.backend)
+            if reported[backend_name] is not None and j.backend.id:
+                # the status files are only read once the batch system no longer has the job as queued or running
+                config = getConfig(backend_name)
+                state = reported[backend_name].get(str(j.backend.id))
+                if state in config['status_pending']:
+                    continue
+                if state in config['status_running']:
+                    if j.status == 'submitted':
+                        stripProxy(j)._getSessionLock()
+                        j.updateStatus('running')
+                    continue
+
             stripProxy(j)._getSessionLock()
             outw = j.getOutputWorkspace()
 
@@ -568,7 +748,8 @@ class Batch(IBackend):
                 if pid or queue:
                     j.updateStatus('running')
 
-                    if pid:
+                    # the id found at submission is kept, it is the id of the job in its array for array subjobs
+                    if pid and not j.backend.id:
                         j.backend.id = pid
 
                     if queue and queue != j.backend.actualqueue:
@@ -581,6 +762,11 @@ class Batch(IBackend):
                 if exitcode is not None:
                     # Job has finished
                     j.backend.exitcode = exitcode
+                    # not known yet if the job was seen running by the batch system rather than from its status file
+                    if queue and not j.backend.actualqueue:
+                        j.backend.actualqueue = queue
+                    if actualCE and not j.backend.actualCE:
+                        j.backend.actualCE = actualCE
                     if exitcode == 0:
                         j.updateStatus('completed')
                     else:
@@ -0,0 +1,175 @@
+"""
+Executor shared by all of the jobs of the Local backend.
+
+Rather than a process per (master) job each running its subjobs, the job scripts of all of the Local jobs are queued
+in a spool directory of the gangadir and run by a single executor process (see LocalExecutor.py.template), which
+runs at most [Local]executor_slots of them at a time, those of the highest priority first. The executor is started
+when a job is queued and no executor is running. It carries on if the Ganga session stops and stops by itself once it
+has nothing left to do, so neither the queue nor the running jobs are lost when the session is restarted.
+"""
+
+import errno
+import fcntl
+import inspect
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from os.path import abspath, dirname, join
+
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+from GangaCore.Runtime.GPIexport import exportToGPI
+
+logger = getLogger()
+
+SPOOL_DIR_NAME = 'localhost_executor'
+
+
+def _task_name(fqid):
+    """ Return the name of the task file of the job of id fqid """
+    return '%s.task' % fqid
+
+
+class LocalExecutor(object):
+    """
+    Client of the executor of the Local jobs of a gangadir
+    """
+
+    def __init__(self, spool_dir=None):
+        """
+        Args:
+            spool_dir (str): Directory of the queue of the executor, defaults to the one in the gangadir
+        """
+        if spool_dir is None:
+            spool_dir = join(getConfig('Configuration')['gangadir'], SPOOL_DIR_NAME)
+        self.spool_dir = spool_dir
+        self.queue_dir = join(spool_dir, 'queue')
+        self.running_dir = join(spool_dir, 'running')
+
+    def _makeSpool(self):
+        for this_dir in (self.queue_dir, self.running_dir):
+            if not os.path.isdir(this_dir):
+                os.makedirs(this_dir)
+
+    def isRunning(self):
+        """ Return if an executor is running on the spool directory """
+        try:
+            lock_file = open(join(self.spool_dir, 'executor.lock'), 'a')
+        except IOError:
+            return False
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                return True
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return False
+
+    def start(self):
+        """ Start an executor unless one is running already """
+        if self.isRunning():
+            return
+        script = join(dirname(abspath(inspect.getfile(inspect.currentframe()))), 'LocalExecutor.py.template')
+        with open(join(self.spool_dir, 'executor.log'), 'a') as log_file:
+            subprocess.Popen([sys.executable, script, self.spool_dir], stdin=subprocess.DEVNULL, stdout=log_file,
+                             stderr=subprocess.STDOUT, cwd=self.spool_dir, start_new_session=True)
+        logger.debug('Started the executor of the Local jobs in %s', self.spool_dir)
+
+    def submit(self, tasks, slots=None):
+        """
+        Queue job scripts and make sure an executor is running them
+        Args:
+            tasks (list): (job id, job script, priority) of each of the jobs to queue
+            slots (int): Number of jobs run at a time, the number of CPUs if negative or None
+        """
+        self._makeSpool()
+        if slots is None or slots < 0:
+            slots = os.cpu_count() or 1
+        with open(join(self.spool_dir, 'slots'), 'w') as slots_file:
+            slots_file.write(str(slots))
+
+        now = time.time()
+        for fqid, script, priority in tasks:
+            task_file = join(self.queue_dir, _task_name(fqid))
+            with open(task_file + '.new', 'w') as new_file:
+                json.dump({'script': script, 'priority': priority, 'submitted': now}, new_file)
+            os.rename(task_file + '.new', task_file)
+        self.start()
+
+    def cancel(self, fqid, timeout=10.):
+        """
+        Take the job of id fqid off the queue, or kill it if it's running. Return if the executor had the job and it is
+        known not to run any more.
+        Args:
+            fqid (str): Id of the job
+            timeout (float): Time (sec) to wait for the pid of a job which is being started
+        """
+        try:
+            os.unlink(join(self.queue_dir, _task_name(fqid)))
+            return True
+        except OSError:
+            pass
+
+        # A job being started is in the running tasks before the executor has written its pid
+        running_file = join(self.running_dir, _task_name(fqid))
+        end_time = time.time() + timeout
+        seen = False
+        while True:
+            try:
+                with open(running_file) as task_file:
+                    task = json.load(task_file)
+            except IOError:
+                # once the task is gone the executor is done with the job, it could not be started or is over
+                return seen
+            except ValueError:
+                task = {}
+            seen = True
+            if 'pid' in task:
+                break
+            if time.time() > end_time:
+                logger.warning('The executor has not started job %s after %s seconds, it could not be killed',
+                               fqid, timeout)
+                return False
+            time.sleep(0.1)
+
+        try:
+            # the job script is the leader of the process group of the job
+            os.killpg(task['pid'], signal.SIGKILL)
+        except OSError as err:
+            if err.errno != errno.ESRCH:
+                logger.warning('While killing job %s: %s', fqid, err)
+                return False
+            logger.debug('Job %s is over already', fqid)
+        return True
+
+    def status(self):
+        """
+        Return what the executor is doing: the number of slots, of jobs running and queued, and the fraction of the
+        slots in use
+        """
+        try:
+            with open(join(self.spool_dir, 'status')) as status_file:
+                status = json.load(status_file)
+        except (IOError, ValueError):
+            status = {'slots': 0, 'running': 0}
+        if os.path.isdir(self.queue_dir):
+            status['queued'] = len([name for name in os.listdir(self.queue_dir) if name.endswith('.task')])
+        else:
+            status['queued'] = 0
+        status['active'] = self.isRunning()
+        status['utilisation'] = float(status['running']) / status['slots'] if status['slots'] else 0.
+        return {key: status[key] for key in ('active', 'slots', 'running', 'queued', 'utilisation')}
+
+
+def localExecutorStatus():
+    """
+    Return the state of the executor running the jobs of the Local backend when [Local]executor is enabled: if it's
+    active, its number of slots, the number of jobs running and queued and the fraction of the slots in use
+    """
+    return LocalExecutor().status()
+
+
+exportToGPI('localExecutorStatus', localExecutorStatus, 'Functions')
@@ -24,6 +24,7 @@ from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem
 from GangaCore.GPIDev.Base.Proxy import getName
 from GangaCore.GPIDev.Lib.File import FileBuffer
 from GangaCore.GPIDev.Lib.File import FileUtils
+from GangaCore.Lib.Localhost.LocalExecutor import LocalExecutor
 
 logger = GangaCore.Utility.logging.getLogger()
 config = GangaCore.Utility.Config.getConfig('Local')
@@ -90,7 +91,12 @@ class Localhost(IBackend):
             'batchsize': SimpleItem(
                 defvalue=-1,
                 typelist=[int],
-                doc='Run a maximum of this number of subjobs in parallel. If value is negative use number of available CPUs')})
+                doc='Run a maximum of this number of subjobs in parallel. If value is negative use number of available CPUs'),
+            'priority': SimpleItem(
+                defvalue=0,
+                typelist=[int],
+                doc='Priority of the job in the queue of the executor of the Local jobs, see [Local]executor. '
+                    'Jobs of higher priority run first')})
     _category = 'backends'
     _name = 'Local'
 
@@ -124,6 +130,9 @@ class Localhost(IBackend):
         super().master_submit(rjobs, subjobconfigs,
                               masterjobconfig, keep_going, self.force_parallel)
 
+        if config['executor']:
+            return self.queue(rjobs)
+
         scriptPath = self.prepare_master_script(rjobs)
         self.run(scriptPath)
 
@@ -154,10 +163,12 @@ class Localhost(IBackend):
                 return 0
 
     def master_resubmit(self, rjobs):
-        scriptPath = self.prepare_master_script(rjobs)
         for sj in rjobs:
             sj.updateStatus('submitted')
-        self.run(scriptPath)
+        if config['executor']:
+            self.queue(rjobs)
+        else:
+            self.run(self.prepare_master_script(rjobs))
 
         master = self.getJobObject().master
         if master is not None:
@@ -168,8 +179,22 @@ class Localhost(IBackend):
     def resubmit(self):
         self.cleanworkdir()
         job = self.getJobObject()
+        if config['executor']:
+            return self.queue([job])
         return self.run(job.getInputWorkspace().getPath('__jobscript__'))
 
+    def queue(self, rjobs):
+        """Queue the job scripts of rjobs to the executor of the Local jobs rather than running them in a process of
+        their own, see LocalExecutor"""
+        tasks = [(j.getFQID('.'), j.getInputWorkspace().getPath('__jobscript__'), j.backend.priority) for j in rjobs]
+        try:
+            LocalExecutor().submit(tasks, config['executor_slots'])
+        except OSError as x:
+            logger.error('cannot queue the jobs to the executor: %s', str(x))
+            return 0
+        self.actualCE = GangaCore.Utility.util.hostname()
+        return 1
+
     def run(self, scriptpath):
         try:
             process = subprocess.Popen([sys.executable, scriptpath, 'subprocess'],
@@ -361,7 +386,10 @@ class Localhost(IBackend):
         if isinstance(pids, int):
             pids = [pids]
 
-        if pids[0] < 0:
+        # jobs run by the executor are killed by it, whether they have started or not
+        if config['executor'] and LocalExecutor().cancel(job.getFQID('.')):
+            pids = []
+        elif pids[0] < 0:
             return 1
 
         for wrapper_pid in pids:
@@ -14,7 +14,11 @@ from GangaCore.GPIDev.Adapters.IGangaFile import IGangaFile
 from GangaCore.Utility.Config import ConfigError, getConfig
 from GangaCore.Utility.Plugin import allPlugins
 from GangaCore.Utility.logging import getLogger
+from concurrent.futures import ThreadPoolExecutor
 import subprocess
+import tempfile
+import shutil
+import gzip
 import os
 import copy
 
@@ -47,6 +51,63 @@ def getMergerObject(file_ext):
     return result
 
 
+def getMergeWorkers():
+    """Returns the number of merges which are run at a time, from the [Mergers] section of the config"""
+    workers = getConfig('Mergers')['merge_workers']
+    if workers is None or workers < 1:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def getMergeFanIn():
+    """Returns the largest number of files merged together in one step, from the [Mergers] section of the config"""
+    return max(2, getConfig('Mergers')['merge_fan_in'])
+
+
+def _chunks(file_list, size):
+    """Split file_list in lists of at most size files, keeping their order"""
+    return [file_list[i:i + size] for i in range(0, len(file_list), size)]
+
+
+def treeMerge(merge_step, file_list, output_file, fan_in=None, workers=None):
+    """Merge the files of file_list into output_file by a tree of merges
+
+    merge_step(files, output) is called on at most fan_in files at a time. The merges of each level of the tree run
+    concurrently, on up to workers threads, and make intermediate files next to output_file with the same name so
+    that tools which look at the extension see the right one. These are removed once the next level is done.
+    """
+    if fan_in is None:
+        fan_in = getMergeFanIn()
+    if workers is None:
+        workers = getMergeWorkers()
+
+    if len(file_list) <= fan_in:
+        merge_step(file_list, output_file)
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix='.merge_', dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            level = 0
+            while len(file_list) > fan_in:
+                chunks = _chunks(file_list, fan_in)
+                level_dir = os.path.join(tmp_dir, str(level))
+                os.mkdir(level_dir)
+                outputs = [os.path.join(level_dir, str(i), os.path.basename(output_file)) for i in range(len(chunks))]
+                for output in outputs:
+                    os.mkdir(os.path.dirname(output))
+                logger.debug('Merging %d files in %d steps' % (len(file_list), len(chunks)))
+                # raises the exception of the first merge which failed
+                list(pool.map(merge_step, chunks, outputs))
+                if level:
+                    shutil.rmtree(os.path.join(tmp_dir, str(level - 1)))
+                file_list = outputs
+                level += 1
+        merge_step(file_list, output_file)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
 class TextMerger(IMerger):
 
     """Merger class for text
@@ -85,6 +146,10 @@ class TextMerger(IMerger):
     If ignorefailed or overwrite are set then they override the values set on the
     merge object.
 
+    When the incremental flag is set, the files of each subjob are merged
+    in steps as the subjobs complete, so that once the job is over only
+    these partial merges are left to combine.
+
     If outputdir is not specified, the default location specfied
     in the [Mergers] section of the .gangarc file will be used.
 
@@ -106,37 +171,62 @@ class TextMerger(IMerger):
     _schema.datadict['compress'] = SimpleItem(
         defvalue=False, doc='Output should be compressed with gzip.')
 
+    def _compressed(self, output_file):
+        """Returns if output_file is written compressed"""
+        return self.compress or output_file.lower().endswith('.gz')
+
     def mergefiles(self, file_list, output_file):
 
+        compress = self._compressed(output_file)
+
+        # the files are copied in parts of at most merge_fan_in files written concurrently which are then joined: a
+        # series of gzip streams is read as one by gzip so each part can be compressed on its own
+        chunks = _chunks(file_list, getMergeFanIn())
+        tmp_dir = tempfile.mkdtemp(prefix='.merge_', dir=os.path.dirname(os.path.abspath(output_file)))
+        try:
+            parts = [os.path.join(tmp_dir, str(i)) for i in range(len(chunks))]
+            with ThreadPoolExecutor(max_workers=getMergeWorkers()) as pool:
+                list(pool.map(lambda chunk, part: _writeTextPart(chunk, part, compress), chunks, parts))
+            self.combinePartials(parts, output_file)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def mergePartial(self, file_list, partial_file):
+        _writeTextPart(file_list, partial_file, self._compressed(partial_file))
+
+    def combinePartials(self, partial_list, output_file):
+
         import time
 
-        if self.compress or output_file.lower().endswith('.gz'):
-            # use gzip
-            import gzip
-            if not output_file.lower().endswith('.gz'):
-                output_file += '.gz'
-            out_file = gzip.GzipFile(output_file, 'w')
-        else:
-            out_file = open(output_file, 'w')
+        compress = self._compressed(output_file)
+        if compress and not output_file.lower().endswith('.gz'):
+            output_file += '.gz'
 
-        out_file.write('# Ganga TextMergeTool - %s #\n' % time.asctime())
-        for f in file_list:
+        # the partial merges only hold the files, each after its header
+        with open(output_file, 'wb') as out_file:
+            _writeText(out_file, '# Ganga TextMergeTool - %s #\n' % time.asctime(), compress)
+            for partial in partial_list:
+                with open(partial, 'rb') as partial_file:
+                    shutil.copyfileobj(partial_file, out_file)
+            _writeText(out_file, '# Ganga Merge Ended Successfully #\n', compress)
 
-            if not f.lower().endswith('.gz'):
-                in_file = open(f)
-            else:
-                import gzip
-                in_file = gzip.GzipFile(f)
 
-            out_file.write('# Start of file %s #\n' % str(f))
-            out_file.write(in_file.read())
-            out_file.write('\n')
+def _writeText(out_file, text, compress):
+    """Write the string text to the binary file out_file, as a gzip stream of its own if compress"""
+    data = text.encode()
+    if compress:
+        data = gzip.compress(data)
+    out_file.write(data)
 
-            in_file.close()
 
-        out_file.write('# Ganga Merge Ended Successfully #\n')
-        out_file.flush()
-        out_file.close()
+def _writeTextPart(file_list, part_file, compress):
+    """Copy the files of file_list, each after a header naming it, to part_file without reading them in memory"""
+    with (gzip.open(part_file, 'wb') if compress else open(part_file, 'wb')) as out_file:
+        for f in file_list:
+            out_file.write(('# Start of file %s #\n' % str(f)).encode())
+            with (gzip.open(f, 'rb') if f.lower().endswith('.gz') else open(f, 'rb')) as in_file:
+                shutil.copyfileobj(in_file, out_file)
+            out_file.write(b'\n')
 
 
 class RootMerger(IMerger):
@@ -178,6 +268,10 @@ class RootMerger(IMerger):
     If ignorefailed or overwrite are set then they override the
     values set on the merge object.
 
+    When the incremental flag is set, the files of each subjob are merged
+    in steps as the subjobs complete, so that once the job is over only
+    these partial merges are left to combine.
+
     A summary of all the files merged will be created for each entry in files.
     This will be created when the merge of those files completes
     successfully. The name of this is the same as the output file, with the
@@ -218,22 +312,30 @@ class RootMerger(IMerger):
         if not default_arguments in merge_cmd:
             merge_cmd += ' %s ' % default_arguments
 
-        # add the list of files, output file first
-        arg_list = [output_file]
-        arg_list.extend(file_list)
-        merge_cmd += ' '.join(arg_list)
+        outputs = []
 
-        rc, out = subprocess.getstatusoutput(merge_cmd)
+        def hadd(files, output):
+            # add the list of files, output file first
+            arg_list = [output]
+            arg_list.extend(files)
+            this_cmd = merge_cmd + ' '.join(arg_list)
 
-        log_file = '%s.hadd_output' % output_file
-        with open(log_file, 'w') as log:
-            log.write('# -- Hadd output -- #\n')
-            log.write('%s\n' % out)
+            rc, out = subprocess.getstatusoutput(this_cmd)
+            outputs.append(out)
+            if rc:
+                logger.error(out)
+                raise PostProcessException(
+                    'The ROOT merge failed to complete. The command used was %s.' % this_cmd)
 
-        if rc:
-            logger.error(out)
-            raise PostProcessException(
-                'The ROOT merge failed to complete. The command used was %s.' % merge_cmd)
+        # many files are added in steps of merge_fan_in files, which are run in parallel, rather than by one hadd
+        try:
+            treeMerge(hadd, file_list, output_file)
+        finally:
+            log_file = '%s.hadd_output' % output_file
+            with open(log_file, 'w') as log:
+                log.write('# -- Hadd output -- #\n')
+                for out in outputs:
+                    log.write('%s\n' % out)
 
 
 class CustomMerger(IMerger):
@@ -368,6 +470,18 @@ class SmartMerger(IMerger):
     _name = 'SmartMerger'
     _schema = IMerger._schema.inherit_copy()
 
+    def _partialMerger(self, file_name):
+        merge_object = getMergerObject(file_name)
+        if merge_object is None:
+            file_ext = os.path.splitext(file_name)[1].lstrip('.').lower()
+            if not file_ext and os.path.basename(file_name) in ['stdout', 'stderr']:
+                file_ext = 'std_merge'
+            merge_object = getMergerObject(file_ext)
+        if merge_object is None:
+            raise PostProcessException('Extension of %s not recognized and so the merge will fail. '
+                                       'Check the [Mergers] section of your .gangarc file.' % file_name)
+        return merge_object
+
     def merge(self, jobs, outputdir=None, ignorefailed=None, overwrite=None):
 
         if ignorefailed is None:
@@ -410,7 +524,7 @@ class SmartMerger(IMerger):
             # store the file association
             type_map.setdefault(file_ext, []).append(f)
 
-        merge_results = []
+        merge_objects = []
         for ext in type_map:
             merge_object = getMergerObject(ext)  # returns an instance
             if merge_object is None:
@@ -420,7 +534,12 @@ class SmartMerger(IMerger):
             else:
                 logger.debug('Extension %s matched and using appropriate object: %s' % (str(ext), str(merge_object)))
             merge_object.files = type_map[ext]
-            merge_result = merge_object.merge(jobs, outputdir, ignorefailed, overwrite)
-            merge_results.append(merge_result)
+            merge_objects.append(merge_object)
+
+        # the files of different types are merged at the same time
+        with ThreadPoolExecutor(max_workers=max(1, len(merge_objects))) as pool:
+            futures = [pool.submit(merge_object.merge, jobs, outputdir, ignorefailed, overwrite)
+                       for merge_object in merge_objects]
+            merge_results = [future.result() for future in futures]
 
         return not False in merge_results
@@ -13,7 +13,9 @@ import GangaCore.Utility.logging
 logger = GangaCore.Utility.logging.getLogger()
 
 import inspect
+import json
 import os
+import time
 from GangaCore.Lib.Executable import randomString
 
 
@@ -24,6 +26,164 @@ def shutdown_transport(tr):
         tr = None
 
 
+# The script of the monitoring agent, run by a Ganga session on the remote site
+agent_script = """#!/usr/bin/env python
+#-----------------------------------------------------
+# This is the monitoring agent of the Remote backend.
+# It stays up and answers the status queries written
+# to its standard input, a line of JSON each, until
+# that is closed
+#-----------------------------------------------------
+import json
+import sys
+
+def backend_record(be):
+    record = {}
+    for name, item in be._impl._schema.allItems():
+        value = getattr(be._impl, name)
+        if isinstance(value, (str, int, float, bool, type(None))):
+            record[name] = value
+    return record
+
+print("***_AGENT_READY_***")
+sys.stdout.flush()
+
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    try:
+        jids = json.loads(line)['ids']
+    except (ValueError, KeyError):
+        continue
+
+    # pick up the jobs submitted by the other sessions since the last query
+    registry = jobs._impl.objects
+    registry.repository.update_index()
+
+    runMonitoring()
+
+    records = []
+    for jid in jids:
+        try:
+            j = jobs(jid)
+        except Exception:
+            continue
+        records.append({'id': jid, 'status': j.status, 'outputdir': j.outputdir,
+                        'exitcode': getattr(j.backend._impl, 'exitcode', None),
+                        'actualCE': getattr(j.backend._impl, 'actualCE', None),
+                        'backend': backend_record(j.backend)})
+
+    # leave the jobs to the sessions which kill or resubmit them until the next query
+    for _, obj in registry.items():
+        registry._release_session_lock_and_flush(obj)
+
+    print("***_STATUS_***" + json.dumps(records))
+    sys.stdout.flush()
+"""
+
+
+class RemoteAgent(object):
+
+    """Monitoring agent of the Remote backend on a remote site
+
+    A Ganga session started on the remote site over the transport of the backend, which is kept running from one
+    monitoring sweep to the next. Each sweep sends it the ids of the jobs to check and gets back a small record of
+    each of them (status, exit code, CE, output directory and the simple attributes of the remote backend) rather
+    than starting a Ganga session which prints the pickled jobs.
+    """
+
+    ready_token = "***_AGENT_READY_***"
+    status_token = "***_STATUS_***"
+
+    # how long to wait for the remote Ganga session to start and for the answer to a query (seconds)
+    start_timeout = 300
+    query_timeout = 300
+
+    def __init__(self, backend):
+        self.transport = backend._transport
+        self.sftp = backend._sftp
+        self.ganga_dir = backend.ganga_dir
+        self.ganga_cmd = backend.ganga_cmd
+        self.pre_script = list(backend.pre_script)
+        self.channel = None
+        self._buffer = ""
+
+    def isAlive(self, backend):
+        """Returns if the agent runs over the transport of backend and can take queries"""
+        return (self.channel is not None and not self.channel.closed and not self.channel.exit_status_ready()
+                and self.transport is backend._transport and self.transport.is_active())
+
+    def start(self):
+        """Start the remote Ganga session of the agent and wait for it to be ready"""
+        code = randomString()
+        script_name = os.path.join(self.ganga_dir, "__agent__%s.py" % code)
+        self.sftp.open(script_name, 'w').write(agent_script)
+
+        # Set up a command file to source, as for the scripts run by run_remote_script
+        cmd_str = ""
+        for c in self.pre_script:
+            cmd_str += c + '\n'
+        cmd_str += "exec " + self.ganga_cmd + " -o\'[Configuration]gangadir=" + self.ganga_dir + "\' " + script_name + '\n'
+        cmd_file = os.path.join(self.ganga_dir, "__gangaagent__" + code)
+        self.sftp.open(cmd_file, 'w').write(cmd_str)
+
+        try:
+            self.channel = self.transport.open_session()
+            self.channel.exec_command("source " + cmd_file)
+            self._readUntil(self.ready_token, self.start_timeout)
+        finally:
+            # Ganga has read both of them once it's ready
+            for name in (cmd_file, script_name):
+                try:
+                    self.sftp.remove(name)
+                except IOError:
+                    pass
+
+        logger.debug("Started the Remote monitoring agent in %s" % self.ganga_dir)
+
+    def query(self, remote_ids):
+        """Returns the records of the remote jobs of ids remote_ids, the ones unknown remotely are left out"""
+        self.channel.sendall((json.dumps({'ids': remote_ids}) + '\n').encode())
+        return json.loads(self._readUntil(self.status_token, self.query_timeout))
+
+    def close(self):
+        """Stop the agent, the remote session ends when its input is closed"""
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+
+    def _readUntil(self, token, timeout):
+        """Read the output of the agent up to a line starting with token and return the rest of that line"""
+        import getpass
+
+        end_time = time.time() + timeout
+        stderr = ""
+        while True:
+            while '\n' in self._buffer:
+                line, self._buffer = self._buffer.split('\n', 1)
+                if line.startswith(token):
+                    return line[len(token):]
+
+            if self.channel.recv_stderr_ready():
+                stderr = (stderr + self.channel.recv_stderr(4096).decode(errors='replace'))[-1536:]
+            if self.channel.recv_ready():
+                self._buffer += self.channel.recv(4096).decode(errors='replace')
+            elif self.channel.exit_status_ready() or self.channel.closed:
+                raise IOError("The Remote monitoring agent stopped: %s" % stderr)
+            elif time.time() > end_time:
+                raise IOError("No answer from the Remote monitoring agent after %d seconds" % timeout)
+            else:
+                time.sleep(0.01)
+
+            if "GRID pass" in self._buffer or "GRID pass" in stderr:
+                password = getpass.getpass('Enter GRID pass phrase: ')
+                self.channel.send(password + "\n")
+                password = ""
+                self._buffer = self._buffer.replace("GRID pass", "")
+                stderr = stderr.replace("GRID pass", "")
+
+
 class Remote(IBackend):
 
     """Remote backend - submit jobs to a Remote pool.
@@ -120,6 +280,8 @@ class Remote(IBackend):
     _code = randomString()
     _transportarray = None
     _key = {}
+    # the monitoring agents, by remote site
+    _agents = {}
 
     _exportmethods = ['setup']
 
@@ -185,8 +347,8 @@ print("***_FINISHED_***")
 
                     # check for too many retries on the same host
                     if t[2] is None or t[3] is None:
-                        logger.warning("Too many retries for remote host " + self.username +
-                                       "@" + self.host + ". Restart Ganga to have another go.")
+                        logger.warning("Too many retries for remote host " + self.username
+                                       + "@" + self.host + ". Restart Ganga to have another go.")
                         return False
 
                     self._transport = t[2]
@@ -294,8 +456,8 @@ print("***_FINISHED_***")
             num_try = num_try + 1
 
         if num_try == 3:
-            logger.error("Could not logon to remote host " + self.username + "@" +
-                         self.host + " after three attempts. Restart Ganga to have another go.")
+            logger.error("Could not logon to remote host " + self.username + "@"
+                         + self.host + " after three attempts. Restart Ganga to have another go.")
             Remote._transportarray = [Remote._transportarray,
                                       [self.username, self.host, None, None]]
             return False
@@ -807,123 +969,70 @@ print("***_FINISHED_***")
             jobs_sort[host_str].append(j)
 
         for host_str in jobs_sort:
-            # Create a ganga script that updates the job info for all jobs at
-            # this remote site
-            script = """#!/usr/bin/env python
-from __future__ import print_function
-#-----------------------------------------------------
-# This is a monitoring script for a remote job. It
-# outputs some useful job info and exits
-#-----------------------------------------------------
-import os,os.path,shutil,tempfile
-import sys,time,traceback
-
-############################################################################################
-
-###INLINEMODULES###
-
-############################################################################################
-
-code = ###CODE###
-jids = ###JOBID###
-
-runMonitoring()
-
-import pickle
-
-for jid in jids:
-
-    j = jobs( jid )
-
-    # Start pickle token
-    print("***_START_PICKLE_***")
-
-    # pickle the job
-    print(j.outputdir)
-    print(pickle.dumps(j._impl))
-    print(j)
-
-    # print a finished token
-    print("***_END_PICKLE_***")
-
-print("***_FINISHED_***")
-"""
 
             mj = jobs_sort[host_str][0]
-            script = script.replace('###CODE###', repr(mj.backend._code))
             rem_ids = []
             for j in jobs_sort[host_str]:
                 rem_ids.append(j.backend.remote_job_id)
-            script = script.replace('###JOBID###', str(rem_ids))
 
             # check for the connection
             if (mj.backend.opentransport() == False):
                 return 0
 
-            # send the script
-            script_name = '/__jobscript__%s.py' % mj.backend._code
-            mj.backend._sftp.open(
-                mj.backend.ganga_dir + script_name, 'w').write(script)
-
-            # run the script
-            stdout, stderr = mj.backend.run_remote_script(
-                script_name, mj.backend.pre_script)
-
-            # Copy the job object
-            if stdout.find("***_FINISHED_***") != -1:
-
-                start_pos = stdout.find("***_START_PICKLE_***")
-                end_pos = stdout.find(
-                    "***_END_PICKLE_***") + len("***_END_PICKLE_***")
-
-                while start_pos != -1 and end_pos != -1:
-                    pickle_str = stdout[start_pos:end_pos + 1]
-
-                    status, outputdir, id, be = mj.backend.grabremoteinfo(
-                        pickle_str)
-
-                    # find the job and update it
-                    found = False
-                    for j in jobs_sort[host_str]:
-
-                        if (id == j.backend.remote_job_id):
-                            found = True
-                            if status != j.status:
-                                j.updateStatus(status)
-
-                            if hasattr(j.backend.remote_backend, 'exitcode'):
-                                j.backend.exitcode = be.exitcode
-                            if hasattr(j.backend.remote_backend, 'actualCE'):
-                                j.backend.actualCE = be.actualCE
-
-                            for o in be._schema.allItems():
-                                exec(
-                                    "j.backend.remote_backend." + o[0] + " = be." + o[0])
-
-                            # check for completed or failed and pull the output
-                            # if required
-                            if j.status == 'completed' or j.status == 'failed':
-
-                                # we should have output, so get the file list
-                                # first
-                                filelist = j.backend._sftp.listdir(outputdir)
-
-                                # go through and sftp them back
-                                for fname in filelist:
-                                    data = j.backend._sftp.open(
-                                        outputdir + '/' + fname, 'r').read()
-                                    open(
-                                        j.outputdir + '/' + os.path.basename(fname), 'w').write(data)
-
-                    if not found:
-                        logger.warning(
-                            "Couldn't match remote id %d with monitored job. Serious problems in Remote monitoring." % id)
-
-                    start_pos = stdout.find("***_START_PICKLE_***", end_pos)
-                    end_pos = stdout.find(
-                        "***_END_PICKLE_***", end_pos) + len("***_END_PICKLE_***")
-
-            # remove the script
-            j.backend._sftp.remove(j.backend.ganga_dir + script_name)
+            # the agent of this site is started by the first sweep and used by the next ones
+            agent = Remote._agents.get(host_str)
+            try:
+                if agent is None or not agent.isAlive(mj.backend):
+                    if agent is not None:
+                        agent.close()
+                    agent = RemoteAgent(mj.backend)
+                    Remote._agents[host_str] = agent
+                    agent.start()
+                records = agent.query(rem_ids)
+            except Exception as err:
+                logger.warning("Problem monitoring the jobs on %s, the monitoring agent will be restarted: %s" %
+                               (host_str, err))
+                agent.close()
+                del Remote._agents[host_str]
+                continue
+
+            for record in records:
+
+                # find the job and update it
+                found = False
+                for j in jobs_sort[host_str]:
+
+                    if (record['id'] == j.backend.remote_job_id):
+                        found = True
+                        if record['status'] != j.status:
+                            j.updateStatus(record['status'])
+
+                        if hasattr(j.backend.remote_backend, 'exitcode'):
+                            j.backend.exitcode = record['exitcode']
+                        if hasattr(j.backend.remote_backend, 'actualCE'):
+                            j.backend.actualCE = record['actualCE']
+
+                        for name, value in record['backend'].items():
+                            try:
+                                setattr(j.backend.remote_backend, name, value)
+                            except Exception as err:
+                                logger.debug("Remote backend attribute %s not copied: %s" % (name, err))
+
+                        # check for completed or failed and pull the output
+                        # if required
+                        if j.status == 'completed' or j.status == 'failed':
+
+                            # we should have output, so get the file list
+                            # first
+                            filelist = j.backend._sftp.listdir(record['outputdir'])
+
+                            # go through and sftp them back
+                            for fname in filelist:
+                                j.backend._sftp.get(record['outputdir'] + '/' + fname,
+                                                    os.path.join(j.outputdir, os.path.basename(fname)))
+
+                if not found:
+                    logger.warning("Couldn't match remote id %d with monitored job. Serious problems in Remote monitoring."
+                                   % record['id'])
 
         return None
@@ -241,6 +241,16 @@ conf_config.addOption(
         'then shared directories will always be deleted if not associated with a persisted Ganga object.'
     ),
 )
+conf_config.addOption(
+    'SandboxCache',
+    True,
+    (
+        'If TRUE (default), the packed input sandbox of a job is kept once in the sandbox_cache directory of the '
+        'gangadir, keyed by the hash of its files, and hard linked into the input workspace of every job with the '
+        'same files rather than packed again for each of them. Tarballs no longer linked to by any job are removed '
+        'when jobs are removed.'
+    ),
+)
 
 conf_config.addOption(
     'autoGenerateJobWorkspace', False, 'Autogenerate workspace dirs for new jobs'
@@ -363,6 +373,21 @@ queues_config.addOption(
 queues_config.addOption(
     'NumWorkerThreads', 5, 'default number of worker threads in the queues system'
 )
+queues_config.addOption(
+    'SubmitPrepareThreads',
+    5,
+    'number of threads preparing the subjobs of a job submitted with parallel_submit',
+)
+queues_config.addOption(
+    'SubmitThreads',
+    5,
+    'number of threads submitting the subjobs of a job submitted with parallel_submit',
+)
+queues_config.addOption(
+    'SubmitMaxPending',
+    100,
+    'largest number of subjobs being prepared or submitted in parallel at any one time',
+)
 
 # ------------------------------------------------
 # Plugins
@@ -623,6 +648,21 @@ local_config.addOption(
     None,
     'The location where the workdir will be created. If None it defaults to the value of $TMPDIR',
 )
+local_config.addOption(
+    'executor',
+    False,
+    (
+        'Queue the jobs and subjobs of all of the Local jobs to one executor process per gangadir, which runs '
+        'executor_slots of them at a time in the order of the priority of their backend, rather than running '
+        'each (master) job in a process of its own. The batchsize of the backend is then not used. '
+        'See localExecutorStatus() for the state of the queue'
+    ),
+)
+local_config.addOption(
+    'executor_slots',
+    -1,
+    'Number of jobs the executor of the Local jobs runs at a time. If negative use number of available CPUs',
+)
 
 # ------------------------------------------------
 # GridShell
@@ -783,6 +823,56 @@ lsf_config.addOption(
     "String pattern for replay from the kill command",
 )
 
+lsf_config.addOption(
+    'job_arrays',
+    True,
+    "Submit the subjobs of a job with a single submit command as a job array rather than one command per subjob",
+)
+lsf_config.addOption(
+    'array_opt',
+    '-J "%(name)s[%(first)d-%(last)d]"',
+    "Option of the submit command making the job array of the subjobs (from first to last index, name of the job)",
+)
+lsf_config.addOption('array_first_index', 1, "Array index of the first subjob of a job array")
+lsf_config.addOption('array_max_size', 1000, "Largest number of subjobs submitted in one job array")
+lsf_config.addOption(
+    'array_index_name', 'LSB_JOBINDEX', "Name of environment with the array index of the job"
+)
+lsf_config.addOption(
+    'array_index_pattern',
+    '%I',
+    "Pattern replaced by the array index in the output file names of a job array",
+)
+lsf_config.addOption(
+    'submit_array_res_pattern',
+    '^Job <(?P<id>\\d*)> is submitted to .*queue <(?P<queue>\\S*)>',
+    "String pattern for replay from the submit command of a job array",
+)
+lsf_config.addOption(
+    'array_id_str', '%(id)s[%(index)d]', "Batch id of a subjob from the id of its job array and its array index"
+)
+lsf_config.addOption(
+    'bulk_status',
+    False,
+    (
+        "Monitor the jobs with one status_str command for all of them rather than by reading the status file of "
+        "each job, which is then only read once the job is neither queued nor running"
+    ),
+)
+lsf_config.addOption(
+    'status_str', 'bjobs -a -noheader -o "jobid jobindex stat"', "String used to query the state of all of the jobs"
+)
+lsf_config.addOption(
+    'status_res_pattern',
+    '^\\s*(?P<id>\\d+)\\s+(?P<index>\\d+)\\s+(?P<status>\\S+)',
+    "String pattern for the batch id, array index and state of each job in the reply of the status command",
+)
+lsf_config.addOption('status_pending', ['PEND', 'PSUSP'], "States of the jobs which are queued")
+lsf_config.addOption('status_running', ['RUN', 'USUSP', 'SSUSP', 'WAIT', 'PROV'], "States of the jobs which are running")
+lsf_config.addOption(
+    'status_cache_time', 10, "Seconds for which the reply of the status command is used for all of the jobs"
+)
+
 tempstr = '''
 '''
 lsf_config.addOption(
@@ -864,6 +954,57 @@ pbs_config.addOption(
     "String pattern for replay from the kill command",
 )
 
+pbs_config.addOption(
+    'job_arrays',
+    True,
+    "Submit the subjobs of a job with a single submit command as a job array rather than one command per subjob",
+)
+pbs_config.addOption(
+    'array_opt',
+    '-J %(first)d-%(last)d',
+    (
+        "Option of the submit command making the job array of the subjobs (from first to last index, name of the job). "
+        "For Torque use '-t %(first)d-%(last)d' with PBS_ARRAYID as array_index_name"
+    ),
+)
+pbs_config.addOption('array_first_index', 0, "Array index of the first subjob of a job array")
+pbs_config.addOption('array_max_size', 10000, "Largest number of subjobs submitted in one job array")
+pbs_config.addOption(
+    'array_index_name', 'PBS_ARRAY_INDEX', "Name of environment with the array index of the job"
+)
+pbs_config.addOption(
+    'array_index_pattern',
+    '^array_index^',
+    "Pattern replaced by the array index in the output file names of a job array",
+)
+pbs_config.addOption(
+    'submit_array_res_pattern',
+    '^(?P<id>\\d*)\\[\\]\\.\\S*',
+    "String pattern for replay from the submit command of a job array",
+)
+pbs_config.addOption(
+    'array_id_str', '%(id)s[%(index)d]', "Batch id of a subjob from the id of its job array and its array index"
+)
+pbs_config.addOption(
+    'bulk_status',
+    False,
+    (
+        "Monitor the jobs with one status_str command for all of them rather than by reading the status file of "
+        "each job, which is then only read once the job is neither queued nor running"
+    ),
+)
+pbs_config.addOption('status_str', 'qstat -t', "String used to query the state of all of the jobs")
+pbs_config.addOption(
+    'status_res_pattern',
+    '^(?P<id>\\d+(\\[\\d+\\])?)\\.\\S*\\s+\\S+\\s+\\S+\\s+\\S+\\s+(?P<status>\\w)\\s',
+    "String pattern for the batch id and state of each job in the reply of the status command",
+)
+pbs_config.addOption('status_pending', ['Q', 'H', 'W', 'T'], "States of the jobs which are queued")
+pbs_config.addOption('status_running', ['R', 'E', 'S', 'U'], "States of the jobs which are running")
+pbs_config.addOption(
+    'status_cache_time', 10, "Seconds for which the reply of the status command is used for all of the jobs"
+)
+
 tempstr = '''
 env = os.environ
 jobnumid = env["PBS_JOBID"]
@@ -951,6 +1092,59 @@ sge_config.addOption(
     "String pattern for replay from the kill command",
 )
 
+sge_config.addOption(
+    'job_arrays',
+    True,
+    "Submit the subjobs of a job with a single submit command as a job array rather than one command per subjob",
+)
+sge_config.addOption(
+    'array_opt',
+    '-t %(first)d-%(last)d',
+    "Option of the submit command making the job array of the subjobs (from first to last index, name of the job)",
+)
+sge_config.addOption('array_first_index', 1, "Array index of the first subjob of a job array")
+sge_config.addOption('array_max_size', 75000, "Largest number of subjobs submitted in one job array")
+sge_config.addOption(
+    'array_index_name', 'SGE_TASK_ID', "Name of environment with the array index of the job"
+)
+sge_config.addOption(
+    'array_index_pattern',
+    '\\$TASK_ID',
+    "Pattern replaced by the array index in the output file names of a job array",
+)
+sge_config.addOption(
+    'submit_array_res_pattern',
+    'Your job-array (?P<id>\\d+)\\.\\d+-\\d+:\\d+ (.+)',
+    "String pattern for replay from the submit command of a job array",
+)
+sge_config.addOption(
+    'array_id_str', '%(id)s.%(index)d', "Batch id of a subjob from the id of its job array and its array index"
+)
+sge_config.addOption(
+    'bulk_status',
+    False,
+    (
+        "Monitor the jobs with one status_str command for all of them rather than by reading the status file of "
+        "each job, which is then only read once the job is neither queued nor running"
+    ),
+)
+sge_config.addOption('status_str', 'qstat -g d', "String used to query the state of all of the jobs")
+sge_config.addOption(
+    'status_res_pattern',
+    (
+        '^\\s*(?P<id>\\d+)\\s+\\S+\\s+\\S+\\s+\\S+\\s+(?P<status>\\w+)\\s+\\S+\\s+\\S+'
+        '(\\s+\\S+@\\S+)?\\s+\\d+(\\s+(?P<index>\\d+))?\\s*$'
+    ),
+    "String pattern for the batch id, array index and state of each job in the reply of the status command",
+)
+sge_config.addOption('status_pending', ['qw', 'hqw', 'hRwq'], "States of the jobs which are queued")
+sge_config.addOption(
+    'status_running', ['r', 't', 'Rr', 'Rt', 's', 'ts', 'S', 'tS', 'T', 'tT'], "States of the jobs which are running"
+)
+sge_config.addOption(
+    'status_cache_time', 10, "Seconds for which the reply of the status command is used for all of the jobs"
+)
+
 # From the SGE man page on qsub
 #
 # ===========================
@@ -1037,6 +1231,54 @@ slurm_config.addOption(
     "String pattern for replay from the kill command",
 )
 
+slurm_config.addOption(
+    'job_arrays',
+    True,
+    "Submit the subjobs of a job with a single submit command as a job array rather than one command per subjob",
+)
+slurm_config.addOption(
+    'array_opt',
+    '--array=%(first)d-%(last)d',
+    "Option of the submit command making the job array of the subjobs (from first to last index, name of the job)",
+)
+slurm_config.addOption('array_first_index', 0, "Array index of the first subjob of a job array")
+slurm_config.addOption('array_max_size', 1000, "Largest number of subjobs submitted in one job array")
+slurm_config.addOption(
+    'array_index_name', 'SLURM_ARRAY_TASK_ID', "Name of environment with the array index of the job"
+)
+slurm_config.addOption(
+    'array_index_pattern',
+    '%a',
+    "Pattern replaced by the array index in the output file names of a job array",
+)
+slurm_config.addOption(
+    'submit_array_res_pattern',
+    '^Submitted batch job (?P<id>\\d+)\\s*',
+    "String pattern for replay from the submit command of a job array",
+)
+slurm_config.addOption(
+    'array_id_str', '%(id)s_%(index)d', "Batch id of a subjob from the id of its job array and its array index"
+)
+slurm_config.addOption(
+    'bulk_status',
+    False,
+    (
+        "Monitor the jobs with one status_str command for all of them rather than by reading the status file of "
+        "each job, which is then only read once the job is neither queued nor running"
+    ),
+)
+slurm_config.addOption('status_str', 'squeue -h -r -u $USER -o "%i %t"', "String used to query the state of all of the jobs")
+slurm_config.addOption(
+    'status_res_pattern',
+    '^\\s*(?P<id>\\S+)\\s+(?P<status>\\S+)',
+    "String pattern for the batch id and state of each job in the reply of the status command",
+)
+slurm_config.addOption('status_pending', ['PD', 'CF', 'RQ', 'RF', 'RH', 'S'], "States of the jobs which are queued")
+slurm_config.addOption('status_running', ['R', 'CG', 'SI', 'SO', 'ST'], "States of the jobs which are running")
+slurm_config.addOption(
+    'status_cache_time', 10, "Seconds for which the reply of the status command is used for all of the jobs"
+)
+
 #  Note: some SLURM systems automatically set the TMPDIR environment
 #        variable, which points to the job's temporary directory.
 #        Make sure that you remove all created files from there, otherwise
@@ -1133,6 +1375,16 @@ merge_config.addOption(
     "location of the merger's outputdir",
 )
 merge_config.addOption('std_merge', 'TextMerger', 'Standard (default) merger')
+merge_config.addOption(
+    'merge_fan_in',
+    100,
+    'Largest number of files merged in one step. Merges of more files are done as a tree of merges of this many files',
+)
+merge_config.addOption(
+    'merge_workers',
+    -1,
+    'Number of merge steps run at a time, the number of CPUs if negative',
+)
 
 # ------------------------------------------------
 # Preparable
@@ -1579,6 +1831,23 @@ reg_config.addOption(
     'AutoFlusherWaitTime', 30, 'Time to wait between auto-flusher runs'
 )
 reg_config.addOption('EnableAutoFlush', True, 'Enable Registry auto-flushing feature')
+reg_config.addOption(
+    'EnableAsyncFlush', True, 'Write jobs changed by the monitoring to disk from a background writer thread'
+)
+reg_config.addOption(
+    'AsyncFlushDelay', 1.0, 'Time the background writer waits for further changes to an object before writing it'
+)
+reg_config.addOption(
+    'AsyncFlushQueueSize', 1000, 'Number of objects which may be queued for the background writer before changing more blocks'
+)
+reg_config.addOption(
+    'SubJobDeltaStorage',
+    False,
+    'Write subjobs as their differences to a template made from their master job when its subjobs are first written',
+)
+reg_config.addOption(
+    'FastXMLLoader', True, 'Load the XML repository files with the caching FastLoader rather than the reference Loader'
+)
 reg_config.addOption(
     'DisableLoadCheck',
     True,
@@ -0,0 +1,24 @@
+import json
+
+from GangaCore.test.Benchmarks.benchmarks import BENCHMARKS, main
+
+
+def test_benchmarks_report(tmpdir):
+    """All of the benchmarks run at a small scale and produce a JSON report"""
+    output = str(tmpdir.join('results.json'))
+    assert main(['--output', output, '--workdir', str(tmpdir.join('work')),
+                 '--submit-sizes', '1', '3', '--flush-sizes', '2', '--registry-sizes', '5',
+                 '--loader-sizes', '3']) == 0
+
+    with open(output) as report_file:
+        report = json.load(report_file)
+    assert report['ganga_version']
+    assert {r['benchmark'] for r in report['results']} == set(BENCHMARKS)
+
+    by_name = {(r['benchmark'], tuple(sorted(r['parameters'].items()))): r for r in report['results']}
+    assert by_name[('monitoring', (('subjobs', 3),))]['per_second'] > 0
+    assert by_name[('select', (('by', 'status'), ('jobs', 5)))]['selected'] == 5
+    assert by_name[('select', (('by', 'none'), ('jobs', 5)))]['selected'] == 0
+    for loader in ('Loader', 'FastLoader'):
+        loader_result = by_name[('loader', (('loader', loader), ('subjobs', 3)))]
+        assert loader_result['failed'] == 0 and loader_result['per_second'] > 0
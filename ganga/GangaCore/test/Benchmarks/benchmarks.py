@@ -0,0 +1,402 @@
+"""
+Benchmarks of how Ganga scales with the number of jobs and subjobs.
+
+Every benchmark runs a real Ganga session against a scratch gangadir and uses the FakeScheduler backend from GangaTest,
+so only the cost of Ganga itself is measured. The results are written as JSON so that they can be compared between
+releases:
+
+    python -m GangaCore.test.Benchmarks.benchmarks --output results.json
+    python -m GangaCore.test.Benchmarks.benchmarks --quick --benchmarks submit monitoring
+    python -m GangaCore.test.Benchmarks.benchmarks --benchmarks loader --loader-repositories ~/gangadir/repository
+
+Benchmarks:
+    submit      Job.submit of a job with N subjobs
+    monitoring  One monitoring sweep over the submitted subjobs: finding the active jobs and updating their status
+    flush       Writing N modified jobs to the repository
+    registry    Starting a session against a gangadir holding N jobs
+    select      jobs.select() over a gangadir holding N jobs, answered from the index
+    loader      Reading the XML files of a job with N subjobs, and of any existing repository given, with the Loader and
+                with the FastLoader
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+# Sizes used when none are given on the command line
+DEFAULT_SIZES = {
+    'submit': [1, 100, 10000],
+    'flush': [1000],
+    'registry': [1000, 10000, 100000],
+    'loader': [5000],
+}
+QUICK_SIZES = {
+    'submit': [1, 100],
+    'flush': [100],
+    'registry': [1000],
+    'loader': [100],
+}
+BENCHMARKS = ('submit', 'monitoring', 'flush', 'registry', 'select', 'loader')
+
+# Options of every benchmark session, the monitoring loop is driven by the benchmarks themselves
+SESSION_OPTS = [('PollThread', 'autostart', False),
+                ('TestingFramework', 'AutoCleanup', False)]
+
+
+class Timer(object):
+    """ Context manager measuring the wall clock time of its body """
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.seconds = time.perf_counter() - self.start
+
+
+def result(benchmark, parameters, seconds, items=None, **extra):
+    """
+    Return a single result as stored in the JSON output
+    Args:
+        benchmark (str): Name of the benchmark
+        parameters (dict): What the benchmark was run with
+        seconds (float): Time taken
+        items (int): Number of items processed, used to work out the rate
+        extra (dict): Any other measurement
+    """
+    this_result = {'benchmark': benchmark, 'parameters': parameters, 'seconds': seconds}
+    if items:
+        this_result['per_second'] = items / seconds if seconds > 0 else None
+    this_result.update(extra)
+    return this_result
+
+
+def start_session(gangadir, extra_opts=()):
+    """ Start a Ganga session using gangadir """
+    from GangaCore.testlib.GangaUnitTest import start_ganga
+    start_ganga(gangadir_for_test=gangadir, extra_opts=SESSION_OPTS + list(extra_opts))
+
+
+def stop_session():
+    """ Stop the running Ganga session, keeping the repository on disk """
+    from GangaCore.testlib.GangaUnitTest import stop_ganga
+    stop_ganga()
+
+
+def bench_submit(workdir, sizes, monitoring=True):
+    """
+    Time Job.submit for jobs with each number of subjobs in sizes and, if asked for, a monitoring sweep over them.
+    Args:
+        workdir (str): Directory for the scratch gangadirs
+        sizes (list): Numbers of subjobs, 1 is a job without splitter
+        monitoring (bool): Also time a monitoring sweep over the submitted jobs
+    """
+    results = []
+    start_session(os.path.join(workdir, 'submit'))
+    try:
+        from GangaCore.GPI import Job, Executable, ArgSplitter, FakeScheduler
+        for size in sizes:
+            j = Job(application=Executable(), backend=FakeScheduler())
+            if size > 1:
+                j.splitter = ArgSplitter(args=[[str(i)] for i in range(size)])
+            with Timer() as t:
+                j.submit()
+            results.append(result('submit', {'subjobs': size}, t.seconds, size))
+
+            if monitoring:
+                results.append(bench_monitoring_sweep(size))
+    finally:
+        stop_session()
+    return results
+
+
+def bench_monitoring_sweep(size):
+    """
+    Time one monitoring sweep: finding the jobs to be monitored and bringing all of them up to date.
+    Args:
+        size (int): Number of subjobs of the job being monitored, used as the parameter of the result
+    """
+    from GangaCore.Core import monitoring_component
+    from GangaCore.GPIDev.Lib.Job.Job import lazyLoadJobBackend
+
+    with Timer() as discover:
+        active = monitoring_component._find_active_jobs()
+    updated = 0
+    with Timer() as update:
+        for these_jobs in active.values():
+            backend = lazyLoadJobBackend(these_jobs[0])
+            for j in these_jobs:
+                if j.subjobs:
+                    to_update = [sj for sj in j.subjobs if sj.status in ('submitted', 'running')]
+                    backend.updateMonitoringInformation(to_update)
+                    j.updateMasterJobStatus()
+                else:
+                    to_update = [j]
+                    backend.updateMonitoringInformation(to_update)
+                updated += len(to_update)
+    return result('monitoring', {'subjobs': size}, discover.seconds + update.seconds, updated,
+                  discover_seconds=discover.seconds, update_seconds=update.seconds)
+
+
+def bench_flush(workdir, sizes):
+    """
+    Time writing a number of modified jobs to the repository in one go
+    Args:
+        workdir (str): Directory for the scratch gangadirs
+        sizes (list): Numbers of jobs to be written
+    """
+    results = []
+    start_session(os.path.join(workdir, 'flush'))
+    try:
+        from GangaCore.GPI import Job, Executable, FakeScheduler
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Core.GangaRepository import getRegistry
+        registry = getRegistry('jobs')
+        for size in sizes:
+            these_jobs = [stripProxy(Job(application=Executable(), backend=FakeScheduler())) for _ in range(size)]
+            registry.flush_all()
+            for i, j in enumerate(these_jobs):
+                j.name = 'flushed_%s' % i
+            with Timer() as t:
+                registry._flush(these_jobs)
+            results.append(result('flush', {'jobs': size}, t.seconds, size))
+    finally:
+        stop_session()
+    return results
+
+
+def make_gangadir(gangadir, size):
+    """
+    Fill gangadir with size identical jobs. One job is created by Ganga, the others are copies of its data file
+    and of its index record, which is much quicker than creating them one at a time.
+    Args:
+        gangadir (str): The gangadir to be filled
+        size (int): Number of jobs
+    """
+    from GangaCore.Core.GangaRepository.IndexStore import IndexStore
+
+    start_session(gangadir)
+    try:
+        from GangaCore.GPI import Job, Executable, FakeScheduler
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Core.GangaRepository import getRegistry
+        registry = getRegistry('jobs')
+        template_id = stripProxy(Job(name='benchmark', application=Executable(), backend=FakeScheduler())).id
+        registry.flush_all()
+        repository = registry.repository
+        template_fn = repository.get_fn(template_id)
+        index_fn = repository._index_store.fn
+        stamp, cat, cls, cache = repository._index_store.get(template_id)
+        root = repository.root
+    finally:
+        stop_session()
+
+    records = []
+    for this_id in range(template_id + 1, template_id + size):
+        this_fn = os.path.join(root, '%ixxx' % int(this_id * 0.001), '%i' % this_id, os.path.basename(template_fn))
+        os.makedirs(os.path.dirname(this_fn))
+        # The repository replaces data files rather than writing to them so they can share the same inode
+        try:
+            os.link(template_fn, this_fn)
+        except OSError:
+            shutil.copyfile(template_fn, this_fn)
+        records.append((this_id, stamp, cat, cls, cache))
+    IndexStore(index_fn).append(records)
+
+
+def bench_registry(workdir, sizes, select=True):
+    """
+    Time starting a session against gangadirs holding each number of jobs in sizes and, if asked for, jobs.select()
+    Args:
+        workdir (str): Directory for the scratch gangadirs
+        sizes (list): Numbers of jobs
+        select (bool): Also time jobs.select() in each of the gangadirs
+    """
+    results = []
+    for size in sizes:
+        gangadir = os.path.join(workdir, 'registry_%s' % size)
+        with Timer() as t:
+            make_gangadir(gangadir, size)
+        logger.info("Created a gangadir with %s jobs in %.1fs" % (size, t.seconds))
+
+        with Timer() as t:
+            start_session(gangadir)
+        try:
+            from GangaCore.GPI import jobs
+            assert len(jobs) == size
+            results.append(result('registry', {'jobs': size}, t.seconds, size))
+            if select:
+                results.extend(bench_select(size))
+        finally:
+            stop_session()
+        shutil.rmtree(gangadir, ignore_errors=True)
+    return results
+
+
+def bench_select(size):
+    """
+    Time jobs.select() on the attributes held in the index, i.e. without loading the jobs
+    Args:
+        size (int): Number of jobs in the registry, used as the parameter of the result
+    """
+    from GangaCore.GPI import jobs
+    results = []
+    for name, attrs in (('status', {'status': 'new'}),
+                        ('backend', {'backend': 'FakeScheduler'}),
+                        ('name', {'name': 'bench*'}),
+                        ('none', {'name': 'no_such_job'})):
+        with Timer() as t:
+            selected = jobs.select(allow_load=False, **attrs)
+        results.append(result('select', {'jobs': size, 'by': name}, t.seconds, size, selected=len(selected)))
+    return results
+
+
+def find_data_files(repository):
+    """ Return the XML data files of all of the objects held under the repository directory """
+    data_files = []
+    for dirpath, dirnames, filenames in os.walk(repository):
+        dirnames.sort()
+        if 'data' in filenames:
+            data_files.append(os.path.join(dirpath, 'data'))
+    return data_files
+
+
+def bench_loader(workdir, sizes, repositories=()):
+    """
+    Time reading XML data files with the Loader and with the FastLoader, each starting without anything cached.
+    Args:
+        workdir (str): Directory for the scratch gangadirs
+        sizes (list): Numbers of subjobs of the jobs which are written and read back
+        repositories (list): Existing repositories whose data files are read as well
+    """
+    results = []
+    gangadir = os.path.join(workdir, 'loader')
+    start_session(gangadir)
+    try:
+        from GangaCore.GPI import Job, Executable, ArgSplitter, FakeScheduler
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Core.GangaRepository import VStreamer
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        sources = []
+        for size in sizes:
+            j = Job(application=Executable(), backend=FakeScheduler(),
+                    splitter=ArgSplitter(args=[[str(i)] for i in range(size)]))
+            j.submit()
+            getRegistry('jobs').flush_all()
+            job_dir = os.path.dirname(getRegistry('jobs').repository.get_fn(stripProxy(j).id))
+            sources.append(({'subjobs': size}, find_data_files(job_dir)))
+        for repository in repositories:
+            sources.append(({'repository': repository}, find_data_files(os.path.expanduser(repository))))
+
+        for parameters, data_files in sources:
+            contents = []
+            for data_file in data_files:
+                with open(data_file) as this_file:
+                    contents.append(this_file.read())
+            for loader in (VStreamer.Loader, VStreamer.FastLoader):
+                VStreamer._cached_eval_strings.clear()
+                VStreamer._cached_values.clear()
+                VStreamer._class_decoders.clear()
+                failed = 0
+                with Timer() as t:
+                    for content in contents:
+                        try:
+                            loader().parse(content)
+                        except Exception as err:
+                            logger.debug("Failed to load a data file: %s" % err)
+                            failed += 1
+                these_parameters = dict(parameters, loader=loader.__name__)
+                results.append(result('loader', these_parameters, t.seconds, len(contents), failed=failed))
+    finally:
+        stop_session()
+    return results
+
+
+def run_benchmarks(benchmarks=BENCHMARKS, sizes=None, workdir=None, repositories=()):
+    """
+    Run the benchmarks and return the report as a dict ready to be written as JSON
+    Args:
+        benchmarks (list): Names of the benchmarks to run
+        sizes (dict): Sizes to run each benchmark with, see DEFAULT_SIZES
+        workdir (str): Directory for the scratch gangadirs, a temporary one is made and removed if not given
+        repositories (list): Existing repositories read by the loader benchmark
+    """
+    from GangaCore import _gangaVersion
+
+    these_sizes = dict(DEFAULT_SIZES)
+    these_sizes.update(sizes or {})
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError("Unknown benchmarks: %s" % ', '.join(sorted(unknown)))
+
+    remove_workdir = workdir is None
+    if workdir is None:
+        workdir = tempfile.mkdtemp(prefix='ganga_benchmarks_')
+
+    report = {
+        'ganga_version': _gangaVersion,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started': datetime.datetime.now().isoformat(),
+        'results': [],
+    }
+    results = report['results']
+    try:
+        if 'submit' in benchmarks or 'monitoring' in benchmarks:
+            submit_results = bench_submit(workdir, these_sizes['submit'], monitoring='monitoring' in benchmarks)
+            results.extend(r for r in submit_results if r['benchmark'] in benchmarks)
+        if 'flush' in benchmarks:
+            results.extend(bench_flush(workdir, these_sizes['flush']))
+        if 'registry' in benchmarks or 'select' in benchmarks:
+            registry_results = bench_registry(workdir, these_sizes['registry'], select='select' in benchmarks)
+            results.extend(r for r in registry_results if r['benchmark'] in benchmarks)
+        if 'loader' in benchmarks:
+            results.extend(bench_loader(workdir, these_sizes['loader'], repositories))
+    finally:
+        if remove_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report['finished'] = datetime.datetime.now().isoformat()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure how Ganga scales with the number of jobs and subjobs')
+    parser.add_argument('--output', '-o', help='File to write the JSON report to, standard output if not given')
+    parser.add_argument('--benchmarks', nargs='+', default=list(BENCHMARKS), choices=BENCHMARKS,
+                        help='Benchmarks to run')
+    parser.add_argument('--quick', action='store_true', help='Use small sizes, for checking the benchmarks work')
+    parser.add_argument('--workdir', help='Directory for the scratch gangadirs, they are kept if this is given')
+    for name in DEFAULT_SIZES:
+        parser.add_argument('--%s-sizes' % name, nargs='+', type=int, dest='%s_sizes' % name,
+                            help='Sizes for the %s benchmark, default %s' % (name, DEFAULT_SIZES[name]))
+    parser.add_argument('--loader-repositories', nargs='+', default=[],
+                        help='Existing repositories, e.g. ~/gangadir/repository, to be read by the loader benchmark')
+    args = parser.parse_args(argv)
+
+    sizes = dict(QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    for name in DEFAULT_SIZES:
+        if getattr(args, '%s_sizes' % name):
+            sizes[name] = getattr(args, '%s_sizes' % name)
+
+    report = run_benchmarks(args.benchmarks, sizes, args.workdir, args.loader_repositories)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
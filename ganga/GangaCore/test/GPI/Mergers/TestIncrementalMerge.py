@@ -0,0 +1,80 @@
+import asyncio
+import os
+import time
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+def run_until_completed(j, timeout=120):
+    """Monitor the subjobs of j until they are all completed, which runs their postprocessors, then update j"""
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    from GangaCore.Lib.Localhost import Localhost
+
+    subjobs = [stripProxy(sj) for sj in j.subjobs]
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        asyncio.run(Localhost.updateMonitoringInformation([sj for sj in subjobs
+                                                           if sj.status in ('submitted', 'running')]))
+        if all(sj.status == 'completed' for sj in subjobs):
+            stripProxy(j).updateMasterJobStatus()
+            return j.status == 'completed'
+        time.sleep(0.5)
+    return False
+
+
+class TestIncrementalMerge(GangaUnitTest):
+
+    def setUp(self):
+        """Make partial merges of two files"""
+        extra_opts = [('PollThread', 'autostart', 'False'), ('Mergers', 'merge_fan_in', '2')]
+        super(TestIncrementalMerge, self).setUp(extra_opts=extra_opts)
+
+    def makeJob(self):
+        from GangaCore.GPI import Job, Executable, Local, ArgSplitter, LocalFile
+
+        j = Job(application=Executable(exe='sh'), backend=Local(),
+                splitter=ArgSplitter(args=[['-c', 'echo "Output from subjob %d." > out.txt' % i] for i in range(5)]))
+        j.outputfiles = [LocalFile('out.txt')]
+        return j
+
+    def test_a_MergeAsSubjobsComplete(self):
+        """ The merge of the subjobs made as they complete has the output of all of them """
+        from GangaCore.GPI import TextMerger
+
+        j = self.makeJob()
+        j.postprocessors = TextMerger(files=['out.txt'], incremental=True)
+        j.submit()
+        assert run_until_completed(j)
+
+        with open(os.path.join(j.outputdir, 'out.txt')) as merged:
+            lines = merged.read().split('\n')
+        assert sorted(line for line in lines if line.startswith('Output')) == \
+            ['Output from subjob %d.' % i for i in range(5)]
+        with open(os.path.join(j.outputdir, 'out.txt.merge_summary')) as summary:
+            assert len([line for line in summary if line.endswith('out.txt\n')]) == 5
+        assert not os.listdir(os.path.join(j.outputdir, '.merge_partials'))
+
+    def test_b_Resume(self):
+        """ The partial merges recorded by a merger are picked up by another one, as in a new session """
+        from GangaCore.GPI import TextMerger
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = self.makeJob()
+        j.submit()
+        assert run_until_completed(j)
+
+        merger = stripProxy(TextMerger(files=['out.txt'], incremental=True))
+        for sj in j.subjobs[:3]:
+            merger.mergeSubjob(stripProxy(sj))
+        partials_dir = merger._partialsDir(stripProxy(j))
+        # the first two subjobs are merged, the third one waits for another
+        assert sorted(os.listdir(partials_dir)) == ['0_out.txt', 'progress']
+
+        new_merger = stripProxy(TextMerger(files=['out.txt'], incremental=True))
+        assert new_merger.mergeIncremental(stripProxy(j))
+
+        with open(os.path.join(j.outputdir, 'out.txt')) as merged:
+            lines = merged.read().split('\n')
+        assert [line for line in lines if line.startswith('Output')] == \
+            ['Output from subjob %d.' % i for i in range(5)]
+        assert not os.path.exists(partials_dir)
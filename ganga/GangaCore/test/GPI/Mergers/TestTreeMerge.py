@@ -0,0 +1,67 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+class TestTreeMerge(GangaUnitTest):
+
+    def setUp(self):
+        """Merge at most two files per step"""
+        extra_opts = [('Mergers', 'merge_fan_in', '2'), ('Mergers', 'merge_workers', '3')]
+        super(TestTreeMerge, self).setUp(extra_opts=extra_opts)
+        self.tmpdir = tempfile.mkdtemp()
+        self.file_list = []
+        for i in range(7):
+            file_name = os.path.join(self.tmpdir, 'in%d.txt' % i)
+            with open(file_name, 'w') as in_file:
+                in_file.write('line of file %d\n' % i)
+            self.file_list.append(file_name)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        super(TestTreeMerge, self).tearDown()
+
+    def test_a_TreeMerge(self):
+        """ The files are merged in steps of at most fan_in files and in order """
+        from GangaCore.Lib.Mergers.Merger import treeMerge
+
+        steps = []
+
+        def cat(files, output):
+            steps.append(len(files))
+            with open(output, 'w') as out_file:
+                for f in files:
+                    with open(f) as in_file:
+                        out_file.write(in_file.read())
+
+        output_file = os.path.join(self.tmpdir, 'out.txt')
+        treeMerge(cat, self.file_list, output_file)
+
+        with open(output_file) as out_file:
+            assert out_file.read() == ''.join('line of file %d\n' % i for i in range(7))
+        assert max(steps) == 2
+        # 7 -> 4 -> 2 -> 1 files, the intermediate ones are gone
+        assert len(steps) == 4 + 2 + 1
+        assert sorted(os.listdir(self.tmpdir)) == sorted(['out.txt'] + ['in%d.txt' % i for i in range(7)])
+
+    def test_b_TextMergerParts(self):
+        """ The text merger gives the same files whether or not they are compressed and made of several parts """
+        from GangaCore.GPI import TextMerger
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        stripProxy(TextMerger()).mergefiles(self.file_list, os.path.join(self.tmpdir, 'out.txt'))
+        stripProxy(TextMerger(compress=True)).mergefiles(self.file_list, os.path.join(self.tmpdir, 'out.txt'))
+
+        with open(os.path.join(self.tmpdir, 'out.txt')) as out_file:
+            text = out_file.read()
+        with gzip.open(os.path.join(self.tmpdir, 'out.txt.gz'), 'rt') as out_file:
+            assert out_file.read().split('\n')[1:] == text.split('\n')[1:]
+
+        lines = text.split('\n')
+        assert lines[0].startswith('# Ganga TextMergeTool')
+        for i, f in enumerate(self.file_list):
+            assert lines[1 + 3 * i:4 + 3 * i] == ['# Start of file %s #' % f, 'line of file %d' % i, '']
+        assert lines[-2:] == ['# Ganga Merge Ended Successfully #', '']
@@ -0,0 +1,65 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+class TestActiveJobIndex(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the monitoring doesn't change the job status behind our back and that jobs persist"""
+        extra_opts = [('PollThread', 'autostart', 'False'), ('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestActiveJobIndex, self).setUp(extra_opts=extra_opts)
+
+    def test_a_SubmitAddsToIndex(self):
+        from GangaCore.GPI import Job
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        reg = getRegistry('jobs')
+        j = Job()
+        assert reg.getActiveJobIds() == {}
+
+        j.submit()
+        assert j.status == 'submitted'
+        assert reg.getActiveJobIds() == {'Local': [j.id]}
+
+    def test_b_IndexRebuiltOnStartup(self):
+        from GangaCore.GPI import jobs
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        assert getRegistry('jobs').getActiveJobIds() == {'Local': [jobs(0).id]}
+
+    def test_c_FinalStatusRemovesFromIndex(self):
+        from GangaCore.GPI import Job
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        reg = getRegistry('jobs')
+        j = Job()
+        j.submit()
+        assert j.id in reg.getActiveJobIds()['Local']
+
+        j.force_status('failed', force=True)
+        assert j.id not in reg.getActiveJobIds().get('Local', [])
+
+    def test_d_RemoveDropsFromIndex(self):
+        from GangaCore.GPI import Job
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        reg = getRegistry('jobs')
+        j = Job()
+        j.submit()
+        assert j.id in reg.getActiveJobIds()['Local']
+
+        this_id = j.id
+        j.remove()
+        assert this_id not in reg.getActiveJobIds().get('Local', [])
+
+    def test_e_SubmittingIsActive(self):
+        from GangaCore.GPI import Job
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        reg = getRegistry('jobs')
+        j = Job()
+        stripProxy(j).updateStatus('submitting')
+        assert j.id in reg.getActiveJobIds()['Local']
+
+        j.force_status('failed', force=True)
+        assert j.id not in reg.getActiveJobIds().get('Local', [])
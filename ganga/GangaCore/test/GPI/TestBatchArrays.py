@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+num_subjobs = 3
+
+# Stands in for sbatch: runs every task of the job array in turn and replies as sbatch does
+FAKE_SBATCH = """
+import os, subprocess, sys
+args = sys.argv[1:]
+if os.path.exists(os.path.join(os.path.dirname(sys.argv[0]), 'fail')):
+    print('sbatch: error: Batch job submission failed')
+    sys.exit(1)
+first, last = [int(i) for i in [a for a in args if a.startswith('--array=')][0][len('--array='):].split('-')]
+for index in range(first, last + 1):
+    env = dict(os.environ, SLURM_ARRAY_TASK_ID=str(index), SLURM_JOB_ID=str(5000 + index))
+    subprocess.call([sys.executable] + args[-1:], env=env)
+print('Submitted batch job 4242')
+"""
+
+
+class TestBatchArrays(GangaUnitTest):
+
+    def setUp(self):
+        """Submit Slurm jobs through a fake sbatch"""
+        self.fake_dir = tempfile.mkdtemp()
+        fake_sbatch = os.path.join(self.fake_dir, 'sbatch.py')
+        with open(fake_sbatch, 'w') as fake_file:
+            fake_file.write(FAKE_SBATCH)
+        extra_opts = [('PollThread', 'autostart', 'False'),
+                      ('Slurm', 'submit_str', 'cd %%s; %s %s %%s %%s %%s %%s' % (sys.executable, fake_sbatch)),
+                      ('Slurm', 'shared_python_executable', 'True'),
+                      ('Slurm', 'heartbeat_frequency', '1')]
+        super(TestBatchArrays, self).setUp(extra_opts=extra_opts)
+
+    def test_a_SubmitArray(self):
+        """ The subjobs are submitted as one job array and each runs its own job script """
+        from GangaCore.GPI import Job, Executable, ArgSplitter, Slurm
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = Job(application=Executable(exe='echo'), backend=Slurm(),
+                splitter=ArgSplitter(args=[['arg%s' % i] for i in range(num_subjobs)]))
+        j.submit()
+
+        assert [sj.backend.id for sj in j.subjobs] == ['4242_%s' % i for i in range(num_subjobs)]
+        # the fake sbatch has run the whole array by the time it replies
+        stripProxy(j.backend).updateMonitoringInformation([stripProxy(sj) for sj in j.subjobs])
+        stripProxy(j).updateMasterJobStatus()
+        assert j.status == 'completed'
+        for i, sj in enumerate(j.subjobs):
+            # the id given at submission is kept once the job is running
+            assert sj.backend.id == '4242_%s' % i
+            with open(os.path.join(sj.outputdir, 'stdout')) as stdout:
+                assert 'arg%s\n' % i in stdout.read()
+
+    def test_b_FailedArray(self):
+        """ If the submission of the job array fails none of the subjobs is submitted """
+        from GangaCore.GPI import Job, Executable, ArgSplitter, Slurm
+        from GangaCore.GPIDev.Lib.Job.Job import JobError
+
+        open(os.path.join(self.fake_dir, 'fail'), 'w').close()
+        j = Job(application=Executable(exe='echo'), backend=Slurm(),
+                splitter=ArgSplitter(args=[['arg%s' % i] for i in range(num_subjobs)]))
+        try:
+            j.submit()
+        except JobError:
+            pass
+        assert j.status in ('new', 'failed')
+        assert all(sj.status == 'new' for sj in j.subjobs)
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+num_subjobs = 3
+
+# Stands in for sbatch: the job array is accepted but never runs
+FAKE_SBATCH = """
+print('Submitted batch job 4242')
+"""
+
+# Stands in for squeue: replies with the content of the 'states' file next to it and counts the queries
+FAKE_SQUEUE = """
+import os, sys
+fake_dir = os.path.dirname(sys.argv[0])
+with open(os.path.join(fake_dir, 'queries'), 'a') as queries:
+    queries.write('.')
+with open(os.path.join(fake_dir, 'states')) as states:
+    print(states.read())
+"""
+
+
+class TestBatchStatus(GangaUnitTest):
+
+    def setUp(self):
+        """Monitor Slurm jobs through a fake squeue"""
+        self.fake_dir = tempfile.mkdtemp()
+        fakes = {}
+        for name, script in (('sbatch', FAKE_SBATCH), ('squeue', FAKE_SQUEUE)):
+            fakes[name] = os.path.join(self.fake_dir, name + '.py')
+            with open(fakes[name], 'w') as fake_file:
+                fake_file.write(script)
+        extra_opts = [('PollThread', 'autostart', 'False'),
+                      ('Slurm', 'submit_str', 'cd %%s; %s %s %%s %%s %%s %%s' % (sys.executable, fakes['sbatch'])),
+                      ('Slurm', 'bulk_status', 'True'),
+                      ('Slurm', 'status_str', '%s %s' % (sys.executable, fakes['squeue']))]
+        super(TestBatchStatus, self).setUp(extra_opts=extra_opts)
+
+    def test_a_BulkStatus(self):
+        """ The states of all the subjobs come from one query, the status files are only read for finished jobs """
+        from GangaCore.GPI import Job, Executable, ArgSplitter, Slurm
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = Job(application=Executable(exe='echo'), backend=Slurm(),
+                splitter=ArgSplitter(args=[['arg%s' % i] for i in range(num_subjobs)]))
+        j.submit()
+
+        with open(os.path.join(self.fake_dir, 'states'), 'w') as states:
+            states.write('4242_0 PD\n4242_1 R\n4200 R\n')
+        # a status file which would finish subjob 0 is left alone while the batch system has it queued
+        for i in (0, 2):
+            with open(os.path.join(j.subjobs[i].outputdir, '__jobstatus__'), 'w') as status_file:
+                status_file.write('PID: 1\nQUEUE: debug\nEXITCODE: 0\n')
+
+        subjobs = [stripProxy(sj) for sj in j.subjobs]
+        for _ in range(2):
+            stripProxy(j.backend).updateMonitoringInformation(subjobs)
+        assert [sj.status for sj in j.subjobs] == ['submitted', 'running', 'completed']
+        assert j.subjobs[2].backend.actualqueue == 'debug'
+
+        with open(os.path.join(self.fake_dir, 'queries')) as queries:
+            assert queries.read() == '.'
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import time
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+# prints when it starts then takes a while
+timed_args = ['-c', 'date +%s.%N; sleep 2']
+
+
+def update_until(jobs, states, timeout=60):
+    """Monitor the (sub)jobs until all of them are in one of states, return if they got there"""
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    from GangaCore.Lib.Localhost import Localhost
+
+    jobs = [stripProxy(j) for j in jobs]
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        asyncio.run(Localhost.updateMonitoringInformation([j for j in jobs if j.status in ('submitted', 'running')]))
+        if all(j.status in states for j in jobs):
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def start_time(j):
+    with open(os.path.join(j.outputdir, 'stdout')) as stdout:
+        return float(stdout.read().split()[0])
+
+
+class TestLocalExecutor(GangaUnitTest):
+
+    def setUp(self):
+        """Run the Local jobs through an executor with one slot"""
+        extra_opts = [('PollThread', 'autostart', 'False'), ('Local', 'executor', 'True'),
+                      ('Local', 'executor_slots', '1')]
+        super(TestLocalExecutor, self).setUp(extra_opts=extra_opts)
+
+    def test_a_SlotsAndPriority(self):
+        """ The jobs run one at a time and the job of higher priority overtakes the ones queued before it """
+        from GangaCore.GPI import Job, Executable, ArgSplitter, Local, localExecutorStatus
+
+        j = Job(application=Executable(exe='sh'), backend=Local(),
+                splitter=ArgSplitter(args=[timed_args] * 3))
+        j.submit()
+        urgent = Job(application=Executable(exe='sh', args=timed_args), backend=Local(priority=10))
+        urgent.submit()
+
+        # the executor started by the first submission may take a moment to come up
+        end_time = time.time() + 10
+        status = localExecutorStatus()
+        while not (status['active'] and status['slots']) and time.time() < end_time:
+            time.sleep(0.1)
+            status = localExecutorStatus()
+        assert status['active'] and status['slots'] == 1
+        assert status['running'] + status['queued'] >= 2
+        assert status['utilisation'] <= 1.
+
+        assert update_until(list(j.subjobs) + [urgent], ['completed'])
+        starts = sorted([start_time(sj) for sj in j.subjobs] + [start_time(urgent)])
+        # one slot: each job starts once the one before it is over
+        assert all(later - earlier >= 1.9 for earlier, later in zip(starts, starts[1:]))
+        # the first subjob may have started already, the others wait for the urgent job
+        assert start_time(urgent) < start_time(j.subjobs[2])
+
+    def test_b_KillQueued(self):
+        """ Killing a job still in the queue of the executor takes it off the queue """
+        from GangaCore.GPI import Job, Executable, Local, localExecutorStatus
+
+        first = Job(application=Executable(exe='sh', args=timed_args), backend=Local())
+        first.submit()
+        second = Job(application=Executable(exe='sh', args=timed_args), backend=Local())
+        second.submit()
+        second.kill()
+        assert second.status == 'killed'
+
+        assert update_until([first], ['completed'])
+        assert localExecutorStatus()['queued'] == 0
+        assert not os.path.exists(os.path.join(second.outputdir, '__jobstatus__'))
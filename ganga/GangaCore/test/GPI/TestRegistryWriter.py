@@ -0,0 +1,48 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+class TestRegistryWriter(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the monitoring doesn't write the jobs behind our back"""
+        extra_opts = [('PollThread', 'autostart', 'False'), ('Registry', 'AsyncFlushDelay', 0.1)]
+        super(TestRegistryWriter, self).setUp(extra_opts=extra_opts)
+
+    def test_a_ScheduledFlushIsWritten(self):
+        from GangaCore.GPI import Job
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        reg = getRegistry('jobs')
+        j = stripProxy(Job())
+        reg._flush([j])
+        j.name = 'written_by_the_writer'
+        assert j._dirty
+
+        reg._schedule_flush([j])
+        reg.write_thread.barrier()
+        assert not j._dirty
+        with open(reg.repository.get_fn(j.id)) as data_file:
+            assert 'written_by_the_writer' in data_file.read()
+
+    def test_b_RepeatedChangesAreCoalesced(self):
+        from GangaCore.GPI import Job
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        reg = getRegistry('jobs')
+        j = stripProxy(Job())
+        writer = reg.write_thread
+
+        # Holding the condition stops the writer from taking the queue
+        with writer._cond:
+            for i in range(10):
+                j.name = 'change_%s' % i
+                reg._schedule_flush([j])
+            assert len(writer._pending) == 1
+
+        reg.flush_all()
+        assert not writer._pending
+        assert not j._dirty
+        with open(reg.repository.get_fn(j.id)) as data_file:
+            assert 'change_9' in data_file.read()
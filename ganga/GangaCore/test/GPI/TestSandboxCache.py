@@ -0,0 +1,59 @@
+import glob
+import os
+import tempfile
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+def packed_sandboxes(j):
+    """The inodes of the packed input sandboxes (of the job and of its master) in the input workspace of a job"""
+    return set(os.stat(tgz).st_ino for tgz in glob.glob(os.path.join(j.inputdir, '_input_sandbox_*.tgz')))
+
+
+class TestSandboxCache(GangaUnitTest):
+
+    def setUp(self):
+        extra_opts = [('PollThread', 'autostart', 'False')]
+        super(TestSandboxCache, self).setUp(extra_opts=extra_opts)
+
+    def test_a_SharedSandbox(self):
+        """ Jobs with the same input files share one tarball, which is removed with the last of them """
+        from GangaCore.GPI import Job, Executable, LocalFile
+        from GangaCore.Core.Sandbox import getSandboxCachePath
+        from GangaTest.Framework.utils import sleep_until_completed
+
+        input_file = tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False)
+        input_file.write('some input')
+        input_file.close()
+
+        jobs = []
+        cached = []
+        for i in range(2):
+            j = Job(application=Executable(exe='cat', args=[os.path.basename(input_file.name)]),
+                    inputfiles=[LocalFile(input_file.name)])
+            j.submit()
+            jobs.append(j)
+            cached.append(set(os.listdir(getSandboxCachePath())))
+
+        assert cached[0] and cached[0] == cached[1]
+        assert packed_sandboxes(jobs[0]) == packed_sandboxes(jobs[1])
+        assert packed_sandboxes(jobs[0]) == set(os.stat(os.path.join(getSandboxCachePath(), name)).st_ino
+                                                for name in cached[0])
+
+        # a job with other input files gets a tarball of its own
+        other_file = tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False)
+        other_file.write('other input')
+        other_file.close()
+        other = Job(application=Executable(exe='cat', args=[os.path.basename(other_file.name)]),
+                    inputfiles=[LocalFile(other_file.name)])
+        other.submit()
+        assert packed_sandboxes(other) - packed_sandboxes(jobs[0])
+        assert len(os.listdir(getSandboxCachePath())) > len(cached[0])
+
+        for j in jobs + [other]:
+            assert sleep_until_completed(j, 60), 'Timeout on completing job'
+        jobs[0].remove()
+        assert cached[0] <= set(os.listdir(getSandboxCachePath()))
+        jobs[1].remove()
+        other.remove()
+        assert not cached[0] & set(os.listdir(getSandboxCachePath()))
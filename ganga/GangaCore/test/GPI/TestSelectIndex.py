@@ -0,0 +1,45 @@
+import pytest
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+class TestSelectIndex(GangaUnitTest):
+
+    def setUp(self):
+        """Keep the jobs between the tests so that the second test sees them unloaded"""
+        extra_opts = [('PollThread', 'autostart', 'False'), ('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestSelectIndex, self).setUp(extra_opts=extra_opts)
+
+    def test_a_CreateJobs(self):
+        from GangaCore.GPI import Job, Executable, Local, Interactive, jobs
+
+        Job(application=Executable(), backend=Local(), name='local_job')
+        Job(application=Executable(), backend=Interactive(), name='interactive_job')
+        assert len(jobs) == 2
+
+    def test_b_SelectFromIndex(self):
+        from GangaCore.GPI import jobs, Local
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Core.exceptions import GangaException
+
+        def loaded():
+            return [j.id for j in jobs if not stripProxy(j)._should_load]
+
+        assert loaded() == []
+
+        s = jobs.select(backend=Local, allow_load=False)
+        assert s.ids() == [0]
+        s = jobs.select(backend='Interactive', name='*job', allow_load=False)
+        assert s.ids() == [1]
+        assert len(jobs.select(application='Executable', status='new', allow_load=False)) == 2
+        assert loaded() == []
+
+        # The index can't answer this, so the jobs have to be loaded
+        with pytest.raises(GangaException):
+            jobs.select(parallel_submit=True, allow_load=False)
+        assert loaded() == []
+
+        assert len(jobs.select(parallel_submit=True)) == 2
+        assert loaded() == [0, 1]
+
+        jobs.remove()
@@ -0,0 +1,73 @@
+from os import path
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+num_subjobs = 5
+
+
+def subjobFiles(j):
+    """ Return the content of the data files of the subjobs of j """
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    job_dir = path.dirname(stripProxy(j)._getRegistry().repository.get_fn(j.id))
+    contents = []
+    for sj in j.subjobs:
+        with open(path.join(job_dir, str(sj.id), 'data')) as data_file:
+            contents.append(data_file.read())
+    return job_dir, contents
+
+
+class TestSubJobDeltaStorage(GangaUnitTest):
+
+    def setUp(self):
+        """Keep the jobs between the tests so the subjobs are read back from disk"""
+        extra_opts = [('PollThread', 'autostart', 'False'), ('TestingFramework', 'AutoCleanup', 'False'),
+                      ('Registry', 'SubJobDeltaStorage', 'True')]
+        super(TestSubJobDeltaStorage, self).setUp(extra_opts=extra_opts)
+
+    def test_a_Submit(self):
+        """ Subjobs are written as deltas to the template of their master """
+        from GangaCore.GPI import Job, Executable, ArgSplitter, FakeScheduler
+        from GangaCore.Core.GangaRepository.DeltaStreamer import TEMPLATE_FILE_NAME, is_delta
+
+        j = Job(application=Executable(exe='echo'), backend=FakeScheduler(),
+                splitter=ArgSplitter(args=[['arg%s' % i] for i in range(num_subjobs)]))
+        j.submit()
+        assert len(j.subjobs) == num_subjobs
+
+        job_dir, contents = subjobFiles(j)
+        assert path.isfile(path.join(job_dir, TEMPLATE_FILE_NAME))
+        assert all(is_delta(content) for content in contents)
+
+    def test_b_Load(self):
+        """ Subjobs come back from their deltas and are written in full once the master has changed """
+        from GangaCore.GPI import jobs
+        from GangaCore.Core.GangaRepository import getRegistry
+        from GangaCore.Core.GangaRepository.DeltaStreamer import is_delta
+
+        j = jobs(0)
+        for i, sj in enumerate(j.subjobs):
+            assert sj.application.args == ['arg%s' % i]
+            assert sj.application.exe == 'echo'
+            assert sj.backend.id > 0
+
+        # The template made in the previous session still matches the master
+        j.subjobs(0).comment = 'changed subjob'
+        getRegistry('jobs').flush_all()
+        job_dir, contents = subjobFiles(j)
+        assert all(is_delta(content) for content in contents)
+
+        j.comment = 'changed after submission'
+        j.subjobs(1).comment = 'changed subjob'
+        getRegistry('jobs').flush_all()
+        job_dir, contents = subjobFiles(j)
+        assert not any(is_delta(content) for content in contents)
+
+    def test_c_LoadFull(self):
+        """ Subjobs written in full after the change of the master come back """
+        from GangaCore.GPI import jobs
+
+        j = jobs(0)
+        assert j.comment == 'changed after submission'
+        assert [sj.comment for sj in j.subjobs] == ['changed subjob'] * 2 + [''] * (num_subjobs - 2)
+        assert [sj.application.args for sj in j.subjobs] == [['arg%s' % i] for i in range(num_subjobs)]
+        jobs.remove()
@@ -93,3 +93,27 @@ class TestSubjobs(GangaUnitTest):
         assert sleep_until_completed(j, 60)
         runtime = j.time.timestamps['backend_final'] - j.time.timestamps['backend_running']
         assert runtime < datetime.timedelta(seconds=int(nsubjobs * sleeptime / batch + 10))
+
+    def testSubJobStatusCounts(self):
+        """
+        Check that the subjob status histogram of the master follows the subjobs
+        """
+        from GangaCore.GPI import Job, ArgSplitter, Local, Executable
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        j = Job(splitter=ArgSplitter(args=[['400'] for _ in range(4)]),
+                application=Executable(exe='sleep'),
+                backend=Local())
+        j.submit()
+
+        raw_j = stripProxy(j)
+        assert sum(raw_j.getSubJobStatusCounts().values()) == 4
+
+        j.subjobs(0).kill()
+        counts = raw_j.getSubJobStatusCounts()
+        assert counts['killed'] == 1
+        assert sum(counts.values()) == 4
+        assert raw_j._getRegistry().getIndexCache(raw_j)['subjobs:status_counts'] == counts
+
+        j.kill()
+        assert raw_j.getSubJobStatusCounts() == {'killed': 4}
+        assert j.returnSubjobStatuses() == '0/4/0/0'
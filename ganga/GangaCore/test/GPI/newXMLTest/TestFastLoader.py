@@ -0,0 +1,92 @@
+from io import StringIO
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+def objectGraph(obj, parents=None):
+    """
+    Return a comparable description of everything a loader has built: classes, schema data, parents and flags
+    Args:
+        obj (unknown): Object returned by the loader or any value found inside it
+        parents (dict): id of each enclosing object -> its depth, used to describe the parents by position
+    """
+    from GangaCore.GPIDev.Base.Objects import Node
+    parents = parents or {}
+    if isinstance(obj, Node):
+        parent = obj._getParent()
+        inner = dict(parents)
+        inner[id(obj)] = len(parents)
+        flags = {k: getattr(obj, k, None) for k in ('_dirty', '_is_a_ref', '_registry', '_index_cache_dict')}
+        return (type(obj), flags, parents.get(id(parent), parent is not None),
+                {k: objectGraph(v, inner) for k, v in obj._data.items()})
+    if isinstance(obj, (list, tuple)):
+        return (type(obj), [objectGraph(v, parents) for v in obj])
+    if isinstance(obj, dict):
+        return (type(obj), {k: objectGraph(v, parents) for k, v in obj.items()})
+    return (type(obj), obj)
+
+
+class TestFastLoader(GangaUnitTest):
+
+    def toXML(self, obj):
+        """ Return the XML written for obj """
+        from GangaCore.Core.GangaRepository.VStreamer import to_file
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        xml = StringIO()
+        to_file(stripProxy(obj), xml)
+        return xml.getvalue()
+
+    def assertLoadersAgree(self, xml):
+        """ Load the XML with both loaders and check they give the same objects and errors """
+        from GangaCore.Core.GangaRepository.VStreamer import Loader, FastLoader
+        obj, errors = Loader().parse(xml)
+        fast_obj, fast_errors = FastLoader().parse(xml)
+        assert objectGraph(fast_obj) == objectGraph(obj)
+        assert [(type(e), str(e)) for e in fast_errors] == [(type(e), str(e)) for e in errors]
+        return fast_obj, fast_errors
+
+    def test_a_SameObjects(self):
+        """ The FastLoader loads the same objects as the Loader """
+        from GangaCore.GPI import Job, Executable, ArgSplitter, LocalFile, GangaList
+
+        j = Job(name='<&> "quoted" \'name\'', comment='café')
+        j.application = Executable(exe='echo', args=['a', 1, ['nested', 2.5]], env={'A': '1', 'B': ''})
+        j.inputfiles = [LocalFile('a.txt'), LocalFile('b.txt')]
+        nested = GangaList()
+        for i in range(3):
+            nested.append([LocalFile('%s.txt' % i)])
+        j.splitter = ArgSplitter(args=nested)
+
+        xml = self.toXML(j)
+        # Load it twice so the second time the values come from the cache
+        for i in range(2):
+            loaded, errors = self.assertLoadersAgree(xml)
+            assert not errors
+            assert loaded.name == j.name
+            assert loaded.application.env == {'A': '1', 'B': ''}
+
+    def test_b_IndependentValues(self):
+        """ Mutable values are not shared between loaded objects """
+        from GangaCore.GPI import Job, Executable
+        from GangaCore.Core.GangaRepository.VStreamer import FastLoader
+
+        xml = self.toXML(Job(application=Executable(env={'A': '1'})))
+        first = FastLoader().parse(xml)[0]
+        second = FastLoader().parse(xml)[0]
+        first.application.env['A'] = '2'
+        first.time.timestamps.clear()
+        assert second.application.env == {'A': '1'}
+        assert 'new' in second.time.timestamps
+
+    def test_c_SameErrors(self):
+        """ Unknown classes and incompatible schemas are reported as the Loader reports them """
+        from GangaCore.GPI import Job, LocalFile
+
+        xml = self.toXML(Job(inputfiles=[LocalFile('a.txt')]))
+        unknown = xml.replace('<class name="LocalFile"', '<class name="NoSuchFile"')
+        loaded, errors = self.assertLoadersAgree(unknown)
+        assert len(errors) == 1
+
+        incompatible = xml.replace('<class name="Executable" version="2.0"', '<class name="Executable" version="99.0"')
+        loaded, errors = self.assertLoadersAgree(incompatible)
+        assert len(errors) == 1
@@ -6,7 +6,7 @@ from os import path, stat, unlink
 
 import time
 
-from .utilFunctions import getJobsPath, getXMLDir, getXMLFile, getSJXMLFile, getSJXMLIndex, getIndexFile
+from .utilFunctions import getJobsPath, getXMLDir, getXMLFile, getSJXMLFile, getSJXMLIndex, getIndexFile, getIndexRecord
 
 testStr = "testFooString"
 testArgs = [[1], [2], [3], [4], [5]]
@@ -225,28 +225,27 @@ class TestSJXMLGenAndLoad(GangaUnitTest):
 
         assert path.isfile(getIndexFile(j))
 
-        with open(getIndexFile(j), 'rb') as handler:
-            obj, errs = from_file(handler)
+        obj = getIndexRecord(j)
 
-            assert isinstance(obj, tuple)
+        assert isinstance(obj, tuple)
 
-            from GangaCore.GPIDev.Base.Proxy import stripProxy, getName
-            raw_j = stripProxy(j)
-            index_cache = raw_j._getRegistry().getIndexCache(raw_j)
-            assert isinstance(index_cache, dict)
+        from GangaCore.GPIDev.Base.Proxy import stripProxy, getName
+        raw_j = stripProxy(j)
+        index_cache = raw_j._getRegistry().getIndexCache(raw_j)
+        assert isinstance(index_cache, dict)
 
-            index_cls = getName(raw_j)
-            index_cat = raw_j._category
-            this_index_cache = (index_cat, index_cls, index_cache)
+        index_cls = getName(raw_j)
+        index_cat = raw_j._category
+        this_index_cache = (index_cat, index_cls, index_cache)
 
-            print(("just-built index: %s" % str(this_index_cache)))
-            print(("from disk: %s" % str(obj)))
+        print(("just-built index: %s" % str(this_index_cache)))
+        print(("from disk: %s" % str(obj)))
 
-            assert this_index_cache == obj
+        assert this_index_cache == obj
 
     def test_i_testSJXMLIndex(self):
         # Check index of all sj
-        from GangaCore.Core.GangaRepository.PickleStreamer import to_file, from_file
+        from GangaCore.Core.GangaRepository.SubJobIndex import SubJobIndex
 
         from GangaCore.GPI import jobs
 
@@ -255,7 +254,7 @@ class TestSJXMLGenAndLoad(GangaUnitTest):
         j = jobs(0)
 
         with open(getSJXMLIndex(j), 'rb') as handler:
-            obj, errs = from_file(handler)
+            obj = SubJobIndex.read(handler).rows()
 
             assert isinstance(obj, dict)
 
@@ -6,7 +6,7 @@ from os import path, stat, unlink
 
 import time
 
-from .utilFunctions import getJobsPath, getXMLDir, getXMLFile, getIndexFile
+from .utilFunctions import getJobsPath, getXMLDir, getXMLFile, getIndexFile, getIndexRecord
 
 testStr = "testFooString"
 
@@ -167,26 +167,23 @@ class TestXMLGenAndLoad(GangaUnitTest):
 
     def test_f_testXMLIndex(self):
         # Check XML Index content
-        from GangaCore.Core.GangaRepository.PickleStreamer import to_file, from_file
-
         from GangaCore.GPI import jobs
 
         j = jobs(0)
 
         assert path.isfile(getIndexFile(j))
 
-        with open(getIndexFile(j), 'rb') as handler:
-            obj, errs = from_file(handler)
+        obj = getIndexRecord(j)
 
-            assert isinstance(obj, tuple)
+        assert isinstance(obj, tuple)
 
-            from GangaCore.GPIDev.Base.Proxy import stripProxy, getName
-            raw_j = stripProxy(j)
-            index_cache = raw_j._getRegistry().getIndexCache(raw_j)
-            assert isinstance(index_cache, dict)
+        from GangaCore.GPIDev.Base.Proxy import stripProxy, getName
+        raw_j = stripProxy(j)
+        index_cache = raw_j._getRegistry().getIndexCache(raw_j)
+        assert isinstance(index_cache, dict)
 
-            index_cls = getName(raw_j)
-            index_cat = raw_j._category
-            this_index_cache = (index_cat, index_cls, index_cache)
+        index_cls = getName(raw_j)
+        index_cat = raw_j._category
+        this_index_cache = (index_cat, index_cls, index_cache)
 
-            assert this_index_cache == obj
+        assert this_index_cache == obj
@@ -64,8 +64,26 @@ def getSJXMLFile(this_sj):
 
 
 def getIndexFile(this_job):
-    """ Returns the path of the index file for a given job (Job or id) within the jobs repo
+    """ Returns the path of the index log holding the index record of a given job (Job or id) within the jobs repo
     Args:
         this_job (Job, int): The Job or Job_ID of interest
     """
-    return path.join(getXMLDir(this_job), '../%s.index' % str(this_job.id))
+    return path.join(getJobsPath(), 'index.log')
+
+
+def getIndexRecord(this_job):
+    """ Returns the (category, class, cache) index record of a given job (Job or id) as found on disk
+    Args:
+        this_job (Job, int): The Job or Job_ID of interest
+    """
+    from GangaCore.Core.GangaRepository.IndexStore import IndexStore
+    if not isinstance(this_job, int):
+        _id = this_job.id
+    else:
+        _id = this_job
+    store = IndexStore(getIndexFile(_id))
+    store.read()
+    record = store.get(_id)
+    if record is None:
+        return None
+    return record[1:]
@@ -0,0 +1,39 @@
+import pytest
+
+from GangaCore.Core.GangaRepository.DeltaStreamer import SubJobTemplate, is_delta
+from GangaCore.Core.GangaRepository.VStreamer import XMLFileError
+
+
+def make_xml(job_id, args, lines=50):
+    """A stand-in for the XML of a job, with lines that differ between jobs in the middle"""
+    body = ['    <value>%s</value>\n' % i for i in range(lines)]
+    body[lines // 2] = '    <value>%s %s</value>\n' % (job_id, args)
+    return '<root>\n' + ''.join(body) + '</root>\n\n'
+
+
+def test_delta_round_trip(tmpdir):
+    """Subjobs come back identical from their deltas, including the text at the end of the file"""
+    template = SubJobTemplate(make_xml(-1, 'master'))
+    for text in (make_xml(1, 'a'), make_xml(2, 'b') + 'no newline', make_xml(3, 'c').replace('\n', '\r\n', 1)):
+        delta = template.delta(text)
+        assert is_delta(delta)
+        assert len(delta) < len(text) / 2
+        assert template.apply(delta) == text
+
+    template.save(str(tmpdir))
+    loaded = SubJobTemplate.load(str(tmpdir))
+    assert loaded.digest == template.digest
+    assert SubJobTemplate.load(str(tmpdir.join('missing'))) is None
+    # The template of a job is never replaced
+    with pytest.raises(OSError):
+        SubJobTemplate(make_xml(-1, 'other')).save(str(tmpdir))
+
+
+def test_delta_fallback():
+    """Nothing is gained for XML unlike the template and deltas can only be read with their own template"""
+    template = SubJobTemplate(make_xml(-1, 'master'))
+    assert template.delta('<root>\n' + 'something else\n' * 50 + '</root>\n') is None
+
+    delta = template.delta(make_xml(1, 'a'))
+    with pytest.raises(XMLFileError):
+        SubJobTemplate(make_xml(-1, 'changed')).apply(delta)
@@ -0,0 +1,87 @@
+import os
+
+from GangaCore.Core.GangaRepository.IndexStore import IndexStore
+
+
+def test_index_store_roundtrip(tmpdir):
+    """Records written to the log can be read back by a new store"""
+    fn = str(tmpdir.join('index.log'))
+    store = IndexStore(fn)
+    store.put(1, 10., 'jobs', 'Job', {'status': 'new'})
+    store.append([(2, 11., 'jobs', 'Job', {'status': 'running'}), (1, 12., 'jobs', 'Job', {'status': 'submitted'})])
+    store.remove(2)
+
+    assert store.get(1) == (12., 'jobs', 'Job', {'status': 'submitted'})
+    assert 2 not in store
+
+    other = IndexStore(fn)
+    assert other.read() == {1, 2}
+    assert other.items() == store.items()
+
+
+def test_index_store_sees_other_appends(tmpdir):
+    """A store only parses what has been appended since its last read"""
+    fn = str(tmpdir.join('index.log'))
+    reader = IndexStore(fn)
+    writer = IndexStore(fn)
+    writer.put(1, 10., 'jobs', 'Job', {})
+    assert reader.read() == {1}
+    assert reader.read() == set()
+    writer.put(2, 11., 'jobs', 'Job', {})
+    assert reader.read() == {2}
+    assert len(reader) == 2
+
+
+def test_index_store_survives_torn_record(tmpdir):
+    """A partially written record doesn't lose the records around it"""
+    fn = str(tmpdir.join('index.log'))
+    store = IndexStore(fn)
+    store.put(1, 10., 'jobs', 'Job', {'status': 'new'})
+    with open(fn, 'ab') as f:
+        with open(fn, 'rb') as f_in:
+            f.write(f_in.read()[:-5])
+
+    other = IndexStore(fn)
+    other.read()
+    assert other.get(1) == (10., 'jobs', 'Job', {'status': 'new'})
+
+    other.put(2, 11., 'jobs', 'Job', {'status': 'new'})
+    third = IndexStore(fn)
+    third.read()
+    assert sorted(dict(third.items())) == [1, 2]
+
+
+def test_index_store_compaction(tmpdir):
+    """Compaction keeps only the latest record of the live objects"""
+    fn = str(tmpdir.join('index.log'))
+    store = IndexStore(fn, compact_min_records=10)
+    for i in range(20):
+        store.put(i % 3, float(i), 'jobs', 'Job', {'n': i})
+    assert store.needs_compaction()
+
+    reader = IndexStore(fn)
+    reader.read()
+    size_before = os.stat(fn).st_size
+    store.compact(live_ids=[0, 1])
+    assert os.stat(fn).st_size < size_before
+    assert not store.needs_compaction()
+    assert sorted(dict(store.items())) == [0, 1]
+    assert store.get(1) == (19., 'jobs', 'Job', {'n': 19})
+
+    # A reader of the old log notices that it has been replaced
+    assert reader.read() == {0, 1, 2}
+    assert reader.items() == store.items()
+
+
+def test_index_store_deferred(tmpdir):
+    """Records appended within deferred are written together when it exits"""
+    fn = str(tmpdir.join('index.log'))
+    store = IndexStore(fn)
+    reader = IndexStore(fn)
+    with store.deferred():
+        store.put(1, 10., 'jobs', 'Job', {})
+        with store.deferred():
+            store.put(2, 11., 'jobs', 'Job', {})
+        assert reader.read() == set()
+    assert reader.read() == {1, 2}
+    assert sorted(dict(store.items())) == [1, 2]
@@ -0,0 +1,51 @@
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from GangaCore.Lib.Localhost.LocalExecutor import LocalExecutor
+
+
+def write_task(executor, where, fqid, task):
+    executor._makeSpool()
+    with open(os.path.join(where, '%s.task' % fqid), 'w') as task_file:
+        json.dump(task, task_file)
+
+
+def test_cancel_queued(tmpdir):
+    """A queued job is taken off the queue"""
+    executor = LocalExecutor(str(tmpdir))
+    write_task(executor, executor.queue_dir, '1', {'script': 'script', 'priority': 0})
+    assert executor.cancel('1')
+    assert not os.listdir(executor.queue_dir)
+    assert not executor.cancel('2')
+
+
+def test_cancel_waits_for_pid(tmpdir):
+    """A job which has been moved to the running tasks is only reported cancelled once its process is killed"""
+    executor = LocalExecutor(str(tmpdir))
+    write_task(executor, executor.running_dir, '1', {'script': 'script', 'priority': 0})
+    process = subprocess.Popen(['sleep', '30'], start_new_session=True)
+
+    def started():
+        time.sleep(0.5)
+        write_task(executor, executor.running_dir, '1', {'script': 'script', 'priority': 0, 'pid': process.pid})
+
+    thread = threading.Thread(target=started)
+    thread.start()
+    try:
+        assert executor.cancel('1')
+        assert process.wait(timeout=10) == -signal.SIGKILL
+    finally:
+        thread.join()
+        if process.poll() is None:
+            process.kill()
+
+
+def test_cancel_never_started(tmpdir):
+    """A job whose pid doesn't show up isn't reported cancelled"""
+    executor = LocalExecutor(str(tmpdir))
+    write_task(executor, executor.running_dir, '1', {'script': 'script', 'priority': 0})
+    assert not executor.cancel('1', timeout=0.3)
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from GangaCore.Core.GangaThread.Pipeline import Pipeline, PipelineStage
+
+
+def _square(x):
+    return x * x
+
+
+def test_pipeline_results_in_order():
+    """Every item goes through every stage and the results come back in the order of the items"""
+    stages = [PipelineStage('double', lambda x: 2 * x, workers=4), PipelineStage('square', _square, workers=2)]
+    pipeline = Pipeline(stages)
+    assert pipeline.run(range(100)) == [(2 * x) ** 2 for x in range(100)]
+    assert [stage.count for stage in stages] == [100, 100]
+    assert all(stage.throughput > 0 for stage in stages)
+
+
+def test_pipeline_process_stage():
+    """Stages can run their function in other processes"""
+    pipeline = Pipeline([PipelineStage('square', _square, workers=2, kind='process')])
+    assert pipeline.run(range(10)) == [x * x for x in range(10)]
+
+
+def test_pipeline_back_pressure():
+    """No more than max_pending items are in flight at once"""
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def enter(x):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.01)
+        return x
+
+    def leave(x):
+        with lock:
+            in_flight[0] -= 1
+        return x
+
+    pipeline = Pipeline([PipelineStage('enter', enter, workers=8), PipelineStage('leave', leave)], max_pending=3)
+    pipeline.run(range(30))
+    assert in_flight[1] <= 3
+
+
+def test_pipeline_stops_on_failure():
+    """The first failure stops the pipeline and is raised unless we keep going"""
+    done = []
+
+    def work(x):
+        if x == 5:
+            raise ValueError('broken')
+        time.sleep(0.01)
+        done.append(x)
+        return x
+
+    with pytest.raises(ValueError):
+        Pipeline([PipelineStage('work', work)], max_pending=2).run(range(100))
+    assert len(done) < 10
+
+    pipeline = Pipeline([PipelineStage('work', work, workers=4)], keep_going=True)
+    results = pipeline.run(range(10))
+    assert list(pipeline.failures) == [5]
+    assert pipeline.failures[5][0] == 'work'
+    assert results[5] is None
+    assert results[6] == 6
@@ -0,0 +1,88 @@
+import io
+import json
+import sys
+from types import SimpleNamespace
+
+from GangaCore.Lib.Remote.Remote import RemoteAgent, agent_script
+
+
+class FakeRepository(object):
+
+    def __init__(self, on_disk, loaded):
+        # the jobs on disk at each update of the index
+        self.on_disk = list(on_disk)
+        self.loaded = loaded
+
+    def update_index(self):
+        for jid, j in self.on_disk.pop(0).items():
+            self.loaded.setdefault(jid, j)
+
+
+class FakeRegistry(object):
+    """The jobs registry of the remote session, in which the jobs written by the other sessions show up on update_index"""
+
+    def __init__(self, on_disk):
+        self.loaded = {}
+        self.repository = FakeRepository(on_disk, self.loaded)
+        self.released = []
+
+    def items(self):
+        return sorted(self.loaded.items())
+
+    def _release_session_lock_and_flush(self, obj):
+        if obj._registry_locked:
+            obj._registry_locked = False
+            self.released.append(obj.id)
+
+
+def make_job(jid, status):
+    schema = SimpleNamespace(allItems=lambda: [('exitcode', None), ('actualCE', None)])
+    impl = SimpleNamespace(_schema=schema, exitcode=0, actualCE='ce.' + str(jid))
+    return SimpleNamespace(id=jid, status=status, outputdir='/out/%d' % jid, backend=SimpleNamespace(_impl=impl),
+                           _registry_locked=False)
+
+
+def run_agent(queries, on_disk, monkeypatch, capsys):
+    """Run the agent script on the queries and return its registry and the records of each answer"""
+    registry = FakeRegistry(on_disk)
+
+    def jobs(jid):
+        return registry.loaded[jid]
+
+    def runMonitoring():
+        # the monitoring locks the jobs it updates
+        for j in registry.loaded.values():
+            j._registry_locked = True
+            j.status = 'completed'
+
+    jobs._impl = SimpleNamespace(objects=registry)
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(''.join(json.dumps({'ids': ids}) + '\n' for ids in queries)))
+    exec(agent_script, {'jobs': jobs, 'runMonitoring': runMonitoring})
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == RemoteAgent.ready_token
+    answers = [json.loads(line[len(RemoteAgent.status_token):]) for line in lines[1:]]
+    return registry, answers
+
+
+def test_agent_sees_jobs_of_other_sessions(monkeypatch, capsys):
+    """A job written after the agent started is found by the next query"""
+    job = make_job(1, 'submitted')
+    # job 2 is submitted by another session between the two queries
+    on_disk = [{1: job}, {1: job, 2: make_job(2, 'submitted')}]
+    registry, answers = run_agent([[1, 2], [1, 2]], on_disk, monkeypatch, capsys)
+
+    assert [record['id'] for record in answers[0]] == [1]
+    assert [record['id'] for record in answers[1]] == [1, 2]
+    assert answers[1][1]['status'] == 'completed'
+    assert answers[1][1]['backend'] == {'exitcode': 0, 'actualCE': 'ce.2'}
+
+
+def test_agent_releases_locks_between_queries(monkeypatch, capsys):
+    """The jobs locked by the monitoring are unlocked before the answer is sent"""
+    jobs = {1: make_job(1, 'submitted'), 2: make_job(2, 'running')}
+    registry, answers = run_agent([[1, 2], [2]], [jobs, jobs], monkeypatch, capsys)
+
+    assert len(answers) == 2
+    assert registry.released == [1, 2, 1, 2]
+    assert not any(j._registry_locked for j in registry.loaded.values())
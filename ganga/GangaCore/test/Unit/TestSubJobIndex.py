@@ -0,0 +1,49 @@
+import pickle
+from io import BytesIO
+
+import pytest
+
+from GangaCore.Core.GangaRepository.SubJobIndex import SubJobIndex
+
+
+def make_row(i, status):
+    """An index cache of a subjob as made by the job registry"""
+    return {'status': status, 'modified': 100. + i, 'id': i, 'name': '', 'display:backend': 'Local',
+            'backend:id': 1000 + i, 'subjobs:status_counts': {}}
+
+
+def test_subjob_index_columns():
+    """Rows are updated in place and can be read back per subjob or per column"""
+    index = SubJobIndex()
+    for i in range(10):
+        index.set(i, make_row(i, 'running' if i % 3 else 'completed'))
+    index.set(4, {'status': 'failed', 'modified': 1.})
+    index.remove(5)
+
+    assert index.get(3) == make_row(3, 'completed')
+    assert index.get(4) == {'status': 'failed', 'modified': 1.}
+    assert 5 not in index and index.get(5) is None
+    assert index.count() == 9 and not index.isComplete(10) and index.isComplete(5)
+    assert index.idsWithStatus(['completed', 'failed']) == [0, 3, 4, 6, 9]
+    assert index.statuses(12)[3:8] == ['completed', 'failed', None, 'completed', 'running']
+    assert index.statuses(12)[10:] == [None, None]
+    assert index.column('backend:id')[:6] == [1000, 1001, 1002, 1003, None, None]
+
+
+def test_subjob_index_file():
+    """The index is read back from its file, as are the pickled dicts of older versions"""
+    index = SubJobIndex()
+    rows = dict((i, make_row(i, 'completed')) for i in range(50))
+    for i, row in rows.items():
+        index.set(i, row)
+
+    written = BytesIO()
+    index.write(written)
+    assert len(written.getvalue()) < len(pickle.dumps(rows, 1))
+    assert SubJobIndex.read(BytesIO(written.getvalue())).rows() == rows
+    assert SubJobIndex.read(BytesIO(pickle.dumps(rows, 1))).rows() == rows
+
+    corrupt = bytearray(written.getvalue())
+    corrupt[-1] ^= 0xff
+    with pytest.raises(ValueError):
+        SubJobIndex.read(BytesIO(bytes(corrupt)))
@@ -52,9 +52,9 @@ def startDiracProcess():
     Start a subprocess that runs the DIRAC commands
     '''
     HOST = 'localhost'  # Connect to localhost
-    end_trans = '###END-TRANS###'
     import subprocess
-    from GangaDirac.Lib.Utilities.DiracUtilities import getDiracEnv, getDiracCommandIncludes, GangaDiracError
+    from GangaDirac.Lib.Utilities.DiracUtilities import (getDiracEnv, getDiracCommandIncludes, GangaDiracError,
+                                                         DiracConnection)
     global dirac_process
     # Some magic to locate the python script to run
     from GangaDirac.Lib.Server.InspectionClient import runClient
@@ -82,23 +82,21 @@ def startDiracProcess():
     # we try until the connection stops being refused. Set a limit of one
     # minute.
     connection_timeout = time.time() + 60
-    started = False
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    while time.time() < connection_timeout and not started:
+    conn = None
+    while time.time() < connection_timeout and conn is None:
         try:
-            s.connect((HOST, PORT))
-            started = True
+            conn = DiracConnection(dirac_process_ids)
         except socket.error:
             time.sleep(1)
-    if not started:
+    if conn is None:
         raise GangaDiracError("Failed to start the Dirac server process!")
     # Now setup the Dirac environment in the subprocess
-    dirac_command = str(rand_hash)
-    dirac_command = dirac_command + getDiracCommandIncludes()
-    dirac_command = dirac_command + end_trans
-    s.sendall(dirac_command.encode("utf-8"))
-    s.recv(1024)
-    s.close()
+    try:
+        reply = conn.request({'command': getDiracCommandIncludes(), 'cwd': None})
+    finally:
+        conn.close()
+    if reply['error']:
+        raise GangaDiracError("Failed to set up the Dirac server process: %s" % reply['error'])
 
 
 exportToGPI('startDiracProcess', startDiracProcess, 'Functions')
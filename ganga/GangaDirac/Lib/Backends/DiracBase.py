@@ -1,6 +1,7 @@
 # \/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\#
 """The Ganga backendhandler for the Dirac system."""
 
+import asyncio
 import datetime
 import fnmatch
 import math
@@ -9,6 +10,7 @@ import os
 import re
 import shutil
 import tempfile
+import threading
 import time
 from subprocess import CalledProcessError, check_output
 import traceback
@@ -26,7 +28,8 @@ from GangaCore.Runtime.GPIexport import exportToGPI
 from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.logging import getLogger, log_user_exception
 from GangaCore.Utility.util import require_disk_space
-from GangaDirac.Lib.Backends.DiracUtils import (get_job_ident,
+from GangaDirac.Lib.Backends.DiracUtils import (MonitoringChunkSizer,
+                                                get_job_ident,
                                                 get_parametric_datasets,
                                                 getAccessURLs, getReplicas,
                                                 outputfiles_foreach,
@@ -34,7 +37,7 @@ from GangaDirac.Lib.Backends.DiracUtils import (get_job_ident,
                                                 result_ok)
 from GangaDirac.Lib.Credentials.DiracProxy import DiracProxy
 from GangaDirac.Lib.Files.DiracFile import DiracFile
-from GangaDirac.Lib.Server.DiracNewCommands import finished_job, getStateTime, getOutputSandbox
+from GangaDirac.Lib.Server.DiracNewCommands import finished_job, getStateTime, getOutputSandbox, submitScript
 from GangaDirac.Lib.Server.DiracNewCommands import status as dirac_status
 from GangaDirac.Lib.Server.DiracProcessManager import AsyncDiracManager
 from GangaDirac.Lib.Utilities.DiracUtilities import GangaDiracError, execute
@@ -46,6 +49,21 @@ default_downloadOutputSandbox = configDirac['default_downloadOutputSandbox']
 default_unpackOutputSandbox = configDirac['default_unpackOutputSandbox']
 logger = getLogger()
 regex = re.compile(r'[*?\[\]]')
+# Chooses the number of jobs whose status is queried from DIRAC at once, see DiracBase.updateMonitoringInformation
+_monitoring_chunk_sizer = None
+
+
+def get_monitoring_chunk_sizer():
+    """
+    Return the MonitoringChunkSizer of this session, a new one is made if the config has changed
+    """
+    global _monitoring_chunk_sizer
+    max_size = configDirac['numParallelJobs']
+    target_time = configDirac['MonitoringChunkTargetTime']
+    if _monitoring_chunk_sizer is None or _monitoring_chunk_sizer.max_size != max_size or \
+            _monitoring_chunk_sizer.target_time != target_time:
+        _monitoring_chunk_sizer = MonitoringChunkSizer(max_size, target_time)
+    return _monitoring_chunk_sizer
 
 
 class DiracBase(IBackend):
@@ -294,8 +312,9 @@ class DiracBase(IBackend):
 
     def master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going=False, parallel_submit=False):
         """  Submit the master job and all of its subjobs. To keep things speedy when talking to DIRAC
-        we can submit several subjobs in the same process. Therefore for each subjob we collect the code for
-       the dirac-script into one large file that we then execute.
+        the subjobs are split into blocks of [DIRAC]maxSubjobsPerProcess which are submitted at the same time through
+        the persistent DIRAC processes. Each subjob gets its DIRAC id as soon as it is submitted, so that a submission
+        which is interrupted leaves the subjobs it did not get to in the 'submitting' state.
         """
         # If you want to go slowly use the regular master_submit:
         if not self.blockSubmit:
@@ -313,8 +332,6 @@ class DiracBase(IBackend):
         nPerProcess = configDirac['maxSubjobsPerProcess']
         nProcessToUse = math.ceil((len(rjobs) * 1.0) / nPerProcess)
 
-        from GangaCore.Core.GangaThread.WorkerThreads import getQueues
-
         # Must check for credentials here as we cannot handle missing credentials on Queues by design!
         cred = None
         try:
@@ -339,64 +356,32 @@ class DiracBase(IBackend):
                                % (remaining, uploaded_expiry.strftime('%d/%m/%Y')))
 
         tmp_dir = tempfile.mkdtemp()
-        # Loop over the processes and create the master script for each one.
-        for i in range(0, int(nProcessToUse)):
-            nSubjobs = 0
-            # The Dirac IDs are stored in a dict so create it at the start of the script
-            masterScript = 'resultdict = {}\n'
-            for sc, sj in zip(subjobconfigs[i * nPerProcess:(i + 1) * nPerProcess],
-                              rjobs[i * nPerProcess:(i + 1) * nPerProcess]):
-                # Add in the script for each subjob
+        try:
+            # Write the script of each subjob, the whole block is only submitted once all of them are there
+            scripts = []
+            for sc, sj in zip(subjobconfigs, rjobs):
                 sj.updateStatus('submitting')
-                fqid = sj.getFQID('.')
-                # Change the output of the job script for our own ends.
-                # This is a bit of a hack but it saves having to rewrite every RTHandler
                 sjScript = sj.backend._job_script(sc, master_input_sandbox, tmp_dir)
+                # The DIRAC processes have already parsed their command line
                 sjScript = sjScript.replace(
-                    "output(result)", "if isinstance(result, dict) and 'Value' in result:\n"
-                    "\tresultdict.update({sjNo : result['Value']})\nelse:\n\tresultdict.update({sjNo : result['Message']})")
-                if nSubjobs == 0:
-                    sjScript = re.sub(r"(dirac = Dirac.*\(\))", r"\1\nsjNo='%s'\n" % fqid, sjScript)
-                if nSubjobs != 0:
-                    sjScript = sjScript.replace(
-                        "from DIRAC.Core.Base.Script import parseCommandLine\nparseCommandLine()\n", "\n")
-                    sjScript = re.sub(r"from .*DIRAC\.Interfaces\.API.Dirac.* import Dirac.*", "", sjScript)
-                    sjScript = re.sub(r"from .*DIRAC\.Interfaces\.API\..*Job import .*Job", "", sjScript)
-                    sjScript = re.sub(r"dirac = Dirac.*\(\)", "", sjScript)
-                    masterScript += "\nsjNo=\'%s\'" % fqid
-                masterScript += sjScript
-                nSubjobs += 1
-            # Return the dict of job numbers and Dirac IDs
-            masterScript += '\noutput(resultdict)\n'
-            dirac_script_filename = os.path.join(
-                self.getJobObject().getInputWorkspace().getPath(), 'dirac-script-%s.py') % i
-            with open(dirac_script_filename, 'w') as f:
-                f.write(masterScript)
-            upperlimit = (i + 1) * nPerProcess
-            if upperlimit > len(rjobs):
-                upperlimit = len(rjobs)
-
-            if (upperlimit - 1) == 0:
-                logger.info("Submitting job")
-            else:
-                logger.info("Submitting subjobs %s to %s" % (i * nPerProcess, upperlimit - 1))
-            try:
-                # Either do the submission in parallel with threads or sequentially
-                if parallel_submit:
-                    getQueues()._monitoring_threadpool.add_function(self._block_submit,
-                                                                    (dirac_script_filename, nSubjobs, keep_going))
-                else:
-                    self._block_submit(dirac_script_filename, nSubjobs, keep_going)
-
-                while not self._subjob_status_check(rjobs, nPerProcess, i):
-                    time.sleep(1.)
-            finally:
-                shutil.rmtree(tmp_dir, ignore_errors=True)
+                    "from DIRAC.Core.Base.Script import parseCommandLine\nparseCommandLine()\n", "\n")
+                dirac_script_filename = os.path.join(
+                    self.getJobObject().getInputWorkspace().getPath(), 'dirac-script-%s.py') % sj.getFQID('.')
+                with open(dirac_script_filename, 'w') as f:
+                    f.write(sjScript)
+                scripts.append(dirac_script_filename)
+
+            jobs_and_scripts = list(zip(rjobs, scripts))
+            blocks = [jobs_and_scripts[i * nPerProcess:(i + 1) * nPerProcess] for i in range(int(nProcessToUse))]
+            submitFailures = self._submit_blocks(blocks)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
-            if (upperlimit - 1) == 0:
-                logger.info("Submitted job")
-            else:
-                logger.info("Submitted subjobs %s to %s" % (i * nPerProcess, upperlimit - 1))
+        # Check that every subjob got submitted ok
+        if len(submitFailures) > 0:
+            for sjNo in submitFailures.keys():
+                logger.error('Job submission failed for job %s : %s' % (sjNo, submitFailures[sjNo]))
+            raise GangaDiracError("Some subjobs failed to submit! Check their status!")
 
         for i in rjobs:
             if i.status in ["new", "failed"]:
@@ -404,13 +389,112 @@ class DiracBase(IBackend):
 
         return 1
 
-    def _subjob_status_check(self, rjobs, nPerProcess, i):
-        has_submitted = True
-        for sj in rjobs[i * nPerProcess:(i + 1) * nPerProcess]:
-            if sj.status not in ["submitted", "failed", "completed", "running", "completing"]:
-                has_submitted = False
+    @require_credential
+    def _submit_blocks(self, blocks):
+        '''Submit blocks of jobs through the DIRAC processes of the AsyncDiracManager. Up to
+        [DIRAC]MaxConcurrentSubmitBlocks blocks are submitted at the same time, the jobs of a block one after the other,
+        and each job is given its DIRAC id and flushed as soon as it has been submitted.
+        Args:
+            blocks (list): The blocks to submit, each a list of (job, filename of its DIRAC API script)
+        Returns a dict of the FQIDs of the jobs which failed to submit -> error message
+        '''
+        j = self.getJobObject()
+        self.id = None
+        self.actualCE = None
+        self.status = None
+        self.extraInfo = None
+        self.statusInfo = ''
+        j.been_queued = False
+
+        async def submit_all():
+            slots = asyncio.Semaphore(max(configDirac['MaxConcurrentSubmitBlocks'], 1))
+            submitFailures = {}
+
+            async def submit(block):
+                async with slots:
+                    submitFailures.update(await self._submit_block(block))
+
+            # Let every block finish before raising, the caller removes the files they submit from afterwards
+            results = await asyncio.gather(*[submit(block) for block in blocks], return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            return submitFailures
+
+        # Talk to the DIRAC processes from the monitoring loop if it runs, so that only one thread starts them
+        from GangaCore.Core import monitoring_component
+        if monitoring_component is not None and monitoring_component.loop.is_running() and \
+                threading.current_thread() is not monitoring_component:
+            future = asyncio.run_coroutine_threadsafe(submit_all(), monitoring_component.loop)
+            try:
+                return future.result()
+            except BaseException:
+                future.cancel()
+                raise
+        return asyncio.run(submit_all())
+
+    async def _submit_block(self, block):
+        '''Submit a block of jobs one after the other. When the DIRAC process fails the job it was submitting is failed,
+        it is not submitted again as DIRAC may already have accepted it. The rest of the block carries on with a new
+        process up to [DIRAC]SubmitBlockRetries times, then the jobs left are failed.
+        Args:
+            block (list): The jobs to submit, as (job, filename of its DIRAC API script)
+        Returns a dict of the FQIDs of the jobs which failed to submit -> error message
+        '''
+        j = self.getJobObject()
+        first, last = block[0][0].getFQID('.'), block[-1][0].getFQID('.')
+        if len(block) == 1:
+            logger.info("Submitting job %s" % first)
+        else:
+            logger.info("Submitting subjobs %s to %s" % (first, last))
+
+        dm = AsyncDiracManager()
+        submitFailures = {}
+        retries = configDirac['SubmitBlockRetries']
+        position = 0
+        while position < len(block):
+            sj, dirac_script = block[position]
+            try:
+                result = await dm.execute(submitScript, args_dict={'script': dirac_script}, return_raw_dict=True,
+                                          cred_req=self.credential_requirements)
+                if result is None:
+                    raise GangaDiracError('The DIRAC process was closed')
+            except GangaDiracError as err:
+                logger.error('Submission of job %s was interrupted, check in DIRAC whether it was submitted before '
+                             'resubmitting it: %s' % (sj.getFQID('.'), err))
+                sj.updateStatus('failed')
+                submitFailures[sj.getFQID('.')] = 'Submission interrupted, the job may be in DIRAC: %s' % err
+                position += 1
+                if position == len(block):
+                    break
+                if retries > 0:
+                    retries -= 1
+                    logger.warning('Carrying on with the submission of the block from %s to %s at job %s'
+                                   % (first, last, block[position][0].getFQID('.')))
+                    continue
+                for sj, _ in block[position:]:
+                    sj.updateStatus('failed')
+                    submitFailures[sj.getFQID('.')] = str(err)
                 break
-        return has_submitted
+
+            # If we get an int we have a DIRAC ID so job submitted
+            if result.get('OK') and isinstance(result.get('Value'), int):
+                sj.backend.id = result['Value']
+                sj.updateStatus('submitted')
+                j.time.timenow('submitted')
+                stripProxy(sj.info).increment()
+                IBackend._flush_submitted(sj)
+            else:
+                sj.updateStatus('failed')
+                submitFailures[sj.getFQID('.')] = result.get('Message', 'DIRAC error!') if not result.get('OK') \
+                    else 'DIRAC error!'
+            position += 1
+
+        if len(block) == 1:
+            logger.info("Submitted job %s" % first)
+        else:
+            logger.info("Submitted subjobs %s to %s" % (first, last))
+        return submitFailures
 
     def _job_script(self, subjobconfig, master_input_sandbox, tmp_dir):
         """Get the script to submit a single DIRAC job
@@ -1608,9 +1692,29 @@ class DiracBase(IBackend):
             for requeue_jobs_group in group_jobs_by_backend_credential(requeue_jobs):
                 for job_chunk in split_jobs_into_chunks(requeue_jobs_group):
                     DiracBase.requeue_dirac_finished_jobs(job_chunk, finalised_statuses)
-            for monitor_jobs_group in group_jobs_by_backend_credential(monitor_jobs):
-                for job_chunk in split_jobs_into_chunks(monitor_jobs_group):
+
+            # The status of several chunks is queried at once, the size of the chunks follows how long queries take
+            sizer = get_monitoring_chunk_sizer()
+            slots = asyncio.Semaphore(max(configDirac['MaxConcurrentMonitoringChunks'], 1))
+
+            async def monitor_chunk(job_chunk):
+                async with slots:
+                    t0 = time.time()
                     await DiracBase.monitor_dirac_running_jobs(job_chunk, finalised_statuses)
+                    sizer.record(len(job_chunk), time.time() - t0)
+
+            job_chunks = [job_chunk for monitor_jobs_group in group_jobs_by_backend_credential(monitor_jobs)
+                          for job_chunk in sizer.split(monitor_jobs_group)]
+            results = await asyncio.gather(*[monitor_chunk(job_chunk) for job_chunk in job_chunks],
+                                           return_exceptions=True)
+            errors = [result for result in results if isinstance(result, BaseException)]
+            for err in errors:
+                if not isinstance(err, GangaDiracError):
+                    raise err
+            if errors:
+                logger.warn("Error in Monitoring Loop, jobs on the DIRAC backend may not update")
+                for err in errors:
+                    logger.debug(''.join(traceback.format_exception(type(err), err, err.__traceback__)))
         except GangaDiracError:
             logger.warn("Error in Monitoring Loop, jobs on the DIRAC backend may not update")
             logger.debug(traceback.format_exc())
@@ -3,6 +3,7 @@ import re
 import itertools
 from GangaCore.Core.exceptions import BackendError
 from GangaDirac.Lib.Utilities.DiracUtilities import execute, GangaDiracError
+from GangaDirac.Lib.Utilities.ReplicaCache import getReplicaCache
 from GangaCore.Utility.logging import getLogger
 logger = getLogger()
 
@@ -225,7 +226,12 @@ def getReplicas(inSet, credential_requirements=None):
     else:
         raise GangaDiracError(
             'You must supply, an LFN as a string, a list of LFNs or a GangaDataset with getLFNs() implemented')
-    reps = execute('getReplicas(%s)' % str(lfns), cred_req=credential_requirements)
+
+    def fetch(missing):
+        return execute('getReplicas(%s)' % str(missing), cred_req=credential_requirements)
+
+    cache = getReplicaCache()
+    reps = fetch(lfns) if cache is None else cache.lookup(lfns, fetch)
     if isinstance(lfns, list) and not len(reps['Successful'].keys()) == len(lfns):
         logger.warning("Not successfully found a replica for all files! The following failed: %s" %
                        reps['Failed'].keys())
@@ -260,3 +266,45 @@ def removeLFNs(inSet, credential_requirements=None):
 
 
 exportToGPI('removeLFNs', removeLFNs, 'Functions')
+
+
+class MonitoringChunkSizer(object):
+    '''
+    Chooses how many jobs are put into each DIRAC status query of the monitoring.
+    Queries which take longer than the target time halve the size of the following ones, quick queries let the size
+    grow back by a quarter at a time up to the maximum.
+    '''
+
+    def __init__(self, max_size, target_time, min_size=50):
+        '''
+        Args:
+            max_size (int): The largest number of jobs in a query
+            target_time (float): The time (sec) a single query should take
+            min_size (int): The smallest number of jobs in a query
+        '''
+        self.max_size = max(int(max_size), 1)
+        self.min_size = max(min(int(min_size), self.max_size), 1)
+        self.target_time = target_time
+        self.size = self.max_size
+
+    def record(self, n_jobs, elapsed):
+        '''
+        Adapt the size of the following queries to how long a query took
+        Args:
+            n_jobs (int): The number of jobs in the query
+            elapsed (float): The time (sec) the query took
+        '''
+        if self.target_time <= 0:
+            return
+        if elapsed > self.target_time:
+            self.size = max(min(self.size, n_jobs) // 2, self.min_size)
+        elif elapsed < self.target_time / 2. and n_jobs >= self.size:
+            self.size = min(self.size + max(self.size // 4, 1), self.max_size)
+
+    def split(self, jobs):
+        '''
+        Split the jobs into chunks of the current size
+        Args:
+            jobs (list): The jobs to be monitored
+        '''
+        return [jobs[i:i + self.size] for i in range(0, len(jobs), self.size)]
@@ -14,6 +14,7 @@ from GangaCore.GPIDev.Lib.File import FileUtils
 from GangaCore.Utility.files import expandfilename
 from GangaCore.Core.exceptions import GangaFileError
 from GangaDirac.Lib.Utilities.DiracUtilities import getDiracEnv, execute, GangaDiracError
+from GangaDirac.Lib.Utilities.ReplicaCache import getReplicaCache
 import GangaCore.Utility.Config
 from GangaCore.Runtime.GPIexport import exportToGPI
 from GangaCore.GPIDev.Credentials import require_credential
@@ -534,9 +535,18 @@ class DiracFile(IGangaFile):
                 self._storedReplicas = copy.deepcopy(self._storedReplicas)
             if (self._storedReplicas == {} and len(self.subfiles) == 0) or forceRefresh:
 
+                def fetch(lfns):
+                    return execute('getReplicas(%s)' % str(lfns), cred_req=self.credential_requirements)
+
+                # other files of the same LFN may have looked it up already
+                cache = getReplicaCache()
                 try:
-                    self._storedReplicas = execute('getReplicas("%s")' %
-                                                   self.lfn, cred_req=self.credential_requirements)
+                    if cache is None:
+                        self._storedReplicas = fetch([self.lfn])
+                    else:
+                        if forceRefresh:
+                            cache.invalidate([self.lfn])
+                        self._storedReplicas = cache.lookup([self.lfn], fetch)
                 except GangaDiracError:
                     logger.error("Couldn't find replicas for: %s" % str(self.lfn))
                     self._storedReplicas = {}
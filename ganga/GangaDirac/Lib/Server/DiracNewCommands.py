@@ -81,6 +81,17 @@ def submit(dirac, djob, mode='wms'):
     return dirac.submitJob(djob, mode=mode)
 
 
+@diracCommand
+def submitScript(dirac, script):
+    ''' Run the DIRAC API script of a Ganga job, return the result of the submission it outputs '''
+    outputs = []
+    with open(script) as script_file:
+        exec(compile(script_file.read(), script, 'exec'), {'output': outputs.append})
+    if not outputs:
+        raise Exception('No output returned by the submission script %s' % script)
+    return outputs[-1]
+
+
 @diracCommand
 def ping(dirac, system, service):
     ''' Ping a given service on a given system running DIRAC '''
@@ -1,46 +1,150 @@
 #!/usr/bin/env python
+"""
+Server executing the commands of a Ganga session within the DIRAC environment.
+Every client connection is served by its own thread and stays open for many commands, so Ganga can have
+several commands in flight at once. Messages are framed and serialised as described in DiracProtocol.
+"""
+import os
 import sys
+import shutil
 import socket
+import tempfile
+import threading
 import traceback
-import six
-HOST = 'localhost'  # Standard loopback interface address (localhost)
-PORT = int(sys.argv[1])        # Port to listen on
-rand_hash = six.moves.input()
-
-# A function to shutdown an existing processes
-
-
-def closeSocket():
-    sc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sc.connect((HOST, PORT))
-    sc.sendall(b'close server')
-    sc.close()
-
-
-end_trans = '###END-TRANS###'
-# This is a wrapper for the client sockets
-
+from contextlib import contextmanager
 
-class socketWrapper(object):
+from DiracProtocol import ProtocolError, recv_frame, send_frame
 
-    def __init__(self, skt):
-        self._socket = skt
-
-    def read(self):
-        cmd = ''
-        while end_trans not in cmd:
-            data = self._socket.recv(1024).decode()
-            if not data:
-                cmd = '###BROKEN###'
-                break
-            cmd += data
-        # Check the random string is in the cmd so we know it came from a trusted source.
-        if rand_hash not in cmd:
-            return 'close-connection'
-        if cmd == '###BROKEN###':
-            return ''
-        return_string = cmd.replace(rand_hash, '')
-        return return_string.replace(end_trans, '')
+HOST = 'localhost'  # Standard loopback interface address (localhost)
+PORT = int(sys.argv[1])        # Port to listen on
+rand_hash = input().strip()
+
+
+class DirectoryLock(object):
+    """
+    The working directory is shared by all threads. The commands which run in the scratch directory share this lock
+    and run side by side, a command which has to run elsewhere holds it on its own for as long as it runs
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._sharing = 0
+        self._exclusive = False
+        # Commands waiting to change directory, the ones which would share the lock wait for them to go first
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._cond:
+            while self._exclusive or self._waiting:
+                self._cond.wait()
+            self._sharing += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._sharing -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._exclusive or self._sharing:
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+
+# Commands which don't say where to run are run in a scratch directory private to this process
+scratch_dir = tempfile.mkdtemp()
+os.chdir(scratch_dir)
+chdir_lock = DirectoryLock()
+
+# The reply to the command being executed by each thread
+_replies = threading.local()
+
+# Number of connections being served, the server only times out when there are none
+_active = [0]
+_active_lock = threading.Lock()
+
+
+def output(data):
+    """
+    Called by the DIRAC commands to hand their result back to Ganga
+    Args:
+        data (object): The result of the command
+    """
+    _replies.output = data
+    _replies.found = True
+
+
+def run_command(cmd, cwd=None):
+    """
+    Execute cmd in the namespace of this module and return the reply to be sent to Ganga
+    Args:
+        cmd (str): The python code to be executed
+        cwd (str): The directory to execute the code in, if any
+    """
+    _replies.output = None
+    _replies.found = False
+    error = None
+    try:
+        try:
+            code = compile(cmd, '<ganga>', 'eval')
+        except SyntaxError:
+            code = compile(cmd, '<ganga>', 'exec')
+        if cwd:
+            with chdir_lock.exclusive():
+                os.chdir(cwd)
+                try:
+                    eval(code, globals())
+                finally:
+                    os.chdir(scratch_dir)
+        else:
+            with chdir_lock.shared():
+                eval(code, globals())
+    except BaseException:
+        error = "Exception raised executing command (cmd) '%s'\n%s" % (cmd, traceback.format_exc())
+    return {'found': _replies.found, 'output': _replies.output, 'error': error}
+
+
+def serve(conn):
+    """
+    Serve the requests arriving on one connection until it is closed
+    Args:
+        conn (socket): The connection to the client
+    """
+    with _active_lock:
+        _active[0] += 1
+    try:
+        # The first message has to carry the random string so we know it came from a trusted source.
+        request_id, hello = recv_frame(conn)
+        if not isinstance(hello, dict) or hello.get('auth') != rand_hash:
+            return
+        send_frame(conn, request_id, {'found': True, 'output': os.getpid(), 'error': None})
+        while True:
+            request_id, request = recv_frame(conn)
+            if request.get('close_server'):
+                os._exit(0)
+            send_frame(conn, request_id, run_command(request['command'], request.get('cwd')))
+    except (ProtocolError, socket.error):
+        pass
+    finally:
+        with _active_lock:
+            _active[0] -= 1
+        try:
+            conn.close()
+        except socket.error:
+            pass
 
 
 # Start the socket
@@ -52,36 +156,13 @@ s.settimeout(1800)
 while True:
     try:
         conn, addr = s.accept()
-        sock = socketWrapper(conn)
-        cmd = sock.read()
-        # Here we define the output method to just send the output of the diracCommand wrapper.
-
-        def output(data):
-            conn.sendall(repr(data).encode())
-
-        if cmd == 'close-connection':
-            conn.shutdown(socket.SHUT_RDWR)
-            conn.close()
-            continue
-
-        if cmd == 'close-server':
-            conn.shutdown(socket.SHUT_RDWR)
-            conn.close()
-            break
-
-        try:
-            print(eval(cmd))
-        except BaseException:
-            try:
-                exec(cmd)
-            except BaseException:
-                print("Exception raised executing command (cmd) '%s'\n" % cmd)
-                print(traceback.format_exc())
-
-        conn.sendall(b'###END-TRANS###')
-    # Catch the timeout and exit
+        conn.settimeout(None)
+        threading.Thread(target=serve, args=(conn,), daemon=True).start()
+    # Catch the timeout and exit once nobody is connected
     except socket.timeout:
-        break
+        with _active_lock:
+            if _active[0] == 0:
+                break
 
-s.shutdown(socket.SHUT_RDWR)
 s.close()
+shutil.rmtree(scratch_dir, ignore_errors=True)
@@ -0,0 +1,147 @@
+"""
+Wire protocol between Ganga and the DIRAC server process.
+
+Every message is a frame made of a fixed header (payload length, request id) followed by the payload.
+The payload is JSON in which the types JSON can't represent (tuples, sets, dates, dicts with non-string keys)
+are tagged so that they come back as they were sent, nothing received is ever evaluated as code.
+This module is imported by the server running within the DIRAC environment so it must only use the standard library.
+"""
+import datetime
+import json
+import struct
+
+# payload length, request id
+HEADER = struct.Struct('!IQ')
+MAX_PAYLOAD = 0xffffffff
+
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+_DATE_FORMAT = '%Y-%m-%d'
+
+
+class ProtocolError(Exception):
+    """ Raised when a connection is closed or a malformed frame is received """
+    pass
+
+
+def _tag(obj):
+    """
+    Return obj converted to something JSON can represent, tagging the types JSON doesn't know about
+    Args:
+        obj (object): The object to be converted
+    """
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, list):
+        return [_tag(o) for o in obj]
+    if isinstance(obj, dict):
+        if all(isinstance(k, str) for k in obj):
+            if '__tag__' not in obj:
+                return {k: _tag(v) for k, v in obj.items()}
+        return {'__tag__': 'dict', 'items': [[_tag(k), _tag(v)] for k, v in obj.items()]}
+    if isinstance(obj, tuple):
+        return {'__tag__': 'tuple', 'items': [_tag(o) for o in obj]}
+    if isinstance(obj, (set, frozenset)):
+        return {'__tag__': 'set', 'items': [_tag(o) for o in obj]}
+    if isinstance(obj, datetime.datetime):
+        return {'__tag__': 'datetime', 'value': obj.strftime(_DATETIME_FORMAT)}
+    if isinstance(obj, datetime.date):
+        return {'__tag__': 'date', 'value': obj.strftime(_DATE_FORMAT)}
+    if isinstance(obj, bytes):
+        return {'__tag__': 'bytes', 'value': obj.decode('latin-1')}
+    # Anything else is sent as its representation
+    return repr(obj)
+
+
+def _untag(obj):
+    """
+    object_hook which turns the tagged objects back into their original types
+    Args:
+        obj (dict): A dict decoded from the JSON
+    """
+    tag = obj.get('__tag__')
+    if tag is None:
+        return obj
+    if tag == 'dict':
+        return {_hashable(k): v for k, v in obj['items']}
+    if tag == 'tuple':
+        return tuple(obj['items'])
+    if tag == 'set':
+        return set(_hashable(o) for o in obj['items'])
+    if tag == 'datetime':
+        return datetime.datetime.strptime(obj['value'], _DATETIME_FORMAT)
+    if tag == 'date':
+        return datetime.datetime.strptime(obj['value'], _DATE_FORMAT).date()
+    if tag == 'bytes':
+        return obj['value'].encode('latin-1')
+    raise ProtocolError("Unknown tag '%s' in payload" % tag)
+
+
+def _hashable(obj):
+    """
+    Lists can't be dict keys or set members, they can only have come from a tuple so turn them back into one
+    Args:
+        obj (object): A decoded key
+    """
+    if isinstance(obj, list):
+        return tuple(_hashable(o) for o in obj)
+    return obj
+
+
+def dumps(obj):
+    """
+    Serialise obj to bytes
+    Args:
+        obj (object): The object to be serialised
+    """
+    return json.dumps(_tag(obj), separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """
+    Deserialise an object serialised by dumps
+    Args:
+        data (bytes): The serialised object
+    """
+    return json.loads(data.decode('utf-8'), object_hook=_untag)
+
+
+def _recv_exactly(sock, size):
+    """
+    Read exactly size bytes from sock into a single buffer
+    Args:
+        sock (socket): The connection to read from
+        size (int): The number of bytes to read
+    """
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        n = sock.recv_into(view[pos:], size - pos)
+        if n == 0:
+            raise ProtocolError("Connection closed")
+        pos += n
+    return buf
+
+
+def send_frame(sock, request_id, obj):
+    """
+    Send obj over sock as one frame
+    Args:
+        sock (socket): The connection to write to
+        request_id (int): The id which the reply to this frame will carry
+        obj (object): The message
+    """
+    payload = dumps(obj)
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError("Message of %s bytes is too large to be sent" % len(payload))
+    sock.sendall(HEADER.pack(len(payload), request_id) + payload)
+
+
+def recv_frame(sock):
+    """
+    Receive one frame from sock and return (request_id, message)
+    Args:
+        sock (socket): The connection to read from
+    """
+    length, request_id = HEADER.unpack(bytes(_recv_exactly(sock, HEADER.size)))
+    return request_id, loads(bytes(_recv_exactly(sock, length)))
@@ -2,6 +2,7 @@ from GangaCore.Core.exceptions import SplitterError
 from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.logging import getLogger
 from GangaDirac.Lib.Utilities.DiracUtilities import execute, GangaDiracError
+from GangaDirac.Lib.Utilities.ReplicaCache import getReplicaCache
 from GangaCore.Core.GangaThread.WorkerThreads import getQueues
 from GangaDirac.Lib.Files.DiracFile import DiracFile
 import random
@@ -315,19 +316,31 @@ def lookUpLFNReplicas(inputs, ignoremissing):
     for _lfn in inputs:
         LFNdict[_lfn.lfn] = _lfn
 
+    # Only the LFNs missing from the replica cache, or stale there, are looked up
+    cache = getReplicaCache()
+    cached = cache.get(allLFNs, 'getReplicasForJobs') if cache is not None else {}
+    missingLFNs = [_lfn for _lfn in allLFNs if _lfn not in cached]
+
     # Request the replicas for all LFN 'LFN_parallel_limit' at a time to not overload the
     # server and give some feedback as this is going on
     global LFN_parallel_limit
-    for i in range(int(math.ceil(float(len(allLFNs)) / LFN_parallel_limit))):
+    num_chunks = int(math.ceil(float(len(missingLFNs)) / LFN_parallel_limit))
+    for i in range(num_chunks):
 
-        getQueues()._monitoring_threadpool.add_function(getLFNReplicas, (allLFNs, i, allLFNData))
+        getQueues()._monitoring_threadpool.add_function(getLFNReplicas, (missingLFNs, i, allLFNData))
 
-    while len(allLFNData) != int(math.ceil(float(len(allLFNs)) / LFN_parallel_limit)):
+    while len(allLFNData) != num_chunks:
         time.sleep(1.)
         # This can take a while so lets protect any repo locks
         import GangaCore.Runtime.Repository_runtime
         GangaCore.Runtime.Repository_runtime.updateLocksNow()
 
+    if cache is not None:
+        for output in allLFNData.values():
+            cache.put(output.get('Successful', {}), 'getReplicasForJobs')
+    if cached:
+        allLFNData[num_chunks] = {'Successful': cached, 'Failed': {}}
+
     bad_lfns = []
 
     # Sort this information and store is in the relevant Ganga objects
@@ -360,7 +373,7 @@ def updateLFNData(bad_lfns, allLFNs, LFNdict, ignoremissing, allLFNData):
 
     global LFN_parallel_limit
 
-    for i in range(int(math.ceil(float(len(allLFNs)) / LFN_parallel_limit))):
+    for i in range(len(allLFNData)):
         output = allLFNData.get(i)
 
         if output is None:
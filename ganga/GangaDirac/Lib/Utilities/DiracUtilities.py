@@ -8,6 +8,7 @@ import json
 import time
 import socket
 import re
+import itertools
 from copy import deepcopy
 from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.logging import getLogger
@@ -15,6 +16,7 @@ from GangaCore.Core.exceptions import GangaException
 from GangaCore.GPIDev.Base.Proxy import isType
 from GangaCore.GPIDev.Credentials import credential_store
 import GangaCore.Utility.execute as gexecute
+from GangaDirac.Lib.Server.DiracProtocol import ProtocolError, recv_frame, send_frame
 logger = getLogger()
 
 # Cache
@@ -24,6 +26,11 @@ DIRAC_INCLUDE = ''
 Dirac_Env_Lock = threading.Lock()
 Dirac_Proxy_Lock = threading.Lock()
 Dirac_Exec_Lock = threading.Lock()
+Dirac_Latency_Lock = threading.Lock()
+# name of command -> number of calls, total and longest time taken (sec)
+DIRAC_COMMAND_LATENCY = {}
+# Pool of connections to the DIRAC server process, created on first use
+DIRAC_CONNECTION_POOL = None
 # /\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\
 
 
@@ -193,6 +200,174 @@ def getValidDiracFiles(job, names=None):
                     yield df
 
 
+class DiracConnection(object):
+    """
+    A persistent, authenticated connection to the DIRAC server process which carries one command at a time
+    """
+
+    def __init__(self, process_ids):
+        """
+        Connect to the server and identify ourselves with the random string it was started with
+        Args:
+            process_ids (tuple): The (pid, port, random string) of the server as set by startDiracProcess
+        """
+        self.process_ids = process_ids
+        self._request_ids = itertools.count(1)
+        self._socket = socket.create_connection(('localhost', process_ids[1]))
+        self.request({'auth': str(process_ids[2])}, timeout=60)
+
+    def request(self, message, timeout=None):
+        """
+        Send a message to the server and return its reply
+        Args:
+            message (dict): The request, i.e. the command and the directory to run it in
+            timeout (int): Time to wait for the reply, None waits forever
+        """
+        request_id = next(self._request_ids)
+        self._socket.settimeout(timeout)
+        send_frame(self._socket, request_id, message)
+        reply_id, reply = recv_frame(self._socket)
+        if reply_id != request_id:
+            raise ProtocolError("Reply to request %s received for request %s" % (reply_id, request_id))
+        return reply
+
+    def close(self):
+        """
+        Close the connection
+        """
+        try:
+            self._socket.close()
+        except socket.error:
+            pass
+
+
+class DiracConnectionPool(object):
+    """
+    Pool of connections to the DIRAC server process.
+    Up to ``size`` commands can be in flight at once, each over its own connection. Connections are kept open and
+    reused for later commands, those to a server process which has since been replaced are dropped.
+    """
+
+    def __init__(self, size):
+        """
+        Args:
+            size (int): The maximum number of commands in flight at once
+        """
+        self.size = max(size, 1)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _process_ids(stale=None):
+        """
+        Return the ids of the running server process, starting a new one if there is none (or the running one is stale)
+        Args:
+            stale (tuple): The ids of a process which can no longer be connected to
+        """
+        import GangaDirac.BOOT as BOOT
+        with Dirac_Exec_Lock:
+            if not BOOT.running_dirac_process or (stale is not None and BOOT.dirac_process_ids == stale):
+                BOOT.startDiracProcess()
+            return BOOT.dirac_process_ids
+
+    def _get(self):
+        """
+        Return an idle connection to the running server or a new one
+        """
+        process_ids = self._process_ids()
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if conn.process_ids == process_ids:
+                    return conn, True
+                conn.close()
+        try:
+            return DiracConnection(process_ids), False
+        except (socket.error, ProtocolError) as err:
+            # The process has gone away (e.g. it has timed out), start a new one
+            logger.debug("Failed to connect to the DIRAC process, restarting it: %s" % err)
+            return DiracConnection(self._process_ids(stale=process_ids)), False
+
+    def execute(self, command, cwd=None, timeout=None):
+        """
+        Run a command on the server and return the reply, blocks whilst ``size`` other commands are in flight
+        Args:
+            command (str): The python code to be executed in the DIRAC environment
+            cwd (str): The directory to run the command in, None to run it in the scratch directory of the server
+            timeout (int): Time to wait for the reply, None waits forever
+        """
+        message = {'command': command, 'cwd': cwd}
+        with self._slots:
+            conn, reused = self._get()
+            try:
+                reply = conn.request(message, timeout)
+            except socket.timeout:
+                conn.close()
+                raise GangaDiracError("DIRAC command timed out")
+            except (socket.error, ProtocolError) as err:
+                conn.close()
+                if not reused:
+                    raise GangaDiracError("Lost connection to the DIRAC process: %s" % err)
+                # The connection was to a server which went away whilst it was idle, so the command never ran
+                logger.debug("Idle connection to the DIRAC process was lost, retrying: %s" % err)
+                conn, _ = self._get()
+                try:
+                    reply = conn.request(message, timeout)
+                except BaseException:
+                    conn.close()
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+            with self._lock:
+                self._idle.append(conn)
+        return reply
+
+    def close(self):
+        """
+        Close all of the idle connections
+        """
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle = []
+
+
+def getDiracConnectionPool():
+    """
+    Returns the pool of connections to the DIRAC server process of this session
+    """
+    global DIRAC_CONNECTION_POOL
+    with Dirac_Env_Lock:
+        if DIRAC_CONNECTION_POOL is None:
+            DIRAC_CONNECTION_POOL = DiracConnectionPool(getConfig('DIRAC')['MaxConcurrentCommands'])
+    return DIRAC_CONNECTION_POOL
+
+
+def _recordCommandLatency(command, seconds):
+    """
+    Add the time taken by a command to the latency statistics of its name
+    Args:
+        command (str): The command which was executed
+        seconds (float): How long it took
+    """
+    match = re.match(r'\s*([A-Za-z_][\w\.]*)', command)
+    name = match.group(1) if match else 'command'
+    with Dirac_Latency_Lock:
+        count, total, longest = DIRAC_COMMAND_LATENCY.get(name, (0, 0., 0.))
+        DIRAC_COMMAND_LATENCY[name] = (count + 1, total + seconds, max(longest, seconds))
+    logger.debug("DIRAC command '%s' took %.3f sec" % (name, seconds))
+
+
+def getDiracCommandLatency():
+    """
+    Returns a dict of the name of each DIRAC command executed -> (number of calls, total time, longest time) in seconds
+    """
+    with Dirac_Latency_Lock:
+        return dict(DIRAC_COMMAND_LATENCY)
+
+
 def execute(command,
             timeout=getConfig('DIRAC')['Timeout'],
             env=None,
@@ -206,7 +381,8 @@ def execute(command,
     """
     Execute a command on the local DIRAC server.
 
-    This function blocks until the server returns.
+    This function blocks until the server returns. Several threads can have commands in flight on the server at once,
+    up to the 'MaxConcurrentCommands' DIRAC config option.
 
     Args:
         command (str): This is the command we're running within our DIRAC session
@@ -220,54 +396,27 @@ def execute(command,
         new_subprocess(bool): Do we want to do this in a fresh subprocess or just connect to the DIRAC server process?
     """
 
-    if cwd is None:
-        # We can in all likelyhood be in a temp folder on a shared (SLOW) filesystem
-        # If we are we do NOT want to execute commands which will involve any I/O on the system that isn't needed
-        cwd_ = tempfile.mkdtemp()
-    else:
-        # We know were whe want to run, lets just run there
-        cwd_ = cwd
-
-    from GangaDirac.BOOT import startDiracProcess
     returnable = ''
     if not new_subprocess:
-        with Dirac_Exec_Lock:
-            # First check if a Dirac process is running
-            from GangaDirac.BOOT import running_dirac_process
-            if not running_dirac_process:
-                startDiracProcess()
-            # Set up a socket to connect to the process
-            from GangaDirac.BOOT import dirac_process_ids
-            HOST = 'localhost'  # The server's hostname or IP address
-            PORT = dirac_process_ids[1]        # The port used by the server
-
-            # Put inside a try/except in case the existing process has timed out
-            try:
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.connect((HOST, PORT))
-            except socket.error as serr:
-                # Start a new process
-                startDiracProcess()
-                from GangaDirac.BOOT import dirac_process_ids
-                PORT = dirac_process_ids[1]
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.connect((HOST, PORT))
-
-            # Send a random string, then change the directory to carry out the command, then send the command
-            command_to_send = str(dirac_process_ids[2])
-            command_to_send += 'os.chdir("%s")\n' % cwd_
-            command_to_send += command
-            s.sendall(('%s###END-TRANS###' % command_to_send).encode('utf-8'))
-            out = ''
-            while '###END-TRANS###' not in out:
-                data = s.recv(1024)
-                out += data.decode("utf-8")
-            s.close()
-            # Some regex nonsense to deal with the long representations in python 3
-            out = re.sub(r'((?:^|\s|,|{|\()\d+)L([^A-Za-z0-9\"\'])', r'\1\2', out)
-            returnable = eval(out)
+        t0 = time.time()
+        reply = getDiracConnectionPool().execute(command, cwd=cwd)
+        _recordCommandLatency(command, time.time() - t0)
+        if reply['found']:
+            returnable = reply['output']
+        elif reply['error']:
+            returnable = reply['error']
+        else:
+            returnable = "No output returned by DIRAC command: %s" % command
 
     else:
+        if cwd is None:
+            # We can in all likelyhood be in a temp folder on a shared (SLOW) filesystem
+            # If we are we do NOT want to execute commands which will involve any I/O on the system that isn't needed
+            cwd_ = tempfile.mkdtemp()
+        else:
+            # We know were whe want to run, lets just run there
+            cwd_ = cwd
+
         if env is None:
             if cred_req is None:
                 env = getDiracEnv()
@@ -295,8 +444,8 @@ def execute(command,
         # TODO we would like some way of working out if the code has been executed correctly
         # Most commands will be OK now that we've added the check for the valid proxy before executing commands here
 
-    if cwd is None:
-        shutil.rmtree(cwd_, ignore_errors=True)
+        if cwd is None:
+            shutil.rmtree(cwd_, ignore_errors=True)
 
     if isinstance(returnable, dict):
         if return_raw_dict:
@@ -0,0 +1,166 @@
+"""
+Cache of the replicas of LFNs, kept in an SQLite database in the gangadir.
+
+DiracFile, the datasets and the splitters look up the replicas of their LFNs through the cache, which only asks DIRAC
+about the LFNs it has no entry for, or an entry older than [DIRAC]ReplicaCacheTTL. Entries are kept by kind of lookup,
+as getReplicas and getReplicasForJobs do not return the same replicas. The database is shared by all of the sessions
+using the gangadir, so that resplitting or resubmitting a large dataset costs almost no DIRAC traffic.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+from GangaCore.Runtime.GPIexport import exportToGPI
+
+logger = getLogger()
+
+REPLICA_CACHE_NAME = 'replica_cache.sqlite'
+
+# Largest number of LFNs in one statement, SQLite allows 999 parameters
+_LFN_CHUNK = 500
+
+# Cache of each gangadir used by this session, created on first use
+_replica_caches = {}
+_replica_caches_lock = threading.Lock()
+
+
+class ReplicaCache(object):
+    """
+    Replicas of LFNs ({SE: PFN}) by kind of lookup, with when they were stored
+    """
+
+    def __init__(self, filename, ttl):
+        """
+        Args:
+            filename (str): The SQLite database of the cache
+            ttl (float): How long (sec) the replicas of an LFN are used once stored
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            self._connection = sqlite3.connect(self.filename, timeout=60, check_same_thread=False)
+            with self._connection:
+                self._connection.execute('CREATE TABLE IF NOT EXISTS replicas (kind TEXT, lfn TEXT, replicas TEXT, '
+                                         'updated REAL, PRIMARY KEY (kind, lfn))')
+        return self._connection
+
+    def get(self, lfns, kind='getReplicas'):
+        """
+        Returns the replicas of the LFNs which have an entry younger than the TTL, as a dict LFN -> {SE: PFN}
+        Args:
+            lfns (list): The LFNs to look up
+            kind (str): The DIRAC command the replicas come from
+        """
+        lfns = list(set(lfns))
+        found = {}
+        oldest = time.time() - self.ttl
+        with self._lock:
+            connection = self._connect()
+            for i in range(0, len(lfns), _LFN_CHUNK):
+                chunk = lfns[i:i + _LFN_CHUNK]
+                rows = connection.execute('SELECT lfn, replicas FROM replicas WHERE kind = ? AND updated >= ? AND '
+                                          'lfn IN (%s)' % ','.join('?' * len(chunk)), [kind, oldest] + chunk)
+                for lfn, replicas in rows:
+                    found[lfn] = json.loads(replicas)
+            self.hits += len(found)
+            self.misses += len(lfns) - len(found)
+        return found
+
+    def put(self, replicas, kind='getReplicas'):
+        """
+        Store the replicas of LFNs
+        Args:
+            replicas (dict): LFN -> {SE: PFN}, as in the 'Successful' result of DIRAC
+            kind (str): The DIRAC command the replicas come from
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO replicas VALUES (?, ?, ?, ?)',
+                                       [(kind, lfn, json.dumps(reps), now) for lfn, reps in replicas.items()])
+
+    def invalidate(self, lfns):
+        """
+        Drop the entries of the LFNs, of all kinds
+        Args:
+            lfns (list): The LFNs whose replicas may have changed
+        """
+        lfns = list(set(lfns))
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                for i in range(0, len(lfns), _LFN_CHUNK):
+                    chunk = lfns[i:i + _LFN_CHUNK]
+                    connection.execute('DELETE FROM replicas WHERE lfn IN (%s)' % ','.join('?' * len(chunk)), chunk)
+
+    def lookup(self, lfns, fetch, kind='getReplicas'):
+        """
+        Returns the replicas of the LFNs in the form of the result of DIRAC, {'Successful': ..., 'Failed': ...},
+        calling fetch only for those missing from the cache or stale, whose successful results are then stored
+        Args:
+            lfns (list): The LFNs to look up
+            fetch (callable): Called with the list of LFNs to look up in DIRAC, returns its result
+            kind (str): The DIRAC command fetch runs
+        """
+        found = self.get(lfns, kind)
+        failed = {}
+        missing = [lfn for lfn in dict.fromkeys(lfns) if lfn not in found]
+        if missing:
+            result = fetch(missing)
+            self.put(result['Successful'], kind)
+            found.update(result['Successful'])
+            failed = result.get('Failed', {})
+        logger.debug("Replicas of %d LFNs from the cache, %d from DIRAC" % (len(lfns) - len(missing), len(missing)))
+        return {'Successful': found, 'Failed': failed}
+
+    def statistics(self):
+        """
+        Returns the number of LFNs found (hits) and missing or stale (misses) in this session and the number of
+        entries of the cache
+        """
+        with self._lock:
+            entries = self._connect().execute('SELECT COUNT(*) FROM replicas').fetchone()[0]
+            return {'hits': self.hits, 'misses': self.misses, 'entries': entries}
+
+
+def getReplicaCache():
+    """
+    Returns the replica cache of the gangadir, None if replicas are not cached ([DIRAC]ReplicaCacheTTL is 0)
+    """
+    ttl = getConfig('DIRAC')['ReplicaCacheTTL']
+    if not ttl or ttl <= 0:
+        return None
+    filename = os.path.join(getConfig('Configuration')['gangadir'], REPLICA_CACHE_NAME)
+    with _replica_caches_lock:
+        if filename not in _replica_caches:
+            _replica_caches[filename] = ReplicaCache(filename, ttl)
+        cache = _replica_caches[filename]
+    cache.ttl = ttl
+    return cache
+
+
+def replicaCacheStatistics():
+    """
+    Returns the number of LFNs whose replicas were found in the replica cache of the gangadir (hits) and had to be
+    asked of DIRAC (misses) in this session, and the number of LFNs in the cache
+    """
+    cache = getReplicaCache()
+    if cache is None:
+        return {'hits': 0, 'misses': 0, 'entries': 0}
+    return cache.statistics()
+
+
+exportToGPI('replicaCacheStatistics', replicaCacheStatistics, 'Functions')
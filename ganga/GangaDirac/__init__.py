@@ -57,9 +57,19 @@ if not _after_bootstrap:
     configDirac.addOption('MaxDiracBulkJobs', 500,
                           'The Maximum allowed number of bulk submitted jobs before Ganga intervenes')
 
+    configDirac.addOption('MaxConcurrentCommands', 4,
+                          'The maximum number of commands which are sent to the DIRAC process at the same time')
+
     configDirac.addOption('numParallelJobs', 1000,
                           'The Maximum allowed number of Jobs to update the status for in parallel')
 
+    configDirac.addOption('MaxConcurrentMonitoringChunks', 4,
+                          'The maximum number of chunks of jobs whose status is queried from DIRAC at the same time')
+
+    configDirac.addOption('MonitoringChunkTargetTime', 60.,
+                          'Time (sec) a single status query should take, chunks of jobs are made smaller when queries '
+                          'take longer than this and larger again when they are quick. Set to 0 to always use numParallelJobs')
+
     configDirac.addOption('failed_sandbox_download', True, 'Automatically download sandbox for failed jobs?')
 
     configDirac.addOption(
@@ -90,6 +100,10 @@ if not _after_bootstrap:
         True,
         'Should the DiracFile object automatically poll the Dirac backend for missing information on an lfn?')
 
+    configDirac.addOption('ReplicaCacheTTL', 86400,
+                          'Time (sec) the replicas of an LFN are taken from the replica cache of the gangadir before '
+                          'DIRAC is asked for them again. Set to 0 to not cache replicas')
+
     configDirac.addOption('OfflineSplitterFraction', 0.75,
                           'If subset is above OfflineSplitterFraction*filesPerJob then keep the subset')
     configDirac.addOption(
@@ -146,6 +160,11 @@ if not _after_bootstrap:
 
     configDirac.addOption('maxSubjobsPerProcess', 100,
                           'Set the maximum number of subjobs to be submitted per process.')
+    configDirac.addOption('MaxConcurrentSubmitBlocks', 4,
+                          'The maximum number of blocks of maxSubjobsPerProcess subjobs which are submitted at the same time')
+    configDirac.addOption('SubmitBlockRetries', 2,
+                          'Number of times the submission of a block of subjobs carries on with a new DIRAC process when '
+                          'one fails. The subjob being submitted then is failed, it is not submitted twice')
     configDirac.addOption(
         'maxSubjobsFinalisationPerProcess',
         40,
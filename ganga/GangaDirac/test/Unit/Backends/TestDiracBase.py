@@ -523,3 +523,81 @@ def test_getOutputData_diskFull(db_full, tmpdir):
         with pytest.raises(GangaDiskSpaceError) as execinfo:
             assert not db_full.getOutputData() == ['a', 'b', 'c']
             assert str(execinfo.value) == 'Mock no disk space!'
+
+
+def submitting_subjobs(db, n):
+    """Make a master job with the backend db and n subjobs waiting to be submitted, return the subjobs"""
+    from GangaDirac.Lib.Backends.DiracBase import DiracBase
+
+    j = Job()
+    j.id = 0
+    j.backend = db
+    db._parent = j
+    subjobs = []
+    for i in range(n):
+        sj = Job()
+        sj.id = i
+        sj._setParent(j)
+        sj.backend = DiracBase()
+        subjobs.append(sj)
+    j.subjobs = subjobs
+    for sj in j.subjobs:
+        sj.updateStatus('submitting')
+    return list(j.subjobs)
+
+
+def test__submit_block_retry(db):
+    """A job whose submission is interrupted is failed rather than submitted again, the block carries on after it"""
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    subjobs = submitting_subjobs(db, 3)
+    block = [(sj, 'script_%s' % sj.id) for sj in subjobs]
+    results = [{'OK': True, 'Value': 100}, GangaDiracError('The DIRAC process died'), {'OK': True, 'Value': 102}]
+    with patch('GangaDirac.Lib.Backends.DiracBase.AsyncDiracManager') as manager:
+        execute = manager.return_value.execute = AsyncMock(side_effect=results)
+        submitFailures = asyncio.run(db._submit_block(block))
+
+    assert [call.kwargs['args_dict']['script'] for call in execute.call_args_list] == ['script_0', 'script_1', 'script_2']
+    assert list(submitFailures) == ['0.1']
+    assert [sj.status for sj in subjobs] == ['submitted', 'failed', 'submitted']
+    assert [sj.backend.id for sj in subjobs] == [100, None, 102]
+
+
+def test__submit_block_failure(db):
+    """Once the retries are used up the jobs left in the block are failed without being submitted"""
+    import asyncio
+    from unittest.mock import AsyncMock
+
+    subjobs = submitting_subjobs(db, 5)
+    block = [(sj, 'script_%s' % sj.id) for sj in subjobs]
+    with patch('GangaDirac.Lib.Backends.DiracBase.AsyncDiracManager') as manager:
+        execute = manager.return_value.execute = AsyncMock(side_effect=GangaDiracError('The DIRAC process died'))
+        submitFailures = asyncio.run(db._submit_block(block))
+
+    # The first job and one more for each of the 2 retries of [DIRAC]SubmitBlockRetries
+    assert execute.call_count == 3
+    assert sorted(submitFailures) == ['0.%s' % i for i in range(5)]
+    assert all(sj.status == 'failed' and sj.backend.id is None for sj in subjobs)
+
+
+def test__submit_blocks_error(db, mocker):
+    """An unexpected error in one block is only raised once the other blocks are done"""
+    import asyncio
+
+    mocker.patch('GangaCore.GPIDev.Credentials.credential_store')
+    subjobs = submitting_subjobs(db, 2)
+
+    async def execute(cmd, args_dict, return_raw_dict, cred_req):
+        if args_dict['script'] == 'script_0':
+            raise RuntimeError('Unexpected')
+        await asyncio.sleep(0.2)
+        return {'OK': True, 'Value': 101}
+
+    with patch('GangaDirac.Lib.Backends.DiracBase.AsyncDiracManager') as manager:
+        manager.return_value.execute = execute
+        with pytest.raises(RuntimeError):
+            db._submit_blocks([[(sj, 'script_%s' % sj.id)] for sj in subjobs])
+
+    assert subjobs[1].status == 'submitted'
+    assert subjobs[1].backend.id == 101
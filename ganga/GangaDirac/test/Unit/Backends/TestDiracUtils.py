@@ -112,3 +112,26 @@ def test_outputfiles_iterator():
     assert [f.name for f in outputfiles_iterator(test_job, TestFile, selection_pred=pred_b)] == ['BS2']
     assert [f.name for f in outputfiles_iterator(
         test_job, TestFile, selection_pred=pred_b, include_subfiles=False)] == []
+
+
+def test_monitoring_chunk_sizer():
+    from GangaDirac.Lib.Backends.DiracUtils import MonitoringChunkSizer
+
+    sizer = MonitoringChunkSizer(1000, 10., min_size=100)
+    assert [len(c) for c in sizer.split(list(range(2500)))] == [1000, 1000, 500]
+
+    # Slow queries shrink the chunks, but not below the minimum
+    sizer.record(1000, 30.)
+    assert sizer.size == 500
+    for _ in range(5):
+        sizer.record(sizer.size, 30.)
+    assert sizer.size == 100
+
+    # Quick queries of full chunks let them grow back, partial chunks say nothing about the size
+    sizer.record(50, 1.)
+    assert sizer.size == 100
+    sizer.record(100, 1.)
+    assert sizer.size == 125
+    for _ in range(20):
+        sizer.record(sizer.size, 1.)
+    assert sizer.size == 1000
@@ -0,0 +1,138 @@
+import datetime
+import inspect
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import pytest
+
+from GangaCore.testlib.GangaUnitTest import load_config_files, clear_config
+
+
+@pytest.fixture(scope='module', autouse=True)
+def config_files():
+    """
+    Load the config files in a way similar to a full Ganga session
+    """
+    load_config_files()
+    yield
+    clear_config()
+
+
+@pytest.fixture(scope='module')
+def dirac_server():
+    """
+    Run the DIRAC server process with a plain python, i.e. without the DIRAC environment or command includes
+    """
+    import GangaDirac.BOOT as BOOT
+    from GangaDirac.Lib.Server import DiracProtocol
+
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('localhost', 0))
+    port = s.getsockname()[1]
+    s.close()
+    serverpath = os.path.join(os.path.dirname(inspect.getsourcefile(DiracProtocol)), 'DiracOldProcess.py')
+    rand_hash = uuid.uuid4()
+    process = subprocess.Popen([sys.executable, serverpath, str(port)], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    process.stdin.write(str(rand_hash).encode('utf-8'))
+    process.stdin.close()
+
+    for _ in range(100):
+        try:
+            socket.create_connection(('localhost', port)).close()
+            break
+        except socket.error:
+            time.sleep(0.1)
+
+    old_ids = BOOT.running_dirac_process, BOOT.dirac_process_ids
+    BOOT.running_dirac_process = (process.pid, port)
+    BOOT.dirac_process_ids = (process.pid, port, rand_hash)
+    yield BOOT.dirac_process_ids
+    BOOT.running_dirac_process, BOOT.dirac_process_ids = old_ids
+    process.kill()
+    process.wait()
+
+
+def test_protocol_roundtrip():
+    """Types which JSON doesn't know about survive the trip"""
+    from GangaDirac.Lib.Server.DiracProtocol import dumps, loads
+
+    value = {'OK': True, 'Value': {1234: ('Done', 'Execution Complete'), (1, 'a'): {1, 2},
+                                   'when': datetime.datetime(2020, 1, 2, 3, 4, 5, 6), '__tag__': [b'raw']}}
+    assert loads(dumps(value)) == value
+
+
+def test_execute(dirac_server):
+    """Commands are executed by the server and their output is returned"""
+    from GangaDirac.Lib.Utilities.DiracUtilities import execute, getDiracCommandLatency, GangaDiracError
+
+    value = execute("output({'OK': True, 'Value': {12: __import__('datetime').datetime(2020, 1, 1)}})")
+    assert value == {12: datetime.datetime(2020, 1, 1)}
+
+    # Large replies come back in one piece
+    assert execute("output({'OK': True, 'Value': 'x' * (8 * 1024 * 1024)})") == 'x' * (8 * 1024 * 1024)
+
+    with pytest.raises(GangaDiracError):
+        execute("output({'OK': False, 'Message': 'failed'})")
+    with pytest.raises(GangaDiracError):
+        execute("raise RuntimeError('broken')")
+
+    assert getDiracCommandLatency()['output'][0] >= 3
+
+
+def test_concurrent_commands(dirac_server):
+    """Several commands are in flight at once"""
+    from GangaDirac.Lib.Utilities.DiracUtilities import DiracConnectionPool
+
+    pool = DiracConnectionPool(4)
+    command = "__import__('time').sleep(1); output({'OK': True, 'Value': 1})"
+    replies = []
+
+    def run():
+        replies.append(pool.execute(command))
+
+    t0 = time.time()
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.time() - t0 < 3
+    assert all(reply['output'] == {'OK': True, 'Value': 1} for reply in replies)
+    pool.close()
+
+
+def test_commands_keep_their_directory(dirac_server, tmpdir):
+    """A command run in a directory of its own doesn't move the commands run side by side with it"""
+    from GangaDirac.Lib.Utilities.DiracUtilities import DiracConnectionPool
+
+    pool = DiracConnectionPool(2)
+    replies = {}
+
+    def run(name, command, cwd=None):
+        replies[name] = pool.execute(command, cwd=cwd)
+
+    elsewhere = threading.Thread(target=run, args=('elsewhere', "__import__('time').sleep(1); "
+                                                   "output({'OK': True, 'Value': __import__('os').getcwd()})",
+                                                   str(tmpdir)))
+    elsewhere.start()
+    time.sleep(0.2)
+    run('scratch', "output({'OK': True, 'Value': __import__('os').getcwd()})")
+    elsewhere.join()
+    pool.close()
+
+    assert replies['elsewhere']['output']['Value'] == os.path.realpath(str(tmpdir))
+    assert replies['scratch']['output']['Value'] != os.path.realpath(str(tmpdir))
+
+
+def test_bad_auth_is_refused(dirac_server):
+    """A connection which doesn't know the random string of the server can't run commands"""
+    from GangaDirac.Lib.Server.DiracProtocol import ProtocolError
+    from GangaDirac.Lib.Utilities.DiracUtilities import DiracConnection
+
+    with pytest.raises((ProtocolError, socket.error)):
+        DiracConnection(dirac_server[:2] + ('wrong',))
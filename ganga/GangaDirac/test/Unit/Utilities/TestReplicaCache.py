@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+
+from GangaCore.testlib.GangaUnitTest import load_config_files, clear_config
+
+
+@pytest.fixture(scope='module', autouse=True)
+def config_files():
+    """
+    Load the config files in a way similar to a full Ganga session
+    """
+    load_config_files()
+    yield
+    clear_config()
+
+
+class FakeDirac(object):
+    """
+    Answers replica lookups for the LFNs it knows and records each of them
+    """
+
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self.lookups = []
+
+    def __call__(self, lfns):
+        self.lookups.append(list(lfns))
+        return {'Successful': {lfn: self.replicas[lfn] for lfn in lfns if lfn in self.replicas},
+                'Failed': {lfn: 'No such file' for lfn in lfns if lfn not in self.replicas}}
+
+
+def test_lookup(tmpdir):
+    """
+    Only the LFNs missing from the cache or stale there are looked up, the cache is kept on disk
+    """
+    from GangaDirac.Lib.Utilities.ReplicaCache import ReplicaCache
+
+    filename = os.path.join(str(tmpdir), 'replicas.sqlite')
+    dirac = FakeDirac({'/lfn/%d' % i: {'SE-%d' % i: 'root://se/lfn/%d' % i} for i in range(3)})
+    cache = ReplicaCache(filename, 3600)
+
+    result = cache.lookup(['/lfn/0', '/lfn/1'], dirac)
+    assert sorted(result['Successful']) == ['/lfn/0', '/lfn/1']
+    result = cache.lookup(['/lfn/0', '/lfn/1', '/lfn/2', '/lfn/missing'], dirac)
+    assert result['Successful']['/lfn/2'] == {'SE-2': 'root://se/lfn/2'}
+    assert list(result['Failed']) == ['/lfn/missing']
+    assert dirac.lookups == [['/lfn/0', '/lfn/1'], ['/lfn/2', '/lfn/missing']]
+    assert cache.statistics() == {'hits': 2, 'misses': 4, 'entries': 3}
+
+    # another session using the same gangadir
+    other = ReplicaCache(filename, 3600)
+    assert other.lookup(['/lfn/1'], dirac)['Successful'] == {'/lfn/1': {'SE-1': 'root://se/lfn/1'}}
+    assert len(dirac.lookups) == 2
+
+    # the entries of the other lookups are kept apart
+    other.lookup(['/lfn/1'], dirac, kind='getReplicasForJobs')
+    assert dirac.lookups[-1] == ['/lfn/1']
+
+    other.invalidate(['/lfn/1'])
+    other.lookup(['/lfn/0', '/lfn/1'], dirac)
+    assert dirac.lookups[-1] == ['/lfn/1']
+
+
+def test_ttl(tmpdir):
+    """
+    Entries older than the TTL are looked up again
+    """
+    from GangaDirac.Lib.Utilities.ReplicaCache import ReplicaCache
+
+    dirac = FakeDirac({'/lfn/0': {'SE': 'root://se/lfn/0'}})
+    cache = ReplicaCache(os.path.join(str(tmpdir), 'replicas.sqlite'), 0.5)
+    cache.lookup(['/lfn/0'], dirac)
+    cache.lookup(['/lfn/0'], dirac)
+    assert len(dirac.lookups) == 1
+    time.sleep(0.6)
+    cache.lookup(['/lfn/0'], dirac)
+    assert len(dirac.lookups) == 2
@@ -26,6 +26,7 @@ from GangaCore.Utility.Config import getConfig
 from GangaDirac.Lib.Files.DiracFile import DiracFile
 
 from .GaudiExecUtils import getGaudiExecInputData, _exec_cmd, getTimestampContent, gaudiPythonWrapper
+from .GaudiExecBuildCache import getGaudiExecBuildCache, getProjectFingerprint, getOptionsFingerprint
 
 logger = getLogger()
 
@@ -271,7 +272,34 @@ class GaudiExec(IPrepareApp):
         self.configure(self)
         logger.info('Preparing %s application.' % getName(self))
 
-        this_build_target = self.buildGangaTarget()
+        build_cache = getGaudiExecBuildCache()
+        cached_build = None
+        if build_cache is not None:
+            fingerprint = getProjectFingerprint(self.directory, self.platform, GaudiExec.build_target)
+            options_fingerprint = getOptionsFingerprint(self.getOptsFiles())
+            cached_build = build_cache.lookup(fingerprint, GaudiExec.cmake_sandbox_name)
+
+        # The shared directory of an identical preparation is only shared by apps counted in the shareref, as the
+        # directory of an app which is not would be removed with it at the end of the session
+        if cached_build and options_fingerprint in cached_build['sharedirs'] and self._getRegistry() is not None:
+            self.is_prepared = ShareDir()
+            self.is_prepared.name = cached_build['sharedirs'][options_fingerprint]
+            logger.info('Project unchanged since it was prepared, sharing directory: %s' % self.is_prepared.name)
+            self.envVars = cached_build['envVars']
+            self.incrementShareCounter(self.is_prepared)
+            for opts_file in self.getOptsFiles():
+                if isinstance(opts_file, DiracFile):
+                    opts_file.localDir = self.getSharedPath()
+            self.post_prepare()
+            return 1
+
+        if cached_build:
+            sharedir = next(iter(cached_build['sharedirs'].values()))
+            this_build_target = path.join(build_cache.shared_path, sharedir, GaudiExec.cmake_sandbox_name)
+            logger.info('Project unchanged since it was built, using %s' % this_build_target)
+            self.envVars = cached_build['envVars']
+        else:
+            this_build_target = self.buildGangaTarget()
 
         self.is_prepared = ShareDir()
         logger.info('Created shared directory: %s' % (self.is_prepared.name))
@@ -318,7 +346,10 @@ class GaudiExec(IPrepareApp):
             self.unprepare()
             raise
 
-        self.cleanGangaTargetArea(this_build_target)
+        if not cached_build:
+            self.cleanGangaTargetArea(this_build_target)
+        if build_cache is not None and self._getRegistry() is not None:
+            build_cache.store(fingerprint, options_fingerprint, self.is_prepared.name, self.envVars)
 
         return 1
 
@@ -0,0 +1,175 @@
+"""
+Cache of the builds of GaudiExec projects, so that preparing an application whose project has not changed since it
+was last built does not build it again.
+
+A build is known by the fingerprint of the project: the names, modes and contents of the files in its directory (the
+build directories aside), the platform and the build target. The index of the cache, kept in the gangadir, gives for
+each fingerprint the environment stored by the build and the shared directories holding its sandbox tarball, by the
+fingerprint of the options they were prepared with. Preparing an application with the same project and options shares
+one of these shared directories, with the same project only its tarball is copied.
+"""
+
+import hashlib
+import json
+import os
+import stat
+import threading
+
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.files import expandfilename
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+BUILD_CACHE_NAME = 'gaudiexec_build_cache.json'
+
+# Directories of a project which do not hold its sources
+_ignored_dirs = ('InstallArea',)
+
+# Digest of each file of a project by (name, size, mtime), so that only the files changed since are read again
+_file_digests = {}
+_file_digests_lock = threading.Lock()
+
+# Held whilst the index is read and rewritten
+_index_lock = threading.Lock()
+
+
+def _fileDigest(filename, file_stat):
+    key = (filename, file_stat.st_size, file_stat.st_mtime_ns)
+    with _file_digests_lock:
+        if key in _file_digests:
+            return _file_digests[key]
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as this_file:
+        for block in iter(lambda: this_file.read(1024 * 1024), b''):
+            digest.update(block)
+    with _file_digests_lock:
+        _file_digests[key] = digest.hexdigest()
+    return _file_digests[key]
+
+
+def getProjectFingerprint(directory, platform, build_target):
+    """
+    Returns the fingerprint of the build of a project: a hash of the names, modes and contents of the files in its
+    directory, except for the build directories, along with the platform and build target
+    Args:
+        directory (str): The directory of the project
+        platform (str): The platform the project is built for
+        build_target (str): The make target which is built
+    """
+    fingerprint = hashlib.sha1(('%s\0%s\0' % (platform, build_target)).encode())
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(_dir for _dir in dirs
+                         if not (_dir.startswith('.') or _dir.startswith('build.') or _dir in _ignored_dirs))
+        for name in sorted(files):
+            filename = os.path.join(root, name)
+            file_stat = os.lstat(filename)
+            if stat.S_ISLNK(file_stat.st_mode):
+                content = os.readlink(filename)
+            elif stat.S_ISREG(file_stat.st_mode):
+                content = _fileDigest(filename, file_stat)
+            else:
+                continue
+            relpath = os.path.relpath(filename, directory)
+            fingerprint.update(('%s\0%o\0%s\0' % (relpath, file_stat.st_mode, content)).encode())
+    return fingerprint.hexdigest()
+
+
+def getOptionsFingerprint(opts_files):
+    """
+    Returns the fingerprint of the options files of an application, which are copied into its shared directory
+    Args:
+        opts_files (list): The options of the application, as names of local files, LocalFiles or DiracFiles
+    """
+    from GangaDirac.Lib.Files.DiracFile import DiracFile
+    fingerprint = hashlib.sha1()
+    for opts_file in opts_files:
+        if isinstance(opts_file, DiracFile):
+            # files on the grid do not change
+            fingerprint.update(('lfn\0%s\0' % opts_file.lfn).encode())
+        else:
+            if isinstance(opts_file, str):
+                filename = opts_file
+            else:
+                filename = os.path.join(opts_file.localDir, os.path.basename(opts_file.namePattern))
+            fingerprint.update(('%s\0%s\0' % (os.path.basename(filename),
+                                              _fileDigest(filename, os.stat(filename)))).encode())
+    return fingerprint.hexdigest()
+
+
+class GaudiExecBuildCache(object):
+    """
+    Index of the builds of GaudiExec projects by their fingerprint
+    """
+
+    def __init__(self, filename, shared_path):
+        """
+        Args:
+            filename (str): The JSON file of the index
+            shared_path (str): The directory of the shared directories
+        """
+        self.filename = filename
+        self.shared_path = shared_path
+
+    def _read(self):
+        try:
+            with open(self.filename) as index_file:
+                return json.load(index_file)
+        except (IOError, ValueError):
+            return {}
+
+    def _write(self, index):
+        with open(self.filename + '.tmp', 'w') as index_file:
+            json.dump(index, index_file)
+        os.rename(self.filename + '.tmp', self.filename)
+
+    def lookup(self, fingerprint, tarball_name):
+        """
+        Returns the build of a project as a dict with the environment ('envVars') and the shared directories holding
+        its tarball by options fingerprint ('sharedirs'), None if there is none. Shared directories which have been
+        removed since are forgotten.
+        Args:
+            fingerprint (str): The fingerprint of the project
+            tarball_name (str): The name of the sandbox tarball in the shared directories
+        """
+        with _index_lock:
+            index = self._read()
+            build = index.get(fingerprint)
+            if build is None:
+                return None
+            sharedirs = {options: name for options, name in build['sharedirs'].items()
+                         if os.path.isfile(os.path.join(self.shared_path, name, tarball_name))}
+            if sharedirs != build['sharedirs']:
+                if sharedirs:
+                    build['sharedirs'] = sharedirs
+                else:
+                    del index[fingerprint]
+                self._write(index)
+        return build if sharedirs else None
+
+    def store(self, fingerprint, options_fingerprint, sharedir, envVars):
+        """
+        Record a shared directory holding the build of a project
+        Args:
+            fingerprint (str): The fingerprint of the project
+            options_fingerprint (str): The fingerprint of the options the shared directory was prepared with
+            sharedir (str): The name of the shared directory
+            envVars (dict): The environment stored by the build
+        """
+        with _index_lock:
+            index = self._read()
+            build = index.setdefault(fingerprint, {'envVars': envVars, 'sharedirs': {}})
+            build['envVars'] = envVars
+            build['sharedirs'][options_fingerprint] = sharedir
+            self._write(index)
+
+
+def getGaudiExecBuildCache():
+    """
+    Returns the build cache of the gangadir, None if builds are not cached ([LHCb]GaudiExecBuildCache is False)
+    """
+    if not getConfig('LHCb')['GaudiExecBuildCache']:
+        return None
+    from GangaCore.GPIDev.Lib.File import getSharedPath
+    gangadir = expandfilename(getConfig('Configuration')['gangadir'])
+    return GaudiExecBuildCache(os.path.join(gangadir, BUILD_CACHE_NAME), getSharedPath())
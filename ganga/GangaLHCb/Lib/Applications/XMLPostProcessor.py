@@ -7,6 +7,7 @@
 import os
 import sys
 import re
+from GangaCore.Utility.Config import getConfig
 from GangaLHCb.Lib.Applications.AppsBaseUtils import backend_handlers, activeSummaryItems
 
 #\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\#
@@ -61,10 +62,10 @@ def postprocess(self, logger):
         #    return
 
         schemapath = os.path.join(env['XMLSUMMARYBASEROOT'], 'xml/XMLSummary.xsd')
-        from GangaLHCb.Lib.XMLSummary.summary import Merge
+        from GangaLHCb.Lib.XMLSummary.merger import StreamMerge
 
         try:
-            XMLSummarydata = Merge(summaries, schemapath)
+            XMLSummarydata = StreamMerge(summaries, schemapath, getConfig('LHCb')['XMLSummaryMergeProcesses'])
         except Exception as err:
             logger.error('Problem while merging the subjobs XML summaries')
             raise
@@ -133,10 +134,10 @@ def GaudiExecPostProcess(self, logger):
         #    return
 
         schemapath = os.path.join(env['XMLSUMMARYBASEROOT'], 'xml/XMLSummary.xsd')
-        from GangaLHCb.Lib.XMLSummary.summary import Merge
+        from GangaLHCb.Lib.XMLSummary.merger import StreamMerge
 
         try:
-            XMLSummarydata = Merge(summaries, schemapath)
+            XMLSummarydata = StreamMerge(summaries, schemapath, getConfig('LHCb')['XMLSummaryMergeProcesses'])
         except Exception as err:
             logger.error('Problem while merging the subjobs XML summaries')
             raise
@@ -11,9 +11,13 @@ from GangaDirac.Lib.Backends.DiracUtils import get_result
 from GangaDirac.Lib.Utilities.DiracUtilities import GangaDiracError
 from GangaDirac.Lib.Files.DiracFile import DiracFile
 from GangaCore.Utility.logging import getLogger
+from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
 from GangaLHCb.Lib.LHCbDataset import LHCbDataset, LHCbCompressedDataset
+from GangaLHCb.Lib.LHCbDataset.LHCbCompressedDataset import LHCbCompressedFileSet
+from GangaLHCb.Lib.LHCbDataset.BKQueryCache import BKQueryCache, getBKQueryCache
 from GangaLHCb.Lib.Backends.Dirac import filterLFNsBySE
 logger = getLogger()
+knownLists = [tuple, list, GangaList]
 #\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\#
 
 
@@ -80,6 +84,13 @@ RecoToDST-07/90000000/DST" ,
     This will query the bookkeeping for the up-to-date version of the data.
     N.B. BKQuery objects can be stored in your Ganga box.
 
+    The result is kept in the gangadir and used again by the next getDataset
+    calls for the same query for [LHCb]BKQueryCacheTTL seconds. To query the
+    bookkeeping anyway use getDataset(useCache=False) or bkq.invalidateCache().
+    Only the files added since the last call for a given consumer are
+    returned by:
+    new_data = bkq.getNewDataset('my_loop')
+
     '''
     schema = {}
     docstr = 'Bookkeeping query path (type dependent)'
@@ -101,17 +112,13 @@ RecoToDST-07/90000000/DST" ,
     _schema = Schema(Version(1, 2), schema)
     _category = 'query'
     _name = "BKQuery"
-    _exportmethods = ['getDataset', 'getDatasetMetadata']
+    _exportmethods = ['getDataset', 'getDatasetMetadata', 'getNewDataset', 'invalidateCache']
 
     def __init__(self, path=''):
         super(BKQuery, self).__init__()
         self.path = path
 
-    @require_credential
-    def getDatasetMetadata(self):
-        '''Gets the dataset from the bookkeeping for current path, etc.'''
-        if not self.path:
-            return None
+    def _checkQuery(self):
         if self.type not in ['Path', 'RunsByDate', 'Run', 'Production']:
             raise GangaException('Type="%s" is not valid.' % self.type)
         if not self.type == 'RunsByDate':
@@ -124,13 +131,29 @@ RecoToDST-07/90000000/DST" ,
             if self.selection:
                 msg = 'selection not supported for type="%s".' % self.type
                 raise GangaException(msg)
+
+    def _datasetCommand(self):
         cmd = "getDataset('%s','%s','%s','%s','%s','%s')" % (self.path, self.dqflag,
                                                              self.type, self.startDate, self.endDate, self.selection)
-        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
-        knownLists = [tuple, list, GangaList]
         if isType(self.dqflag, knownLists):
-            cmd = "getDataset('%s',%s,'%s','%s','%s','%s')" % (self.path, self.dqflag,
-                                                               self.type, self.startDate, self.endDate, self.selection)
+            cmd = "getDataset('%s',%s,'%s','%s','%s','%s')" % (self.path, self.dqflag, self.type, self.startDate,
+                                                               self.endDate, self.selection)
+        return cmd
+
+    def _cacheKey(self, SE):
+        """The key of the result of this query in the BKQuery cache"""
+        dqflag = list(self.dqflag) if isType(self.dqflag, knownLists) else self.dqflag
+        SE = list(SE) if isType(SE, knownLists) else SE
+        return BKQueryCache.key([self.path, dqflag, self.type, self.startDate, self.endDate, self.selection, SE,
+                                 self.check_archived])
+
+    @require_credential
+    def getDatasetMetadata(self):
+        '''Gets the dataset from the bookkeeping for current path, etc.'''
+        if not self.path:
+            return None
+        self._checkQuery()
+        cmd = self._datasetCommand()
 
         try:
             value = get_result(cmd, 'BK query error.', credential_requirements=self.credential_requirements)
@@ -150,31 +173,10 @@ RecoToDST-07/90000000/DST" ,
 
         return {'OK': False, 'Value': metadata}
 
-    @require_credential
-    def getDataset(self, compressed=True, SE=None):
-        '''Gets the dataset from the bookkeeping for current path, etc.'''
-        if not self.path:
-            return None
-        if self.type not in ['Path', 'RunsByDate', 'Run', 'Production']:
-            raise GangaException('Type="%s" is not valid.' % self.type)
-        if not self.type == 'RunsByDate':
-            if self.startDate:
-                msg = 'startDate not supported for type="%s".' % self.type
-                raise GangaException(msg)
-            if self.endDate:
-                msg = 'endDate not supported for type="%s".' % self.type
-                raise GangaException(msg)
-            if self.selection:
-                msg = 'selection not supported for type="%s".' % self.type
-                raise GangaException(msg)
-        cmd = "getDataset('%s','%s','%s','%s','%s','%s')" % (self.path, self.dqflag,
-                                                             self.type, self.startDate, self.endDate, self.selection)
-        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
-        knownLists = [tuple, list, GangaList]
-        if isType(self.dqflag, knownLists):
-            cmd = "getDataset('%s',%s,'%s','%s','%s','%s')" % (self.path, self.dqflag, self.type, self.startDate,
-                                                               self.endDate, self.selection)
-        result = get_result(cmd, 'BK query error.', credential_requirements=self.credential_requirements)
+    def _queryLFNs(self, SE):
+        '''Runs the query in the bookkeeping and returns the LFNs of the dataset'''
+        result = get_result(self._datasetCommand(), 'BK query error.',
+                            credential_requirements=self.credential_requirements)
         logger.debug("Finished Running Command")
         files = []
         value = result
@@ -187,14 +189,8 @@ RecoToDST-07/90000000/DST" ,
             tempFiles = filterLFNsBySE(files, SE)
             files = tempFiles
 
-        logger.debug("Creating dataset")
-
         if len(files) == 0:
-            logger.warning("No files found for BKQuery %s, returning an empty data set" % self.path)
-            if compressed:
-                return LHCbCompressedDataset()
-            else:
-                return LHCbDataset()
+            return files
 
         # If we think this is an MC request check to see if the data set has been archived.
         isMC = False
@@ -204,8 +200,8 @@ RecoToDST-07/90000000/DST" ,
             logger.debug('Detected an MC data set. Checking if it has been archived')
             all_reps = get_result("getReplicas(%s)" % files, 'Get replica error.',
                                   credential_requirements=self.credential_requirements)
+            all_ses = set([])
             if 'Successful' in all_reps:
-                all_ses = set([])
                 for _lfn, _repz in all_reps['Successful'].items():
                     all_ses.update(_repz.keys())
 
@@ -223,22 +219,71 @@ RecoToDST-07/90000000/DST" ,
                 logger.warning(
                     "All the files are only available on archive SEs. It is likely the data set has been archived. Contact data management to request that it be staged")
 
+        return files
+
+    def _getLFNs(self, SE, useCache):
+        '''Returns the LFNs of the dataset as their common prefix and the list of the rest of each of them, from the
+        BKQuery cache if it has a result of this query younger than [LHCb]BKQueryCacheTTL'''
+        cache = getBKQueryCache()
+        key = self._cacheKey(SE)
+        if useCache:
+            result = cache.get(key)
+            if result is not None:
+                logger.debug("Using the cached result of BKQuery %s" % self.path)
+                return result
+        return cache.put(key, self._queryLFNs(SE))
+
+    def _makeDataset(self, prefix, suffixes, compressed):
+        logger.debug("Creating dataset")
         if compressed:
-            ds = LHCbCompressedDataset(files)
+            if not suffixes:
+                return addProxy(LHCbCompressedDataset())
+            return addProxy(LHCbCompressedDataset(LHCbCompressedFileSet(suffixes, lfn_prefix=prefix)))
 
-        else:
-            logger.debug("Creating new list")
-            new_files = [DiracFile(lfn=f) for f in files]
+        logger.debug("Creating new list")
+        new_files = [DiracFile(lfn=prefix + f) for f in suffixes]
 
-            logger.info("Constructing LHCbDataset")
+        logger.info("Constructing LHCbDataset")
 
-            logger.debug("Imported LHCbDataset")
-            ds = LHCbDataset(files=new_files, fromRef=True)
+        logger.debug("Imported LHCbDataset")
+        ds = LHCbDataset(files=new_files, fromRef=True)
 
-            logger.debug("Returning Dataset")
+        logger.debug("Returning Dataset")
 
         return addProxy(ds)
 
+    @require_credential
+    def getDataset(self, compressed=True, SE=None, useCache=True):
+        '''Gets the dataset from the bookkeeping for current path, etc.
+        The result is kept in the gangadir and used again for [LHCb]BKQueryCacheTTL seconds, unless useCache is False'''
+        if not self.path:
+            return None
+        self._checkQuery()
+        prefix, suffixes = self._getLFNs(SE, useCache)
+
+        if len(suffixes) == 0:
+            logger.warning("No files found for BKQuery %s, returning an empty data set" % self.path)
+
+        return self._makeDataset(prefix, suffixes, compressed)
+
+    @require_credential
+    def getNewDataset(self, consumer, compressed=True, SE=None, useCache=True):
+        '''Gets the files of the dataset which are new since the last time getNewDataset was called for the consumer
+        (any name, e.g. of a loop over the data) with this query. The first time all of the files are new.'''
+        if not self.path:
+            return None
+        self._checkQuery()
+        self._getLFNs(SE, useCache)
+        added, removed = getBKQueryCache().changes(self._cacheKey(SE), consumer)
+        if removed:
+            logger.info("%d files have been removed from the dataset of BKQuery %s since %s last asked" %
+                        (len(removed), self.path, consumer))
+        return self._makeDataset('', added, compressed)
+
+    def invalidateCache(self, SE=None):
+        '''Have the next getDataset query the bookkeeping rather than use the result kept in the gangadir'''
+        getBKQueryCache().invalidate(self._cacheKey(SE))
+
 #\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\#
 
 
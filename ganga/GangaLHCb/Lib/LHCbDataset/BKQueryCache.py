@@ -0,0 +1,184 @@
+"""
+Cache of the results of bookkeeping queries, kept in an SQLite database in the gangadir.
+
+BKQuery.getDataset only runs a query (and the archive check of MC data sets) when the cache has no result for its
+parameters, or one older than [LHCb]BKQueryCacheTTL. The LFNs of a result are stored as the common prefix and the
+compressed list of suffixes, the form LHCbCompressedFileSet keeps them in. Each time the result of a query changes the
+LFNs added and removed are recorded, so that BKQuery.getNewDataset can return the files which are new to a consumer
+since it last asked.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+BKQUERY_CACHE_NAME = 'bkquery_cache.sqlite'
+
+# Cache of each gangadir used by this session, created on first use
+_bkquery_caches = {}
+_bkquery_caches_lock = threading.Lock()
+
+
+def _pack(strings):
+    return zlib.compress('\n'.join(strings).encode())
+
+
+def _unpack(packed):
+    if packed is None:
+        return []
+    strings = zlib.decompress(packed).decode()
+    return strings.split('\n') if strings else []
+
+
+def compressLFNs(lfns):
+    """
+    Returns the common prefix of the LFNs and the compressed list of the rest of each of them
+    Args:
+        lfns (list): The LFNs to compress
+    """
+    prefix = os.path.commonpath(lfns) if lfns else ''
+    if prefix in lfns:
+        # the prefix is cut at a directory, so that no LFN is left with an empty suffix
+        prefix = os.path.dirname(prefix)
+    if prefix == '/':
+        prefix = ''
+    return prefix, _pack(lfn[len(prefix):] for lfn in lfns)
+
+
+class BKQueryCache(object):
+    """
+    Results of bookkeeping queries by their parameters, with when they were stored and how they changed
+    """
+
+    def __init__(self, filename, ttl):
+        """
+        Args:
+            filename (str): The SQLite database of the cache
+            ttl (float): How long (sec) the result of a query is used once stored
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            self._connection = sqlite3.connect(self.filename, timeout=60, check_same_thread=False)
+            with self._connection:
+                self._connection.execute('CREATE TABLE IF NOT EXISTS results (query TEXT PRIMARY KEY, prefix TEXT, '
+                                         'suffixes BLOB, updated REAL)')
+                self._connection.execute('CREATE TABLE IF NOT EXISTS changes (query TEXT, updated REAL, '
+                                         'added BLOB, removed BLOB)')
+                self._connection.execute('CREATE TABLE IF NOT EXISTS consumers (query TEXT, consumer TEXT, '
+                                         'seen REAL, PRIMARY KEY (query, consumer))')
+        return self._connection
+
+    @staticmethod
+    def key(parameters):
+        """
+        Returns the key of the result of a query in the cache
+        Args:
+            parameters (list): The parameters which the result of the query depends on
+        """
+        return json.dumps(parameters)
+
+    def get(self, query):
+        """
+        Returns the result of a query as (prefix, suffixes) if it was stored less than the TTL ago, None otherwise
+        Args:
+            query (str): The key of the query
+        """
+        with self._lock:
+            row = self._connect().execute('SELECT prefix, suffixes, updated FROM results WHERE query = ?',
+                                          (query,)).fetchone()
+        if row is None or row[2] < time.time() - self.ttl:
+            return None
+        return row[0], _unpack(row[1])
+
+    def put(self, query, lfns):
+        """
+        Store the result of a query, recording the LFNs added and removed since the result stored before
+        Args:
+            query (str): The key of the query
+            lfns (list): The LFNs the query returned
+        """
+        now = time.time()
+        prefix, suffixes = compressLFNs(lfns)
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute('SELECT prefix, suffixes FROM results WHERE query = ?', (query,)).fetchone()
+            known = set(row[0] + suffix for suffix in _unpack(row[1])) if row else set()
+            current = set(lfns)
+            added = sorted(current - known)
+            removed = sorted(known - current)
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                                   (query, prefix, suffixes, now))
+                if added or removed:
+                    connection.execute('INSERT INTO changes VALUES (?, ?, ?, ?)',
+                                       (query, now, _pack(added) if added else None,
+                                        _pack(removed) if removed else None))
+        return prefix, [lfn[len(prefix):] for lfn in lfns]
+
+    def changes(self, query, consumer):
+        """
+        Returns the LFNs added to and removed from the result of a query since the consumer last asked, the first time
+        all of the LFNs are new. The stored result is not refreshed, which is up to the caller.
+        Args:
+            query (str): The key of the query
+            consumer (str): The name the consumer of the query is known by
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute('SELECT seen FROM consumers WHERE query = ? AND consumer = ?',
+                                     (query, consumer)).fetchone()
+            seen = row[0] if row else 0.
+            rows = connection.execute('SELECT updated, added, removed FROM changes WHERE query = ? AND updated > ? '
+                                      'ORDER BY updated', (query, seen)).fetchall()
+            added = set()
+            removed = set()
+            for updated, added_lfns, removed_lfns in rows:
+                # an LFN removed and added back again (or the other way round) is not a change
+                added_lfns = set(_unpack(added_lfns))
+                removed_lfns = set(_unpack(removed_lfns))
+                added, removed = (added - removed_lfns) | (added_lfns - removed), \
+                    (removed - added_lfns) | (removed_lfns - added)
+                seen = updated
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO consumers VALUES (?, ?, ?)', (query, consumer, seen))
+        return sorted(added), sorted(removed)
+
+    def invalidate(self, query):
+        """
+        Have the result of a query looked up again the next time it is asked for. The result is kept to find what
+        changes then.
+        Args:
+            query (str): The key of the query
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('UPDATE results SET updated = 0 WHERE query = ?', (query,))
+
+
+def getBKQueryCache():
+    """
+    Returns the cache of bookkeeping queries of the gangadir
+    """
+    ttl = getConfig('LHCb')['BKQueryCacheTTL']
+    filename = os.path.join(getConfig('Configuration')['gangadir'], BKQUERY_CACHE_NAME)
+    with _bkquery_caches_lock:
+        if filename not in _bkquery_caches:
+            _bkquery_caches[filename] = BKQueryCache(filename, ttl)
+        cache = _bkquery_caches[filename]
+    cache.ttl = ttl
+    return cache
@@ -2,6 +2,8 @@
 import os
 import tempfile
 import fnmatch
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
 from GangaCore.Core.exceptions import GangaException
 from GangaCore.GPIDev.Lib.Dataset import GangaDataset
 from GangaCore.GPIDev.Schema import GangaFileItem, SimpleItem, Schema, Version, ComponentItem
@@ -13,7 +15,7 @@ import GangaLHCb.Lib.LHCbDataset
 from GangaCore.GPIDev.Base.Proxy import isType
 from GangaDirac.Lib.Backends.DiracUtils import get_result
 from GangaCore.GPIDev.Credentials import require_credential
-from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList, GangaListIter
 logger = GangaCore.Utility.logging.getLogger()
 
 # \/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\#
@@ -98,7 +100,7 @@ class LHCbCompressedDataset(GangaDataset):
     _schema = Schema(Version(3, 0), schema)
     _category = 'datasets'
     _name = "LHCbCompressedDataset"
-    _exportmethods = ['getReplicas', '__len__', '__getitem__', '__iter__', '__next__', 'replicate',
+    _exportmethods = ['getReplicas', '__len__', '__getitem__', '__iter__', 'replicate',
                       'append', 'extend', 'getCatalog', 'optionsString', 'getFileNames', 'getFilenameList',
                       'getLFNs', 'getFullFileNames', 'getFullDataset', 'hasLFNs',
                       'difference', 'isSubset', 'isSuperset', 'intersection',
@@ -146,29 +148,36 @@ class LHCbCompressedDataset(GangaDataset):
 
         self.files._setParent(self)
         self.persistency = persistency
-        self.current = 0
         logger.debug("Dataset Created")
 
+    def _offsets(self):
+        '''Return the index of the first file of each set followed by the total no. of files in the dataset'''
+        # The offsets are kept until the sets change, the list of sets they were made for is kept along with them so
+        # that they are not used for another one (e.g. once files has been set or the dataset copied)
+        cached = self.__dict__.get('_cachedOffsets')
+        if cached is None or cached[0] is not self.files or cached[1] != len(self.files):
+            offsets = list(accumulate((len(_set) for _set in self.files), initial=0))
+            cached = (self.files, len(self.files), offsets)
+            self._cachedOffsets = cached
+        return cached[2]
+
+    def _resetOffsets(self):
+        '''Drop the offsets of the sets, to be called whenever the sets change'''
+        self.__dict__.pop('_cachedOffsets', None)
+
     def _location(self, i):
         '''Figure out where a file of index i is. Returns the subset no and the location within that subset'''
-        setNo = 0
-        fileTotal = 0
-        while fileTotal < i + 1 and setNo < len(self.files):
-            fileTotal += len(self.files[setNo])
-            setNo += 1
-        if fileTotal < i:
+        offsets = self._offsets()
+        if i < 0:
+            i += offsets[-1]
+        if i < 0 or i >= offsets[-1]:
             return -1, -1
-        setNo = setNo - 1
-        fileTotal = fileTotal - len(self.files[setNo])
-        setLocation = i - fileTotal
-        return setNo, setLocation
+        setNo = bisect_right(offsets, i) - 1
+        return setNo, i - offsets[setNo]
 
     def _totalNFiles(self):
         '''Return the total no. of files in the dataset'''
-        total = 0
-        for _set in self.files:
-            total += len(_set)
-        return total
+        return self._offsets()[-1]
 
     def __len__(self):
         '''Redefine the __len__ function'''
@@ -176,35 +185,30 @@ class LHCbCompressedDataset(GangaDataset):
 
     def __getitem__(self, i):
         '''Proivdes scripting (e.g. ds[2] returns the 3rd file) '''
-        if isinstance(i, type(slice(0))):
-            # We construct a list of all LFNs first. Not the most efficient but it
-            # allows us to use the standard slice machinery
-            newLFNs = self.getLFNs()[i]
-            # Now pull out the prefixes/suffixes
-            setNo = 0
-            step = 1
-            # If we are going backwards start at the end
-            if i.step and i.step < 0:
-                step = -1
-                setNo = len(self.files) - 1
-            # Iterate over the LFNs and find out where it came from
+        if isinstance(i, slice):
+            offsets = self._offsets()
+            indices = range(*i.indices(offsets[-1]))
+            # The indices in increasing order so that they can be searched for the start and end of each set
+            ascending = indices if indices.step > 0 else indices[::-1]
+            setNos = range(len(self.files)) if indices.step > 0 else range(len(self.files) - 1, -1, -1)
             ds = LHCbCompressedDataset()
-            tempList = []
-            j = 0
-            while j < len(newLFNs):
-                if newLFNs[j] in self.files[setNo].getLFNs():
-                    tempList.append(newLFNs[j])
-                    j += 1
-                else:
-                    if len(tempList) > 0:
-                        ds.addSet(LHCbCompressedFileSet(tempList))
-                    setNo += step
-                    tempList = []
-            ds.addSet(LHCbCompressedFileSet(tempList))
+            for setNo in setNos:
+                first, last = offsets[setNo], offsets[setNo + 1]
+                selected = ascending[bisect_left(ascending, first):bisect_left(ascending, last)]
+                if not selected:
+                    continue
+                if indices.step < 0:
+                    selected = selected[::-1]
+                # Take the suffixes of this set in one go, the prefix is unchanged
+                start = selected.start - first
+                stop = start + len(selected) * selected.step
+                this_set = self.files[setNo]
+                suffixes = this_set.suffixes[start:stop if stop >= 0 else None:selected.step]
+                ds.addSet(LHCbCompressedFileSet(suffixes, this_set.lfn_prefix))
         else:
             # Figure out where the file lies
             setNo, setLocation = self._location(i)
-            if setNo < 0 or i >= self._totalNFiles():
+            if setNo < 0:
                 logger.error("Unable to retrieve file %s. It is larger than the dataset size" % i)
                 return None
             ds = DiracFile(lfn=self.files[setNo].getLFN(setLocation),
@@ -212,20 +216,18 @@ class LHCbCompressedDataset(GangaDataset):
         return ds
 
     def __iter__(self):
-        '''Fix the iterator'''
-        self.current = 0
-        return self
-
-    def __next__(self):
-        '''Fix the iterator'''
-        if self.current == self._totalNFiles():
-            raise StopIteration
-        else:
-            self.current += 1
-            return self[self.current - 1]
+        '''Iterate over the files of the dataset as DiracFiles, one set at a time'''
+        for _set in self.files:
+            prefix = _set.lfn_prefix
+            for _suffix in _set.suffixes:
+                yield DiracFile(lfn=prefix + _suffix, credential_requirements=self.credential_requirements)
+
+    def _export___iter__(self):
+        return GangaListIter(self.__iter__())
 
     def addSet(self, newSet):
         '''Add a new FileSet to the dataset'''
+        self._resetOffsets()
         self.files.append(newSet)
 
     def getFileNames(self):
@@ -254,6 +256,7 @@ class LHCbCompressedDataset(GangaDataset):
         already in the dataset. You may extend with another LHCbCompressedDataset,
         LHCbDataset, DiracFile or a list of string of LFNs'''
 
+        self._resetOffsets()
         if isType(other, LHCbCompressedDataset):
             self.files.extend(other.files)
         elif isType(other, GangaLHCb.Lib.LHCbDataset.LHCbDataset):
@@ -423,7 +426,7 @@ class LHCbCompressedDataset(GangaDataset):
                 return snew + sdatasetsnew + sold + sdatasetsold
 
     def _checkOtherFiles(self, other):
-        if isType(other, GangaList) or isType(other, []):
+        if isType(other, [list, tuple, GangaList]):
             other_files = other
         elif isType(other, LHCbCompressedDataset):
             other_files = other.getLFNs()
@@ -435,8 +438,8 @@ class LHCbCompressedDataset(GangaDataset):
 
     def difference(self, other):
         '''Returns a new data set w/ files in this that are not in other.'''
-        other_files = self._checkOtherFiles(other)
-        files = set(self.getLFNs()).difference(other_files)
+        other_files = set(self._checkOtherFiles(other))
+        files = dict.fromkeys(_lfn for _lfn in self.getLFNs() if _lfn not in other_files)
         data = LHCbCompressedDataset(list(files))
         return data
 
@@ -453,22 +456,24 @@ class LHCbCompressedDataset(GangaDataset):
     def symmetricDifference(self, other):
         '''Returns a new data set w/ files in either this or other but not
         both.'''
-        other_files = self._checkOtherFiles(other)
-        files = set(self.getLFNs()).symmetric_difference(other_files)
-        data = LHCbCompressedDataset(list(files))
+        these_files = dict.fromkeys(self.getLFNs())
+        other_files = dict.fromkeys(self._checkOtherFiles(other))
+        files = [_lfn for _lfn in these_files if _lfn not in other_files]
+        files.extend(_lfn for _lfn in other_files if _lfn not in these_files)
+        data = LHCbCompressedDataset(files)
         return data
 
     def intersection(self, other):
         '''Returns a new data set w/ files common to this and other.'''
-        other_files = self._checkOtherFiles(other)
-        files = set(self.getLFNs()).intersection(other_files)
+        other_files = set(self._checkOtherFiles(other))
+        files = dict.fromkeys(_lfn for _lfn in self.getLFNs() if _lfn in other_files)
         data = LHCbCompressedDataset(list(files))
         return data
 
     def union(self, other):
         '''Returns a new data set w/ files from this and other.'''
-        other_files = self._checkOtherFiles(other)
-        files = set(self.getLFNs()).union(other_files)
+        files = dict.fromkeys(self.getLFNs())
+        files.update(dict.fromkeys(self._checkOtherFiles(other)))
         data = LHCbCompressedDataset(list(files))
         return data
 
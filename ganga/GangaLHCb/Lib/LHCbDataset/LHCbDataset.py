@@ -13,6 +13,7 @@ from .LHCbDatasetUtils import isLFN, isPFN, isDiracFile, strToDataFile, getDataF
 from GangaCore.GPIDev.Base.Proxy import isType, stripProxy, getName
 from GangaCore.GPIDev.Lib.Job.Job import Job, JobTemplate
 from GangaDirac.Lib.Backends.DiracUtils import get_result
+from GangaDirac.Lib.Utilities.ReplicaCache import getReplicaCache
 from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList, makeGangaListByRef
 from GangaCore.GPIDev.Adapters.IGangaFile import IGangaFile
 from GangaCore.GPIDev.Lib.File.LocalFile import LocalFile
@@ -139,8 +140,14 @@ class LHCbDataset(GangaDataset):
     def getReplicas(self):
         'Returns the replicas for all files in the dataset.'
         lfns = self.getLFNs()
-        cmd = 'getReplicas(%s)' % str(lfns)
-        result = get_result(cmd, 'LFC query error. Could not get replicas.')
+
+        def fetch(missing):
+            cmd = 'getReplicas(%s)' % str(missing)
+            return get_result(cmd, 'LFC query error. Could not get replicas.')
+
+        # only the LFNs missing from the replica cache are looked up
+        cache = getReplicaCache()
+        result = fetch(lfns) if cache is None else cache.lookup(lfns, fetch)
         return result['Successful']
 
     def hasLFNs(self):
@@ -0,0 +1,305 @@
+"""
+Merging of XML summaries which streams through them rather than parsing each of them into a tree.
+
+Each summary is read with iterparse, folding its counters, lumi counters and file records into a SummaryAccumulator
+and dropping its elements as soon as they have been read. The summaries can be shared out in contiguous shards among
+a pool of processes, the accumulators of which are reduced in order. The merged Summary is then built from the
+accumulated totals and is the same as the one made by summary.Merge.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+from GangaLHCb.Lib.XMLSummary import summary
+from GangaLHCb.Lib.XMLSummary.summary import Summary
+
+# Schema of each schema file read by this process
+_schemas = {}
+
+# Fewest summaries read by each process of the pool
+_min_shard_size = 100
+
+
+def _getSchema(schemafile):
+    if schemafile not in _schemas:
+        _schemas[schemafile] = summary.__schema__.Schema(schemafile)
+    return _schemas[schemafile]
+
+
+def _earlierStep(step, other, steps):
+    """The earlier of two steps in the enumeration of the schema, as retained by summary.Merge"""
+    if step == other:
+        return step
+    for this_step in steps:
+        if step == this_step:
+            return step
+        if other == this_step:
+            return other
+    return step
+
+
+def _mergeStatus(status, other):
+    """The status of a file seen as status, then as other, as in Summary.__file_merger__"""
+    if other is None or status == 'fail':
+        return status
+    if other == 'fail':
+        return other
+    if status == 'mult':
+        return status
+    if status == 'full':
+        return 'mult'
+    if other == 'none':
+        return status
+    return other
+
+
+class SummaryAccumulator(object):
+    """
+    The totals of a run of XML summaries: success, step, memory usage, file records, counters and lumi counters
+    """
+
+    def __init__(self, schemafile):
+        """
+        Args:
+            schemafile (str): The XML schema of the summaries
+        """
+        self.schemafile = schemafile
+        self.nSummaries = 0
+        self.success = True
+        self.step = ''
+        # [unit, maximum] of the memory usage
+        self.memory = None
+        # [name, GUID, status, events] by mother, in the order they were seen
+        self.files = {'input': [], 'output': []}
+        self.counters = {'counters': {}, 'lumiCounters': {}}
+        # [format, [values of each summary], max, min] by name. The values are summed in order once all of them are
+        # known, as the merged summary sums the doubles of the summaries one after the other
+        self.statEntities = {'counters': {}, 'lumiCounters': {}}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the index of the file records is rebuilt when needed
+        state.pop('_fileIndex', None)
+        return state
+
+    def _index(self, mother):
+        if not hasattr(self, '_fileIndex'):
+            self._fileIndex = {}
+            for this_mother, records in self.files.items():
+                self._fileIndex[this_mother] = {}
+                for record in records:
+                    for key in record[:2]:
+                        if key is not None:
+                            self._fileIndex[this_mother][key] = record
+        return self._fileIndex[mother]
+
+    def _fillFile(self, mother, filename, GUID, status, events):
+        """Add a file record as Summary.__fill_file__ does"""
+        if filename == "":
+            filename = None
+        if GUID == "":
+            GUID = None
+        if status == "":
+            status = None
+        if filename is None and GUID is None:
+            return
+        if filename is not None and "LFN:" not in filename.upper() and "PFN:" not in filename.upper():
+            filename = "PFN:" + filename
+
+        index = self._index(mother)
+        record = None
+        if GUID is not None and GUID in index:
+            record = index[GUID]
+        elif filename is not None and filename in index:
+            record = index[filename]
+
+        if record is None:
+            record = [filename, GUID, 'none' if status is None else status, events]
+            self.files[mother].append(record)
+            for key in (filename, GUID):
+                if key is not None:
+                    index[key] = record
+            return
+
+        if GUID is not None and filename is not None:
+            for i, key in ((0, filename), (1, GUID)):
+                if record[i] is None:
+                    record[i] = key
+                    index[key] = record
+        record[2] = _mergeStatus(record[2], status)
+        record[3] += events
+
+    def _fillMemory(self, unit, memory):
+        if self.memory is None:
+            self.memory = [unit, memory]
+            return
+        if self.memory[0] != unit:
+            raise AttributeError('I cannot compare two MemoryMaxima when they have different units! '
+                                 + self.memory[0] + " " + unit)
+        if self.memory[1] < memory:
+            self.memory[1] = memory
+
+    def _fillStatEntity(self, mother, name, format, values, max, min):
+        if name not in self.statEntities[mother]:
+            self.statEntities[mother][name] = [format, [(format, values)], max, min]
+            return
+        stat = self.statEntities[mother][name]
+        stat[1].append((format, values))
+        if stat[2] < max:
+            stat[2] = max
+        if stat[3] > min:
+            stat[3] = min
+
+    def read(self, xmlfile):
+        """
+        Fold the content of a summary file into the totals
+        Args:
+            xmlfile (str): The summary file
+        """
+        schema = _getSchema(self.schemafile)
+        xmlfile = os.path.expanduser(os.path.expandvars(xmlfile))
+        if not os.path.exists(xmlfile):
+            raise IOError('file does not exist ' + str(xmlfile))
+
+        def vtree(element):
+            return summary.__schema__.VTree(element, schema, None, False)
+
+        path = []
+        seen = set()
+        for event, element in ElementTree.iterparse(xmlfile, events=('start', 'end')):
+            if event == 'start':
+                if not path and not schema.Tag_isRoot(element.tag):
+                    raise TypeError('This file does not have the root of the schema')
+                path.append(element.tag)
+                continue
+            path.pop()
+            tag = element.tag
+            mother = path[-1] if path else None
+            if mother == schema.root():
+                # only the first of each child of the summary is merged
+                if tag in seen:
+                    continue
+                seen.add(tag)
+                if tag == 'success':
+                    if vtree(element).value() is False:
+                        self.success = False
+                elif tag == 'step':
+                    self.step = _earlierStep(self.step, element.text, schema.Tag_enumeration('step'))
+                element.clear()
+            elif len(path) != 2 or path[1] in seen:
+                continue
+            elif mother == 'usage' and tag == 'stat':
+                self._fillMemory(element.attrib['unit'], vtree(element).value())
+            elif mother in self.files and tag == summary.__file_tag__:
+                self._fillFile(mother, element.attrib['name'], element.attrib['GUID'], element.attrib['status'],
+                               int(element.text))
+            elif mother in self.counters and tag == summary.__count_tag__:
+                name = element.attrib['name']
+                self.counters[mother][name] = self.counters[mother].get(name, 0) + int(element.text)
+            elif mother in self.statEntities and tag == 'statEntity':
+                stat = vtree(element)
+                self._fillStatEntity(mother, element.attrib['name'], stat.attrib('format'), stat.value(),
+                                     stat.attrib('max'), stat.attrib('min'))
+        self.nSummaries += 1
+
+    def update(self, other):
+        """
+        Fold the totals of the summaries which come after these into them
+        Args:
+            other (SummaryAccumulator): The totals of the next summaries
+        """
+        if other.nSummaries == 0:
+            return
+        self.nSummaries += other.nSummaries
+        self.success = self.success and other.success
+        self.step = _earlierStep(self.step, other.step, _getSchema(self.schemafile).Tag_enumeration('step'))
+        if other.memory is not None:
+            self._fillMemory(*other.memory)
+        for mother, records in other.files.items():
+            for filename, GUID, status, events in records:
+                self._fillFile(mother, filename, GUID, status, events)
+        for mother, counters in other.counters.items():
+            for name, value in counters.items():
+                self.counters[mother][name] = self.counters[mother].get(name, 0) + value
+        for mother, stats in other.statEntities.items():
+            for name, (format, contributions, max, min) in stats.items():
+                if name not in self.statEntities[mother]:
+                    self.statEntities[mother][name] = [format, list(contributions), max, min]
+                    continue
+                stat = self.statEntities[mother][name]
+                stat[1].extend(contributions)
+                if stat[2] < max:
+                    stat[2] = max
+                if stat[3] > min:
+                    stat[3] = min
+
+    def summary(self):
+        """
+        Returns the merged Summary of the summaries
+        """
+        schema = _getSchema(self.schemafile)
+        merged = Summary(schema)
+        merged.children('success')[0].value(self.success)
+        merged.children('step')[0].__element__.text = self.step
+        if self.memory is not None:
+            merged.fill_memory(self.memory[1], self.memory[0])
+        for filename, GUID, status, events in self.files['input']:
+            merged.fill_input(filename, GUID, status, events)
+        for filename, GUID, status, events in self.files['output']:
+            merged.fill_output(filename, GUID, status, events)
+        for name, value in self.counters['lumiCounters'].items():
+            merged.fill_lumi(name, value)
+        for name, value in self.counters['counters'].items():
+            merged.fill_counter(name, value)
+        for mother in ('counters', 'lumiCounters'):
+            for name, (format, contributions, max, min) in self.statEntities[mother].items():
+                values = list(contributions[0][1])
+                for this_format, these_values in contributions[1:]:
+                    for i in range(len(format)):
+                        for j in range(len(this_format)):
+                            if format[i] == this_format[j]:
+                                # all entries are additive
+                                values[i] = values[i] + these_values[j]
+                                break
+                element = ElementTree.Element('statEntity', {'name': name, 'format': ' '.join(format),
+                                                             'max': str(max), 'min': str(min)})
+                element.text = schema.__list2str__(values)
+                merged.fill_VTree_counter(summary.__schema__.VTree(element, schema, None, False),
+                                          isLumi=mother == 'lumiCounters')
+        if not schema.__check__(merged.__element__):
+            raise AttributeError('merged file could not be verified')
+        return merged
+
+
+def _readSummaries(schemafile, summaries):
+    accumulator = SummaryAccumulator(schemafile)
+    for xmlfile in summaries:
+        accumulator.read(xmlfile)
+    return accumulator
+
+
+def StreamMerge(summaries, schemafile=summary.__default_schema__, processes=0):
+    """
+    Merge a list of summary files, return a new Summary
+    Args:
+        summaries (list): The summary files
+        schemafile (str): The XML schema of the summaries
+        processes (int): The number of processes to share the summaries among, 0 to read them in this one
+    """
+    if not isinstance(summaries, list):
+        raise TypeError('you should send a list into the merger, I got a ' + str(type(summaries)) + ' object instead')
+    schemafile = os.path.expanduser(os.path.expandvars(schemafile))
+
+    processes = min(processes, len(summaries) // _min_shard_size)
+    if processes <= 1:
+        return _readSummaries(schemafile, summaries).summary()
+
+    shard_size = -(-len(summaries) // processes)
+    shards = [summaries[i:i + shard_size] for i in range(0, len(summaries), shard_size)]
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        accumulators = list(pool.map(_readSummaries, [schemafile] * len(shards), shards))
+    accumulator = accumulators[0]
+    for other in accumulators[1:]:
+        accumulator.update(other)
+    return accumulator.summary()
@@ -343,7 +343,7 @@ class Summary(__schema__.VTree):
         # print self.__count_dict__
         # print self.__count_dict__[mother]
         if name not in self.__count_dict__[mother]:
-            counters = __schema__.VTree([bt for bt in self.__element__.getchildren()
+            counters = __schema__.VTree([bt for bt in list(self.__element__)
                                         if mother in bt.tag][0], self.__schema__, self, False)
             # counter=counter.clone()
             counters.__append_element__(counter)
@@ -449,8 +449,8 @@ def Merge(summaries, schemafile=__default_schema__):
     sum_objects = []
 
     if type("") == type(summaries[0]) and str(type(Summary(schemafile=schemafile))) == str(type(summaries[0])):
-        raise TypeError('you should send strings or Summaries into the merger, I got a ' +
-                        str(type(summaries[0])) + ' object instead')
+        raise TypeError('you should send strings or Summaries into the merger, I got a '
+                        + str(type(summaries[0])) + ' object instead')
 
     if str(type(Summary(schemafile=schemafile))) == str(type(summaries[0])):
         sum_objects = summaries
@@ -71,6 +71,15 @@ if not _after_bootstrap:
                          'Possible SplitByFiles backend algorithms to use to split jobs into subjobs,\
                           options are: GangaDiracSplitter, OfflineGangaDiracSplitter, \
                           splitInputDataBySize and splitInputData')
+    configLHCb.addOption('BKQueryCacheTTL', 3600,
+                         'Time (sec) for which the result of a BKQuery is kept in the gangadir and used instead of '
+                         'querying the bookkeeping again, 0 to always query it')
+    configLHCb.addOption('GaudiExecBuildCache', True,
+                         'Reuse the build of a GaudiExec project when preparing it again with its files unchanged, '
+                         'rather than running make again')
+    configLHCb.addOption('XMLSummaryMergeProcesses', 0,
+                         'Number of processes among which the XML summaries of the subjobs of a job are shared out '
+                         'when merging them, 0 to read all of them in the Ganga process')
     defaultLHCbDirac = 'prod'
     configLHCb.addOption('LHCbDiracVersion', defaultLHCbDirac, 'set LHCbDirac version')
 
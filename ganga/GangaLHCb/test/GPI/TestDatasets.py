@@ -113,3 +113,29 @@ class TestDatasets(GangaUnitTest):
         assert len(ds1) == 4
         assert ds1.getLFNs() == ['/path/to/some/file/a', '/path/to/some/otherfile/b',
                                  '/otherpath/to/some/file/c', '/path/to/some/otherfile/d']
+
+        # Iteration goes through every set in order and yields DiracFiles
+        assert [_f.lfn for _f in ds1] == ds1.getLFNs()
+        assert all(isinstance(_f, DiracFile) for _f in ds1)
+        assert ds1[-1].lfn == '/path/to/some/otherfile/d'
+        assert ds1[4] is None
+
+        # Slices keep the sets they were taken from
+        assert ds1[1:3].getLFNs() == ['/path/to/some/otherfile/b', '/otherpath/to/some/file/c']
+        assert len(ds1[1:3].files) == 2
+        assert ds1[::-1].getLFNs() == ds1.getLFNs()[::-1]
+        assert ds1[3:0:-2].getLFNs() == ['/path/to/some/otherfile/d', '/path/to/some/otherfile/b']
+        assert len(ds1[10:]) == 0
+
+        # Set operations keep the order of the files
+        assert ds1.intersection(ds2).getLFNs() == ['/otherpath/to/some/file/c', '/path/to/some/otherfile/d']
+        assert ds2.symmetricDifference(['/path/to/some/otherfile/d', '/new/file']).getLFNs() == \
+            ['/otherpath/to/some/file/c', '/new/file']
+
+        # Indexing follows the sets added after the dataset was last indexed
+        ds1.append('/appended/file')
+        assert len(ds1) == 5
+        assert ds1[4].lfn == '/appended/file'
+        ds1.extend(ds2)
+        assert ds1[-1].lfn == '/path/to/some/otherfile/d'
+        assert len(ds1) == 7
@@ -0,0 +1,70 @@
+""" Test the cache of the results of bookkeeping queries"""
+
+import os
+import time
+
+
+def test_result(tmpdir):
+    """The result of a query is used until it is older than the TTL or invalidated"""
+    from GangaLHCb.Lib.LHCbDataset.BKQueryCache import BKQueryCache
+
+    cache = BKQueryCache(os.path.join(str(tmpdir), 'bkquery_cache.sqlite'), 0.5)
+    query = cache.key(['/LHCb/Collision18/Beam6500GeV/Real Data/90000000/DST', 'OK', 'Path', '', '', '', None, True])
+    other = cache.key(['/LHCb/Collision18/Beam6500GeV/Real Data/90000000/DST', 'OK', 'Path', '', '', '', 'CERN-DST',
+                       True])
+    lfns = ['/lhcb/LHCb/Collision18/DST/00001/%04d.dst' % i for i in range(3)]
+
+    assert cache.get(query) is None
+    assert cache.put(query, lfns) == ('/lhcb/LHCb/Collision18/DST/00001', ['/0000.dst', '/0001.dst', '/0002.dst'])
+    assert cache.get(query) == ('/lhcb/LHCb/Collision18/DST/00001', ['/0000.dst', '/0001.dst', '/0002.dst'])
+    assert cache.get(other) is None
+
+    cache.invalidate(query)
+    assert cache.get(query) is None
+    cache.put(query, lfns)
+    time.sleep(0.6)
+    assert cache.get(query) is None
+
+    cache.put(query, [])
+    cache.ttl = 3600
+    assert cache.get(query) == ('', [])
+
+
+def test_single_file(tmpdir):
+    """The result of a query which returns a single LFN is kept whole"""
+    from GangaLHCb.Lib.LHCbDataset.BKQueryCache import BKQueryCache
+
+    cache = BKQueryCache(os.path.join(str(tmpdir), 'bkquery_cache.sqlite'), 3600)
+    query = cache.key(['/LHCb/Collision18/Beam6500GeV/Real Data/90000000/DST', 'OK', 'Path', '', '', '', None, True])
+
+    assert cache.put(query, ['/lhcb/LHCb/Collision18/DST/00001/0000.dst']) == \
+        ('/lhcb/LHCb/Collision18/DST/00001', ['/0000.dst'])
+    assert cache.get(query) == ('/lhcb/LHCb/Collision18/DST/00001', ['/0000.dst'])
+
+    cache.put(query, ['/0000.dst'])
+    assert cache.get(query) == ('', ['/0000.dst'])
+
+
+def test_changes(tmpdir):
+    """Each consumer gets the LFNs added and removed since it last asked"""
+    from GangaLHCb.Lib.LHCbDataset.BKQueryCache import BKQueryCache
+
+    cache = BKQueryCache(os.path.join(str(tmpdir), 'bkquery_cache.sqlite'), 3600)
+    query = cache.key(['/MC/2018/Beam6500GeV/Sim09/12345678/ALLSTREAMS.DST', 'OK', 'Path', '', '', '', None, True])
+
+    cache.put(query, ['/lfn/a', '/lfn/b'])
+    assert cache.changes(query, 'first') == (['/lfn/a', '/lfn/b'], [])
+    assert cache.changes(query, 'first') == ([], [])
+
+    cache.put(query, ['/lfn/a', '/lfn/c'])
+    assert cache.changes(query, 'first') == (['/lfn/c'], ['/lfn/b'])
+    cache.put(query, ['/lfn/a', '/lfn/b', '/lfn/c', '/lfn/d'])
+    assert cache.changes(query, 'first') == (['/lfn/b', '/lfn/d'], [])
+
+    # a consumer which has not asked before gets the whole of the current result
+    assert cache.changes(query, 'second') == (['/lfn/a', '/lfn/b', '/lfn/c', '/lfn/d'], [])
+
+    # a file removed and added back again since the consumer last asked is no change
+    cache.put(query, ['/lfn/a', '/lfn/c', '/lfn/d'])
+    cache.put(query, ['/lfn/a', '/lfn/b', '/lfn/c'])
+    assert cache.changes(query, 'second') == ([], ['/lfn/d'])
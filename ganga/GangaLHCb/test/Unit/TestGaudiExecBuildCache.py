@@ -0,0 +1,49 @@
+""" Test the cache of the builds of GaudiExec projects"""
+
+import os
+
+
+def write(filename, content):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as this_file:
+        this_file.write(content)
+
+
+def test_fingerprint(tmpdir):
+    """The fingerprint of a project changes with its sources, not with its builds"""
+    from GangaLHCb.Lib.Applications.GaudiExecBuildCache import getProjectFingerprint
+
+    project = str(tmpdir)
+    write(os.path.join(project, 'Makefile'), 'include toolchain.cmake')
+    write(os.path.join(project, 'Phys', 'MyAnalysis', 'src', 'MyAlg.cpp'), 'int a;')
+    fingerprint = getProjectFingerprint(project, 'x86_64-centos7-gcc9-opt', 'ganga-input-sandbox')
+
+    write(os.path.join(project, 'build.x86_64-centos7-gcc9-opt', 'ganga', 'input-sandbox.tgz'), 'built')
+    write(os.path.join(project, '.git', 'index'), 'checked out')
+    assert getProjectFingerprint(project, 'x86_64-centos7-gcc9-opt', 'ganga-input-sandbox') == fingerprint
+
+    assert getProjectFingerprint(project, 'x86_64-centos7-gcc9-dbg', 'ganga-input-sandbox') != fingerprint
+    write(os.path.join(project, 'Phys', 'MyAnalysis', 'src', 'MyAlg.cpp'), 'int b;')
+    assert getProjectFingerprint(project, 'x86_64-centos7-gcc9-opt', 'ganga-input-sandbox') != fingerprint
+
+
+def test_index(tmpdir):
+    """The builds are found by fingerprint for as long as a shared directory holds their tarball"""
+    from GangaLHCb.Lib.Applications.GaudiExecBuildCache import GaudiExecBuildCache
+
+    shared_path = os.path.join(str(tmpdir), 'shared')
+    cache = GaudiExecBuildCache(os.path.join(str(tmpdir), 'gaudiexec_build_cache.json'), shared_path)
+    assert cache.lookup('project', 'cmake-input-sandbox.tgz') is None
+
+    for name in ('conf-1', 'conf-2'):
+        write(os.path.join(shared_path, name, 'cmake-input-sandbox.tgz'), 'built')
+    env = {'XMLSUMMARYBASEROOT': '/cvmfs/lhcb.cern.ch/lib/lhcb/LHCB/LHCB_v42r4/Kernel/XMLSummaryBase'}
+    cache.store('project', 'options', 'conf-1', env)
+    cache.store('project', 'other options', 'conf-2', env)
+    build = cache.lookup('project', 'cmake-input-sandbox.tgz')
+    assert build == {'envVars': env, 'sharedirs': {'options': 'conf-1', 'other options': 'conf-2'}}
+
+    os.unlink(os.path.join(shared_path, 'conf-1', 'cmake-input-sandbox.tgz'))
+    assert cache.lookup('project', 'cmake-input-sandbox.tgz')['sharedirs'] == {'other options': 'conf-2'}
+    os.unlink(os.path.join(shared_path, 'conf-2', 'cmake-input-sandbox.tgz'))
+    assert cache.lookup('project', 'cmake-input-sandbox.tgz') is None
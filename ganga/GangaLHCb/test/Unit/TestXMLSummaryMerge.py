@@ -0,0 +1,184 @@
+""" Test that merging XML summaries by streaming them gives the same summary as summary.Merge"""
+
+import os
+import random
+
+# The parts of the XMLSummary schema of LHCb which the summaries written by the tests use
+SCHEMA = '''<?xml version="1.0" encoding="UTF-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" elementFormDefault="qualified">
+  <xs:element name="summary">
+    <xs:complexType>
+      <xs:sequence>
+        <xs:element name="success" type="xs:boolean" default="false"/>
+        <xs:element name="step" type="StepType" default="initialize"/>
+        <xs:element name="usage" type="UsageType"/>
+        <xs:element name="input" type="FilesType"/>
+        <xs:element name="output" type="FilesType"/>
+        <xs:element name="counters" type="CountersType"/>
+        <xs:element name="lumiCounters" type="CountersType"/>
+      </xs:sequence>
+      <xs:attribute name="version" type="xs:string"/>
+    </xs:complexType>
+  </xs:element>
+  <xs:simpleType name="DoubleList">
+    <xs:list itemType="xs:double"/>
+  </xs:simpleType>
+  <xs:simpleType name="StringList">
+    <xs:list itemType="xs:string"/>
+  </xs:simpleType>
+  <xs:simpleType name="StatusType">
+    <xs:restriction base="xs:string">
+      <xs:enumeration value="none"/>
+      <xs:enumeration value="fail"/>
+      <xs:enumeration value="part"/>
+      <xs:enumeration value="full"/>
+      <xs:enumeration value="mult"/>
+    </xs:restriction>
+  </xs:simpleType>
+  <xs:complexType name="FileType">
+    <xs:simpleContent>
+      <xs:extension base="xs:unsignedLong">
+        <xs:attribute name="GUID" type="xs:string" default=""/>
+        <xs:attribute name="name" type="xs:string" default=""/>
+        <xs:attribute name="status" type="StatusType" default="none"/>
+      </xs:extension>
+    </xs:simpleContent>
+  </xs:complexType>
+  <xs:complexType name="CounterType">
+    <xs:simpleContent>
+      <xs:extension base="xs:unsignedLong">
+        <xs:attribute name="name" type="xs:string" use="required"/>
+      </xs:extension>
+    </xs:simpleContent>
+  </xs:complexType>
+  <xs:complexType name="StatEntityType">
+    <xs:simpleContent>
+      <xs:extension base="DoubleList">
+        <xs:attribute name="name" type="xs:string" use="required"/>
+        <xs:attribute name="format" type="StringList" default="Flag Entries Flag2"/>
+        <xs:attribute name="max" type="xs:double" default="0"/>
+        <xs:attribute name="min" type="xs:double" default="0"/>
+      </xs:extension>
+    </xs:simpleContent>
+  </xs:complexType>
+  <xs:complexType name="StatType">
+    <xs:simpleContent>
+      <xs:extension base="xs:double">
+        <xs:attribute name="useOf" type="xs:string" use="required"/>
+        <xs:attribute name="unit" type="xs:string" default="b"/>
+      </xs:extension>
+    </xs:simpleContent>
+  </xs:complexType>
+  <xs:complexType name="FilesType">
+    <xs:sequence>
+      <xs:element name="file" type="FileType" minOccurs="0" maxOccurs="unbounded"/>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:complexType name="CountersType">
+    <xs:sequence>
+      <xs:choice minOccurs="0" maxOccurs="unbounded">
+        <xs:element name="counter" type="CounterType" minOccurs="0" maxOccurs="unbounded"/>
+        <xs:element name="statEntity" type="StatEntityType" minOccurs="0" maxOccurs="unbounded"/>
+      </xs:choice>
+    </xs:sequence>
+  </xs:complexType>
+  <xs:simpleType name="StepType">
+    <xs:restriction base="xs:string">
+      <xs:enumeration value="initialize"/>
+      <xs:enumeration value="execute"/>
+      <xs:enumeration value="finalize"/>
+      <xs:enumeration value="terminate"/>
+    </xs:restriction>
+  </xs:simpleType>
+  <xs:complexType name="UsageType">
+    <xs:sequence>
+      <xs:element name="stat" type="StatType" minOccurs="0" maxOccurs="unbounded"/>
+    </xs:sequence>
+  </xs:complexType>
+</xs:schema>
+'''
+
+SUMMARY = '''<?xml version="1.0" encoding="UTF-8"?>
+<summary version="1.0" xsi:noNamespaceSchemaLocation="$XMLSUMMARYBASEROOT/xml/XMLSummary.xsd"
+         xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <success>%(success)s</success>
+  <step>%(step)s</step>
+  <usage>
+    <stat unit="KB" useOf="MemoryMaximum">%(memory)d.0</stat>
+  </usage>
+  <input>
+%(input)s  </input>
+  <output>
+%(output)s  </output>
+  <counters>
+%(counters)s  </counters>
+  <lumiCounters>
+%(lumiCounters)s  </lumiCounters>
+</summary>
+'''
+
+
+def statEntity(rnd, name):
+    return '    <statEntity format="Flag Entries Flag2" name="%s" max="%r" min="%r">%r %d %r</statEntity>\n' % (
+        name, rnd.random() * 10, rnd.random(), rnd.random() * 100, rnd.randint(1, 100), rnd.random() * 1000)
+
+
+def writeSummaries(directory, n, seed):
+    """Write n summaries which share some of their input and output files, return their names"""
+    rnd = random.Random(seed)
+    summaries = []
+    for i in range(n):
+        content = {
+            'success': rnd.choice(['True', 'True', 'False']),
+            'step': rnd.choice(['initialize', 'execute', 'finalize', 'terminate']),
+            'memory': rnd.randint(1000, 9000),
+            'input': ''.join('    <file GUID="G%d" name="LFN:/lhcb/f%d.dst" status="%s">%d</file>\n'
+                             % (k, k, rnd.choice(['full', 'part', 'fail', 'none', 'mult']), rnd.randint(0, 1000))
+                             for k in rnd.sample(range(3 * n), 3)),
+            'output': ('    <file GUID="" name="PFN:out_%d.root" status="full">%d</file>\n'
+                       % (rnd.randint(0, 2), rnd.randint(0, 100))
+                       + '    <file GUID="" name="tuple.root" status="full">%d</file>\n' % rnd.randint(0, 100)),
+            'counters': (''.join('    <counter name="c%d">%d</counter>\n' % (k, rnd.randint(0, 10**6)) for k in range(5))
+                         + statEntity(rnd, 's1')),
+            'lumiCounters': ('    <counter name="lumi_simple">%d</counter>\n' % rnd.randint(0, 100)
+                             + statEntity(rnd, 'IntegrateBeamCrossing/Luminosity')),
+        }
+        filename = os.path.join(directory, 'summary_%d.xml' % i)
+        with open(filename, 'w') as summary_file:
+            summary_file.write(SUMMARY % content)
+        summaries.append(filename)
+    return summaries
+
+
+def content(merged):
+    """Everything held by a merged summary, in an order which doesn't depend on how it was built"""
+    from GangaLHCb.Lib.XMLSummary import summary
+
+    elements = []
+    for child in list(merged.__element__):
+        for element in [child] + list(child):
+            vtree = summary.__schema__.VTree(element, merged.__schema__, None, False)
+            if element.tag == 'statEntity':
+                attributes = (element.attrib['name'], vtree.attrib('max'), vtree.attrib('min'))
+            else:
+                attributes = tuple(sorted(element.attrib.items()))
+            elements.append((child.tag, element.tag, attributes, str(vtree.value())))
+    return sorted(elements)
+
+
+def test_stream_merge(tmpdir, monkeypatch):
+    """StreamMerge gives the summary made by summary.Merge, whether the summaries are shared out or not"""
+    from GangaLHCb.Lib.XMLSummary import merger, summary
+
+    schemafile = os.path.join(str(tmpdir), 'XMLSummary.xsd')
+    with open(schemafile, 'w') as schema_file:
+        schema_file.write(SCHEMA)
+    # share small runs of summaries out among the processes too
+    monkeypatch.setattr(merger, '_min_shard_size', 2)
+
+    for seed, n in enumerate([1, 2, 7, 30]):
+        directory = tmpdir.mkdir('summaries_%d' % seed)
+        summaries = writeSummaries(str(directory), n, seed)
+        expected = content(summary.Merge(summaries, schemafile))
+        assert content(merger.StreamMerge(summaries, schemafile)) == expected
+        assert content(merger.StreamMerge(summaries, schemafile, processes=3)) == expected
@@ -0,0 +1,69 @@
+import itertools
+import time
+
+import GangaCore.Utility.logging
+from GangaCore.GPIDev.Adapters.IBackend import IBackend
+from GangaCore.GPIDev.Lib.Job import JobError
+from GangaCore.GPIDev.Schema import Schema, SimpleItem, Version
+from GangaCore.Utility.Config import getConfig
+
+logger = GangaCore.Utility.logging.getLogger()
+
+monconf = getConfig('PollThread')
+monconf.addOption('FakeScheduler', 1, 'poll rate for the fake scheduler')
+
+
+class FakeScheduler(IBackend):
+
+    """In-process stand-in for a batch system, used to measure how Ganga itself scales.
+
+    Nothing is run: each submission takes submit_latency seconds, the job then sits in the queue for queue_time
+    seconds before it is reported as running and for run_time more seconds before it is reported as completed
+    (or failed if fail is set).
+    """
+    _schema = Schema(Version(1, 0), {
+        'id': SimpleItem(defvalue=-1, protected=1, copyable=0, doc='Id of the job in the fake scheduler'),
+        'submit_latency': SimpleItem(defvalue=0., typelist=['float', 'int'],
+                                     doc='Time taken by each submission in seconds'),
+        'queue_time': SimpleItem(defvalue=0., typelist=['float', 'int'], changable_at_resubmit=1,
+                                 doc='Time spent queueing before the job is reported as running in seconds'),
+        'run_time': SimpleItem(defvalue=0., typelist=['float', 'int'], changable_at_resubmit=1,
+                               doc='Time spent running before the job is reported as finished in seconds'),
+        'fail': SimpleItem(defvalue='', changable_at_resubmit=1,
+                           doc='Define the artificial failures: "submit" or "run"'),
+        'submit_time': SimpleItem(defvalue=0., typelist=['float', 'int'], protected=1, comparable=0, copyable=0,
+                                  doc='When the job was handed to the fake scheduler'),
+    })
+    _category = 'backends'
+    _name = 'FakeScheduler'
+
+    _next_id = itertools.count(1)
+
+    def __init__(self):
+        super(FakeScheduler, self).__init__()
+
+    def submit(self, jobconfig, master_input_sandbox):
+        if self.submit_latency:
+            time.sleep(self.submit_latency)
+        if self.fail == 'submit':
+            raise JobError('triggered failure during submit')
+        self.id = next(FakeScheduler._next_id)
+        self.submit_time = time.time()
+        return 1
+
+    def resubmit(self):
+        return self.submit(None, None)
+
+    def kill(self):
+        return True
+
+    @staticmethod
+    def updateMonitoringInformation(jobs):
+        now = time.time()
+        for j in jobs:
+            backend = j.backend
+            elapsed = now - backend.submit_time
+            if elapsed >= backend.queue_time + backend.run_time:
+                j.updateStatus('failed' if backend.fail == 'run' else 'completed')
+            elif elapsed >= backend.queue_time and j.status != 'running':
+                j.updateStatus('running')
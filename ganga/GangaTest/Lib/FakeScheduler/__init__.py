@@ -0,0 +1,3 @@
+from .FakeScheduler import FakeScheduler
+
+__all__ = ['FakeScheduler']
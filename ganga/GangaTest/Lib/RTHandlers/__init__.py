@@ -3,3 +3,4 @@ from GangaCore.GPIDev.Adapters.ApplicationRuntimeHandlers import allHandlers
 
 allHandlers.add('Executable', 'TestSubmitter', RTHandler)
 allHandlers.add('Executable', 'DummyRemote', RTHandler)
+allHandlers.add('Executable', 'FakeScheduler', RTHandler)
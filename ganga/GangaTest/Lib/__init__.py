@@ -2,6 +2,7 @@ import GangaTest.Lib.StoreTestFramework
 import GangaTest.Lib.CrashTest
 import GangaTest.Lib.RTHandlers
 import GangaTest.Lib.TestSubmitter.TestSubmitter
+import GangaTest.Lib.FakeScheduler
 import GangaTest.Lib.TestSubmitter.TestSplitter
 import GangaTest.Lib.TestApplication.TestApplication
 import GangaTest.Lib.GListApp.GListApp